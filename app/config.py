@@ -82,6 +82,8 @@ BACKGROUND_STORAGE_URL = 'db://background'
 TRACE_STORAGE_URL = 'db://trace'
 
 # Database connections
+DB_COPY_BUFFER_SIZE = _ByteSize('4 MiB')  # binary COPY data buffered before parsing
+DB_CURSOR_BATCH_SIZE = 10_000  # rows per server-side cursor fetch
 DUCKDB_TMPDIR: DirectoryPath | None = None
 
 # Replication processing
@@ -112,6 +114,7 @@ URLSAFE_BLACKLIST = '/;.,?%#'
 TRACE_FILE_UPLOAD_MAX_SIZE = _ByteSize('50 MiB')
 XML_PARSE_MAX_SIZE = _ByteSize('50 MiB')  # the same as CGImap
 REQUEST_PATH_QUERY_MAX_LENGTH = 2000
+STREAM_RESPONSE_BATCH_SIZE = 1000  # larger responses are streamed in batches
 
 # Compression settings
 COMPRESS_HTTP_MIN_SIZE = _ByteSize('1 KiB')
@@ -129,6 +132,10 @@ TRUSTED_HOSTS_EXTRA = ''
 
 # -------------------- Authentication and User --------------------
 
+# Auth cache
+AUTH_CACHE_EXPIRE = timedelta(minutes=1)
+AUTH_CACHE_SIZE = 10_000  # number of access tokens
+
 # Cookie settings
 COOKIE_AUTH_MAX_AGE = timedelta(days=365)
 COOKIE_GENERIC_MAX_AGE = timedelta(days=365)
@@ -244,6 +251,9 @@ CHANGESET_QUERY_MAX_LIMIT = 100
 CHANGESET_QUERY_WEB_LIMIT = 30
 CHANGESET_COMMENT_BODY_MAX_LENGTH = 5_000
 CHANGESET_COMMENTS_PAGE_SIZE = 15
+OPTIMISTIC_DIFF_GROUP_COMMIT_MAX_ELEMENTS = 100_000
+OPTIMISTIC_DIFF_GROUP_COMMIT_WINDOW = timedelta(milliseconds=2)
+OPTIMISTIC_DIFF_INCREMENTAL_MAX_CHANGES = 10_000  # more changes reload all elements
 OPTIMISTIC_DIFF_RETRY_TIMEOUT = timedelta(seconds=30)
 
 # Notes
@@ -265,6 +275,8 @@ REPORT_COMMENTS_PAGE_SIZE = 15
 # Search and Query
 MAP_QUERY_AREA_MAX_SIZE = 0.25  # in square degrees
 MAP_QUERY_LEGACY_NODES_LIMIT = 50_000
+MAP_QUERY_PAGE_NODES_LIMIT = 10_000  # nodes per API 0.7 map page
+MAP_QUERY_CURSOR_EXPIRE = timedelta(minutes=5)
 SEARCH_LOCAL_AREA_LIMIT = 100.0  # in square degrees
 SEARCH_LOCAL_MAX_ITERATIONS = 7
 SEARCH_LOCAL_RATIO = 0.5  # [0 - 1], smaller = more locality
@@ -314,6 +326,7 @@ ADMIN_TASK_TIMEOUT = timedelta(minutes=3)
 # General cache settings
 CACHE_DEFAULT_EXPIRE = timedelta(days=3)
 FILE_CACHE_LOCK_TIMEOUT = timedelta(seconds=15)
+TIMESCALEDB_CHUNKS_CACHE_EXPIRE = timedelta(minutes=1)
 
 # External service caches
 DNS_CACHE_EXPIRE = timedelta(minutes=10)
@@ -326,6 +339,17 @@ NOMINATIM_SEARCH_HTTP_TIMEOUT = timedelta(seconds=30)
 OVERPASS_CACHE_EXPIRE = timedelta(minutes=10)
 S3_CACHE_EXPIRE = timedelta(days=1)
 
+# Map query caches
+MAP_QUERY_TILE_CACHE_ZOOM = 16
+MAP_QUERY_TILE_CACHE_MAX_TILES = 16  # larger queries bypass the cache
+MAP_QUERY_TILE_CACHE_SIZE = 2048  # number of tiles
+MAP_QUERY_TILE_CACHE_MAX_CHANGES = 10_000  # more changes invalidate all tiles
+
+# Element caches
+ELEMENT_LATEST_CACHE_EXPIRE = timedelta(minutes=1)
+ELEMENT_LATEST_CACHE_SIZE = 20_000  # number of elements
+ELEMENT_VERSION_CACHE_SIZE = 20_000  # number of elements
+
 # Content caches
 DYNAMIC_AVATAR_CACHE_EXPIRE = timedelta(days=30)
 GRAVATAR_CACHE_EXPIRE = timedelta(days=7)
@@ -1,26 +1,41 @@
 from asyncio import TaskGroup
+from contextlib import aclosing
 from typing import Annotated, Literal
 from warnings import catch_warnings, filterwarnings
 
 import numpy as np
 from fastapi import APIRouter, Query, Response, status
 from pydantic import PositiveInt
+from starlette.responses import StreamingResponse
 
-from app.config import CHANGESET_QUERY_DEFAULT_LIMIT, CHANGESET_QUERY_MAX_LIMIT
+from app.config import (
+    CHANGESET_QUERY_DEFAULT_LIMIT,
+    CHANGESET_QUERY_MAX_LIMIT,
+    STREAM_RESPONSE_BATCH_SIZE,
+    XML_PARSE_MAX_SIZE,
+)
 from app.format import Format06
 from app.lib.auth_context import api_user
 from app.lib.date_utils import parse_date
 from app.lib.exceptions_context import raise_for
 from app.lib.geo_utils import parse_bbox
+from app.lib.pbf import PBF
+from app.lib.timing_context import timing
 from app.lib.xml_body import xml_body
+from app.middlewares.request_context_middleware import get_request
 from app.models.db.changeset_comment import changeset_comments_resolve_rich_text
+from app.models.db.element_batch import ElementBatch
 from app.models.db.user import User
 from app.models.types import ChangesetId, UserId
 from app.queries.changeset_comment_query import ChangesetCommentQuery
 from app.queries.changeset_query import ChangesetQuery
 from app.queries.element_query import ElementQuery
 from app.queries.user_query import UserQuery
-from app.responses.osm_response import DiffResultResponse, OSMChangeResponse
+from app.responses.osm_response import (
+    DiffResultResponse,
+    OSMChangeResponse,
+    OSMStream,
+)
 from app.services.changeset_service import ChangesetService
 from app.services.optimistic_diff import OptimisticDiff
 from app.validators.display_name import DisplayNameNormalizing
@@ -82,15 +97,46 @@ async def download_changeset(
     if changeset is None:
         raise_for.changeset_not_found(changeset_id)
 
-    async with TaskGroup() as tg:
-        tg.create_task(UserQuery.resolve_users([changeset]))
+    async def encode(batch: ElementBatch):
+        await UserQuery.resolve_element_batch_users(batch)
+        return Format06.encode_osmchange_batch(batch)
+
+    return OSMStream(
+        head={},
+        items=ElementQuery.iter_batches_by_changeset(
+            changeset_id,
+            sort_by='sequence_id',
+            batch_size=STREAM_RESPONSE_BATCH_SIZE,
+        ),
+        encode=encode,
+    )
 
-        elements = await ElementQuery.get_by_changeset(
-            changeset_id, sort_by='sequence_id'
-        )
-        tg.create_task(UserQuery.resolve_elements_users(elements))
 
-    return Format06.encode_osmchange(elements)
+@router.get('/changeset/{changeset_id:int}/download.pbf')
+async def download_changeset_pbf(
+    changeset_id: ChangesetId,
+):
+    changeset = await ChangesetQuery.find_one_by_id(changeset_id)
+    if changeset is None:
+        raise_for.changeset_not_found(changeset_id)
+
+    # A plain dump of the element versions, in the /download order.
+    # PBF has no osmChange actions: they are implied by the version and
+    # the visible flag (version 1 is a create, hidden is a delete).
+    async def content():
+        yield PBF.encode_header()
+        async with aclosing(
+            ElementQuery.iter_batches_by_changeset(
+                changeset_id,
+                sort_by='sequence_id',
+                batch_size=STREAM_RESPONSE_BATCH_SIZE,
+            )
+        ) as batches:
+            async for batch in batches:
+                await UserQuery.resolve_element_batch_users(batch)
+                yield PBF.encode_batch(batch)
+
+    return StreamingResponse(content(), media_type='application/x-protobuf')
 
 
 @router.put('/changeset/{changeset_id:int}')
@@ -119,13 +165,17 @@ async def update_changeset(
 @router.post('/changeset/{changeset_id:int}/upload', response_class=DiffResultResponse)
 async def upload_diff(
     changeset_id: ChangesetId,
-    data: Annotated[list, xml_body('osmChange')],
     _: Annotated[User, api_user('write_api')],
 ):
+    xml = get_request()._body  # noqa: SLF001
+    if len(xml) > XML_PARSE_MAX_SIZE:
+        raise_for.input_too_big(len(xml))
+
     try:
-        elements = Format06.decode_osmchange(changeset_id, data)
+        with timing('decode'):
+            elements = Format06.decode_osmchange(changeset_id, xml)
     except Exception as e:
-        raise_for.bad_xml('osmChange', str(e))
+        raise_for.bad_xml('osmChange', str(e), xml)
 
     assigned_ref_map = await OptimisticDiff.run(elements)
     return Format06.encode_diff_result(assigned_ref_map)
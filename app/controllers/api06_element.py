@@ -1,4 +1,3 @@
-from asyncio import TaskGroup
 from typing import Annotated
 
 from fastapi import APIRouter, Path, Query, Response, status
@@ -8,8 +7,10 @@ from app.lib.auth_context import api_user
 from app.lib.exceptions_context import raise_for
 from app.lib.xml_body import xml_body
 from app.models.db.element import Element
+from app.models.db.element_batch import ElementBatch
 from app.models.db.user import User
 from app.models.element import ElementId, ElementType, TypedElementId
+from app.queries.element_cache_query import ElementCacheQuery
 from app.queries.element_query import ElementQuery
 from app.queries.user_query import UserQuery
 from app.services.optimistic_diff import OptimisticDiff
@@ -154,8 +155,7 @@ async def get_many(
 @router.get('/{type:element_type}/{id:int}.json')
 async def get_latest(type: ElementType, id: ElementId):
     typed_id = typed_element_id(type, id)
-    elements = await ElementQuery.get_by_refs([typed_id], limit=1)
-    element = next(iter(elements), None)
+    element = await ElementCacheQuery.get_latest(typed_id)
     if element is None:
         raise_for.element_not_found(typed_id)
 
@@ -170,11 +170,11 @@ async def get_latest(type: ElementType, id: ElementId):
 @router.get('/{type:element_type}/{id:int}/{version:int}.json')
 async def get_version(type: ElementType, id: ElementId, version: int):
     ref = (typed_element_id(type, id), version)
-    elements = await ElementQuery.get_by_versioned_refs([ref], limit=1)
-    if not elements:
+    element = await ElementCacheQuery.get_version(*ref)
+    if element is None:
         raise_for.element_not_found(ref)
 
-    return await _encode_element(elements[0])
+    return await _encode_element(element)
 
 
 @router.get('/{type:element_type}/{id:int}/history')
@@ -205,22 +205,18 @@ async def get_full(type: ElementType, id: ElementId):
     if not element['visible']:
         return Response(None, status.HTTP_410_GONE)
 
-    async with TaskGroup() as tg:
-        tg.create_task(UserQuery.resolve_elements_users(elements))
-
-        members_elements = await ElementQuery.get_by_refs(
-            element['members'],
-            at_sequence_id=at_sequence_id,
-            skip_typed_ids=[typed_id],
-            recurse_ways=True,
-            sort_dir='asc',
-            limit=None,
-        )
-        tg.create_task(UserQuery.resolve_elements_users(members_elements))
+    members_elements = await ElementQuery.get_by_refs(
+        element['members'],
+        at_sequence_id=at_sequence_id,
+        skip_typed_ids=[typed_id],
+        recurse_ways=True,
+        sort_dir='asc',
+        limit=None,
+    )
 
     # Ensure members are before the element
     members_elements.append(element)
-    return Format06.encode_elements(members_elements)
+    return await _encode_elements(members_elements)
 
 
 @router.get('/{type:element_type}/{id:int}/relations')
@@ -260,5 +256,6 @@ async def _encode_element(element: Element):
 
 async def _encode_elements(elements: list[Element]):
     """Resolve required data fields for elements and encode them."""
-    await UserQuery.resolve_elements_users(elements)
-    return Format06.encode_elements(elements)
+    batch = ElementBatch.from_elements(elements)
+    await UserQuery.resolve_element_batch_users(batch)
+    return Format06.encode_element_batch(batch)
@@ -7,8 +7,11 @@ from app.format import Format06
 from app.lib.exceptions_context import raise_for
 from app.lib.geo_utils import parse_bbox
 from app.lib.xmltodict import get_xattr
-from app.queries.element_query import ElementQuery
+from app.models.db.element import Element
+from app.models.db.element_batch import ElementBatch
+from app.queries.element_tile_query import ElementTileQuery
 from app.queries.user_query import UserQuery
+from app.responses.osm_response import OSMStream
 
 router = APIRouter(prefix='/api/0.6')
 
@@ -21,22 +24,31 @@ async def get_map(bbox: Annotated[str, Query()]):
     if geometry.area > MAP_QUERY_AREA_MAX_SIZE:
         raise_for.map_query_area_too_big()
 
-    elements = await ElementQuery.find_many_by_geom(
+    elements = await ElementTileQuery.find_many_by_geom(
         geometry,
         nodes_limit=MAP_QUERY_LEGACY_NODES_LIMIT,
         legacy_nodes_limit=True,
     )
 
-    await UserQuery.resolve_elements_users(elements)
+    # Batches are encoded independently: keep the element types grouped
+    elements.sort(key=lambda element: element['typed_id'] >> 60)
+
+    async def encode(batch: list[Element]):
+        element_batch = ElementBatch.from_elements(batch)
+        await UserQuery.resolve_element_batch_users(element_batch)
+        return Format06.encode_element_batch(element_batch)
 
     xattr = get_xattr()
     minx, miny, maxx, maxy = geometry.bounds
-    return {
-        'bounds': {
-            xattr('minlon'): minx,
-            xattr('minlat'): miny,
-            xattr('maxlon'): maxx,
-            xattr('maxlat'): maxy,
+    return OSMStream(
+        head={
+            'bounds': {
+                xattr('minlon'): minx,
+                xattr('minlat'): miny,
+                xattr('maxlon'): maxx,
+                xattr('maxlat'): maxy,
+            }
         },
-        **Format06.encode_elements(elements),
-    }
+        items=elements,
+        encode=encode,
+    )
@@ -1,30 +1,68 @@
+from time import time
 from typing import Annotated
 
 from fastapi import APIRouter, Query
 
-from app.config import MAP_QUERY_AREA_MAX_SIZE, MAP_QUERY_LEGACY_NODES_LIMIT
+from app.config import MAP_QUERY_AREA_MAX_SIZE, MAP_QUERY_PAGE_NODES_LIMIT
 from app.format import Format07
 from app.lib.exceptions_context import raise_for
 from app.lib.geo_utils import parse_bbox
+from app.lib.map_cursor_utils import MapCursorUtils
+from app.models.db.element import Element
+from app.models.element import TypedElementId
+from app.models.proto.server_pb2 import MapCursor
+from app.models.types import SequenceId
 from app.queries.element_query import ElementQuery
 from app.queries.user_query import UserQuery
+from app.responses.osm_response import OSMStream
 
 router = APIRouter(prefix='/api/0.7')
 
 
-# TODO: limits + cursor (1min expiration?)
 @router.get('/map')
-async def get_map(bbox: Annotated[str, Query()]):
+async def get_map(
+    bbox: Annotated[str | None, Query()] = None,
+    cursor: Annotated[str | None, Query()] = None,
+):
+    after_typed_id: TypedElementId | None
+    if cursor is not None:
+        state = MapCursorUtils.from_str(cursor)
+        bbox = state.bbox
+        # Keep the snapshot creation time, so paged snapshots expire too
+        timestamp = state.timestamp
+        at_sequence_id = SequenceId(state.at_sequence_id)
+        after_typed_id = TypedElementId(state.after_typed_id)
+    elif bbox is not None:
+        timestamp = int(time())
+        at_sequence_id = await ElementQuery.get_current_sequence_id()
+        after_typed_id = None
+    else:
+        raise_for.bad_bbox('')
+
     geometry = parse_bbox(bbox)
     if geometry.area > MAP_QUERY_AREA_MAX_SIZE:
         raise_for.map_query_area_too_big()
 
-    elements = await ElementQuery.find_many_by_geom(
+    elements, next_typed_id = await ElementQuery.find_page_by_geom(
         geometry,
-        nodes_limit=MAP_QUERY_LEGACY_NODES_LIMIT,
-        legacy_nodes_limit=True,
+        at_sequence_id=at_sequence_id,
+        after_typed_id=after_typed_id,
+        nodes_limit=MAP_QUERY_PAGE_NODES_LIMIT,
     )
 
-    await UserQuery.resolve_elements_users(elements)
+    head: dict = {}
+    if next_typed_id is not None:
+        head['cursor'] = MapCursorUtils.to_str(
+            MapCursor(
+                timestamp=timestamp,
+                bbox=bbox,
+                at_sequence_id=at_sequence_id,
+                after_typed_id=next_typed_id,
+            )
+        )
+
+    async def encode(batch: list[Element]):
+        await UserQuery.resolve_elements_users(batch)
+        return {'elements': Format07.encode_elements(batch)}
 
-    return Format07.encode_elements(elements)
+    return OSMStream(head=head, items=elements, encode=encode)
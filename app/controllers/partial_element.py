@@ -18,6 +18,7 @@ from app.models.element import ElementId, ElementType
 from app.models.proto.shared_pb2 import PartialElementParams
 from app.models.types import SequenceId
 from app.queries.changeset_query import ChangesetQuery
+from app.queries.element_cache_query import ElementCacheQuery
 from app.queries.element_query import ElementQuery
 from app.queries.user_query import UserQuery
 from speedup.element_type import split_typed_element_id, typed_element_id
@@ -29,10 +30,9 @@ router = APIRouter(prefix='/partial')
 async def get_latest(type: ElementType, id: ElementId):
     typed_id = typed_element_id(type, id)
     at_sequence_id = await ElementQuery.get_current_sequence_id()
-    elements = await ElementQuery.get_by_refs(
-        [typed_id], at_sequence_id=at_sequence_id, limit=1
+    element = await ElementCacheQuery.get_latest(
+        typed_id, at_sequence_id=at_sequence_id
     )
-    element = next(iter(elements), None)
     if element is None:
         return await render_response(
             'partial/not-found',
@@ -51,12 +51,11 @@ async def get_latest(type: ElementType, id: ElementId):
 
 @router.get('/{type:element_type}/{id:int}/history/{version:int}')
 async def get_version(type: ElementType, id: ElementId, version: int):
-    versioned_typed_id = (typed_element_id(type, id), version)
+    typed_id = typed_element_id(type, id)
     at_sequence_id = await ElementQuery.get_current_sequence_id()
-    elements = await ElementQuery.get_by_versioned_refs(
-        [versioned_typed_id], at_sequence_id=at_sequence_id, limit=1
+    element = await ElementCacheQuery.get_version(
+        typed_id, version, at_sequence_id=at_sequence_id
     )
-    element = next(iter(elements), None)
     if element is None:
         id_text = f'{id} {t("browse.version").lower()} {version}'
         return await render_response(
@@ -8,7 +8,7 @@ from app.format import FormatLeaflet
 from app.lib.exceptions_context import raise_for
 from app.lib.geo_utils import parse_bbox
 from app.models.proto.shared_pb2 import RenderElementsData
-from app.queries.element_query import ElementQuery
+from app.queries.element_tile_query import ElementTileQuery
 
 router = APIRouter(prefix='/api/web')
 
@@ -30,7 +30,7 @@ async def get_map(
         nodes_limit = limit + 1
         legacy_nodes_limit = False
 
-    elements = await ElementQuery.find_many_by_geom(
+    elements = await ElementTileQuery.find_many_by_geom(
         geometry,
         partial_ways=True,
         include_relations=False,
@@ -0,0 +1,16 @@
+from typing import Annotated
+
+from fastapi import APIRouter
+
+from app.lib.auth_context import web_user
+from app.lib.timing_context import timing_histograms
+from app.models.db.user import User
+
+router = APIRouter(prefix='/api/web')
+
+
+@router.get('/settings/timings')
+async def timings(
+    _: Annotated[User, web_user('role_administrator')],
+):
+    return timing_histograms()
@@ -1,22 +1,53 @@
 import logging
+from itertools import compress
 from typing import Any
 
 import cython
 import numpy as np
+from orjson import Fragment
 from shapely import Point, get_coordinates, points
 
+from app.config import (
+    ELEMENT_RELATION_MEMBERS_LIMIT,
+    ELEMENT_WAY_MEMBERS_LIMIT,
+    LEGACY_HIGH_PRECISION_TIME,
+    TAGS_KEY_MAX_LENGTH,
+    TAGS_LIMIT,
+    TAGS_MAX_SIZE,
+)
 from app.lib.date_utils import legacy_date
 from app.lib.exceptions_context import raise_for
 from app.lib.format_style_context import format_is_json
 from app.models.db.element import Element, ElementInit, validate_elements
-from app.models.element import ElementId, ElementType, TypedElementId
+from app.models.db.element_batch import ElementBatch
+from app.models.element import (
+    ELEMENT_TYPE_NUMS,
+    ElementId,
+    ElementType,
+    TypedElementId,
+    split_typed_element_ids_array,
+)
 from app.models.types import ChangesetId
 from app.services.optimistic_diff.prepare import OSMChangeAction
+from speedup.element_encode import element_encode
 from speedup.element_type import (
     split_typed_element_id,
     split_typed_element_ids,
     typed_element_id,
 )
+from speedup.osmchange_decode import (
+    OSMChangeActionError,
+    osmchange_decode,
+    osmchange_decode_configure,
+)
+
+osmchange_decode_configure(
+    TAGS_LIMIT,
+    TAGS_MAX_SIZE,
+    TAGS_KEY_MAX_LENGTH,
+    ELEMENT_WAY_MEMBERS_LIMIT,
+    ELEMENT_RELATION_MEMBERS_LIMIT,
+)
 
 
 class Element06Mixin:
@@ -49,14 +80,26 @@ class Element06Mixin:
             }
 
         # Merge elements of the same type together
-        result: dict[ElementType, list[dict]] = {'node': [], 'way': [], 'relation': []}
-        for element, type_id in zip(
-            elements,
-            split_typed_element_ids(elements),
-            strict=True,
-        ):
-            result[type_id[0]].append(_encode_element(element, is_json=False))
-        return result  # pyright: ignore[reportReturnType]
+        type_nums = split_typed_element_ids_array(
+            np.array([element['typed_id'] for element in elements], np.uint64)
+        )[0]
+        return {
+            type: [
+                _encode_element(element, is_json=False)
+                for element in compress(elements, (type_nums == type_num).tolist())
+            ]
+            for type, type_num in ELEMENT_TYPE_NUMS.items()
+        }
+
+    @staticmethod
+    def encode_element_batch(batch: ElementBatch) -> dict[str, Fragment] | bytes:
+        """
+        Encode an element batch, like encode_elements.
+        XML is returned pre-encoded, as the children of the root element.
+        """
+        if format_is_json():
+            return {'elements': Fragment(_encode_element_batch(batch, is_json=True))}
+        return _encode_element_batch(batch, is_json=False)
 
     @staticmethod
     def decode_elements(elements: list[tuple[ElementType, dict]]) -> list[ElementInit]:
@@ -109,83 +152,50 @@ class Element06Mixin:
 
         return result
 
+    @staticmethod
+    def encode_osmchange_batch(batch: ElementBatch) -> bytes:
+        """
+        Encode an element batch, like encode_osmchange.
+        Returns pre-encoded XML, the children of the osmChange element.
+        """
+        return _encode_element_batch(batch, is_json=False, osmchange=True)
+
     @staticmethod
     def decode_osmchange(
-        changeset_id: ChangesetId | None,
-        changes: list[tuple[OSMChangeAction, list[tuple[ElementType, dict]]]] | dict,
+        changeset_id: ChangesetId | None, xml: bytes
     ) -> list[ElementInit]:
         """
+        Decode and validate an osmChange document.
         If changeset_id is None, it will be extracted from the element data.
 
-        >>> decode_osmchange([
-        ...     ('create', [('node', {'@id': 1, '@version': 1, ...})]),
-        ...     ('modify', [('way', {'@id': 2, '@version': 2, ...})])
-        ... ])
+        >>> decode_osmchange(1, b'<osmChange><create><node id="-1" ...')
         [Element(type=ElementType, ...), Element(type=ElementType.way, ...)]
         """
-        # skip attributes-only osmChange (empty)
-        if isinstance(changes, dict):
-            logging.debug('Skipped empty osmChange')
-            return []
-
-        result: list[ElementInit] = []
-        for action, elements_data in changes:
-            # skip osmChange attributes
-            if action[:1] == '@':
-                continue
-            # skip attributes-only actions
-            if isinstance(elements_data, dict):
-                continue
-
+        try:
+            elements, points_index, points_coords = osmchange_decode(xml, changeset_id)
+        except OSMChangeActionError as e:
+            action, element = e.args
+            if element is None:
+                raise_for.diff_unsupported_action(action)
             if action == 'create':
-                for key, data in elements_data:
-                    data['@version'] = 0
-                    element = _decode_element_unsafe(
-                        key, data, changeset_id=changeset_id
-                    )
-                    element_id = split_typed_element_id(element['typed_id'])[1]
-
-                    if element_id > 0:
-                        raise_for.diff_create_bad_id(element)
-
-                    result.append(element)
-
-            elif action == 'modify':
-                for key, data in elements_data:
-                    element = _decode_element_unsafe(
-                        key, data, changeset_id=changeset_id
-                    )
-
-                    if element['version'] <= 1:
-                        raise_for.diff_update_bad_version(element)
-
-                    result.append(element)
-
-            elif action == 'delete':
-                delete_if_unused: cython.bint = False
-
-                for key, data in elements_data:
-                    if key == '@if-unused':  # pyright: ignore[reportUnnecessaryComparison]
-                        delete_if_unused = True
-                        continue
-
-                    data['@visible'] = False
-                    element = _decode_element_unsafe(
-                        key, data, changeset_id=changeset_id
-                    )
-
-                    if element['version'] <= 1:
-                        raise_for.diff_update_bad_version(element)
-                    if delete_if_unused:
-                        # noinspection PyTypedDict
-                        element['delete_if_unused'] = True
-
-                    result.append(element)
+                raise_for.diff_create_bad_id(element)
+            raise_for.diff_update_bad_version(element)
 
-            else:
-                raise_for.diff_unsupported_action(action)
+        if not elements:
+            logging.debug('Skipped empty osmChange')
+            return elements
+
+        # Create all node points at once
+        if points_index:
+            coords = np.frombuffer(points_coords, np.float64).reshape(-1, 2).round(7)
+            for i, point in zip(
+                np.frombuffer(points_index, np.int64).tolist(),
+                points(coords).tolist(),
+                strict=True,
+            ):
+                elements[i]['point'] = point
 
-        return result
+        return elements
 
 
 @cython.cfunc
@@ -366,6 +376,43 @@ def _encode_element(element: Element, *, is_json: cython.bint) -> dict:
         }
 
 
+@cython.cfunc
+def _encode_element_batch(
+    batch: ElementBatch, *, is_json: cython.bint, osmchange: cython.bint = False
+) -> bytes:
+    """Encode an element batch with speedup.element_encode."""
+    created_at = batch.created_at
+    if not LEGACY_HIGH_PRECISION_TIME:
+        created_at = created_at.astype('datetime64[s]')
+
+    return element_encode(
+        {
+            'typed_id': batch.typed_id,
+            'changeset_id': batch.changeset_id,
+            'version': batch.version,
+            'visible': batch.visible,
+            'created_at': created_at.astype('datetime64[us]', copy=False).view(
+                np.int64
+            ),
+            'lon': batch.lon.round(7),
+            'lat': batch.lat.round(7),
+            'tags_offsets': batch.tags_offsets,
+            'tags_keys': batch.tags_keys,
+            'tags_keys_offsets': batch.tags_keys_offsets,
+            'tags_values': batch.tags_values,
+            'tags_values_offsets': batch.tags_values_offsets,
+            'members_offsets': batch.members_offsets,
+            'members': batch.members,
+            'members_roles': batch.members_roles,
+            'members_roles_offsets': batch.members_roles_offsets,
+            'user_id': batch.user_id,
+            'users': batch.users,
+        },
+        is_json,
+        osmchange,
+    )
+
+
 @cython.cfunc
 def _decode_element_unsafe(
     type: ElementType, data: dict, *, changeset_id: ChangesetId | None
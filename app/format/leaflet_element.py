@@ -1,13 +1,19 @@
 import logging
+from itertools import compress
 
 import cython
+import numpy as np
 from polyline_rs import encode_lonlat
 from shapely import Point, get_coordinates
 
 from app.lib.elements_filter import ElementsFilter
 from app.lib.query_features import QueryFeatureResult
 from app.models.db.element import Element
-from app.models.element import TypedElementId
+from app.models.element import (
+    ELEMENT_TYPE_NUMS,
+    TypedElementId,
+    split_typed_element_ids_array,
+)
 from app.models.proto.shared_pb2 import RenderElementsData
 from speedup.element_type import split_typed_element_id
 
@@ -21,15 +27,18 @@ class LeafletElementMixin:
         areas: cython.bint = True,
     ) -> RenderElementsData:
         """Format elements into a minimal structure, suitable for map rendering."""
-        node_id_map: dict[TypedElementId, Element] = {}
-        ways: list[Element] = []
-        for element in elements:
-            typed_id = element['typed_id']
-            type = split_typed_element_id(typed_id)[0]
-            if type == 'node':
-                node_id_map[typed_id] = element
-            elif type == 'way':
-                ways.append(element)
+        type_nums = split_typed_element_ids_array(
+            np.array([element['typed_id'] for element in elements], np.uint64)
+        )[0]
+        node_id_map: dict[TypedElementId, Element] = {
+            element['typed_id']: element
+            for element in compress(
+                elements, (type_nums == ELEMENT_TYPE_NUMS['node']).tolist()
+            )
+        }
+        ways: list[Element] = list(
+            compress(elements, (type_nums == ELEMENT_TYPE_NUMS['way']).tolist())
+        )
 
         member_nodes: set[TypedElementId] = set()
         render_ways = _render_ways(
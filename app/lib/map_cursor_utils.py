@@ -0,0 +1,50 @@
+import logging
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from time import time
+
+from google.protobuf.message import DecodeError
+
+from app.config import MAP_QUERY_CURSOR_EXPIRE
+from app.lib.crypto import hash_compare, hmac_bytes
+from app.lib.exceptions_context import raise_for
+from app.models.proto.server_pb2 import MapCursor
+
+
+class MapCursorUtils:
+    @staticmethod
+    def from_str(s: str) -> MapCursor:
+        """Parse and validate the given string into a map cursor."""
+        try:
+            payload = urlsafe_b64decode(s + '=' * (-len(s) % 4))
+        except ValueError:
+            logging.info('Map cursor is not well-encoded')
+            raise_for.bad_cursor()
+
+        if len(payload) <= 32:
+            logging.info('Map cursor is too short')
+            raise_for.bad_cursor()
+
+        serialized = payload[:-32]
+        signature = payload[-32:]
+        if not hash_compare(serialized, signature, hash_func=hmac_bytes):
+            logging.info('Map cursor signature mismatch')
+            raise_for.bad_cursor()
+
+        try:
+            cursor = MapCursor.FromString(serialized)
+        except DecodeError:
+            # Warning instead of Info because this is a signed cursor
+            logging.warning('Map cursor is malformed')
+            raise_for.bad_cursor()
+
+        if cursor.timestamp + MAP_QUERY_CURSOR_EXPIRE.total_seconds() < time():
+            raise_for.cursor_expired()
+
+        return cursor
+
+    @staticmethod
+    def to_str(cursor: MapCursor) -> str:
+        """Convert the given map cursor into a signed string."""
+        payload = cursor.SerializeToString()
+        payload += hmac_bytes(payload)
+        return urlsafe_b64encode(payload).rstrip(b'=').decode('ascii')
@@ -0,0 +1,467 @@
+import lzma
+import struct
+import zlib
+from datetime import UTC, datetime, timedelta
+from itertools import pairwise
+from os import SEEK_CUR
+from pathlib import Path
+from typing import TypedDict
+
+import cython
+import numpy as np
+from numpy.typing import NDArray
+from zstandard import ZstdDecompressor
+
+from app.config import GENERATOR
+from app.models.db.element_batch import ElementBatch, split_strings
+from app.models.element import (
+    TypedElementId,
+    split_typed_element_ids_array,
+    typed_element_ids_array,
+)
+from app.models.proto.osmpbf_pb2 import (
+    Blob,
+    BlobHeader,
+    DenseNodes,
+    HeaderBlock,
+    Info,
+    PrimitiveBlock,
+    PrimitiveGroup,
+)
+from app.models.types import ChangesetId, DisplayName, UserId
+
+_BLOB_HEADER_SIZE = struct.Struct('>I')
+_BLOB_HEADER_MAX_SIZE = 64 * 1024  # 64 KB
+_BLOCK_MAX_ELEMENTS = 8000
+
+# Written files carry the visible flags of historical elements
+_REQUIRED_FEATURES = ('OsmSchema-V0.6', 'DenseNodes', 'HistoricalInformation')
+_SUPPORTED_FEATURES = frozenset(_REQUIRED_FEATURES)
+
+_EPOCH = datetime.fromtimestamp(0, UTC)
+_ZSTD_DECOMPRESS = ZstdDecompressor().decompress
+
+
+class PBFElement(TypedDict):
+    typed_id: TypedElementId
+    changeset_id: ChangesetId
+    version: int
+    visible: bool
+    tags: dict[str, str] | None
+    point: tuple[float, float] | None
+    """
+    Point coordinates as (lon, lat).
+    """
+
+    members: list[TypedElementId] | None
+    members_roles: list[str] | None
+    created_at: datetime
+    user_id: UserId | None
+    display_name: DisplayName | None
+
+
+class PBF:
+    @staticmethod
+    def blob_ranges(path: Path) -> list[tuple[int, int]]:
+        """
+        Scan the PBF file and return the (offset, size) of its OSMData blobs.
+        Only the blob headers are read, the blobs themselves are skipped.
+        """
+        result: list[tuple[int, int]] = []
+
+        with path.open('rb') as f:
+            while header_size_bytes := f.read(_BLOB_HEADER_SIZE.size):
+                header_size: int = _BLOB_HEADER_SIZE.unpack(header_size_bytes)[0]
+                if header_size > _BLOB_HEADER_MAX_SIZE:
+                    raise ValueError(f'PBF blob header is too large: {header_size}')
+
+                header = BlobHeader.FromString(f.read(header_size))
+                if header.type == 'OSMHeader':
+                    block = HeaderBlock.FromString(
+                        _decompress_blob(f.read(header.datasize))
+                    )
+                    unsupported = set(block.required_features) - _SUPPORTED_FEATURES
+                    if unsupported:
+                        raise NotImplementedError(
+                            f'Unsupported PBF features {sorted(unsupported)!r}'
+                        )
+                    continue
+
+                if header.type == 'OSMData':
+                    result.append((f.tell(), header.datasize))
+                f.seek(header.datasize, SEEK_CUR)
+
+        return result
+
+    @staticmethod
+    def decode_blob(data: bytes) -> list[PBFElement]:
+        """Decode an OSMData blob into elements, in the file order."""
+        block = PrimitiveBlock.FromString(_decompress_blob(data))
+        strings = [s.decode() for s in block.stringtable.s]
+        result: list[PBFElement] = []
+
+        for group in block.primitivegroup:
+            _decode_group(block, group, strings, result)
+
+        return result
+
+    @staticmethod
+    def encode_header(
+        *,
+        replication_timestamp: datetime | None = None,
+        replication_sequence_number: int | None = None,
+    ) -> bytes:
+        """Encode the OSMHeader file block, which starts every PBF file."""
+        block = HeaderBlock(
+            required_features=_REQUIRED_FEATURES,
+            writingprogram=GENERATOR,
+        )
+        if replication_timestamp is not None:
+            block.osmosis_replication_timestamp = int(replication_timestamp.timestamp())
+        if replication_sequence_number is not None:
+            block.osmosis_replication_sequence_number = replication_sequence_number
+        return _encode_file_block('OSMHeader', block.SerializeToString())
+
+    @staticmethod
+    def encode_batch(batch: ElementBatch) -> bytes:
+        """
+        Encode an element batch as OSMData file blocks, preserving the batch order.
+        Concatenated file blocks following the header form a valid PBF file.
+        """
+        return b''.join(
+            _encode_file_block(
+                'OSMData',
+                _encode_block(batch[i : i + _BLOCK_MAX_ELEMENTS]).SerializeToString(),
+            )
+            for i in range(0, len(batch), _BLOCK_MAX_ELEMENTS)
+        )
+
+
+@cython.cfunc
+def _decompress_blob(data: bytes) -> bytes:
+    blob = Blob.FromString(data)
+    kind = blob.WhichOneof('data')
+
+    if kind == 'zlib_data':
+        return zlib.decompress(
+            blob.zlib_data, bufsize=blob.raw_size or zlib.DEF_BUF_SIZE
+        )
+    if kind == 'zstd_data':
+        return _ZSTD_DECOMPRESS(blob.zstd_data, max_output_size=blob.raw_size)
+    if kind == 'raw':
+        return blob.raw
+    if kind == 'lzma_data':
+        return lzma.decompress(blob.lzma_data)
+
+    raise NotImplementedError(f'Unsupported PBF blob compression {kind!r}')
+
+
+@cython.cfunc
+def _encode_file_block(type: str, data: bytes) -> bytes:
+    blob = Blob(raw_size=len(data), zlib_data=zlib.compress(data))
+    blob_bytes = blob.SerializeToString()
+    header = BlobHeader(type=type, datasize=len(blob_bytes)).SerializeToString()
+    return b''.join((_BLOB_HEADER_SIZE.pack(len(header)), header, blob_bytes))
+
+
+@cython.cfunc
+def _typed_ids(ids: NDArray[np.int64], type_nums: NDArray | int) -> list:
+    """Combine positive element ids with type numbers, matching PBF member types."""
+    if ids.size and ids.min() <= 0:
+        raise ValueError('PBF element ids must be positive')
+    return typed_element_ids_array(type_nums, ids).tolist()
+
+
+@cython.cfunc
+def _decode_group(
+    block: PrimitiveBlock,
+    group: PrimitiveGroup,
+    strings: list[str],
+    result: list[PBFElement],
+) -> None:
+    granularity: cython.longlong = block.granularity
+    lat_offset: cython.longlong = block.lat_offset
+    lon_offset: cython.longlong = block.lon_offset
+    date_granularity: cython.longlong = block.date_granularity
+
+    if group.HasField('dense'):
+        _decode_dense(block, group.dense, strings, result)
+
+    if group.nodes:
+        typed_ids = _typed_ids(np.array([node.id for node in group.nodes], np.int64), 0)
+        for typed_id, node in zip(typed_ids, group.nodes, strict=True):
+            element = _decode_element(
+                typed_id, node, strings, date_granularity=date_granularity
+            )
+            if element['visible']:
+                element['point'] = (
+                    (lon_offset + granularity * node.lon) / 1e9,
+                    (lat_offset + granularity * node.lat) / 1e9,
+                )
+            result.append(element)
+
+    if group.ways:
+        typed_ids = _typed_ids(np.array([way.id for way in group.ways], np.int64), 1)
+        for typed_id, way in zip(typed_ids, group.ways, strict=True):
+            element = _decode_element(
+                typed_id, way, strings, date_granularity=date_granularity
+            )
+            if way.refs:
+                element['members'] = _typed_ids(
+                    np.cumsum(np.array(way.refs, np.int64)), 0
+                )
+            result.append(element)
+
+    if group.relations:
+        typed_ids = _typed_ids(
+            np.array([relation.id for relation in group.relations], np.int64), 2
+        )
+        for typed_id, relation in zip(typed_ids, group.relations, strict=True):
+            element = _decode_element(
+                typed_id, relation, strings, date_granularity=date_granularity
+            )
+            if relation.memids:
+                element['members'] = _typed_ids(
+                    np.cumsum(np.array(relation.memids, np.int64)),
+                    np.array(relation.types, np.uint64),
+                )
+                element['members_roles'] = [strings[i] for i in relation.roles_sid]
+            result.append(element)
+
+
+@cython.cfunc
+def _decode_element(
+    typed_id: TypedElementId,
+    data,
+    strings: list[str],
+    *,
+    date_granularity: cython.longlong,
+) -> PBFElement:
+    """Decode the tags and metadata common to nodes, ways and relations."""
+    if not data.HasField('info'):
+        raise ValueError('PBF elements without metadata are not supported')
+
+    info: Info = data.info
+    uid: cython.longlong = info.uid
+    return {
+        'typed_id': typed_id,
+        'changeset_id': info.changeset,  # type: ignore
+        'version': info.version,
+        'visible': info.visible if info.HasField('visible') else True,
+        'tags': (
+            {strings[k]: strings[v] for k, v in zip(data.keys, data.vals, strict=True)}
+            if data.keys
+            else None
+        ),
+        'point': None,
+        'members': None,
+        'members_roles': None,
+        'created_at': _EPOCH
+        + timedelta(milliseconds=info.timestamp * date_granularity),
+        'user_id': uid if uid > 0 else None,  # type: ignore
+        'display_name': strings[info.user_sid] if uid > 0 else None,  # type: ignore
+    }
+
+
+@cython.cfunc
+def _decode_dense(
+    block: PrimitiveBlock,
+    dense: DenseNodes,
+    strings: list[str],
+    result: list[PBFElement],
+) -> None:
+    if not dense.HasField('denseinfo'):
+        raise ValueError('PBF elements without metadata are not supported')
+
+    size: cython.Py_ssize_t = len(dense.id)
+    info = dense.denseinfo
+    granularity: cython.longlong = block.granularity
+    typed_ids = _typed_ids(np.cumsum(np.array(dense.id, np.int64)), 0)
+    lons: list[float] = (
+        (block.lon_offset + granularity * np.cumsum(np.array(dense.lon, np.int64)))
+        / 1e9
+    ).tolist()
+    lats: list[float] = (
+        (block.lat_offset + granularity * np.cumsum(np.array(dense.lat, np.int64)))
+        / 1e9
+    ).tolist()
+    timestamps: list[int] = (
+        np.cumsum(np.array(info.timestamp, np.int64)) * block.date_granularity
+    ).tolist()
+    changesets: list[int] = np.cumsum(np.array(info.changeset, np.int64)).tolist()
+    uids: list[int] = np.cumsum(np.array(info.uid, np.int64)).tolist()
+    user_sids: list[int] = np.cumsum(np.array(info.user_sid, np.int64)).tolist()
+    versions: list[int] = list(info.version)
+    visibles: list[bool] = list(info.visible) or [True] * size
+
+    # Tags are stored as key and value string indexes, each node ends with 0
+    keys_vals = list(dense.keys_vals)
+    j: cython.Py_ssize_t = 0
+    i: cython.Py_ssize_t
+    for i in range(size):
+        tags: dict[str, str] = {}
+        if keys_vals:
+            while k := keys_vals[j]:
+                tags[strings[k]] = strings[keys_vals[j + 1]]
+                j += 2
+            j += 1
+
+        visible = visibles[i]
+        uid = uids[i]
+        result.append({
+            'typed_id': typed_ids[i],
+            'changeset_id': changesets[i],  # type: ignore
+            'version': versions[i],
+            'visible': visible,
+            'tags': tags or None,
+            'point': (lons[i], lats[i]) if visible else None,
+            'members': None,
+            'members_roles': None,
+            'created_at': _EPOCH + timedelta(milliseconds=timestamps[i]),
+            'user_id': uid if uid > 0 else None,  # type: ignore
+            'display_name': strings[user_sids[i]] if uid > 0 else None,  # type: ignore
+        })
+
+
+@cython.cfunc
+def _encode_block(batch: ElementBatch) -> PrimitiveBlock:
+    """Encode the batch as a block, with a group for each run of the same type."""
+    block = PrimitiveBlock()
+    strings: dict[bytes, int] = {b'': 0}
+    size = len(batch)
+
+    type_nums, ids = split_typed_element_ids_array(batch.typed_id)
+    # Timestamps in the default date granularity, seconds
+    timestamps = batch.created_at.astype('datetime64[s]').view(np.int64)
+    user_ids = (
+        batch.user_id.astype(np.int64)
+        if batch.user_id is not None
+        else np.zeros(size, np.int64)
+    )
+    users = batch.users or {}
+    user_sids = np.array(
+        [
+            strings.setdefault(user['display_name'].encode(), len(strings))
+            if (user := users.get(user_id)) is not None  # type: ignore
+            else 0
+            for user_id in user_ids.tolist()
+        ],
+        np.int64,
+    )
+
+    # String table indices, aligned with the batch string columns
+    tags_keys_sids = _string_ids(batch.tags_keys, batch.tags_keys_offsets, strings)
+    tags_values_sids = _string_ids(
+        batch.tags_values, batch.tags_values_offsets, strings
+    )
+    members_roles_sids = _string_ids(
+        batch.members_roles, batch.members_roles_offsets, strings
+    )
+
+    splits: list[int] = (np.flatnonzero(np.diff(type_nums)) + 1).tolist()
+    for start, end in zip([0, *splits], [*splits, size], strict=True):
+        group = block.primitivegroup.add()
+        type_num: int = type_nums[start].item()
+        if type_num == 0:
+            _encode_dense(
+                group.dense, batch, start, end, tags_keys_sids, tags_values_sids
+            )
+            dense_info = group.dense.denseinfo
+            dense_info.version.extend(batch.version[start:end].tolist())
+            dense_info.timestamp.extend(_delta(timestamps[start:end]))
+            dense_info.changeset.extend(
+                _delta(batch.changeset_id[start:end].astype(np.int64))
+            )
+            dense_info.uid.extend(_delta(user_ids[start:end]))
+            dense_info.user_sid.extend(_delta(user_sids[start:end]))
+            dense_info.visible.extend(batch.visible[start:end].tolist())
+            continue
+
+        elements = group.ways.add if type_num == 1 else group.relations.add
+        for i in range(start, end):
+            element = elements()
+            element.id = ids[i].item()
+            _encode_tags(element, batch, i, tags_keys_sids, tags_values_sids)
+
+            info = element.info
+            info.version = batch.version[i].item()
+            info.timestamp = timestamps[i].item()
+            info.changeset = batch.changeset_id[i].item()
+            info.uid = user_ids[i].item()
+            info.user_sid = user_sids[i].item()
+            info.visible = batch.visible[i].item()
+
+            members_start, members_end = batch.members_offsets[i : i + 2].tolist()
+            if members_start == members_end:
+                continue
+
+            members = batch.members[members_start:members_end]
+            member_type_nums, member_ids = split_typed_element_ids_array(members)
+            if type_num == 1:
+                element.refs.extend(_delta(member_ids))
+            else:
+                element.memids.extend(_delta(member_ids))
+                element.types.extend(member_type_nums.tolist())
+                element.roles_sid.extend(members_roles_sids[members_start:members_end])
+
+    block.stringtable.s.extend(strings)
+    return block
+
+
+@cython.cfunc
+def _encode_dense(
+    dense: DenseNodes,
+    batch: ElementBatch,
+    start: cython.Py_ssize_t,
+    end: cython.Py_ssize_t,
+    tags_keys_sids: list[int],
+    tags_values_sids: list[int],
+) -> None:
+    dense.id.extend(_delta(split_typed_element_ids_array(batch.typed_id[start:end])[1]))
+
+    # Coordinates in the default granularity, 100 nanodegrees.
+    # Deleted nodes have no point, they are encoded as 0.
+    for column, values in ((dense.lon, batch.lon), (dense.lat, batch.lat)):
+        coords = np.rint(values[start:end] * 1e7)
+        coords[np.isnan(coords)] = 0
+        column.extend(_delta(coords.astype(np.int64)))
+
+    tags_offsets: list[int] = batch.tags_offsets[start : end + 1].tolist()
+    if tags_offsets[0] == tags_offsets[-1]:
+        return
+
+    keys_vals: list[int] = []
+    for tags_start, tags_end in pairwise(tags_offsets):
+        for i in range(tags_start, tags_end):
+            keys_vals.append(tags_keys_sids[i])
+            keys_vals.append(tags_values_sids[i])
+        keys_vals.append(0)
+    dense.keys_vals.extend(keys_vals)
+
+
+@cython.cfunc
+def _encode_tags(
+    element,
+    batch: ElementBatch,
+    i: cython.Py_ssize_t,
+    tags_keys_sids: list[int],
+    tags_values_sids: list[int],
+):
+    tags_start, tags_end = batch.tags_offsets[i : i + 2].tolist()
+    if tags_start == tags_end:
+        return
+
+    element.keys.extend(tags_keys_sids[tags_start:tags_end])
+    element.vals.extend(tags_values_sids[tags_start:tags_end])
+
+
+@cython.cfunc
+def _string_ids(
+    data: NDArray[np.uint8], offsets: NDArray[np.int64], strings: dict[bytes, int]
+) -> list[int]:
+    return [strings.setdefault(s, len(strings)) for s in split_strings(data, offsets)]
+
+
+@cython.cfunc
+def _delta(values: NDArray[np.int64]) -> list[int]:
+    return np.diff(values, prepend=0).tolist()
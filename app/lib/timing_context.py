@@ -0,0 +1,110 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+from time import perf_counter
+
+from sentry_sdk import start_span
+
+# Upper bounds of the histogram buckets, in milliseconds
+_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+
+
+@dataclass(slots=True)
+class _Histogram:
+    count: int = 0
+    total_ms: float = 0
+    max_ms: float = 0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(_BUCKETS_MS) + 1))
+
+
+_CTX: ContextVar[dict[str, float]] = ContextVar('Timing')
+_HISTOGRAMS: dict[str, _Histogram] = {}
+
+
+@contextmanager
+def timing_context():
+    """Context manager for collecting the phase timings in ContextVar."""
+    timings: dict[str, float] = {}
+    token = _CTX.set(timings)
+    try:
+        yield timings
+    finally:
+        _CTX.reset(token)
+
+
+def current_timings() -> dict[str, float] | None:
+    """Get the phase timings of the current context, if collecting."""
+    return _CTX.get(None)
+
+
+@contextmanager
+def timing(name: str):
+    """
+    Measure the duration of a phase.
+    The phase is traced as a Sentry span, added to the context timings,
+    and recorded in the in-process histogram.
+    """
+    ts = perf_counter()
+    try:
+        with start_span(op='timing', name=name):
+            yield
+    finally:
+        record_timing(name, (perf_counter() - ts) * 1000)
+
+
+def timed(name: str):
+    """Decorator to measure the duration of an async function as a phase."""
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timing(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record_timing(name: str, duration_ms: float) -> None:
+    """Record the phase duration. Repeated phases are summed in the context timings."""
+    timings = _CTX.get(None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0) + duration_ms
+
+    histogram = _HISTOGRAMS.get(name)
+    if histogram is None:
+        histogram = _HISTOGRAMS[name] = _Histogram()
+    histogram.count += 1
+    histogram.total_ms += duration_ms
+    histogram.max_ms = max(histogram.max_ms, duration_ms)
+    histogram.buckets[bisect_left(_BUCKETS_MS, duration_ms)] += 1
+
+
+def format_server_timing(timings: dict[str, float]) -> str:
+    """
+    Format the timings as a Server-Timing header value.
+
+    >>> format_server_timing({'xml_parse': 1.23456, 'decode': 2})
+    'xml_parse;dur=1.235, decode;dur=2.000'
+    """
+    return ', '.join(f'{name};dur={dur:.3f}' for name, dur in timings.items())
+
+
+def timing_histograms() -> dict[str, dict]:
+    """Get the snapshot of the in-process phase histograms."""
+    bounds = [*_BUCKETS_MS, None]
+    return {
+        name: {
+            'count': histogram.count,
+            'total_ms': histogram.total_ms,
+            'max_ms': histogram.max_ms,
+            'buckets': [
+                {'le_ms': bound, 'count': count}
+                for bound, count in zip(bounds, histogram.buckets, strict=True)
+            ],
+        }
+        for name, histogram in sorted(_HISTOGRAMS.items())
+    }
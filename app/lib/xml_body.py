@@ -3,6 +3,7 @@ from typing import Any
 from fastapi import Depends, params
 
 from app.lib.exceptions_context import raise_for
+from app.lib.timing_context import timing
 from app.lib.xmltodict import XMLToDict
 from app.middlewares.request_context_middleware import get_request
 
@@ -19,7 +20,8 @@ def xml_body(path: str) -> params.Depends:
 
     def dependency() -> list[tuple[str, Any]] | dict[str, Any]:
         xml = get_request()._body  # noqa: SLF001
-        data = XMLToDict.parse(xml)
+        with timing('xml_parse'):
+            data = XMLToDict.parse(xml)
 
         for part in parts:
             if not isinstance(data, dict):
@@ -1,5 +1,7 @@
 import logging
-from typing import Any, Literal, LiteralString, Protocol, overload
+from collections.abc import Iterable, Iterator
+from functools import partial
+from typing import IO, Any, Literal, LiteralString, Protocol, overload
 
 from sizestr import sizestr
 
@@ -7,9 +9,11 @@ from app.config import XML_PARSE_MAX_SIZE
 from app.lib.exceptions_context import raise_for
 from app.lib.format_style_context import format_is_json
 from speedup.xattr import xattr_json, xattr_xml
-from speedup.xml_parse import xml_parse
+from speedup.xml_parse import XMLStreamParser, xml_parse
 from speedup.xml_unparse import xml_unparse
 
+_ITERPARSE_CHUNK_SIZE = 1024 * 1024  # 1 MB
+
 
 class XMLToDict:
     @staticmethod
@@ -27,23 +31,68 @@ class XMLToDict:
         except ValueError as e:
             raise_for.bad_xml('data', str(e), xml_bytes)
 
+    @staticmethod
+    def iterparse(
+        source: IO[bytes] | Iterable[bytes],
+        *,
+        size_limit: int | None = XML_PARSE_MAX_SIZE,
+    ) -> Iterator[tuple[str, Any]]:
+        """
+        Parse XML incrementally from a binary file or an iterable of chunks.
+        Yields the root element children as (name, value) records once they are complete.
+        """
+        chunks: Iterable[bytes] = (
+            iter(partial(source.read, _ITERPARSE_CHUNK_SIZE), b'')
+            if hasattr(source, 'read')
+            else source  # type: ignore
+        )
+        parser = XMLStreamParser()
+        size = 0
+        chunk = b''
+
+        try:
+            for chunk in chunks:
+                size += len(chunk)
+                if size_limit is not None and size > size_limit:
+                    raise_for.input_too_big(size)
+                yield from parser.feed(chunk)
+            yield from parser.close()
+        except ValueError as e:
+            raise_for.bad_xml('data', str(e), _chunk_for_error(chunk))
+
+        logging.debug('Parsed %s XML stream', sizestr(size))
+
     @staticmethod
     @overload
-    def unparse(d: dict[str, Any]) -> str: ...
+    def unparse(d: dict[str, Any], *, fragment: bool = False) -> str: ...
     @staticmethod
     @overload
-    def unparse(d: dict[str, Any], *, binary: Literal[True]) -> bytes: ...
+    def unparse(
+        d: dict[str, Any], *, binary: Literal[True], fragment: bool = False
+    ) -> bytes: ...
     @staticmethod
     @overload
-    def unparse(d: dict[str, Any], *, binary: Literal[False]) -> str: ...
+    def unparse(
+        d: dict[str, Any], *, binary: Literal[False], fragment: bool = False
+    ) -> str: ...
     @staticmethod
-    def unparse(d: dict[str, Any], *, binary: bool = False) -> str | bytes:
-        """Unparse dict to XML string."""
-        result = xml_unparse(d, binary)
+    def unparse(
+        d: dict[str, Any], *, binary: bool = False, fragment: bool = False
+    ) -> str | bytes:
+        """
+        Unparse dict to XML string.
+        If fragment is True, only the root element's children are returned.
+        """
+        result = xml_unparse(d, binary, fragment)
         logging.debug('Unparsed %s XML string', sizestr(len(result)))
         return result
 
 
+def _chunk_for_error(chunk: bytes) -> bytes:
+    # The chunk may end in the middle of a multi-byte character
+    return bytes(chunk).decode(errors='replace').encode()
+
+
 class _XAttrCallable(Protocol):
     def __call__(
         self, name: LiteralString, /, xml: LiteralString | None = None
@@ -47,12 +47,14 @@ from app.middlewares.rate_limit_middleware import RateLimitMiddleware
 from app.middlewares.request_body_middleware import RequestBodyMiddleware
 from app.middlewares.request_context_middleware import RequestContextMiddleware
 from app.middlewares.runtime_middleware import RuntimeMiddleware
+from app.middlewares.server_timing_middleware import ServerTimingMiddleware
 from app.middlewares.subdomain_middleware import SubdomainMiddleware
 from app.middlewares.test_site_middleware import TestSiteMiddleware
 from app.middlewares.translation_middleware import TranslationMiddleware
 from app.middlewares.unsupported_browser_middleware import UnsupportedBrowserMiddleware
 from app.responses.osm_response import setup_api_router_response
 from app.responses.precompressed_static_files import PrecompressedStaticFiles
+from app.services.cache_invalidation_service import CacheInvalidationService
 from app.services.changeset_service import ChangesetService
 from app.services.email_service import EmailService
 from app.services.rate_limit_service import RateLimitService
@@ -90,6 +92,7 @@ async def lifespan(_):
 
         async with (
             EmailService.context(),
+            CacheInvalidationService.context(),
             ChangesetService.context(),
             RateLimitService.context(),
         ):
@@ -139,6 +142,7 @@ if ENV != 'prod':
 
 main.add_middleware(RequestContextMiddleware)
 main.add_middleware(DefaultHeadersMiddleware)
+main.add_middleware(ServerTimingMiddleware)
 
 if ENV != 'prod':
     main.add_middleware(RuntimeMiddleware)
@@ -1,4 +1,3 @@
-import gzip
 import logging
 import zlib
 from io import BytesIO
@@ -14,7 +13,8 @@ from zstandard import ZstdDecompressor
 from app.config import REQUEST_BODY_MAX_SIZE
 from app.middlewares.request_context_middleware import get_request
 
-_ZSTD_DECOMPRESS = ZstdDecompressor().decompress
+_ZSTD_DECOMPRESSOR = ZstdDecompressor()
+_ZSTD_BLOCK_MAX_SIZE = 128 * 1024
 
 
 class RequestBodyMiddleware:
@@ -30,9 +30,13 @@ class RequestBodyMiddleware:
             return await self.app(scope, receive, send)
 
         request = get_request()
+        content_encoding = request.headers.get('Content-Encoding')
+        decompressor = _get_decompressor(content_encoding)
         input_size: cython.Py_ssize_t = 0
         buffer = BytesIO()
 
+        # Decompress while receiving, so the size limit applies
+        # before the whole decompressed body is materialized
         async for chunk in request.stream():
             chunk_size: cython.Py_ssize_t = len(chunk)
             if not chunk_size:
@@ -45,21 +49,27 @@ class RequestBodyMiddleware:
                     status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
                 )(scope, receive, send)
 
+            if decompressor is not None:
+                # Decompress at most one byte past the limit
+                max_length = REQUEST_BODY_MAX_SIZE - buffer.tell() + 1
+                try:
+                    chunk = decompressor.decompress(chunk, max_length)
+                except Exception:
+                    return await _decompress_error_response(scope, receive, send)
+
             buffer.write(chunk)
+            if buffer.tell() > REQUEST_BODY_MAX_SIZE:
+                return await Response(
+                    f'Decompressed request body exceeded {sizestr(REQUEST_BODY_MAX_SIZE)}',
+                    status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )(scope, receive, send)
 
         if input_size:
             body = buffer.getvalue()
-            content_encoding = request.headers.get('Content-Encoding')
-            decompressor = _get_decompressor(content_encoding)
 
             if decompressor is not None:
-                try:
-                    body = decompressor(body)
-                except Exception:
-                    return await Response(
-                        'Unable to decompress request body',
-                        status.HTTP_400_BAD_REQUEST,
-                    )(scope, receive, send)
+                if not decompressor.is_finished():
+                    return await _decompress_error_response(scope, receive, send)
 
                 logging.debug(
                     'Request body size: %s -> %s (compression: %s)',
@@ -68,12 +78,6 @@ class RequestBodyMiddleware:
                     content_encoding,
                 )
 
-                if len(body) > REQUEST_BODY_MAX_SIZE:
-                    return await Response(
-                        f'Decompressed request body exceeded {sizestr(REQUEST_BODY_MAX_SIZE)}',
-                        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    )(scope, receive, send)
-
             else:
                 logging.debug(
                     'Request body size: %s',
@@ -82,6 +86,7 @@ class RequestBodyMiddleware:
         else:
             body = b''
 
+        del buffer
         request._body = body  # update shared instance # noqa: SLF001
         wrapper_finished: cython.bint = False
 
@@ -95,9 +100,85 @@ class RequestBodyMiddleware:
         return await self.app(scope, wrapper, send)
 
 
-@cython.cfunc
-def _decompress_zstd(buffer: bytes) -> bytes:
-    return _ZSTD_DECOMPRESS(buffer, allow_extra_data=False)
+class _ZlibDecompressor:
+    """Incremental zlib decompressor, supporting multi-member gzip streams."""
+
+    __slots__ = ('_decompressor', '_gzip', '_wbits')
+
+    def __init__(self, *, gzip: bool) -> None:
+        self._gzip = gzip
+        self._wbits = 16 + zlib.MAX_WBITS if gzip else zlib.MAX_WBITS
+        self._decompressor = zlib.decompressobj(self._wbits)
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        decompressor = self._decompressor
+        result = decompressor.decompress(data, max_length)
+
+        while (remaining := max_length - len(result)) > 0:
+            if data := decompressor.unconsumed_tail:
+                pass
+            # Data past the end of a gzip member starts the next member
+            elif self._gzip and decompressor.eof and (data := decompressor.unused_data):
+                decompressor = self._decompressor = zlib.decompressobj(self._wbits)
+            else:
+                break
+            result += decompressor.decompress(data, remaining)
+
+        return result
+
+    def is_finished(self) -> bool:
+        return self._decompressor.eof
+
+
+class _ZstdDecompressor:
+    """Incremental zstd decompressor, rejecting data after the frame."""
+
+    __slots__ = ('_decompressor', '_trailing_data')
+
+    def __init__(self) -> None:
+        self._decompressor = _ZSTD_DECOMPRESSOR.decompressobj()
+        self._trailing_data = False
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        # zstandard cannot limit the output size, so the input is fed in slices.
+        # A block decodes to at most 128 KiB, and takes at least 4 bytes of input.
+        decompressor = self._decompressor
+        view = memoryview(data)
+        result = b''
+
+        while view and (remaining := max_length - len(result)) > 0:
+            if decompressor.eof:
+                self._trailing_data = True
+                break
+            size = 4 * (remaining // _ZSTD_BLOCK_MAX_SIZE + 1)
+            result += decompressor.decompress(view[:size])
+            view = view[size:]
+
+        return result
+
+    def is_finished(self) -> bool:
+        decompressor = self._decompressor
+        return (
+            decompressor.eof
+            and not decompressor.unused_data
+            and not self._trailing_data
+        )
+
+
+class _BrotliDecompressor:
+    """Incremental brotli decompressor."""
+
+    __slots__ = ('_decompressor',)
+
+    def __init__(self) -> None:
+        self._decompressor = brotli.Decompressor()
+
+    def decompress(self, data: bytes, max_length: int) -> bytes:
+        # brotli 1.1 cannot limit the output size, the caller enforces the limit
+        return self._decompressor.process(data)
+
+    def is_finished(self) -> bool:
+        return self._decompressor.is_finished()
 
 
 @cython.cfunc
@@ -105,11 +186,18 @@ def _get_decompressor(content_encoding: str | None):
     if content_encoding is None:
         return None
     if content_encoding == 'zstd':
-        return _decompress_zstd
+        return _ZstdDecompressor()
     if content_encoding == 'br':
-        return brotli.decompress
+        return _BrotliDecompressor()
     if content_encoding == 'gzip':
-        return gzip.decompress
+        return _ZlibDecompressor(gzip=True)
     if content_encoding == 'deflate':
-        return zlib.decompress
+        return _ZlibDecompressor(gzip=False)
     return None
+
+
+async def _decompress_error_response(scope: Scope, receive: Receive, send: Send):
+    return await Response(
+        'Unable to decompress request body',
+        status.HTTP_400_BAD_REQUEST,
+    )(scope, receive, send)
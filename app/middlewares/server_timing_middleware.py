@@ -0,0 +1,28 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.lib.timing_context import format_server_timing, timing_context
+
+
+class ServerTimingMiddleware:
+    """Add Server-Timing header with the measured request phases."""
+
+    __slots__ = ('app',)
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        with timing_context() as timings:
+
+            async def wrapper(message: Message) -> None:
+                if message['type'] == 'http.response.start' and timings:
+                    headers = MutableHeaders(raw=message['headers'])
+                    headers['Server-Timing'] = format_server_timing(timings)
+
+                return await send(message)
+
+            return await self.app(scope, receive, wrapper)
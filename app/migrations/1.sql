@@ -0,0 +1,14 @@
+CREATE TABLE element_counter (
+    id boolean PRIMARY KEY DEFAULT TRUE CHECK (id),
+    sequence_id bigint NOT NULL,
+    node_id bigint NOT NULL,
+    way_id bigint NOT NULL,
+    relation_id bigint NOT NULL
+);
+
+INSERT INTO element_counter (sequence_id, node_id, way_id, relation_id)
+SELECT
+    COALESCE((SELECT MAX(sequence_id) FROM element), 0),
+    COALESCE((SELECT MAX(typed_id) FROM element WHERE typed_id <= 1152921504606846975), 0),
+    COALESCE((SELECT MAX(typed_id) FROM element WHERE typed_id BETWEEN 1152921504606846976 AND 2305843009213693951) - 1152921504606846976, 0),
+    COALESCE((SELECT MAX(typed_id) FROM element WHERE typed_id >= 2305843009213693952) - 2305843009213693952, 0);
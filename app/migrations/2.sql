@@ -0,0 +1,10 @@
+CREATE TABLE element_sequence_minute (
+    minute timestamptz PRIMARY KEY,
+    min_sequence_id bigint NOT NULL,
+    max_sequence_id bigint NOT NULL
+);
+
+INSERT INTO element_sequence_minute (minute, min_sequence_id, max_sequence_id)
+SELECT date_trunc('minute', created_at), MIN(sequence_id), MAX(sequence_id)
+FROM element
+GROUP BY 1;
@@ -0,0 +1,383 @@
+from dataclasses import dataclass
+from datetime import UTC
+from itertools import chain, pairwise
+from typing import Any
+
+import cython
+import numpy as np
+from numpy.typing import NDArray
+from shapely import get_coordinates, points
+
+from app.models.db.element import Element
+from app.models.db.user import UserDisplay
+from app.models.element import TYPED_ELEMENT_ID_RELATION_MIN, TypedElementId
+from app.models.types import UserId
+
+# Columns to select for ElementBatch.from_copy, in binary COPY format
+ELEMENT_BATCH_COPY_COLUMNS = """
+    typed_id, sequence_id, changeset_id, version, visible, latest, created_at,
+    ST_X(point), ST_Y(point),
+    hstore_to_array(tags), members, members_roles
+"""
+
+
+@dataclass(kw_only=True, slots=True)
+class ElementBatch:
+    """
+    Columnar representation of a list of elements.
+
+    Fixed-size fields are stored in NumPy arrays. Variable-length fields are stored
+    in flat buffers, indexed by offset arrays of length len(batch) + 1.
+    Strings are stored as concatenated UTF-8 bytes, indexed by offset arrays
+    of length num_strings + 1.
+    """
+
+    typed_id: NDArray[np.uint64]
+    sequence_id: NDArray[np.uint64]
+    changeset_id: NDArray[np.uint64]
+    version: NDArray[np.uint64]
+    visible: NDArray[np.bool_]
+    latest: NDArray[np.bool_]
+
+    created_at: NDArray[np.datetime64]
+    """
+    Naive UTC timestamps with microsecond precision.
+    """
+
+    lon: NDArray[np.float64]
+    lat: NDArray[np.float64]
+    """
+    Point coordinates, NaN for elements without a point.
+    """
+
+    tags_offsets: NDArray[np.int64]
+    tags_keys: NDArray[np.uint8]
+    tags_keys_offsets: NDArray[np.int64]
+    tags_values: NDArray[np.uint8]
+    tags_values_offsets: NDArray[np.int64]
+
+    members_offsets: NDArray[np.int64]
+    members: NDArray[np.uint64]
+    members_roles: NDArray[np.uint8]
+    members_roles_offsets: NDArray[np.int64]
+    """
+    Member roles, aligned with members. Way members have empty roles.
+    """
+
+    # runtime
+    user_id: NDArray[np.uint64] | None = None
+    """
+    Resolved user ids, 0 for anonymous elements.
+    """
+
+    users: dict[UserId, UserDisplay] | None = None
+
+    def __len__(self) -> int:
+        return len(self.typed_id)
+
+    @staticmethod
+    def from_copy(columns: dict[str, Any]) -> 'ElementBatch':
+        """Create a batch from columns parsed by speedup.element_copy."""
+        return ElementBatch(
+            typed_id=np.frombuffer(columns['typed_id'], np.uint64),
+            sequence_id=np.frombuffer(columns['sequence_id'], np.uint64),
+            changeset_id=np.frombuffer(columns['changeset_id'], np.uint64),
+            version=np.frombuffer(columns['version'], np.uint64),
+            visible=np.frombuffer(columns['visible'], np.bool_),
+            latest=np.frombuffer(columns['latest'], np.bool_),
+            created_at=np.frombuffer(columns['created_at'], 'datetime64[us]'),
+            lon=np.frombuffer(columns['lon'], np.float64),
+            lat=np.frombuffer(columns['lat'], np.float64),
+            tags_offsets=np.frombuffer(columns['tags_offsets'], np.int64),
+            tags_keys=np.frombuffer(columns['tags_keys'], np.uint8),
+            tags_keys_offsets=np.frombuffer(columns['tags_keys_offsets'], np.int64),
+            tags_values=np.frombuffer(columns['tags_values'], np.uint8),
+            tags_values_offsets=np.frombuffer(columns['tags_values_offsets'], np.int64),
+            members_offsets=np.frombuffer(columns['members_offsets'], np.int64),
+            members=np.frombuffer(columns['members'], np.uint64),
+            members_roles=np.frombuffer(columns['members_roles'], np.uint8),
+            members_roles_offsets=np.frombuffer(
+                columns['members_roles_offsets'], np.int64
+            ),
+        )
+
+    @staticmethod
+    def from_elements(elements: list[Element]) -> 'ElementBatch':
+        """Create a batch from element dicts."""
+        if not elements:
+            return _empty_batch()
+
+        size = len(elements)
+        coords = np.full((size, 2), np.nan, np.float64)
+        points_mask = [element['point'] is not None for element in elements]
+        if any(points_mask):
+            coords[points_mask] = get_coordinates([
+                element['point'] for element in elements if element['point'] is not None
+            ])
+
+        typed_ids = [element['typed_id'] for element in elements]
+        tags_keys, tags_values, tags_offsets = _flatten_tags([
+            element['tags'] for element in elements
+        ])
+        members_flat, members_roles_flat, members_offsets = _flatten_members(
+            typed_ids,
+            [element['members'] for element in elements],
+            [element['members_roles'] for element in elements],
+        )
+        tags_keys_data, tags_keys_offsets = _join_strings(tags_keys)
+        tags_values_data, tags_values_offsets = _join_strings(tags_values)
+        members_roles_data, members_roles_offsets = _join_strings(members_roles_flat)
+
+        return ElementBatch(
+            typed_id=np.array(typed_ids, np.uint64),
+            sequence_id=np.fromiter(
+                (element['sequence_id'] for element in elements), np.uint64, size
+            ),
+            changeset_id=np.fromiter(
+                (element['changeset_id'] for element in elements), np.uint64, size
+            ),
+            version=np.fromiter(
+                (element['version'] for element in elements), np.uint64, size
+            ),
+            visible=np.fromiter(
+                (element['visible'] for element in elements), np.bool_, size
+            ),
+            latest=np.fromiter(
+                (element['latest'] for element in elements), np.bool_, size
+            ),
+            created_at=np.array(
+                [element['created_at'].replace(tzinfo=None) for element in elements],
+                'datetime64[us]',
+            ),
+            lon=coords[:, 0],
+            lat=coords[:, 1],
+            tags_offsets=tags_offsets,
+            tags_keys=tags_keys_data,
+            tags_keys_offsets=tags_keys_offsets,
+            tags_values=tags_values_data,
+            tags_values_offsets=tags_values_offsets,
+            members_offsets=members_offsets,
+            members=np.array(members_flat, np.uint64),
+            members_roles=members_roles_data,
+            members_roles_offsets=members_roles_offsets,
+        )
+
+    def to_elements(self) -> list[Element]:
+        """Convert the batch back to element dicts."""
+        size = len(self)
+        if not size:
+            return []
+
+        points_mask = ~np.isnan(self.lon)
+        points_list: list = [None] * size
+        for i, point in zip(
+            np.flatnonzero(points_mask).tolist(),
+            points(np.stack((self.lon[points_mask], self.lat[points_mask]), 1)),
+            strict=True,
+        ):
+            points_list[i] = point
+
+        typed_ids: list[TypedElementId] = self.typed_id.tolist()
+        tags_offsets: list[int] = self.tags_offsets.tolist()
+        members_offsets: list[int] = self.members_offsets.tolist()
+        members: list[TypedElementId] = self.members.tolist()
+        tags_keys = _decode_strings(self.tags_keys, self.tags_keys_offsets)
+        tags_values = _decode_strings(self.tags_values, self.tags_values_offsets)
+        members_roles = _decode_strings(self.members_roles, self.members_roles_offsets)
+        user_ids: list[UserId] | None = (
+            self.user_id.tolist() if self.user_id is not None else None
+        )
+        users = self.users
+
+        result: list[Element] = [None] * size  # type: ignore
+        i: cython.Py_ssize_t
+        for i, (
+            typed_id,
+            sequence_id,
+            changeset_id,
+            version,
+            visible,
+            latest,
+            created_at,
+        ) in enumerate(
+            zip(
+                typed_ids,
+                self.sequence_id.tolist(),
+                self.changeset_id.tolist(),
+                self.version.tolist(),
+                self.visible.tolist(),
+                self.latest.tolist(),
+                self.created_at.tolist(),
+                strict=True,
+            )
+        ):
+            tags_start, tags_end = tags_offsets[i], tags_offsets[i + 1]
+            members_start, members_end = members_offsets[i], members_offsets[i + 1]
+            element: Element = {
+                'changeset_id': changeset_id,
+                'typed_id': typed_id,
+                'version': version,
+                'visible': visible,
+                'tags': (
+                    dict(
+                        zip(
+                            tags_keys[tags_start:tags_end],
+                            tags_values[tags_start:tags_end],
+                            strict=True,
+                        )
+                    )
+                    if tags_start != tags_end
+                    else None
+                ),
+                'point': points_list[i],
+                'members': (
+                    members[members_start:members_end]
+                    if members_start != members_end
+                    else None
+                ),
+                'members_roles': (
+                    members_roles[members_start:members_end]
+                    if members_start != members_end
+                    and typed_id >= TYPED_ELEMENT_ID_RELATION_MIN
+                    else None
+                ),
+                'sequence_id': sequence_id,
+                'latest': latest,
+                'created_at': created_at.replace(tzinfo=UTC),
+            }
+            if user_ids is not None and (user_id := user_ids[i]):
+                element['user_id'] = user_id
+                if users is not None and (user := users.get(user_id)) is not None:
+                    element['user'] = user
+            result[i] = element
+
+        return result
+
+    def __getitem__(self, key: slice) -> 'ElementBatch':
+        """Get a batch with the elements in the given range."""
+        start, stop, step = key.indices(len(self))
+        if step != 1:
+            raise ValueError('ElementBatch slicing does not support steps')
+        stop = max(start, stop)
+
+        tags_start, tags_end = self.tags_offsets[[start, stop]].tolist()
+        members_start, members_end = self.members_offsets[[start, stop]].tolist()
+        tags_keys, tags_keys_offsets = _slice_strings(
+            self.tags_keys, self.tags_keys_offsets, tags_start, tags_end
+        )
+        tags_values, tags_values_offsets = _slice_strings(
+            self.tags_values, self.tags_values_offsets, tags_start, tags_end
+        )
+        members_roles, members_roles_offsets = _slice_strings(
+            self.members_roles, self.members_roles_offsets, members_start, members_end
+        )
+        return ElementBatch(
+            typed_id=self.typed_id[start:stop],
+            sequence_id=self.sequence_id[start:stop],
+            changeset_id=self.changeset_id[start:stop],
+            version=self.version[start:stop],
+            visible=self.visible[start:stop],
+            latest=self.latest[start:stop],
+            created_at=self.created_at[start:stop],
+            lon=self.lon[start:stop],
+            lat=self.lat[start:stop],
+            tags_offsets=self.tags_offsets[start : stop + 1] - tags_start,
+            tags_keys=tags_keys,
+            tags_keys_offsets=tags_keys_offsets,
+            tags_values=tags_values,
+            tags_values_offsets=tags_values_offsets,
+            members_offsets=self.members_offsets[start : stop + 1] - members_start,
+            members=self.members[members_start:members_end],
+            members_roles=members_roles,
+            members_roles_offsets=members_roles_offsets,
+            user_id=self.user_id[start:stop] if self.user_id is not None else None,
+            users=self.users,
+        )
+
+
+def split_strings(data: NDArray[np.uint8], offsets: NDArray[np.int64]) -> list[bytes]:
+    """Split a string column into the UTF-8 encoded strings."""
+    buffer = data.tobytes()
+    return [buffer[start:end] for start, end in pairwise(offsets.tolist())]
+
+
+@cython.cfunc
+def _empty_batch() -> ElementBatch:
+    offsets = np.zeros(1, np.int64)
+    strings = np.empty(0, np.uint8)
+    return ElementBatch(
+        typed_id=np.empty(0, np.uint64),
+        sequence_id=np.empty(0, np.uint64),
+        changeset_id=np.empty(0, np.uint64),
+        version=np.empty(0, np.uint64),
+        visible=np.empty(0, np.bool_),
+        latest=np.empty(0, np.bool_),
+        created_at=np.empty(0, 'datetime64[us]'),
+        lon=np.empty(0, np.float64),
+        lat=np.empty(0, np.float64),
+        tags_offsets=offsets,
+        tags_keys=strings,
+        tags_keys_offsets=offsets,
+        tags_values=strings,
+        tags_values_offsets=offsets,
+        members_offsets=offsets,
+        members=np.empty(0, np.uint64),
+        members_roles=strings,
+        members_roles_offsets=offsets,
+    )
+
+
+@cython.cfunc
+def _flatten_tags(
+    tags: list[dict[str, str] | None] | tuple[dict[str, str] | None, ...],
+) -> tuple[list[str], list[str], NDArray[np.int64]]:
+    offsets = np.zeros(len(tags) + 1, np.int64)
+    np.cumsum([len(t) if t else 0 for t in tags], out=offsets[1:])
+    keys = list(chain.from_iterable(t for t in tags if t))
+    values = list(chain.from_iterable(t.values() for t in tags if t))
+    return keys, values, offsets
+
+
+@cython.cfunc
+def _flatten_members(
+    typed_ids: list[TypedElementId] | tuple[TypedElementId, ...],
+    members: list[list[TypedElementId] | None] | tuple[list | None, ...],
+    members_roles: list[list[str] | None] | tuple[list | None, ...],
+) -> tuple[list[TypedElementId], list[str], NDArray[np.int64]]:
+    offsets = np.zeros(len(members) + 1, np.int64)
+    np.cumsum([len(m) if m else 0 for m in members], out=offsets[1:])
+    members_flat = list(chain.from_iterable(m for m in members if m))
+    members_roles_flat: list[str] = []
+    for typed_id, m, roles in zip(typed_ids, members, members_roles, strict=True):
+        if not m:
+            continue
+        if typed_id >= TYPED_ELEMENT_ID_RELATION_MIN and roles is not None:
+            members_roles_flat.extend(roles)
+        else:
+            members_roles_flat.extend([''] * len(m))
+    return members_flat, members_roles_flat, offsets
+
+
+@cython.cfunc
+def _decode_strings(data: NDArray[np.uint8], offsets: NDArray[np.int64]) -> list[str]:
+    buffer = data.tobytes()
+    return [buffer[start:end].decode() for start, end in pairwise(offsets.tolist())]
+
+
+@cython.cfunc
+def _join_strings(strings: list[str]) -> tuple[NDArray[np.uint8], NDArray[np.int64]]:
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), np.int64, len(encoded)), out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), np.uint8), offsets
+
+
+@cython.cfunc
+def _slice_strings(
+    data: NDArray[np.uint8],
+    offsets: NDArray[np.int64],
+    start: cython.Py_ssize_t,
+    stop: cython.Py_ssize_t,
+) -> tuple[NDArray[np.uint8], NDArray[np.int64]]:
+    data_start, data_stop = offsets[[start, stop]].tolist()
+    return data[data_start:data_stop], offsets[start : stop + 1] - data_start
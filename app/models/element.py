@@ -1,5 +1,8 @@
 from typing import Literal, NewType
 
+import numpy as np
+from numpy.typing import NDArray
+
 from speedup.element_type import typed_element_id
 
 ElementType = Literal['node', 'way', 'relation']
@@ -13,3 +16,56 @@ TYPED_ELEMENT_ID_WAY_MAX = TypedElementId(TYPED_ELEMENT_ID_RELATION_MIN - 1)
 TYPED_ELEMENT_ID_WAY_MIN = typed_element_id('way', ElementId(0))
 TYPED_ELEMENT_ID_NODE_MAX = TypedElementId(TYPED_ELEMENT_ID_WAY_MIN - 1)
 TYPED_ELEMENT_ID_NODE_MIN = typed_element_id('node', ElementId(0))
+
+ELEMENT_TYPES: tuple[ElementType, ...] = ('node', 'way', 'relation')
+"""Element types, indexed by their TypedElementId type number."""
+ELEMENT_TYPE_NUMS: dict[ElementType, int] = {
+    type: num for num, type in enumerate(ELEMENT_TYPES)
+}
+
+_TYPED_ELEMENT_ID_SIGN_BIT = 1 << 59
+_TYPED_ELEMENT_ID_ID_LIMIT = 1 << 56
+
+
+def split_typed_element_ids_array(
+    typed_ids: NDArray[np.uint64],
+) -> tuple[NDArray[np.uint8], NDArray[np.int64]]:
+    """
+    Split an array of typed element ids into type numbers and element ids.
+    Type numbers index ELEMENT_TYPES, and match the PBF member types.
+    """
+    typed_ids = np.asarray(typed_ids, np.uint64)
+    type_nums = ((typed_ids >> 60) & 0b11).astype(np.uint8)
+    if type_nums.size and (max_type_num := type_nums.max().item()) >= len(
+        ELEMENT_TYPES
+    ):
+        raise NotImplementedError(f'Unsupported element type number {max_type_num}')
+
+    ids = (typed_ids & (_TYPED_ELEMENT_ID_ID_LIMIT - 1)).astype(np.int64)
+    np.negative(ids, out=ids, where=(typed_ids & _TYPED_ELEMENT_ID_SIGN_BIT) != 0)
+    return type_nums, ids
+
+
+def typed_element_ids_array(
+    type_nums: NDArray[np.integer] | int,
+    ids: NDArray[np.integer],
+) -> NDArray[np.uint64]:
+    """
+    Combine type numbers and element ids into an array of typed element ids.
+    A single type number applies to all ids.
+    """
+    ids = np.asarray(ids, np.int64)
+    if np.any(
+        (ids >= _TYPED_ELEMENT_ID_ID_LIMIT) | (ids <= -_TYPED_ELEMENT_ID_ID_LIMIT)
+    ):
+        raise OverflowError('ElementId is too large for TypedElementId')
+
+    type_nums = np.asarray(type_nums, np.uint64)
+    if type_nums.size and (max_type_num := type_nums.max().item()) >= len(
+        ELEMENT_TYPES
+    ):
+        raise NotImplementedError(f'Unsupported element type number {max_type_num}')
+
+    result = np.abs(ids).view(np.uint64) | (type_nums << 60)
+    result[ids < 0] |= np.uint64(_TYPED_ELEMENT_ID_SIGN_BIT)
+    return result
@@ -0,0 +1,142 @@
+import logging
+from time import monotonic
+
+import cython
+from lrucache_rs import LRUCache
+
+from app.config import (
+    ELEMENT_LATEST_CACHE_EXPIRE,
+    ELEMENT_LATEST_CACHE_SIZE,
+    ELEMENT_VERSION_CACHE_SIZE,
+)
+from app.models.db.element import Element
+from app.models.element import TypedElementId
+from app.models.types import SequenceId
+from app.queries.element_query import ElementQuery
+from app.services.cache_invalidation_service import CacheInvalidationService
+
+# Superseded element versions are immutable and never need invalidation.
+_VERSION_CACHE: LRUCache[tuple[TypedElementId, int], Element] = LRUCache(
+    maxsize=ELEMENT_VERSION_CACHE_SIZE
+)
+
+# Latest element versions, invalidated after applying the optimistic diff.
+# Entries also expire, in case an invalidation is missed.
+_LATEST_CACHE: LRUCache[TypedElementId, tuple[Element, float]] = LRUCache(
+    maxsize=ELEMENT_LATEST_CACHE_SIZE
+)
+
+# Incremented on every invalidation.
+# Prevents loads that started before the invalidation from populating the cache.
+_GENERATION: int = 0
+
+
+class ElementCacheQuery:
+    @staticmethod
+    async def get_latest(
+        typed_id: TypedElementId,
+        *,
+        at_sequence_id: SequenceId | None = None,
+    ) -> Element | None:
+        """
+        Get the current element by its ref.
+
+        Behaves like ElementQuery.get_by_refs with a single ref,
+        but is served from the in-process element cache when possible.
+        """
+        element = _get_latest(typed_id)
+        if element is not None and (
+            at_sequence_id is None or element['sequence_id'] <= at_sequence_id
+        ):
+            return element.copy()
+
+        generation = _GENERATION
+        elements = await ElementQuery.get_by_refs(
+            [typed_id], at_sequence_id=at_sequence_id, limit=1
+        )
+        element = next(iter(elements), None)
+        if element is not None:
+            _store(element, generation)
+        return element
+
+    @staticmethod
+    async def get_version(
+        typed_id: TypedElementId,
+        version: int,
+        *,
+        at_sequence_id: SequenceId | None = None,
+    ) -> Element | None:
+        """
+        Get the element version by its versioned ref.
+
+        Behaves like ElementQuery.get_by_versioned_refs with a single ref,
+        but is served from the in-process element cache when possible.
+        """
+        element = _VERSION_CACHE.get((typed_id, version))
+        if element is None:
+            element = _get_latest(typed_id)
+            if element is not None and element['version'] != version:
+                element = None
+
+        if element is not None:
+            if at_sequence_id is not None and element['sequence_id'] > at_sequence_id:
+                return None
+            return element.copy()
+
+        generation = _GENERATION
+        elements = await ElementQuery.get_by_versioned_refs(
+            [(typed_id, version)], at_sequence_id=at_sequence_id, limit=1
+        )
+        element = next(iter(elements), None)
+        if element is not None:
+            _store(element, generation)
+        return element
+
+
+@cython.cfunc
+def _get_latest(typed_id: TypedElementId) -> Element | None:
+    entry = _LATEST_CACHE.get(typed_id)
+    if entry is None:
+        return None
+
+    element, expires_at = entry
+    if expires_at <= monotonic():
+        del _LATEST_CACHE[typed_id]
+        return None
+
+    return element
+
+
+@cython.cfunc
+def _store(element: Element, generation: int) -> None:
+    """Cache a copy of the element loaded from the database."""
+    if element['latest']:
+        # The element may have been superseded while loading
+        if generation == _GENERATION:
+            _LATEST_CACHE[element['typed_id']] = (
+                element.copy(),
+                monotonic() + ELEMENT_LATEST_CACHE_EXPIRE.total_seconds(),
+            )
+    else:
+        _VERSION_CACHE[element['typed_id'], element['version']] = element.copy()
+
+
+def _invalidate(typed_ids: list[int] | None) -> None:
+    global _GENERATION
+    _GENERATION += 1
+
+    if typed_ids is None:
+        _LATEST_CACHE.clear()
+        return
+
+    num_invalidated = 0
+    for typed_id in typed_ids:
+        if typed_id in _LATEST_CACHE:
+            del _LATEST_CACHE[typed_id]  # type: ignore
+            num_invalidated += 1
+
+    if num_invalidated:
+        logging.debug('Invalidated %d latest element cache entries', num_invalidated)
+
+
+CacheInvalidationService.register('element', _invalidate)
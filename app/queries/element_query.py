@@ -1,21 +1,27 @@
 import logging
 from asyncio import TaskGroup
+from collections.abc import AsyncGenerator
 from contextlib import nullcontext
+from datetime import datetime
 from typing import Any, Literal, LiteralString
 
 import cython
 from psycopg import AsyncConnection, IsolationLevel
 from psycopg.rows import dict_row
 from psycopg.sql import SQL, Composable, Identifier
+from shapely import Point
 from shapely.geometry.base import BaseGeometry
 
 from app.config import (
+    DB_COPY_BUFFER_SIZE,
+    DB_CURSOR_BATCH_SIZE,
     LEGACY_GEOM_SKIP_MISSING_NODES,
     MAP_QUERY_LEGACY_NODES_LIMIT,
 )
 from app.db import db
 from app.lib.exceptions_context import raise_for
 from app.models.db.element import Element
+from app.models.db.element_batch import ELEMENT_BATCH_COPY_COLUMNS, ElementBatch
 from app.models.element import (
     TYPED_ELEMENT_ID_NODE_MAX,
     TYPED_ELEMENT_ID_RELATION_MIN,
@@ -26,8 +32,11 @@ from app.models.element import (
     TypedElementId,
 )
 from app.models.types import ChangesetId, SequenceId
+from speedup.element_copy import element_copy_parse
 from speedup.element_type import split_typed_element_id
 
+_COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+
 
 class ElementQuery:
     @staticmethod
@@ -47,13 +56,56 @@ class ElementQuery:
             return (await r.fetchone())[0]  # type: ignore
 
     @staticmethod
-    async def get_current_ids() -> dict[ElementType, ElementId]:
+    async def get_sequence_id_by_timestamp(
+        timestamp: datetime,
+        conn: AsyncConnection | None = None,
+    ) -> SequenceId | None:
+        """
+        Get the first sequence id of the elements created at or after the timestamp.
+        Returns None if no such elements exist.
+        The result never decreases as the timestamp increases, so consecutive ranges never overlap.
+        """
+        async with nullcontext(conn) if conn is not None else db() as conn:  # noqa: PLR1704
+            # Resolve the whole minutes using the sequence index
+            async with await conn.execute(
+                """
+                SELECT MIN(min_sequence_id) FROM element_sequence_minute
+                WHERE minute >= %s
+                """,
+                (timestamp,),
+            ) as r:
+                result: SequenceId | None = (await r.fetchone())[0]  # type: ignore
+
+            # Resolve the partial minute using the elements
+            async with await conn.execute(
+                """
+                SELECT e.sequence_id
+                FROM element_sequence_minute m
+                JOIN element e ON e.sequence_id BETWEEN m.min_sequence_id AND m.max_sequence_id
+                WHERE m.minute = date_trunc('minute', %(timestamp)s::timestamptz)
+                AND m.minute < %(timestamp)s
+                AND e.created_at >= %(timestamp)s
+                ORDER BY e.sequence_id
+                LIMIT 1
+                """,
+                {'timestamp': timestamp},
+            ) as r:
+                row: tuple[SequenceId] | None = await r.fetchone()
+
+        if row is not None and (result is None or row[0] < result):
+            return row[0]
+        return result
+
+    @staticmethod
+    async def get_current_ids(
+        conn: AsyncConnection | None = None,
+    ) -> dict[ElementType, ElementId]:
         """
         Get the last id for each element type.
         Returns 0 if no elements exist with the given type.
         """
         async with (
-            db() as conn,
+            nullcontext(conn) if conn is not None else db() as conn,  # noqa: PLR1704
             await conn.execute(
                 """
                 SELECT MAX(typed_id) FROM element
@@ -81,6 +133,41 @@ class ElementQuery:
                     result[type] = id
             return result  # type: ignore
 
+    @staticmethod
+    async def get_changed_refs(
+        after_sequence_id: SequenceId,
+        until_sequence_id: SequenceId,
+        *,
+        limit: int | None = None,
+    ) -> list[
+        tuple[SequenceId, TypedElementId, Point | None, list[TypedElementId] | None]
+    ]:
+        """
+        Get the (sequence_id, typed_id, point, members) of elements
+        changed in the (after_sequence_id, until_sequence_id] range.
+        """
+        if after_sequence_id >= until_sequence_id:
+            return []
+
+        params: list[Any] = [after_sequence_id, until_sequence_id]
+
+        if limit is not None:
+            limit_clause = SQL('LIMIT %s')
+            params.append(limit)
+        else:
+            limit_clause = SQL('')
+
+        query = SQL("""
+            SELECT sequence_id, typed_id, point, members
+            FROM element
+            WHERE sequence_id > %s AND sequence_id <= %s
+            ORDER BY sequence_id
+            {limit}
+        """).format(limit=limit_clause)
+
+        async with db() as conn, await conn.execute(query, params) as r:
+            return await r.fetchall()  # type: ignore
+
     @staticmethod
     async def check_is_latest(versioned_refs: list[tuple[TypedElementId, int]]) -> bool:
         """Check if the given elements are currently up-to-date."""
@@ -608,6 +695,70 @@ class ElementQuery:
         ):
             return await r.fetchall()  # type: ignore
 
+    @staticmethod
+    def iter_by_changeset(
+        changeset_id: ChangesetId,
+        *,
+        sort_by: Literal['typed_id', 'sequence_id'] = 'typed_id',
+        batch_size: int = DB_CURSOR_BATCH_SIZE,
+    ) -> AsyncGenerator[list[Element]]:
+        """Iterate elements by the changeset id, in batches."""
+        query = SQL("""
+            SELECT * FROM element
+            WHERE changeset_id = %s
+            ORDER BY {sort_by}
+        """).format(sort_by=Identifier(sort_by))
+        return _iter_batches(query, (changeset_id,), batch_size)
+
+    @staticmethod
+    def iter_batches_by_changeset(
+        changeset_id: ChangesetId,
+        *,
+        sort_by: Literal['typed_id', 'sequence_id'] = 'typed_id',
+        batch_size: int = DB_CURSOR_BATCH_SIZE,
+    ) -> AsyncGenerator[ElementBatch]:
+        """Iterate elements by the changeset id, in columnar batches."""
+        query = SQL("""
+            SELECT {columns} FROM element
+            WHERE changeset_id = %s
+            ORDER BY {sort_by}
+        """).format(
+            columns=SQL(ELEMENT_BATCH_COPY_COLUMNS), sort_by=Identifier(sort_by)
+        )
+        return _iter_element_batches(query, (changeset_id,), batch_size)
+
+    @staticmethod
+    def iter_by_sequence_range(
+        start_sequence_id: SequenceId,
+        end_sequence_id: SequenceId,
+        *,
+        batch_size: int = DB_CURSOR_BATCH_SIZE,
+    ) -> AsyncGenerator[list[Element]]:
+        """Iterate elements within the sequence_id range (inclusive), in batches."""
+        query = SQL("""
+            SELECT * FROM element
+            WHERE sequence_id BETWEEN %s AND %s
+            ORDER BY sequence_id
+        """)
+        return _iter_batches(query, (start_sequence_id, end_sequence_id), batch_size)
+
+    @staticmethod
+    def iter_batches_by_sequence_range(
+        start_sequence_id: SequenceId,
+        end_sequence_id: SequenceId,
+        *,
+        batch_size: int = DB_CURSOR_BATCH_SIZE,
+    ) -> AsyncGenerator[ElementBatch]:
+        """Iterate elements within the sequence_id range (inclusive), in columnar batches."""
+        query = SQL("""
+            SELECT {columns} FROM element
+            WHERE sequence_id BETWEEN %s AND %s
+            ORDER BY sequence_id
+        """).format(columns=SQL(ELEMENT_BATCH_COPY_COLUMNS))
+        return _iter_element_batches(
+            query, (start_sequence_id, end_sequence_id), batch_size
+        )
+
     @staticmethod
     async def find_many_by_geom(
         geometry: BaseGeometry,
@@ -755,6 +906,99 @@ class ElementQuery:
 
         return result
 
+    @staticmethod
+    async def find_page_by_geom(
+        geometry: BaseGeometry,
+        *,
+        at_sequence_id: SequenceId,
+        after_typed_id: TypedElementId | None = None,
+        nodes_limit: int,
+        partial_ways: bool = False,
+        include_relations: bool = True,
+    ) -> tuple[list[Element], TypedElementId | None]:
+        """
+        Find a page of elements within the given geometry, as of the at_sequence_id snapshot.
+
+        Matching nodes are paginated by typed_id, starting after after_typed_id.
+        Related elements are resolved like in find_many_by_geom. Ways and relations
+        spanning multiple pages are returned with each of them.
+
+        Returns the elements and the typed_id to continue after, or None on the last page.
+        """
+        params: dict[str, Any] = {
+            'at_sequence_id': at_sequence_id,
+            'after_typed_id': after_typed_id if after_typed_id is not None else -1,
+            'geometry': geometry,
+            'limit': nodes_limit + 1,  # to detect more pages
+        }
+        query = SQL("""
+            SELECT * FROM ({snapshot}) AS nodes
+            ORDER BY typed_id
+            LIMIT %(limit)s
+        """).format(
+            snapshot=_snapshot_query(
+                SQL(
+                    'typed_id > %(after_typed_id)s AND typed_id <= 1152921504606846975'
+                ),
+                SQL('point && %(geometry)s'),
+            )
+        )
+
+        async with (
+            db() as conn,
+            await conn.cursor(row_factory=dict_row).execute(query, params) as r,
+        ):
+            nodes: list[Element] = await r.fetchall()  # type: ignore
+
+        if len(nodes) > nodes_limit:
+            nodes = nodes[:nodes_limit]
+            next_typed_id = nodes[-1]['typed_id']
+        else:
+            next_typed_id = None
+
+        if not nodes:
+            return [], None
+
+        nodes_typed_ids = [node['typed_id'] for node in nodes]
+        ways = await _get_parents_at_sequence_id(
+            nodes_typed_ids,
+            SQL('typed_id BETWEEN 1152921504606846976 AND 2305843009213693951'),
+            at_sequence_id,
+        )
+        result: list[Element] = nodes.copy()
+
+        # fetch ways' nodes
+        if not partial_ways:
+            ways_nodes_typed_ids = {
+                member
+                for way in ways
+                if (members := way['members'])
+                for member in members
+            }
+            ways_nodes_typed_ids.difference_update(nodes_typed_ids)
+            result.extend(
+                await ElementQuery.get_by_refs(
+                    list(ways_nodes_typed_ids),
+                    at_sequence_id=at_sequence_id,
+                    limit=len(ways_nodes_typed_ids),
+                )
+            )
+
+        result.extend(ways)
+
+        # fetch nodes' and ways' relations
+        if include_relations:
+            nodes_typed_ids.extend(way['typed_id'] for way in ways)
+            result.extend(
+                await _get_parents_at_sequence_id(
+                    nodes_typed_ids,
+                    SQL('typed_id >= 2305843009213693952'),
+                    at_sequence_id,
+                )
+            )
+
+        return result, next_typed_id
+
     @staticmethod
     async def get_last_visible_sequence_id(element: Element) -> SequenceId | None:
         """Get the last sequence_id of the element, during which it was visible."""
@@ -772,3 +1016,139 @@ class ElementQuery:
             ) as r,
         ):
             return (await r.fetchone())[0]  # type: ignore
+
+
+@cython.cfunc
+def _snapshot_query(type_condition: Composable, condition: Composable) -> Composable:
+    """
+    Build a query for elements matching the condition, as of the at_sequence_id snapshot.
+    Elements unchanged since the snapshot are matched with the latest-only indexes.
+    Only the elements changed since then are resolved to their historical versions.
+    """
+    return SQL("""
+        SELECT * FROM element
+        WHERE {type_condition}
+        AND {condition}
+        AND latest
+        AND sequence_id <= %(at_sequence_id)s
+        UNION ALL
+        SELECT * FROM (
+            SELECT DISTINCT ON (typed_id) * FROM element
+            WHERE typed_id = ANY(
+                SELECT typed_id FROM element
+                WHERE {type_condition}
+                AND sequence_id > %(at_sequence_id)s
+            )
+            AND sequence_id <= %(at_sequence_id)s
+            ORDER BY typed_id, sequence_id DESC
+        ) AS snapshot
+        WHERE {condition}
+    """).format(type_condition=type_condition, condition=condition)
+
+
+async def _get_parents_at_sequence_id(
+    members: list[TypedElementId],
+    type_condition: Composable,
+    at_sequence_id: SequenceId,
+) -> list[Element]:
+    """Get elements that reference the given elements, as of the at_sequence_id snapshot."""
+    query = SQL("""
+        SELECT * FROM ({snapshot}) AS parents
+        ORDER BY typed_id
+    """).format(
+        snapshot=_snapshot_query(
+            type_condition, SQL('members && %(members)s::bigint[]')
+        )
+    )
+
+    async with (
+        db() as conn,
+        await conn.cursor(row_factory=dict_row).execute(
+            query, {'members': members, 'at_sequence_id': at_sequence_id}
+        ) as r,
+    ):
+        return await r.fetchall()  # type: ignore
+
+
+async def _iter_batches(
+    query: Composable,
+    params: tuple[Any, ...],
+    batch_size: int,
+) -> AsyncGenerator[list[Element]]:
+    """
+    Iterate the query results in batches.
+    Uses a server-side cursor to avoid loading all rows into memory.
+    """
+    async with (
+        db() as conn,
+        conn.cursor('element_iter', row_factory=dict_row) as r,
+    ):
+        await r.execute(query, params)
+        while rows := await r.fetchmany(batch_size):
+            yield rows  # type: ignore
+
+
+async def _iter_element_batches(
+    query: Composable,
+    params: tuple[Any, ...],
+    batch_size: int,
+) -> AsyncGenerator[ElementBatch]:
+    """
+    Like _iter_batches, but yields columnar batches instead of element dicts.
+    Streams the results in binary COPY format and parses the rows in C,
+    avoiding the per-value Python decoding of regular cursors.
+    """
+    buffer = bytearray()
+    header_size: int | None = None
+    done = False
+
+    async with (
+        db() as conn,
+        conn.cursor() as r,
+        r.copy(
+            SQL('COPY ({}) TO STDOUT (FORMAT BINARY)').format(query), params
+        ) as copy,
+    ):
+        async for data in copy:
+            buffer += data
+
+            if header_size is None:
+                header_size = _parse_copy_header(buffer)
+                if header_size is None:
+                    continue
+                del buffer[:header_size]
+
+            if len(buffer) < DB_COPY_BUFFER_SIZE:
+                continue
+
+            while True:
+                consumed, done, columns = element_copy_parse(buffer, batch_size)
+                del buffer[:consumed]
+                batch = ElementBatch.from_copy(columns)
+                if batch:
+                    yield batch
+                if done or len(batch) < batch_size:
+                    break
+
+    while not done:
+        if header_size is None:
+            raise ValueError('Truncated COPY data')
+        consumed, done, columns = element_copy_parse(buffer, batch_size)
+        if not consumed and not done:
+            raise ValueError('Truncated COPY data')
+        del buffer[:consumed]
+        batch = ElementBatch.from_copy(columns)
+        if batch:
+            yield batch
+
+
+@cython.cfunc
+def _parse_copy_header(buffer: bytearray) -> int | None:
+    """Get the size of the binary COPY header. Returns None if the header is incomplete."""
+    if len(buffer) < 19:
+        return None
+    if buffer[:11] != _COPY_SIGNATURE:
+        raise ValueError('Invalid COPY signature')
+    # signature, flags field, header extension length, header extension
+    size = 19 + int.from_bytes(buffer[15:19])
+    return size if len(buffer) >= size else None
@@ -0,0 +1,308 @@
+import logging
+from asyncio import TaskGroup
+from bisect import bisect_right
+from dataclasses import dataclass
+
+import cython
+from lrucache_rs import LRUCache
+from shapely import Polygon, box, get_coordinates, intersects_xy
+from shapely.geometry.base import BaseGeometry
+
+from app.config import (
+    MAP_QUERY_LEGACY_NODES_LIMIT,
+    MAP_QUERY_TILE_CACHE_MAX_CHANGES,
+    MAP_QUERY_TILE_CACHE_MAX_TILES,
+    MAP_QUERY_TILE_CACHE_SIZE,
+    MAP_QUERY_TILE_CACHE_ZOOM,
+)
+from app.lib.exceptions_context import raise_for
+from app.models.db.element import Element
+from app.models.element import (
+    TYPED_ELEMENT_ID_NODE_MAX,
+    TYPED_ELEMENT_ID_WAY_MAX,
+    TypedElementId,
+)
+from app.models.types import SequenceId
+from app.queries.element_query import ElementQuery
+
+_TileKey = tuple[int, int]
+
+# Tiles form a regular lon/lat grid with the same width as web mercator tiles at the configured zoom.
+# Unlike web mercator, the grid also covers the polar regions.
+_TILE_SIZE: float = 360 / (1 << MAP_QUERY_TILE_CACHE_ZOOM)
+_TILE_MAX_X: int = (1 << MAP_QUERY_TILE_CACHE_ZOOM) - 1
+_TILE_MAX_Y: int = (1 << (MAP_QUERY_TILE_CACHE_ZOOM - 1)) - 1
+
+
+@dataclass(slots=True)
+class _Tile:
+    sequence_id: SequenceId
+    """
+    sequence_id up to which the tile is known to be up-to-date.
+    """
+
+    bounds: tuple[float, float, float, float]
+    """
+    Tile bounds (minx, miny, maxx, maxy).
+    """
+
+    elements: list[Element]
+    """
+    Elements matching the tile, as returned by ElementQuery.find_many_by_geom.
+    """
+
+    typed_ids: set[TypedElementId]
+    """
+    Set of element refs contained in the tile, used for invalidation.
+    """
+
+
+_TILE_CACHE: LRUCache[_TileKey, _Tile] = LRUCache(maxsize=MAP_QUERY_TILE_CACHE_SIZE)
+
+
+class ElementTileQuery:
+    @staticmethod
+    async def find_many_by_geom(
+        geometry: BaseGeometry,
+        *,
+        partial_ways: bool = False,
+        include_relations: bool = True,
+        nodes_limit: int | None = None,
+        legacy_nodes_limit: bool = False,
+    ) -> list[Element]:
+        """
+        Find elements within the given geometry.
+
+        Behaves like ElementQuery.find_many_by_geom, but assembles the result
+        from the per-tile cache. Only the tiles affected by changes since their
+        cached sequence_id are fetched from the database.
+        Large or multi-part geometries bypass the cache.
+        """
+        if legacy_nodes_limit and nodes_limit != MAP_QUERY_LEGACY_NODES_LIMIT:
+            raise ValueError(
+                'nodes_limit must be MAP_QUERY_NODES_LEGACY_LIMIT when legacy_nodes_limit is True'
+            )
+
+        keys = _get_tile_keys(geometry) if isinstance(geometry, Polygon) else None
+        if keys is None:
+            return await ElementQuery.find_many_by_geom(
+                geometry,
+                partial_ways=partial_ways,
+                include_relations=include_relations,
+                nodes_limit=nodes_limit,
+                legacy_nodes_limit=legacy_nodes_limit,
+            )
+
+        tiles = await _get_tiles(keys)
+        return _assemble_elements(
+            tiles,
+            geometry,
+            partial_ways=partial_ways,
+            include_relations=include_relations,
+            nodes_limit=nodes_limit,
+            legacy_nodes_limit=legacy_nodes_limit,
+        )
+
+
+@cython.cfunc
+def _get_tile_keys(geometry: Polygon) -> list[_TileKey] | None:
+    """Get the keys of tiles covering the geometry. Returns None if there are too many tiles."""
+    minx, miny, maxx, maxy = geometry.bounds
+    min_x: cython.int = max(int((minx + 180) // _TILE_SIZE), 0)
+    min_y: cython.int = max(int((miny + 90) // _TILE_SIZE), 0)
+    max_x: cython.int = min(int((maxx + 180) // _TILE_SIZE), _TILE_MAX_X)
+    max_y: cython.int = min(int((maxy + 90) // _TILE_SIZE), _TILE_MAX_Y)
+
+    if (max_x - min_x + 1) * (max_y - min_y + 1) > MAP_QUERY_TILE_CACHE_MAX_TILES:
+        return None
+
+    return [
+        (x, y)  #
+        for x in range(min_x, max_x + 1)
+        for y in range(min_y, max_y + 1)
+    ]
+
+
+@cython.cfunc
+def _get_tile_bounds(key: _TileKey) -> tuple[float, float, float, float]:
+    x, y = key
+    minx = x * _TILE_SIZE - 180
+    miny = y * _TILE_SIZE - 90
+    return minx, miny, minx + _TILE_SIZE, min(miny + _TILE_SIZE, 90)
+
+
+async def _get_tiles(keys: list[_TileKey]) -> list[_Tile]:
+    """Get the up-to-date tiles, fetching the missing or invalidated ones."""
+    current_sequence_id = await ElementQuery.get_current_sequence_id()
+    tiles: dict[_TileKey, _Tile | None] = {key: _TILE_CACHE.get(key) for key in keys}
+
+    stale_keys = [
+        key
+        for key, tile in tiles.items()
+        if tile is not None and tile.sequence_id < current_sequence_id
+    ]
+    if stale_keys:
+        for key in await _revalidate_tiles(
+            {key: tiles[key] for key in stale_keys},  # type: ignore
+            current_sequence_id,
+        ):
+            tiles[key] = None
+
+    fetch_keys = [key for key, tile in tiles.items() if tile is None]
+    if fetch_keys:
+        logging.debug('Map tile cache fetching %d tiles', len(fetch_keys))
+        async with TaskGroup() as tg:
+            tasks = [
+                tg.create_task(_fetch_tile(key, current_sequence_id))
+                for key in fetch_keys
+            ]
+        for key, task in zip(fetch_keys, tasks, strict=True):
+            tile = tiles[key] = task.result()
+            _TILE_CACHE[key] = tile
+
+    return list(tiles.values())  # type: ignore
+
+
+async def _revalidate_tiles(
+    tiles: dict[_TileKey, _Tile],
+    current_sequence_id: SequenceId,
+) -> list[_TileKey]:
+    """
+    Check the stale tiles against the changes since their sequence_id.
+    Valid tiles are bumped to the current sequence_id. Returns the invalidated tile keys.
+    """
+    changes = await ElementQuery.get_changed_refs(
+        min(tile.sequence_id for tile in tiles.values()),
+        current_sequence_id,
+        limit=MAP_QUERY_TILE_CACHE_MAX_CHANGES + 1,
+    )
+    if len(changes) > MAP_QUERY_TILE_CACHE_MAX_CHANGES:
+        logging.debug('Map tile cache invalidating all tiles (too many changes)')
+        return list(tiles)
+
+    changes_sequence_ids = [change[0] for change in changes]
+    result: list[_TileKey] = []
+
+    for key, tile in tiles.items():
+        typed_ids = tile.typed_ids
+        minx, miny, maxx, maxy = tile.bounds
+        valid: cython.bint = True
+
+        for _, typed_id, point, members in changes[
+            bisect_right(changes_sequence_ids, tile.sequence_id) :
+        ]:
+            if (
+                # Element in the tile was changed
+                typed_id in typed_ids
+                # Element now references an element in the tile
+                or (members and not typed_ids.isdisjoint(members))
+                # Node was moved into the tile
+                or (
+                    point is not None
+                    and minx <= point.x <= maxx
+                    and miny <= point.y <= maxy
+                )
+            ):
+                valid = False
+                break
+
+        if valid:
+            tile.sequence_id = current_sequence_id
+        else:
+            result.append(key)
+
+    return result
+
+
+async def _fetch_tile(key: _TileKey, sequence_id: SequenceId) -> _Tile:
+    bounds = _get_tile_bounds(key)
+    elements = await ElementQuery.find_many_by_geom(box(*bounds))
+    return _Tile(
+        sequence_id=sequence_id,
+        bounds=bounds,
+        elements=elements,
+        typed_ids={element['typed_id'] for element in elements},
+    )
+
+
+@cython.cfunc
+def _assemble_elements(
+    tiles: list[_Tile],
+    geometry: Polygon,
+    *,
+    partial_ways: cython.bint,
+    include_relations: cython.bint,
+    nodes_limit: int | None,
+    legacy_nodes_limit: cython.bint,
+) -> list[Element]:
+    """Assemble the find_many_by_geom result from the tiles."""
+    # Merge tiles, preferring the most recent element versions
+    elements_map: dict[TypedElementId, Element] = {}
+    for tile in tiles:
+        for element in tile.elements:
+            typed_id = element['typed_id']
+            prev = elements_map.get(typed_id)
+            if prev is None or prev['sequence_id'] < element['sequence_id']:
+                elements_map[typed_id] = element
+
+    nodes: list[Element] = []
+    ways: list[Element] = []
+    relations: list[Element] = []
+
+    for typed_id, element in elements_map.items():
+        if typed_id <= TYPED_ELEMENT_ID_NODE_MAX:
+            if element['point'] is not None:
+                nodes.append(element)
+        elif typed_id <= TYPED_ELEMENT_ID_WAY_MAX:
+            ways.append(element)
+        else:
+            relations.append(element)
+
+    # Find all matching nodes within the geometry
+    if nodes:
+        coords = get_coordinates([node['point'] for node in nodes])
+        mask: list[bool] = intersects_xy(geometry, coords[:, 0], coords[:, 1]).tolist()
+        nodes = [node for node, match in zip(nodes, mask, strict=True) if match]
+        if not nodes:
+            return []
+
+    if nodes_limit is not None and len(nodes) > nodes_limit:
+        if legacy_nodes_limit:
+            raise_for.map_query_nodes_limit_exceeded()
+        nodes = nodes[:nodes_limit]
+
+    # Find nodes' ways
+    nodes_typed_ids = {node['typed_id'] for node in nodes}
+    ways = [
+        way
+        for way in ways
+        if (members := way['members'])  #
+        and not nodes_typed_ids.isdisjoint(members)
+    ]
+    result: list[Element] = nodes.copy()
+
+    # Find ways' nodes
+    if not partial_ways:
+        ways_nodes_typed_ids = {
+            member for way in ways if (members := way['members']) for member in members
+        }
+        ways_nodes_typed_ids.difference_update(nodes_typed_ids)
+        result.extend(
+            element
+            for typed_id in ways_nodes_typed_ids
+            if (element := elements_map.get(typed_id)) is not None
+        )
+
+    result.extend(ways)
+
+    # Find nodes' and ways' relations
+    if include_relations:
+        nodes_typed_ids.update(way['typed_id'] for way in ways)
+        result.extend(
+            relation
+            for relation in relations
+            if (members := relation['members'])
+            and not nodes_typed_ids.isdisjoint(members)
+        )
+
+    return result
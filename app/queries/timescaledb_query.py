@@ -1,11 +1,26 @@
 from contextlib import nullcontext
+from dataclasses import dataclass
+from time import monotonic
 from typing import Literal
 
 from psycopg import AsyncConnection
-from psycopg.sql import SQL
 
+from app.config import TIMESCALEDB_CHUNKS_CACHE_EXPIRE
 from app.db import db
 
+_INT64_MAX = (1 << 63) - 1
+
+
+@dataclass(slots=True)
+class _ChunksEntry:
+    # Ascending, end-exclusive, the last range is open-ended
+    ranges: list[tuple[int, int]]
+    last_end: int
+    expires_at: float
+
+
+_CACHE: dict[str, _ChunksEntry] = {}
+
 
 class TimescaleDBQuery:
     @staticmethod
@@ -16,19 +31,56 @@ class TimescaleDBQuery:
         inclusive: bool = True,
         sort: Literal['asc', 'desc'] = 'desc',
     ) -> list[tuple[int, int]]:
-        async with (
-            nullcontext(conn) if conn is not None else db() as conn,  # noqa: PLR1704
-            await conn.execute(
-                SQL("""
-                SELECT range_start_integer, range_end_integer {inclusive}
-                FROM timescaledb_information.chunks
-                WHERE hypertable_name = %s
-                ORDER BY range_end_integer {sort}
-                """).format(
-                    inclusive=SQL('- 1') if inclusive else SQL(''),
-                    sort=SQL(sort),
-                ),
-                (table,),
-            ) as r,
-        ):
-            return await r.fetchall() or [(-2, -1)]
+        """
+        Get the id ranges of the hypertable chunks.
+        The ranges are cached in-process, the last range is open-ended
+        to include the chunks created since.
+        """
+        entry = _CACHE.get(table)
+        if entry is None or entry.expires_at <= monotonic():
+            entry = _CACHE[table] = await _load_chunks_ranges(table, conn)
+
+        ranges = (
+            [(start, end - 1) for start, end in entry.ranges]
+            if inclusive
+            else entry.ranges.copy()
+        )
+        if sort == 'desc':
+            ranges.reverse()
+        return ranges
+
+    @staticmethod
+    def observe_id(table: str, new_id: int) -> None:
+        """Expire the cached chunks ranges if the id is beyond the last cached chunk."""
+        entry = _CACHE.get(table)
+        if entry is not None and new_id >= entry.last_end:
+            del _CACHE[table]
+
+
+async def _load_chunks_ranges(table: str, conn: AsyncConnection | None) -> _ChunksEntry:
+    async with (
+        nullcontext(conn) if conn is not None else db() as conn,  # noqa: PLR1704
+        await conn.execute(
+            """
+            SELECT range_start_integer, range_end_integer
+            FROM timescaledb_information.chunks
+            WHERE hypertable_name = %s
+            ORDER BY range_end_integer
+            """,
+            (table,),
+        ) as r,
+    ):
+        ranges: list[tuple[int, int]] = await r.fetchall()
+
+    if ranges:
+        last_end = ranges[-1][1]
+        ranges[-1] = (ranges[-1][0], _INT64_MAX)
+    else:
+        last_end = 0
+        ranges = [(0, _INT64_MAX)]
+
+    return _ChunksEntry(
+        ranges=ranges,
+        last_end=last_end,
+        expires_at=monotonic() + TIMESCALEDB_CHUNKS_CACHE_EXPIRE.total_seconds(),
+    )
@@ -1,5 +1,6 @@
 from typing import Any, Literal
 
+import numpy as np
 from psycopg.rows import dict_row
 from psycopg.sql import SQL, Composable, Identifier
 from shapely import Point
@@ -9,6 +10,7 @@ from app.db import db
 from app.lib.auth_context import auth_user
 from app.lib.user_name_blacklist import is_user_name_blacklisted
 from app.models.db.element import Element
+from app.models.db.element_batch import ElementBatch
 from app.models.db.user import User, UserDisplay
 from app.models.types import ChangesetId, DisplayName, Email, UserId
 
@@ -278,3 +280,36 @@ class UserQuery:
                         element['user_id'] = user_id
 
         await UserQuery.resolve_users(elements)
+
+    @staticmethod
+    async def resolve_element_batch_users(batch: ElementBatch) -> None:
+        """Resolve the user_id and users fields for the given element batch."""
+        if not len(batch):
+            return
+
+        changeset_ids, inverse = np.unique(batch.changeset_id, return_inverse=True)
+
+        async with (
+            db() as conn,
+            await conn.execute(
+                """
+                SELECT id, user_id FROM changeset
+                WHERE id = ANY(%s) AND user_id IS NOT NULL
+                """,
+                (changeset_ids.tolist(),),
+            ) as r,
+        ):
+            changeset_user_id: dict[ChangesetId, UserId] = dict(await r.fetchall())
+
+        batch.user_id = np.array(
+            [changeset_user_id.get(id, 0) for id in changeset_ids.tolist()],
+            np.uint64,
+        )[inverse]
+
+        users: list[dict[str, Any]] = [
+            {'user_id': user_id} for user_id in set(changeset_user_id.values())
+        ]
+        await UserQuery.resolve_users(users)
+        batch.users = {
+            item['user_id']: item['user'] for item in users if 'user' in item
+        }
@@ -1,4 +1,6 @@
-from collections.abc import Callable
+from collections.abc import AsyncGenerator, AsyncIterable, Awaitable, Callable, Sized
+from contextlib import aclosing, nullcontext
+from dataclasses import dataclass
 from functools import wraps
 from typing import Any, NoReturn, override
 
@@ -7,9 +9,16 @@ import orjson
 from fastapi import APIRouter, Response
 from fastapi.dependencies.utils import get_dependant
 from fastapi.routing import APIRoute
+from starlette.responses import StreamingResponse
 from starlette.routing import request_response
 
-from app.config import ATTRIBUTION_URL, COPYRIGHT, GENERATOR, LICENSE_URL
+from app.config import (
+    ATTRIBUTION_URL,
+    COPYRIGHT,
+    GENERATOR,
+    LICENSE_URL,
+    STREAM_RESPONSE_BATCH_SIZE,
+)
 from app.lib.format_style_context import format_style
 from app.lib.xmltodict import XMLToDict
 from app.middlewares.request_context_middleware import get_request
@@ -43,6 +52,31 @@ _GPX_ATTRS = {
 }
 
 
+@dataclass(kw_only=True, slots=True)
+class OSMStream[T: Sized]:
+    """
+    Response content encoded and sent in batches.
+    Large responses are streamed to reduce memory usage and time-to-first-byte.
+    """
+
+    head: dict[str, Any]
+    """
+    Content preceding the streamed items, e.g., bounds.
+    """
+
+    items: T | AsyncIterable[T]
+    """
+    Batch of items to encode, or an async iterable of batches.
+    A single batch must support slicing and is split into smaller batches.
+    """
+
+    encode: Callable[[T], Awaitable[dict[str, Any] | list | bytes]]
+    """
+    Encode a batch of items. The result must have the same shape for every batch.
+    XML batches may be pre-encoded as bytes, the children of the root element.
+    """
+
+
 class OSMResponse(Response):
     xml_root = 'osm'
 
@@ -65,6 +99,34 @@ class OSMResponse(Response):
 
         raise NotImplementedError(f'Unsupported osm format style {style!r}')
 
+    @classmethod
+    async def serialize_stream(cls, content: OSMStream) -> Response:
+        style = format_style()
+        if style not in {'json', 'xml'}:
+            raise NotImplementedError(f'Unsupported osm stream format style {style!r}')
+
+        items = content.items
+        batches = _encode_stream_batches(content)
+        first = await anext(batches, None)
+        if first is None:
+            # Serialize only the head if there are no batches to learn the shape from
+            if isinstance(items, AsyncIterable):
+                return cls.serialize(content.head)
+            first = await content.encode(items[0:0])  # type: ignore
+
+        # Small responses are serialized at once
+        second = await anext(batches, None)
+        if second is None:
+            if isinstance(first, bytes):
+                return _serialize_xml_fragment(cls.xml_root, content.head, first)
+            return cls.serialize(
+                {**content.head, **first} if isinstance(first, dict) else first
+            )
+
+        if style == 'json':
+            return _stream_json(content.head, first, second, batches)
+        return _stream_xml(cls.xml_root, content.head, first, second, batches)
+
 
 class OSMChangeResponse(OSMResponse):
     xml_root = 'osmChange'
@@ -96,6 +158,8 @@ def _serialize_json(content: Any):
 
 @cython.cfunc
 def _serialize_xml(xml_root: str, content: Any):
+    if isinstance(content, bytes):
+        return _serialize_xml_fragment(xml_root, {}, content)
     if isinstance(content, dict):
         content = {xml_root: {**_XML_ATTRS, **content}}
     elif isinstance(content, (list, tuple)):  # noqa: UP038
@@ -107,6 +171,150 @@ def _serialize_xml(xml_root: str, content: Any):
     return Response(encoded, media_type='application/xml; charset=utf-8')
 
 
+@cython.cfunc
+def _serialize_xml_fragment(xml_root: str, head: dict[str, Any], fragment: bytes):
+    prefix, suffix = _xml_root_tags(xml_root, head)
+    return Response(
+        b''.join((prefix, fragment, suffix)),
+        media_type='application/xml; charset=utf-8',
+    )
+
+
+async def _encode_stream_batches[T: Sized](
+    content: OSMStream[T],
+) -> AsyncGenerator[dict[str, Any] | list | bytes]:
+    items = content.items
+    encode = content.encode
+
+    if isinstance(items, AsyncIterable):
+        # Close the source deterministically, releasing any database connection,
+        # when the client disconnects or the stream fails
+        async with (
+            aclosing(items) if isinstance(items, AsyncGenerator) else nullcontext()
+        ):
+            async for batch in items:
+                if len(batch):
+                    yield await encode(batch)
+    else:
+        for i in range(0, len(items), STREAM_RESPONSE_BATCH_SIZE):
+            yield await encode(items[i : i + STREAM_RESPONSE_BATCH_SIZE])  # type: ignore
+
+
+@cython.cfunc
+def _stream_json(
+    head: dict[str, Any],
+    first: dict[str, Any] | list,
+    second: dict[str, Any] | list,
+    batches: AsyncGenerator[dict[str, Any] | list],
+):
+    # include json attributes if api 0.6 and not notes
+    path: str = get_request().url.path
+    if path.startswith('/api/0.6/') and not path.startswith('/api/0.6/notes'):
+        head = {**_JSON_ATTRS, **head}
+
+    # The streamed items are stored under the only key of the batch dict,
+    # or directly in the batch list
+    key: str | None
+    if isinstance(first, dict):
+        if len(first) != 1:
+            raise TypeError(f'Invalid json stream batch keys {list(first)}')
+        key = next(iter(first))
+        prefix = orjson.dumps({**head, key: []})[:-2]
+        suffix = b']}'
+    elif not head:
+        key = None
+        prefix = b'['
+        suffix = b']'
+    else:
+        raise TypeError('Json stream with list batches does not support head')
+
+    async def iterator():
+        async with aclosing(batches):
+            yield prefix
+            is_first: cython.bint = True
+
+            for batch in (first, second):
+                encoded = _encode_json_stream_batch(key, batch, is_first)
+                if encoded:
+                    yield encoded
+                    is_first = False
+
+            async for batch in batches:
+                encoded = _encode_json_stream_batch(key, batch, is_first)
+                if encoded:
+                    yield encoded
+                    is_first = False
+
+        yield suffix
+
+    return StreamingResponse(iterator(), media_type='application/json; charset=utf-8')
+
+
+@cython.cfunc
+def _encode_json_stream_batch(
+    key: str | None,
+    batch: dict[str, Any] | list,
+    is_first: cython.bint,
+) -> bytes:
+    items = batch[key] if key is not None else batch  # type: ignore
+    encoded = orjson.dumps(
+        items,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z,
+    )
+    # Strip the list brackets and join with the previous batch.
+    # Items may be a pre-encoded orjson.Fragment, so check emptiness after encoding.
+    encoded = encoded[1:-1]
+    if not encoded:
+        return b''
+    return encoded if is_first else b',' + encoded
+
+
+@cython.cfunc
+def _stream_xml(
+    xml_root: str,
+    head: dict[str, Any],
+    first: dict[str, Any] | list | bytes,
+    second: dict[str, Any] | list | bytes,
+    batches: AsyncGenerator[dict[str, Any] | list | bytes],
+):
+    prefix, suffix = _xml_root_tags(xml_root, head)
+
+    async def iterator():
+        async with aclosing(batches):
+            yield prefix
+            yield _encode_xml_stream_batch(xml_root, first)
+            yield _encode_xml_stream_batch(xml_root, second)
+            async for batch in batches:
+                yield _encode_xml_stream_batch(xml_root, batch)
+        yield suffix
+
+    return StreamingResponse(iterator(), media_type='application/xml; charset=utf-8')
+
+
+@cython.cfunc
+def _xml_root_tags(xml_root: str, head: dict[str, Any]) -> tuple[bytes, bytes]:
+    """Get the opening root element with the head, and the closing root element."""
+    # Unparse the head and reopen the root element
+    prefix: bytes = XMLToDict.unparse(
+        {xml_root: {**_XML_ATTRS, **head}}, binary=True
+    ).rstrip()
+    if prefix.endswith(b'/>'):
+        prefix = prefix[:-2] + b'>'
+    else:
+        prefix = prefix[: -len(xml_root) - 3]
+    suffix = f'</{xml_root}>\n'.encode()
+    return prefix, suffix
+
+
+@cython.cfunc
+def _encode_xml_stream_batch(
+    xml_root: str, batch: dict[str, Any] | list | bytes
+) -> bytes:
+    if isinstance(batch, bytes):
+        return batch
+    return XMLToDict.unparse({xml_root: batch}, binary=True, fragment=True)
+
+
 @cython.cfunc
 def _serialize_rss(content: Any):
     if not isinstance(content, bytes):
@@ -159,6 +367,9 @@ def _get_serializing_endpoint(endpoint: Callable, response_class: type[OSMRespon
     async def serializing_endpoint(*args, **kwargs):
         content = await endpoint(*args, **kwargs)
 
+        if isinstance(content, OSMStream):
+            return await response_class.serialize_stream(content)
+
         # Serialize responses only if needed
         return (
             content
@@ -0,0 +1,90 @@
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from time import monotonic
+
+from lrucache_rs import LRUCache
+
+from app.config import AUTH_CACHE_EXPIRE, AUTH_CACHE_SIZE
+from app.models.db.oauth2_token import OAuth2Token
+from app.models.db.user import User
+from app.models.types import UserId
+from app.services.cache_invalidation_service import CacheInvalidationService
+
+
+@dataclass(slots=True)
+class _Entry:
+    token: OAuth2Token
+    user: User
+    expires_at: float
+
+
+_CACHE: LRUCache[bytes, _Entry] = LRUCache(maxsize=AUTH_CACHE_SIZE)
+
+# Incremented on every invalidation.
+# Prevents loads that started before the invalidation from populating the cache.
+_GENERATION: int = 0
+
+
+class AuthCacheService:
+    @staticmethod
+    async def get_or_load(
+        token_hashed: bytes,
+        loader: Callable[[], Awaitable[tuple[OAuth2Token, User] | None]],
+    ) -> tuple[OAuth2Token, User] | None:
+        """
+        Get the cached token and user for the hashed access token.
+        On a cache miss, call the loader and cache its result.
+        Unsuccessful loads are not cached.
+        """
+        entry = _CACHE.get(token_hashed)
+        if entry is not None:
+            if entry.expires_at > monotonic():
+                # Copy to isolate the runtime fields set during the request
+                return entry.token.copy(), entry.user.copy()
+            del _CACHE[token_hashed]
+
+        generation = _GENERATION
+        result = await loader()
+        if result is None or generation != _GENERATION:
+            return result
+
+        token, user = result
+        _CACHE[token_hashed] = _Entry(
+            token=token.copy(),
+            user=user.copy(),
+            expires_at=monotonic() + AUTH_CACHE_EXPIRE.total_seconds(),
+        )
+        return result
+
+    @staticmethod
+    async def invalidate_users(user_ids: list[UserId]) -> None:
+        """
+        Invalidate the cached authentications of the users in all processes.
+        Must be called after committing changes to the users or their tokens.
+        """
+        await CacheInvalidationService.publish('auth_user', user_ids)
+
+
+def _invalidate(user_ids: list[int] | None) -> None:
+    global _GENERATION
+    _GENERATION += 1
+
+    if user_ids is None:
+        _CACHE.clear()
+        return
+
+    user_ids_set = set(user_ids)
+    keys = [
+        key
+        for key in _CACHE
+        if (entry := _CACHE.peek(key)) is not None and entry.user['id'] in user_ids_set
+    ]
+    for key in keys:
+        del _CACHE[key]
+
+    if keys:
+        logging.debug('Invalidated %d auth cache entries', len(keys))
+
+
+CacheInvalidationService.register('auth_user', _invalidate)
@@ -4,6 +4,7 @@ from fastapi import Request
 from pydantic import SecretStr
 
 from app.config import ENV
+from app.lib.crypto import hash_bytes
 from app.lib.testmethod import testmethod
 from app.middlewares.request_context_middleware import get_request
 from app.models.db.oauth2_token import OAuth2Token
@@ -12,6 +13,7 @@ from app.models.scope import PUBLIC_SCOPES, Scope
 from app.models.types import DisplayName
 from app.queries.oauth2_token_query import OAuth2TokenQuery
 from app.queries.user_query import UserQuery
+from app.services.auth_cache_service import AuthCacheService
 
 # default scopes when using session auth
 _SESSION_AUTH_SCOPES: tuple[Scope, ...] = (*PUBLIC_SCOPES, 'web_user')
@@ -86,6 +88,27 @@ async def _extract_oauth2_token(request: Request) -> SecretStr | None:
     return None
 
 
+async def _authenticate_token(
+    access_token: SecretStr,
+) -> tuple[OAuth2Token, User] | None:
+    """Resolve the access token and its user, using the auth cache."""
+
+    async def loader() -> tuple[OAuth2Token, User] | None:
+        token = await AuthService.authenticate_oauth2(access_token)
+        if token is None:
+            return None
+
+        user = await UserQuery.find_one_by_id(token['user_id'])
+        if user is None:
+            return None
+
+        return token, user
+
+    return await AuthCacheService.get_or_load(
+        hash_bytes(access_token.get_secret_value()), loader
+    )
+
+
 async def _authenticate_with_oauth2(
     request: Request,
 ) -> tuple[User, tuple[Scope, ...]] | None:
@@ -94,14 +117,11 @@ async def _authenticate_with_oauth2(
         return None
 
     logging.debug('Attempting to authenticate with OAuth2')
-    token = await AuthService.authenticate_oauth2(access_token)
-    if token is None:
-        return None
-
-    user = await UserQuery.find_one_by_id(token['user_id'])
-    if user is None:
+    r = await _authenticate_token(access_token)
+    if r is None:
         return None
 
+    token, user = r
     scopes = user_extend_scopes(user, tuple(token['scopes']))
     return user, scopes
 
@@ -116,12 +136,12 @@ async def _authenticate_with_cookie(
     del auth
 
     logging.debug('Attempting to authenticate with cookies')
-    token = await AuthService.authenticate_oauth2(access_token)
-    if token is None or token['scopes'] != ['web_user']:
+    r = await _authenticate_token(access_token)
+    if r is None:
         return None
 
-    user = await UserQuery.find_one_by_id(token['user_id'])
-    if user is None:
+    token, user = r
+    if token['scopes'] != ['web_user']:
         return None
 
     scopes = user_extend_scopes(user, _SESSION_AUTH_SCOPES)
@@ -0,0 +1,98 @@
+import logging
+from asyncio import TaskGroup
+from collections.abc import Callable, Iterable
+from contextlib import asynccontextmanager
+from itertools import batched
+from typing import Literal
+
+from psycopg import AsyncConnection
+
+from app.config import POSTGRES_URL
+from app.db import db
+from app.lib.retry import retry
+
+CacheKind = Literal['auth_user', 'element']
+
+CacheInvalidationHandler = Callable[[list[int] | None], None]
+"""Invalidate the given keys, or the entire cache when None."""
+
+_CHANNEL = 'cache_invalidation'
+
+# NOTIFY payloads are limited to 8000 bytes, int64 keys take up to 21 bytes each
+_KEYS_PER_MESSAGE = 256
+
+_HANDLERS: dict[CacheKind, list[CacheInvalidationHandler]] = {}
+
+
+class CacheInvalidationService:
+    @staticmethod
+    @asynccontextmanager
+    async def context():
+        """Context manager for receiving cache invalidations from other processes."""
+        async with TaskGroup() as tg:
+            task = tg.create_task(_listen_task())
+            yield
+            task.cancel()  # avoid "Task was destroyed" warning during tests
+
+    @staticmethod
+    def register(kind: CacheKind, handler: CacheInvalidationHandler) -> None:
+        """Register an in-process cache handler for the given kind of invalidations."""
+        _HANDLERS.setdefault(kind, []).append(handler)
+
+    @staticmethod
+    async def publish(kind: CacheKind, keys: Iterable[int] | None = None) -> None:
+        """
+        Invalidate the given keys, or the entire cache when None, in all processes.
+        The current process is invalidated immediately, other processes shortly after.
+        Must be called after committing the changes.
+
+        Publish failures are logged and not raised, as the changes are already
+        committed. Other processes then rely on their cache expiry.
+        """
+        if keys is None:
+            payloads = [kind]
+        else:
+            keys = list(keys)
+            if not keys:
+                return
+            payloads = [
+                f'{kind}:{",".join(map(str, chunk))}'
+                for chunk in batched(keys, _KEYS_PER_MESSAGE, strict=False)
+            ]
+
+        _dispatch(kind, keys)
+
+        try:
+            async with db(True, autocommit=True) as conn, conn.cursor() as cursor:
+                await cursor.executemany(
+                    'SELECT pg_notify(%s, %s)',
+                    [(_CHANNEL, payload) for payload in payloads],
+                )
+        except Exception:
+            logging.warning(
+                'Failed to publish %s cache invalidation', kind, exc_info=True
+            )
+
+
+def _dispatch(kind: CacheKind, keys: list[int] | None) -> None:
+    for handler in _HANDLERS.get(kind, ()):
+        handler(keys)
+
+
+def _dispatch_payload(payload: str) -> None:
+    kind, sep, keys_str = payload.partition(':')
+    keys = [int(key) for key in keys_str.split(',')] if sep else None
+    _dispatch(kind, keys)  # type: ignore
+
+
+@retry(None)
+async def _listen_task() -> None:
+    async with await AsyncConnection.connect(POSTGRES_URL, autocommit=True) as conn:
+        await conn.execute(f'LISTEN {_CHANNEL}')
+
+        # Invalidations may have been missed while disconnected
+        for kind in _HANDLERS:
+            _dispatch(kind, None)
+
+        async for notify in conn.notifies():
+            _dispatch_payload(notify.payload)
@@ -22,6 +22,7 @@ from app.lib.sentry import SENTRY_CHANGESET_MANAGEMENT_MONITOR
 from app.lib.testmethod import testmethod
 from app.models.db.changeset import ChangesetInit
 from app.models.types import ChangesetId, UserId
+from app.queries.timescaledb_query import TimescaleDBQuery
 from app.services.user_subscription_service import UserSubscriptionService
 
 _PROCESS_REQUEST_EVENT = Event()
@@ -56,6 +57,7 @@ class ChangesetService:
         ):
             changeset_id: ChangesetId = (await r.fetchone())[0]  # type: ignore
 
+        TimescaleDBQuery.observe_id('changeset', changeset_id)
         logging.debug('Created changeset %d by user %d', changeset_id, user_id)
         await UserSubscriptionService.subscribe('changeset', changeset_id)
         return changeset_id
@@ -63,6 +63,40 @@ class MigrationService:
                 logging.debug('Setting sequence counter %r to %d', sequence, last_value)
                 await conn.execute('SELECT setval(%s, %s)', (sequence, last_value))
 
+            # Set the element counter used for allocating element ids
+            sequence_id = await ElementQuery.get_current_sequence_id(conn)
+            current_ids = await ElementQuery.get_current_ids(conn)
+            logging.debug(
+                'Setting element counter to sequence_id=%d, ids=%r',
+                sequence_id,
+                current_ids,
+            )
+            await conn.execute(
+                """
+                UPDATE element_counter SET
+                    sequence_id = %s,
+                    node_id = %s,
+                    way_id = %s,
+                    relation_id = %s
+                """,
+                (
+                    sequence_id,
+                    current_ids['node'],
+                    current_ids['way'],
+                    current_ids['relation'],
+                ),
+            )
+
+            # Rebuild the element sequence index used for timestamp lookups
+            logging.debug('Rebuilding element sequence index')
+            await conn.execute('TRUNCATE element_sequence_minute')
+            await conn.execute("""
+                INSERT INTO element_sequence_minute (minute, min_sequence_id, max_sequence_id)
+                SELECT date_trunc('minute', created_at), MIN(sequence_id), MAX(sequence_id)
+                FROM element
+                GROUP BY 1
+            """)
+
     @staticmethod
     @register_admin_task
     async def delete_notes_without_comments(
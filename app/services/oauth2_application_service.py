@@ -24,7 +24,8 @@ from app.models.db.oauth2_application import (
     oauth2_app_avatar_url,
 )
 from app.models.scope import PublicScope
-from app.models.types import ApplicationId, ClientId, StorageKey
+from app.models.types import ApplicationId, ClientId, StorageKey, UserId
+from app.services.auth_cache_service import AuthCacheService
 from app.services.image_service import ImageService
 from app.utils import splitlines_trim
 from app.validators.url import UriValidator
@@ -125,6 +126,7 @@ class OAuth2ApplicationService:
     ) -> None:
         """Update an OAuth2 application."""
         user_id = auth_user(required=True)['id']
+        revoked_user_ids: list[UserId] = []
 
         async with db(True) as conn:
             result = await conn.execute(
@@ -145,13 +147,18 @@ class OAuth2ApplicationService:
                 raise_for.unauthorized()
 
             if revoke_all_authorizations:
-                await conn.execute(
+                async with await conn.execute(
                     """
                     DELETE FROM oauth2_token
                     WHERE application_id = %s
+                    RETURNING user_id
                     """,
                     (app_id,),
-                )
+                ) as r:
+                    revoked_user_ids = list({row[0] for row in await r.fetchall()})
+
+        if revoked_user_ids:
+            await AuthCacheService.invalidate_users(revoked_user_ids)
 
     @staticmethod
     async def update_avatar(app_id: ApplicationId, avatar_file: UploadFile) -> str:
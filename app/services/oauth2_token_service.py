@@ -33,6 +33,7 @@ from app.models.scope import PublicScope
 from app.models.types import ApplicationId, ClientId, OAuth2TokenId, UserId
 from app.queries.oauth2_application_query import OAuth2ApplicationQuery
 from app.queries.oauth2_token_query import OAuth2TokenQuery
+from app.services.auth_cache_service import AuthCacheService
 from app.services.system_app_service import SYSTEM_APP_CLIENT_ID_MAP
 from speedup.buffered_rand import buffered_rand_urlsafe
 
@@ -341,6 +342,7 @@ class OAuth2TokenService:
                 ),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
         return access_token
 
     @staticmethod
@@ -357,6 +359,7 @@ class OAuth2TokenService:
                 (token_id, user_id),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
         logging.debug('Revoked OAuth2 token %d', token_id)
 
     @staticmethod
@@ -364,15 +367,20 @@ class OAuth2TokenService:
         """Revoke the given access token."""
         access_token_hashed = hash_bytes(access_token.get_secret_value())
 
-        async with db(True) as conn:
+        async with (
+            db(True) as conn,
             await conn.execute(
                 """
                 DELETE FROM oauth2_token
                 WHERE token_hashed = %s
+                RETURNING user_id
                 """,
                 (access_token_hashed,),
-            )
+            ) as r,
+        ):
+            user_ids: list[UserId] = [row[0] for row in await r.fetchall()]
 
+        await AuthCacheService.invalidate_users(user_ids)
         logging.debug('Revoked OAuth2 access token')
 
     @staticmethod
@@ -401,6 +409,7 @@ class OAuth2TokenService:
         async with db(True) as conn:
             await conn.execute(query, params)
 
+        await AuthCacheService.invalidate_users([user_id])
         logging.debug('Revoked OAuth2 app tokens %d for user %d', app_id, user_id)
 
     @staticmethod
@@ -26,11 +26,13 @@ class OptimisticDiff:
 
         ts = monotonic()
         attempt: cython.int = 0
+        previous: OptimisticDiffPrepare | None = None
 
         while True:
             try:
-                prep = OptimisticDiffPrepare(elements)
+                prep = OptimisticDiffPrepare(elements, previous)
                 await prep.prepare()
+                previous = prep
                 return await OptimisticDiffApply.apply(prep)
             except* (OptimisticDiffError, OperationalError) as e:
                 attempt += 1
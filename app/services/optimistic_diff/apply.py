@@ -1,39 +1,86 @@
-from asyncio import Lock, TaskGroup
+import asyncio
+import logging
+from asyncio import Future, Lock, Task, TaskGroup
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
 from io import BytesIO
+from time import perf_counter
 
 import cython
 from psycopg import AsyncConnection
 from psycopg.sql import SQL
 
+from app.config import (
+    OPTIMISTIC_DIFF_GROUP_COMMIT_MAX_ELEMENTS,
+    OPTIMISTIC_DIFF_GROUP_COMMIT_WINDOW,
+)
 from app.db import db
 from app.exceptions.optimistic_diff_error import OptimisticDiffError
 from app.lib.compressible_geometry import compressible_geometry
 from app.lib.date_utils import utcnow
+from app.lib.timing_context import (
+    current_timings,
+    record_timing,
+    timed,
+    timing,
+    timing_context,
+)
 from app.models.db.changeset import Changeset
 from app.models.db.element import Element, ElementInit
-from app.models.element import ElementId, ElementType, TypedElementId
+from app.models.element import (
+    TYPED_ELEMENT_ID_NODE_MAX,
+    TYPED_ELEMENT_ID_WAY_MAX,
+    TYPED_ELEMENT_ID_WAY_MIN,
+    ElementId,
+    ElementType,
+    TypedElementId,
+)
 from app.models.types import SequenceId
-from app.queries.changeset_query import ChangesetQuery
 from app.queries.element_query import ElementQuery
+from app.services.cache_invalidation_service import CacheInvalidationService
 from app.services.optimistic_diff.prepare import (
     ElementStateEntry,
     OptimisticDiffPrepare,
 )
 from speedup.element_type import split_typed_element_id, typed_element_id
 
+_ApplyResult = dict[TypedElementId, tuple[TypedElementId, list[int]]]
+
+
+@dataclass(slots=True)
+class _Pending:
+    prepare: OptimisticDiffPrepare
+    refs: set[TypedElementId]
+    """
+    Refs of the existing elements the update depends on, used for conflict detection.
+    """
+    future: Future[_ApplyResult]
+    timings: dict[str, float] | None
+    """
+    Phase timings of the requesting context, extended with the group phases.
+    """
+
+
+# Advisory lock keys are offset by the chunk index
+_PARTITION_LOCK_KEY_BASE = 5339174160207986688
+_PARTITION_SIZE = 5_000_000  # matches the element hypertable chunk interval
+
 _WRITE_LOCK = Lock()
+_QUEUE: deque[_Pending] = deque()
+_GROUP_COMMIT_TASK: Task | None = None
 
 
 class OptimisticDiffApply:
     @staticmethod
-    async def apply(
-        prepare: OptimisticDiffPrepare,
-    ) -> dict[TypedElementId, tuple[TypedElementId, list[int]]]:
+    async def apply(prepare: OptimisticDiffPrepare) -> _ApplyResult:
         """
         Apply the optimistic diff update.
+        Concurrent non-conflicting updates are applied together in a single transaction.
         Returns a dict, mapping original element refs to the new versions.
         """
+        global _GROUP_COMMIT_TASK
+
         if not prepare.apply_elements:
             return {}
 
@@ -41,55 +88,314 @@ class OptimisticDiffApply:
             if (point := element['point']) is not None:
                 element['point'] = compressible_geometry(point)
 
-        async with db(True) as conn:
-            # Lock the tables to avoid concurrent updates.
-            # Then perform all the updates at once.
-            await conn.execute(
-                'LOCK TABLE changeset, changeset_bounds, element IN EXCLUSIVE MODE'
+        future: Future[_ApplyResult] = asyncio.get_running_loop().create_future()
+        _QUEUE.append(
+            _Pending(prepare, _get_dependent_refs(prepare), future, current_timings())
+        )
+
+        if _GROUP_COMMIT_TASK is None or _GROUP_COMMIT_TASK.done():
+            _GROUP_COMMIT_TASK = asyncio.create_task(_group_commit_task())
+
+        with timing('apply'):
+            return await future
+
+
+@cython.cfunc
+def _get_dependent_refs(prepare: OptimisticDiffPrepare) -> set[TypedElementId]:
+    """Get the refs of the existing elements that are changed, checked or referenced."""
+    refs = {
+        typed_id
+        for typed_id in prepare.element_state  #
+        if not typed_id & 1 << 59
+    }
+    refs.update(prepare.reference_check_element_refs)
+    refs.update(
+        member
+        for element in prepare.apply_elements
+        if (members := element['members'])
+        for member in members
+        if not member & 1 << 59
+    )
+    return refs
+
+
+async def _group_commit_task() -> None:
+    """Apply the queued updates in groups until the queue is empty."""
+    while _QUEUE:
+        # Give the concurrent uploads a chance to join the group,
+        # unless there is nothing to batch
+        if len(_QUEUE) > 1:
+            await asyncio.sleep(OPTIMISTIC_DIFF_GROUP_COMMIT_WINDOW.total_seconds())
+
+        group = _take_group()
+        if group:
+            await _apply_pending(group)
+
+
+async def _apply_pending(group: list[_Pending]) -> None:
+    """
+    Apply the group of pending updates and resolve their futures.
+    If the group fails unexpectedly, its updates are retried individually,
+    so that one update's error is not reported to the unrelated ones.
+    """
+    try:
+        # Collect the group phases separately from the task creator context
+        with timing_context() as timings:
+            results = await _apply_group([pending.prepare for pending in group])
+    except asyncio.CancelledError:
+        for pending in group:
+            pending.future.cancel()
+        raise
+    except Exception as e:
+        if len(group) > 1:
+            logging.warning(
+                'Optimistic group of %d updates failed, retrying individually',
+                len(group),
+                exc_info=True,
             )
+            for i, pending in enumerate(group):
+                if pending.future.done():  # cancelled by the caller
+                    continue
+                try:
+                    await _apply_pending([pending])
+                except asyncio.CancelledError:
+                    for remaining in group[i + 1 :]:
+                        remaining.future.cancel()
+                    raise
+            return
 
-            async with TaskGroup() as tg:
-                # Check if the element_state is valid
-                tg.create_task(_check_elements_latest(prepare.element_state))
-
-                # Check if the elements have no new references
-                if prepare.reference_check_element_refs:
-                    tg.create_task(
-                        _check_elements_unreferenced(
-                            list(prepare.reference_check_element_refs),
-                            prepare.at_sequence_id,
-                        )
-                    )
+        for pending in group:
+            if not pending.future.done():
+                pending.future.set_exception(e)
+        return
 
-                # Process elements and changeset updates in parallel
-                now = utcnow()
-                tg.create_task(_update_changeset(conn, now, prepare.changeset))
-                update_elements_t = tg.create_task(
-                    _update_elements(
-                        conn, now, prepare.element_state, prepare.apply_elements
-                    )
-                )
+    for pending, result in zip(group, results, strict=True):
+        if pending.future.done():
+            continue
+        if (pending_timings := pending.timings) is not None:
+            for name, duration_ms in timings.items():
+                pending_timings[name] = pending_timings.get(name, 0) + duration_ms
+        if isinstance(result, Exception):
+            pending.future.set_exception(result)
+        else:
+            pending.future.set_result(result)
+
+
+@cython.cfunc
+def _take_group() -> list[_Pending]:
+    """
+    Take the largest group of non-conflicting updates from the queue.
+    Updates conflict when they share a changeset or depend on the same elements.
+    Conflicting updates are kept in the queue, in order, for the next group.
+    """
+    group: list[_Pending] = []
+    deferred: list[_Pending] = []
+    refs: set[TypedElementId] = set()
+    changeset_ids: set[int] = set()
+    num_elements: cython.Py_ssize_t = 0
+
+    while _QUEUE:
+        pending = _QUEUE.popleft()
+        if pending.future.done():  # cancelled by the caller
+            continue
+
+        prepare = pending.prepare
+        changeset_id = prepare.changeset['id']
+        prepare_num_elements: cython.Py_ssize_t = len(prepare.apply_elements)
+
+        if group and (
+            changeset_id in changeset_ids
+            or not refs.isdisjoint(pending.refs)
+            or num_elements + prepare_num_elements
+            > OPTIMISTIC_DIFF_GROUP_COMMIT_MAX_ELEMENTS
+        ):
+            deferred.append(pending)
+        else:
+            group.append(pending)
+            num_elements += prepare_num_elements
+
+        # Deferred updates also block the later conflicting ones to preserve the order
+        refs.update(pending.refs)
+        changeset_ids.add(changeset_id)
+
+    _QUEUE.extendleft(reversed(deferred))
+    return group
+
+
+async def _apply_group(
+    prepares: list[OptimisticDiffPrepare],
+) -> list[_ApplyResult | OptimisticDiffError]:
+    """
+    Apply the group of updates in a single transaction.
+    Returns the result or the validation error for each update.
+    """
+    if len(prepares) > 1:
+        logging.debug('Optimistic applying group of %d updates', len(prepares))
+
+    async with db(True) as conn:
+        # Lock the affected element partitions to avoid concurrent updates.
+        # Non-overlapping updates from other transactions proceed in parallel.
+        with timing('lock_wait'):
+            await _lock_partitions(
+                conn,
+                {
+                    typed_id
+                    for prepare in prepares
+                    for typed_id in _get_dependent_refs(prepare)
+                },
+            )
 
-        # Build result mapping
-        assigned_id_map: dict[TypedElementId, TypedElementId] = (
-            update_elements_t.result()
+        with timing('check'):
+            errors = await _check_prepares(conn, prepares)
+        valid_prepares = [
+            prepare
+            for prepare, error in zip(prepares, errors, strict=True)
+            if error is None
+        ]
+        if not valid_prepares:
+            return errors  # type: ignore
+
+        # Update the changesets first, so that the element counter row
+        # is locked for as short as possible
+        now = utcnow()
+        await _update_changesets(
+            conn, now, [prepare.changeset for prepare in valid_prepares]
         )
-        result: dict[TypedElementId, tuple[TypedElementId, list[int]]] = {}
+        assigned_id_maps = iter(await _update_elements(conn, now, valid_prepares))
+
+        ts = perf_counter()
+
+    record_timing('commit', (perf_counter() - ts) * 1000)
+
+    # Invalidate the cached latest versions of the changed elements
+    await CacheInvalidationService.publish(
+        'element',
+        [
+            typed_id
+            for prepare in valid_prepares
+            for typed_id, entry in prepare.element_state.items()
+            if entry.remote is not None
+        ],
+    )
+
+    return [
+        _build_result(prepare, next(assigned_id_maps)) if error is None else error
+        for prepare, error in zip(prepares, errors, strict=True)
+    ]
 
-        for element in prepare.apply_elements:
-            typed_id = element['typed_id']
-            version = element['version']
 
-            if typed_id not in result:
-                result[typed_id] = (
-                    # Lookup negative ids in the assigned map.
-                    assigned_id_map[typed_id] if typed_id & 1 << 59 else typed_id,
-                    [version],
+@cython.cfunc
+def _build_result(
+    prepare: OptimisticDiffPrepare,
+    assigned_id_map: dict[TypedElementId, TypedElementId],
+) -> _ApplyResult:
+    """Build the mapping of original element refs to the new versions."""
+    result: _ApplyResult = {}
+
+    for element in prepare.apply_elements:
+        typed_id = element['typed_id']
+        version = element['version']
+
+        if typed_id not in result:
+            result[typed_id] = (
+                # Lookup negative ids in the assigned map.
+                assigned_id_map[typed_id] if typed_id & 1 << 59 else typed_id,
+                [version],
+            )
+        else:
+            result[typed_id][1].append(version)
+
+    return result
+
+
+async def _lock_partitions(conn: AsyncConnection, refs: set[TypedElementId]) -> None:
+    """
+    Lock the element partitions of the refs until the end of the transaction.
+    The locks are acquired in ascending order to avoid deadlocks.
+    """
+    keys = sorted({_partition_lock_key(typed_id) for typed_id in refs})
+    if not keys:
+        return
+
+    logging.debug('Optimistic locking %d element partitions', len(keys))
+    await conn.execute(
+        'SELECT pg_advisory_xact_lock(key) FROM unnest(%s::bigint[]) AS key',
+        (keys,),
+    )
+
+
+@cython.cfunc
+def _partition_lock_key(typed_id: cython.ulonglong) -> int:
+    """Get the advisory lock key of the element hypertable chunk containing the element."""
+    # Mirrors element_partition_func in the database schema
+    if typed_id <= TYPED_ELEMENT_ID_NODE_MAX:
+        partition = typed_id // 60
+    elif typed_id <= TYPED_ELEMENT_ID_WAY_MAX:
+        partition = (
+            typed_id - TYPED_ELEMENT_ID_WAY_MIN
+        ) // 6 + TYPED_ELEMENT_ID_WAY_MIN
+    else:
+        partition = typed_id
+
+    return _PARTITION_LOCK_KEY_BASE + partition // _PARTITION_SIZE
+
+
+async def _check_prepares(
+    conn: AsyncConnection,
+    prepares: list[OptimisticDiffPrepare],
+) -> list[OptimisticDiffError | None]:
+    """Check if the updates are still valid. Returns the error for each invalid update."""
+    # Lock the changesets to avoid concurrent changeset updates
+    async with await conn.execute(
+        """
+        SELECT id, updated_at
+        FROM changeset
+        WHERE id = ANY(%s)
+        ORDER BY id
+        FOR UPDATE
+        """,
+        ([prepare.changeset['id'] for prepare in prepares],),
+    ) as r:
+        updated_at_map: dict[int, datetime] = dict(await r.fetchall())
+
+    async with TaskGroup() as tg:
+        tasks = [
+            tg.create_task(
+                _check_prepare(prepare, updated_at_map[prepare.changeset['id']])
+            )
+            for prepare in prepares
+        ]
+
+    return [task.result() for task in tasks]
+
+
+async def _check_prepare(
+    prepare: OptimisticDiffPrepare, changeset_updated_at: datetime
+) -> OptimisticDiffError | None:
+    changeset = prepare.changeset
+    if changeset['updated_at'] != changeset_updated_at:
+        return OptimisticDiffError(
+            f'Changeset {changeset["id"]} is outdated ({changeset["updated_at"]} != {changeset_updated_at})'
+        )
+
+    error: OptimisticDiffError | None = None
+    try:
+        async with TaskGroup() as tg:
+            # Check if the element_state is valid
+            tg.create_task(_check_elements_latest(prepare.element_state))
+
+            # Check if the elements have no new references
+            if prepare.reference_check_element_refs:
+                tg.create_task(
+                    _check_elements_unreferenced(
+                        list(prepare.reference_check_element_refs),
+                        prepare.at_sequence_id,
+                    )
                 )
-            else:
-                result[typed_id][1].append(version)
+    except* OptimisticDiffError as e:
+        error = e.exceptions[0]  # type: ignore
 
-        return result
+    return error
 
 
 async def _check_elements_latest(
@@ -119,89 +425,129 @@ async def _check_elements_unreferenced(
         raise OptimisticDiffError(f'Element is referenced after {after_sequence_id}')
 
 
+@timed('update_changesets')
+async def _update_changesets(
+    conn: AsyncConnection, now: datetime, changesets: list[Changeset]
+) -> None:
+    """Update the changeset table."""
+    async with _WRITE_LOCK, conn.pipeline():
+        for changeset in changesets:
+            await _update_changeset(conn, now, changeset)
+
+
 async def _update_changeset(
     conn: AsyncConnection, now: datetime, changeset: Changeset
 ) -> None:
-    """
-    Update the changeset table.
-    Raises OptimisticDiffError if the changeset was modified in the meantime.
-    """
     changeset_id = changeset['id']
-    updated_at_ = await ChangesetQuery.get_updated_at_by_ids([changeset_id])
-    updated_at = updated_at_[changeset_id]
-    if changeset['updated_at'] != updated_at:
-        raise OptimisticDiffError(
-            f'Changeset {changeset_id} is outdated ({changeset["updated_at"]} != {updated_at})'
-        )
 
-    async with _WRITE_LOCK, conn.pipeline():
-        # Update the changeset
-        closed_at = now if 'size_limit_reached' in changeset else None
-        updated_at = now
-        await conn.execute(
-            """
-            UPDATE changeset
-            SET
-                size = %s,
-                num_create = %s,
-                num_modify = %s,
-                num_delete = %s,
-                union_bounds = ST_QuantizeCoordinates(%s, 7),
-                closed_at = %s,
-                updated_at = %s
-            WHERE id = %s
-            """,
-            (
-                changeset['size'],
-                changeset['num_create'],
-                changeset['num_modify'],
-                changeset['num_delete'],
-                changeset['union_bounds'],
-                closed_at,
-                updated_at,
-                changeset_id,
-            ),
-        )
+    # Update the changeset
+    closed_at = now if 'size_limit_reached' in changeset else None
+    updated_at = now
+    await conn.execute(
+        """
+        UPDATE changeset
+        SET
+            size = %s,
+            num_create = %s,
+            num_modify = %s,
+            num_delete = %s,
+            union_bounds = ST_QuantizeCoordinates(%s, 7),
+            closed_at = %s,
+            updated_at = %s
+        WHERE id = %s
+        """,
+        (
+            changeset['size'],
+            changeset['num_create'],
+            changeset['num_modify'],
+            changeset['num_delete'],
+            changeset['union_bounds'],
+            closed_at,
+            updated_at,
+            changeset_id,
+        ),
+    )
 
-        # Update the changeset bounds
-        # It's not possible for bounds to switch from MultiPolygon to None.
-        bounds = changeset.get('bounds')
-        if bounds is None:
-            return
+    # Update the changeset bounds
+    # It's not possible for bounds to switch from MultiPolygon to None.
+    bounds = changeset.get('bounds')
+    if bounds is None:
+        return
 
-        await conn.execute(
-            """
-            DELETE FROM changeset_bounds
-            WHERE changeset_id = %s
-            """,
-            (changeset_id,),
-        )
-        await conn.execute(
-            """
-            INSERT INTO changeset_bounds (changeset_id, bounds)
-            SELECT %s, (ST_Dump(ST_QuantizeCoordinates(%s, 7))).geom
-            """,
-            (changeset_id, bounds),
-        )
+    await conn.execute(
+        """
+        DELETE FROM changeset_bounds
+        WHERE changeset_id = %s
+        """,
+        (changeset_id,),
+    )
+    await conn.execute(
+        """
+        INSERT INTO changeset_bounds (changeset_id, bounds)
+        SELECT %s, (ST_Dump(ST_QuantizeCoordinates(%s, 7))).geom
+        """,
+        (changeset_id, bounds),
+    )
 
 
 async def _update_elements(
     conn: AsyncConnection,
     now: datetime,
-    element_state: dict[TypedElementId, ElementStateEntry],
-    elements_init: list[ElementInit],
-) -> dict[TypedElementId, TypedElementId]:
-    """Update the element table by creating new revisions."""
-    async with TaskGroup() as tg:
-        current_sequence_task = tg.create_task(ElementQuery.get_current_sequence_id())
-        current_id_task = tg.create_task(ElementQuery.get_current_ids())
+    prepares: list[OptimisticDiffPrepare],
+) -> list[dict[TypedElementId, TypedElementId]]:
+    """
+    Update the element table by creating new revisions.
+    Returns the assigned id map for each update.
+    """
+    # Count the new elements to allocate their ids
+    num_new_ids: dict[ElementType, int] = {'node': 0, 'way': 0, 'relation': 0}
+    element_state: dict[TypedElementId, ElementStateEntry] = {}
+    for prepare in prepares:
+        for typed_id in {
+            typed_id
+            for element in prepare.apply_elements
+            if (typed_id := element['typed_id']) & 1 << 59
+        }:
+            num_new_ids[split_typed_element_id(typed_id)[0]] += 1
+        element_state.update(prepare.element_state)
+
+    num_elements = sum(len(prepare.apply_elements) for prepare in prepares)
+    async with _WRITE_LOCK:
+        with timing('update_latest'):
+            await _update_latest_elements(conn, element_state)
+
+        # The counter row stays locked until commit, serializing the concurrent
+        # transactions from here on. Take it as late as possible, right before COPY.
+        with timing('allocate_ids'):
+            sequence_id, current_id_map = await _allocate_ids(
+                conn, num_elements, num_new_ids
+            )
+        await _update_sequence_index(
+            conn, now, sequence_id + 1, sequence_id + num_elements
+        )
 
-    current_sequence_id = current_sequence_task.result()
-    current_id_map: dict[ElementType, ElementId] = current_id_task.result()
+        elements, assigned_id_maps = _build_elements(
+            prepares, now, sequence_id, current_id_map
+        )
+        with timing('copy_elements'):
+            await _copy_elements(conn, elements)
 
+    return assigned_id_maps
+
+
+@cython.cfunc
+def _build_elements(
+    prepares: list[OptimisticDiffPrepare],
+    now: datetime,
+    sequence_id: SequenceId,
+    current_id_map: dict[ElementType, ElementId],
+) -> tuple[list[Element], list[dict[TypedElementId, TypedElementId]]]:
+    """
+    Build the new element revisions, numbered after the allocated ids.
+    Returns the elements and the assigned id map for each update.
+    """
     elements: list[Element] = []
-    prev_map: dict[TypedElementId, Element] = {}
-    assigned_id_map: dict[TypedElementId, TypedElementId] = {}
+    assigned_id_maps: list[dict[TypedElementId, TypedElementId]] = []
 
     # This compiled check is slightly misleading.
     # Cython will always use the first declaration.
@@ -210,54 +556,114 @@ async def _update_elements(
     else:
         element_init: ElementInit
 
-    # Process elements and prepare data for insert
-    for sequence_id, element_init in enumerate(elements_init, current_sequence_id + 1):
-        element: Element = {
-            **element_init,
-            'sequence_id': sequence_id,  # type: ignore
-            'latest': True,
-            'created_at': now,
-        }
-        elements.append(element)
-        typed_id = element['typed_id']
-
-        # Assign ids for new elements
-        if typed_id & 1 << 59:
-            original_typed_id = typed_id
-            if original_typed_id in assigned_id_map:
-                # Reuse already assigned id
-                typed_id = assigned_id_map[original_typed_id]
-            else:
-                # Assign a new id
-                type = split_typed_element_id(typed_id)[0]
-                new_id: ElementId = current_id_map[type] + 1  # type: ignore
-                current_id_map[type] = new_id
-                typed_id = typed_element_id(type, new_id)
-                assigned_id_map[original_typed_id] = typed_id
-            element['typed_id'] = typed_id
-
-        # Update the latest flag for changed elements (local)
-        prev = prev_map.get(typed_id)
-        if prev is not None:
-            prev['latest'] = False
-        prev_map[typed_id] = element
-
-    # Update members with assigned ids
-    for element in elements:
-        # TODO: tainted members check in the prepare phase
-        if members := element['members']:
-            element['members'] = [
-                assigned_id_map[member]  #
-                if member & 1 << 59
-                else member
-                for member in members
-            ]
-
-    async with _WRITE_LOCK:
-        await _update_latest_elements(conn, element_state)
-        await _copy_elements(conn, elements)
+    for prepare in prepares:
+        prepare_elements: list[Element] = []
+        prev_map: dict[TypedElementId, Element] = {}
+        assigned_id_map: dict[TypedElementId, TypedElementId] = {}
+
+        # Process elements and prepare data for insert
+        for element_init in prepare.apply_elements:
+            sequence_id += 1  # type: ignore
+            element: Element = {
+                **element_init,
+                'sequence_id': sequence_id,  # type: ignore
+                'latest': True,
+                'created_at': now,
+            }
+            prepare_elements.append(element)
+            typed_id = element['typed_id']
 
-    return assigned_id_map
+            # Assign ids for new elements
+            if typed_id & 1 << 59:
+                original_typed_id = typed_id
+                if original_typed_id in assigned_id_map:
+                    # Reuse already assigned id
+                    typed_id = assigned_id_map[original_typed_id]
+                else:
+                    # Assign a new id
+                    type = split_typed_element_id(typed_id)[0]
+                    new_id: ElementId = current_id_map[type] + 1  # type: ignore
+                    current_id_map[type] = new_id
+                    typed_id = typed_element_id(type, new_id)
+                    assigned_id_map[original_typed_id] = typed_id
+                element['typed_id'] = typed_id
+
+            # Update the latest flag for changed elements (local)
+            prev = prev_map.get(typed_id)
+            if prev is not None:
+                prev['latest'] = False
+            prev_map[typed_id] = element
+
+        # Update members with assigned ids
+        for element in prepare_elements:
+            # TODO: tainted members check in the prepare phase
+            if members := element['members']:
+                element['members'] = [
+                    assigned_id_map[member]  #
+                    if member & 1 << 59
+                    else member
+                    for member in members
+                ]
+
+        elements.extend(prepare_elements)
+        assigned_id_maps.append(assigned_id_map)
+
+    return elements, assigned_id_maps
+
+
+async def _allocate_ids(
+    conn: AsyncConnection,
+    num_sequence_ids: int,
+    num_ids: dict[ElementType, int],
+) -> tuple[SequenceId, dict[ElementType, ElementId]]:
+    """
+    Allocate contiguous blocks of sequence ids and element ids in one round-trip.
+    Returns the last ids before the allocated blocks.
+    The counter row stays locked until commit, so the sequence_id order matches the commit order.
+    """
+    async with await conn.execute(
+        """
+        UPDATE element_counter SET
+            sequence_id = sequence_id + %(sequence)s,
+            node_id = node_id + %(node)s,
+            way_id = way_id + %(way)s,
+            relation_id = relation_id + %(relation)s
+        RETURNING
+            sequence_id - %(sequence)s,
+            node_id - %(node)s,
+            way_id - %(way)s,
+            relation_id - %(relation)s
+        """,
+        {'sequence': num_sequence_ids, **num_ids},
+    ) as r:
+        sequence_id, node_id, way_id, relation_id = await r.fetchone()  # type: ignore
+
+    return sequence_id, {'node': node_id, 'way': way_id, 'relation': relation_id}
+
+
+async def _update_sequence_index(
+    conn: AsyncConnection,
+    now: datetime,
+    min_sequence_id: int,
+    max_sequence_id: int,
+) -> None:
+    """Extend the sequence id range of the current minute, used for timestamp lookups."""
+    await conn.execute(
+        """
+        INSERT INTO element_sequence_minute (minute, min_sequence_id, max_sequence_id)
+        VALUES (date_trunc('minute', %s::timestamptz), %s, %s)
+        ON CONFLICT (minute) DO UPDATE SET
+            min_sequence_id = LEAST(
+                element_sequence_minute.min_sequence_id,
+                EXCLUDED.min_sequence_id
+            ),
+            max_sequence_id = GREATEST(
+                element_sequence_minute.max_sequence_id,
+                EXCLUDED.max_sequence_id
+            )
+        """,
+        (now, min_sequence_id, max_sequence_id),
+    )
 
 
 async def _update_latest_elements(
@@ -1,8 +1,8 @@
 import logging
 from asyncio import TaskGroup
-from collections import defaultdict
 from collections.abc import Sequence
 from dataclasses import dataclass
+from time import perf_counter
 from typing import Final, Literal
 
 import cython
@@ -10,25 +10,30 @@ import numpy as np
 from psycopg import AsyncConnection, IsolationLevel
 from shapely import Point, bounds, box
 
+from app.config import OPTIMISTIC_DIFF_INCREMENTAL_MAX_CHANGES
 from app.db import db
 from app.lib.auth_context import auth_user
 from app.lib.changeset_bounds import extend_changeset_bounds
 from app.lib.exceptions_context import raise_for
+from app.lib.timing_context import record_timing, timed, timing
 from app.models.db.changeset import Changeset, changeset_increase_size
 from app.models.db.element import Element, ElementInit
 from app.models.element import (
+    ELEMENT_TYPE_NUMS,
     TYPED_ELEMENT_ID_NODE_MAX,
     TYPED_ELEMENT_ID_NODE_MIN,
     TYPED_ELEMENT_ID_RELATION_MAX,
     TYPED_ELEMENT_ID_RELATION_MIN,
     ElementType,
     TypedElementId,
+    split_typed_element_ids_array,
 )
 from app.models.types import SequenceId
 from app.queries.changeset_bounds_query import ChangesetBoundsQuery
 from app.queries.changeset_query import ChangesetQuery
 from app.queries.element_query import ElementQuery
 from app.queries.user_query import UserQuery
+from app.services.optimistic_diff.reference_index import ReferenceIndex
 from speedup.element_type import split_typed_element_id, split_typed_element_ids
 
 OSMChangeAction = Literal['create', 'modify', 'delete']
@@ -63,7 +68,7 @@ class OptimisticDiffPrepare:
     Local element state, mapping from element ref to remote and local elements.
     """
 
-    _elements_parents_refs: dict[TypedElementId, set[TypedElementId]]
+    elements_parents_refs: dict[TypedElementId, set[TypedElementId]]
     """
     Local element parents cache, mapping from element ref to the set of parent element refs.
     """
@@ -78,11 +83,9 @@ class OptimisticDiffPrepare:
     Local reference check state, set of element refs that need to be checked for references after last_sequence_id.
     """
 
-    _reference_override: defaultdict[tuple[TypedElementId, bool], set[TypedElementId]]
+    _reference_index: ReferenceIndex
     """
-    Local reference override, mapping from (element ref, override) tuple to the set of referenced element refs.
-
-    For example, `(way/1, False)` = `{node/1, node/2}` means that way/1 no longer references node/1 and node/2 locally.
+    Local reference changes, indexed by element ref and upload position.
     """
 
     changeset: Changeset
@@ -100,22 +103,52 @@ class OptimisticDiffPrepare:
     Changeset bounding box set of element refs.
     """
 
-    def __init__(self, elements: Sequence[ElementInit]) -> None:
+    _previous: 'OptimisticDiffPrepare | None'
+    """
+    Previous successful preparation of the same elements, reused during retries.
+    """
+
+    _changed_refs: set[TypedElementId] | None
+    """
+    Set of element refs changed since the previous preparation, or None to reload everything.
+    """
+
+    _changed_members_refs: set[TypedElementId]
+    """
+    Set of element refs referenced by the elements changed since the previous preparation.
+    """
+
+    visible_refs: set[TypedElementId]
+    """
+    Set of remote member refs known to be visible at at_sequence_id.
+    """
+
+    def __init__(
+        self,
+        elements: Sequence[ElementInit],
+        previous: 'OptimisticDiffPrepare | None' = None,
+    ) -> None:
         self.apply_elements = []
         self._elements = elements
         self.element_state = {}
-        self._elements_parents_refs = {}
+        self.elements_parents_refs = {}
         self._elements_check_members_remote = []
         self.reference_check_element_refs = set()
-        self._reference_override = defaultdict(set)
         self._bbox_points = []
         self._bbox_refs = set()
+        self._previous = previous
+        self._changed_refs = None
+        self._changed_members_refs = set()
+        self.visible_refs = set()
 
     async def prepare(self) -> None:
         async with db(isolation_level=IsolationLevel.REPEATABLE_READ) as conn:
             self.at_sequence_id = await ElementQuery.get_current_sequence_id(conn)
             logging.debug('Optimistic preparing at sequence_id %d', self.at_sequence_id)
 
+            if self._previous is not None:
+                await self._load_changed_refs()
+
             async with TaskGroup() as tg:
                 tg.create_task(self._preload_elements_state())
                 tg.create_task(self._preload_elements_parents(conn))
@@ -127,15 +160,29 @@ class OptimisticDiffPrepare:
         num_create: cython.int = 0
         num_modify: cython.int = 0
         num_delete: cython.int = 0
+        ts = perf_counter()
+
+        # Diff the members of all elements at once
+        reference_index = self._reference_index = ReferenceIndex(
+            self._elements,
+            {
+                typed_id: remote['members']
+                for typed_id, entry in element_state.items()
+                if (remote := entry.remote) is not None
+            },
+        )
 
+        pos: cython.Py_ssize_t
         action: OSMChangeAction
         entry: ElementStateEntry | None
         prev: ElementInit | None
 
-        for element, (element_type, element_id) in zip(
-            self._elements,
-            split_typed_element_ids(self._elements),  # type: ignore
-            strict=True,
+        for pos, (element, (element_type, element_id)) in enumerate(
+            zip(
+                self._elements,
+                split_typed_element_ids(self._elements),  # type: ignore
+                strict=True,
+            )
         ):
             typed_id = element['typed_id']
             version = element['version']
@@ -171,16 +218,14 @@ class OptimisticDiffPrepare:
                 if action == 'delete' and not prev['visible']:
                     raise_for.element_already_deleted(typed_id)
 
-            # Update references and check if all newly added members are valid
+            # Check if all newly added members are valid
             if element_type != 'node':
-                added_members_refs = self._update_reference_override(
-                    prev, element, typed_id
-                )
+                added_members_refs = reference_index.added_members(pos)
                 if added_members_refs:
                     self._check_members_local(element, added_members_refs)
 
             # On delete, check if not referenced by other elements
-            if action == 'delete' and not self._check_element_can_delete(element):
+            if action == 'delete' and not self._check_element_can_delete(element, pos):
                 logging.debug('Optimistic skipping delete for %s (is used)', typed_id)
                 continue
 
@@ -195,6 +240,7 @@ class OptimisticDiffPrepare:
             else:
                 entry.current = element
 
+        record_timing('prepare_elements', (perf_counter() - ts) * 1000)
         self._update_changeset_size(
             num_create=num_create,
             num_modify=num_modify,
@@ -205,6 +251,35 @@ class OptimisticDiffPrepare:
             tg.create_task(self._update_changeset_bounds())
             tg.create_task(self._check_members_remote())
 
+        # Release the previous preparation, only one level is needed
+        self._previous = None
+
+    async def _load_changed_refs(self) -> None:
+        """Load the element refs changed since the previous preparation."""
+        previous = self._previous
+        assert previous is not None, 'Previous preparation must be set'
+
+        changes = await ElementQuery.get_changed_refs(
+            previous.at_sequence_id,
+            self.at_sequence_id,
+            limit=OPTIMISTIC_DIFF_INCREMENTAL_MAX_CHANGES + 1,
+        )
+        if len(changes) > OPTIMISTIC_DIFF_INCREMENTAL_MAX_CHANGES:
+            logging.debug('Optimistic reloading all elements (too many changes)')
+            return
+
+        logging.debug(
+            'Optimistic reusing previous preparation (%d changes)', len(changes)
+        )
+        self._changed_refs = {typed_id for _, typed_id, _, _ in changes}
+        self._changed_members_refs = {
+            member
+            for _, _, _, members in changes
+            if members  #
+            for member in members
+        }
+
+    @timed('preload_elements')
     async def _preload_elements_state(self) -> None:
         """Preload elements state from the database."""
         # Only preload elements that exist in the database (positive element_id)
@@ -217,12 +292,35 @@ class OptimisticDiffPrepare:
         if not num_typed_ids:
             return
 
-        logging.debug('Optimistic preloading %d elements', num_typed_ids)
-        elements = await ElementQuery.get_by_refs(
-            typed_ids,
-            at_sequence_id=self.at_sequence_id,
-            limit=num_typed_ids,
-        )
+        elements: list[Element] = []
+        fetch_typed_ids = typed_ids
+
+        # Reuse the previously loaded elements that did not change since
+        previous = self._previous
+        changed_refs = self._changed_refs
+        if previous is not None and changed_refs is not None:
+            previous_state = previous.element_state
+            fetch_typed_ids = []
+            for typed_id in dict.fromkeys(typed_ids):
+                entry = previous_state.get(typed_id)
+                if (
+                    entry is not None
+                    and (remote := entry.remote) is not None
+                    and typed_id not in changed_refs
+                ):
+                    elements.append(remote)
+                else:
+                    fetch_typed_ids.append(typed_id)
+
+        if fetch_typed_ids:
+            logging.debug('Optimistic preloading %d elements', len(fetch_typed_ids))
+            elements.extend(
+                await ElementQuery.get_by_refs(
+                    fetch_typed_ids,
+                    at_sequence_id=self.at_sequence_id,
+                    limit=len(fetch_typed_ids),
+                )
+            )
 
         # Check if all elements exist
         if len(elements) != num_typed_ids:
@@ -237,6 +335,7 @@ class OptimisticDiffPrepare:
             for element in elements
         }
 
+    @timed('preload_parents')
     async def _preload_elements_parents(self, conn: AsyncConnection) -> None:
         """Preload elements parents from the database."""
         # Only preload elements that exist in the database (positive element_id) and will be deleted
@@ -249,19 +348,46 @@ class OptimisticDiffPrepare:
         if not typed_ids:
             return
 
-        logging.debug('Optimistic preloading parents for %d elements', len(typed_ids))
-        self._elements_parents_refs = (
-            await ElementQuery.get_current_parents_refs_by_refs(
-                typed_ids, conn, limit=None
+        parents_refs: dict[TypedElementId, set[TypedElementId]] = {}
+        fetch_typed_ids = typed_ids
+
+        # Reuse the previously loaded parents, unless a parent changed
+        # or a changed element references the element
+        previous = self._previous
+        changed_refs = self._changed_refs
+        if previous is not None and changed_refs is not None:
+            previous_parents_refs = previous.elements_parents_refs
+            changed_members_refs = self._changed_members_refs
+            fetch_typed_ids = []
+            for typed_id in typed_ids:
+                parents = previous_parents_refs.get(typed_id)
+                if (
+                    parents is not None
+                    and typed_id not in changed_members_refs
+                    and changed_refs.isdisjoint(parents)
+                ):
+                    parents_refs[typed_id] = parents
+                else:
+                    fetch_typed_ids.append(typed_id)
+
+        if fetch_typed_ids:
+            logging.debug(
+                'Optimistic preloading parents for %d elements', len(fetch_typed_ids)
+            )
+            parents_refs.update(
+                await ElementQuery.get_current_parents_refs_by_refs(
+                    fetch_typed_ids, conn, limit=None
+                )
             )
-        )
 
-    def _check_element_can_delete(self, element: ElementInit) -> bool:
+        self.elements_parents_refs = parents_refs
+
+    def _check_element_can_delete(self, element: ElementInit, pos: int) -> bool:
         """Check if the element can be deleted."""
         typed_id = element['typed_id']
+        positive_refs, negative_refs = self._reference_index.references(typed_id, pos)
 
         # Check if not referenced by element state
-        positive_refs = self._reference_override[typed_id, True]
         if positive_refs:
             if element.get('delete_if_unused'):
                 return False
@@ -272,9 +398,8 @@ class OptimisticDiffPrepare:
         if typed_id & 1 << 59:
             return True
 
-        parent_typed_ids = self._elements_parents_refs[typed_id]
+        parent_typed_ids = self.elements_parents_refs[typed_id]
         if parent_typed_ids:
-            negative_refs = self._reference_override[typed_id, False]
             used_by = parent_typed_ids - negative_refs
             if used_by:
                 if element.get('delete_if_unused'):
@@ -285,62 +410,6 @@ class OptimisticDiffPrepare:
         self.reference_check_element_refs.add(typed_id)
         return True
 
-    def _update_reference_override(
-        self,
-        prev: ElementInit | None,
-        element: ElementInit,
-        typed_id: TypedElementId,
-    ) -> list[TypedElementId] | None:
-        """Update the local reference overrides. Returns the newly added references if any."""
-        next_members = element['members']
-        prev_members = prev['members'] if prev is not None else None
-        next_members_arr = (
-            np.unique(np.array(next_members, np.uint64))
-            if next_members is not None
-            else None
-        )
-        prev_members_arr = (
-            np.unique(np.array(prev_members, np.uint64))
-            if prev_members is not None
-            else None
-        )
-        if next_members_arr is None and prev_members_arr is None:
-            return None
-
-        if next_members_arr is not None and prev_members_arr is not None:
-            typed_ids_removed = np.setdiff1d(
-                prev_members_arr, next_members_arr, assume_unique=True
-            )
-            typed_ids_added = np.setdiff1d(
-                next_members_arr, prev_members_arr, assume_unique=True
-            )
-        elif next_members_arr is not None:
-            typed_ids_removed = None
-            typed_ids_added = next_members_arr
-        else:
-            assert prev_members_arr is not None
-            typed_ids_removed = prev_members_arr
-            typed_ids_added = None
-
-        reference_override = self._reference_override
-
-        # Remove old references
-        if typed_ids_removed is not None:
-            typed_ids_removed_: list[TypedElementId] = typed_ids_removed.tolist()
-            for ref in typed_ids_removed_:
-                reference_override[ref, True].discard(typed_id)
-                reference_override[ref, False].add(typed_id)
-
-        # Add new references
-        if typed_ids_added is not None:
-            typed_ids_added_: list[TypedElementId] = typed_ids_added.tolist()
-            for ref in typed_ids_added_:
-                reference_override[ref, True].add(typed_id)
-                reference_override[ref, False].discard(typed_id)
-            return typed_ids_added_
-
-        return None
-
     def _check_members_local(
         self, parent: ElementInit, members: list[TypedElementId]
     ) -> None:
@@ -375,6 +444,7 @@ class OptimisticDiffPrepare:
                 set(not_found),
             ))
 
+    @timed('check_members')
     async def _check_members_remote(self) -> None:
         """Check if the members exist and are visible using the database."""
         remote_refs = {
@@ -385,10 +455,25 @@ class OptimisticDiffPrepare:
         if not remote_refs:
             return
 
-        visible_refs = await ElementQuery.filter_visible_refs(
-            list(remote_refs),
-            at_sequence_id=self.at_sequence_id,
-        )
+        # Reuse the previously checked refs that did not change since
+        check_refs = remote_refs
+        visible_refs: set[TypedElementId] = set()
+        previous = self._previous
+        changed_refs = self._changed_refs
+        if previous is not None and changed_refs is not None:
+            visible_refs = remote_refs.intersection(previous.visible_refs)
+            visible_refs.difference_update(changed_refs)
+            check_refs = remote_refs.difference(visible_refs)
+
+        if check_refs:
+            visible_refs.update(
+                await ElementQuery.filter_visible_refs(
+                    list(check_refs),
+                    at_sequence_id=self.at_sequence_id,
+                )
+            )
+
+        self.visible_refs = visible_refs
         hidden_refs = remote_refs.difference(visible_refs)
         if not hidden_refs:
             return
@@ -498,50 +583,49 @@ class OptimisticDiffPrepare:
             ).tolist()
         )
 
-        typed_ids_diff: list[TypedElementId] = (
-            typed_ids_all if full_diff else typed_ids_changed
-        ).tolist()
+        typed_ids_diff = typed_ids_all if full_diff else typed_ids_changed
+        type_nums = split_typed_element_ids_array(typed_ids_diff)[0]
+        node_typed_ids: list[TypedElementId] = typed_ids_diff[
+            type_nums == ELEMENT_TYPE_NUMS['node']
+        ].tolist()
+        way_typed_ids: list[TypedElementId] = typed_ids_diff[
+            type_nums == ELEMENT_TYPE_NUMS['way']
+        ].tolist()
 
         element_state: dict[TypedElementId, ElementStateEntry] = self.element_state
         bbox_points: list[Point] = self._bbox_points
         bbox_refs: set[TypedElementId] = self._bbox_refs
 
-        for typed_id, type_id in zip(
-            typed_ids_diff,
-            split_typed_element_ids(typed_ids_diff),
-            strict=True,
-        ):
-            type = type_id[0]
+        for typed_id in node_typed_ids:
+            entry = element_state.get(typed_id)
+            if entry is None:
+                bbox_refs.add(typed_id)
+                continue
 
-            if type == 'node':
-                entry = element_state.get(typed_id)
-                if entry is None:
-                    bbox_refs.add(typed_id)
-                    continue
+            point = entry.current.get('point')
+            assert point is not None, f'Node {typed_id} point must be set'
+            bbox_points.append(point)
 
-                point = entry.current.get('point')
-                assert point is not None, f'Node {typed_id} point must be set'
-                bbox_points.append(point)
+        for typed_id in way_typed_ids:
+            entry = element_state.get(typed_id)
+            if entry is None:
+                bbox_refs.add(typed_id)
+                continue
 
-            elif type == 'way':
-                entry = element_state.get(typed_id)
+            members = entry.current['members']
+            assert members is not None, f'Way {typed_id} members must be set'
+
+            for node_typed_id in members:
+                entry = element_state.get(node_typed_id)
                 if entry is None:
-                    bbox_refs.add(typed_id)
+                    bbox_refs.add(node_typed_id)
                     continue
 
-                members = entry.current['members']
-                assert members is not None, f'Way {typed_id} members must be set'
-
-                for node_typed_id in members:
-                    entry = element_state.get(node_typed_id)
-                    if entry is None:
-                        bbox_refs.add(node_typed_id)
-                        continue
-
-                    point = entry.current.get('point')
-                    assert point is not None, f'Node {node_typed_id} point must be set'
-                    bbox_points.append(point)
+                point = entry.current.get('point')
+                assert point is not None, f'Node {node_typed_id} point must be set'
+                bbox_points.append(point)
 
+    @timed('preload_changeset')
     async def _preload_changeset(self) -> None:
         """Preload changeset state from the database."""
         # Currently enforce single changeset updates
@@ -603,12 +687,13 @@ class OptimisticDiffPrepare:
 
         if bbox_refs:
             logging.debug('Optimistic loading %d bbox elements', len(bbox_refs))
-            elements = await ElementQuery.get_by_refs(
-                bbox_refs,
-                at_sequence_id=self.at_sequence_id,
-                recurse_ways=True,
-                limit=None,
-            )
+            with timing('bounds_load'):
+                elements = await ElementQuery.get_by_refs(
+                    bbox_refs,
+                    at_sequence_id=self.at_sequence_id,
+                    recurse_ways=True,
+                    limit=None,
+                )
 
             for element in elements:
                 point = element['point']
@@ -629,7 +714,10 @@ class OptimisticDiffPrepare:
             return
 
         # Update changeset bounds
-        new_bounds = extend_changeset_bounds(self.changeset.get('bounds'), bbox_points)
+        with timing('bounds_extend'):
+            new_bounds = extend_changeset_bounds(
+                self.changeset.get('bounds'), bbox_points
+            )
         self.changeset['bounds'] = new_bounds
 
         # Update union_bounds
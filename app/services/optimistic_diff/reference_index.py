@@ -0,0 +1,168 @@
+from collections.abc import Sequence
+
+import cython
+import numpy as np
+from numpy.typing import NDArray
+
+from app.models.db.element import ElementInit
+from app.models.element import TYPED_ELEMENT_ID_NODE_MAX, TypedElementId
+
+
+class ReferenceIndex:
+    """
+    Local reference changes of an upload, computed in one vectorized pass.
+
+    Each element is diffed against its previous state: the previous element
+    with the same ref in the upload, or the remote element.
+    The resulting reference events are sorted by (member, parent, position),
+    so the references at any upload position can be answered with array lookups.
+    """
+
+    __slots__ = (
+        '_added',
+        '_event_added',
+        '_event_member',
+        '_event_parent',
+        '_event_pos',
+    )
+
+    def __init__(
+        self,
+        elements: Sequence[ElementInit],
+        remote_members: dict[TypedElementId, list[TypedElementId] | None],
+    ) -> None:
+        last_members = remote_members.copy()
+        next_lists: list[list[TypedElementId]] = []
+        next_pos: list[int] = []
+        prev_lists: list[list[TypedElementId]] = []
+        prev_pos: list[int] = []
+        parent_ids: list[TypedElementId] = []
+
+        # Collect the member lists of all parent elements and their previous states
+        pos: cython.Py_ssize_t
+        for pos, element in enumerate(elements):
+            typed_id = element['typed_id']
+            parent_ids.append(typed_id)
+            if typed_id <= TYPED_ELEMENT_ID_NODE_MAX:
+                continue
+
+            members = element['members']
+            prev_members = last_members.get(typed_id)
+            last_members[typed_id] = members
+            if members:
+                next_lists.append(members)
+                next_pos.append(pos)
+            if prev_members:
+                prev_lists.append(prev_members)
+                prev_pos.append(pos)
+
+        next_pos_arr, next_member_arr = _unique_pairs(next_pos, next_lists)
+        prev_pos_arr, prev_member_arr = _unique_pairs(prev_pos, prev_lists)
+
+        # Pairs present in both the next and previous members are unchanged
+        pos_arr = np.concatenate((next_pos_arr, prev_pos_arr))
+        member_arr = np.concatenate((next_member_arr, prev_member_arr))
+        added_arr = np.concatenate((
+            np.ones(next_pos_arr.size, np.bool_),
+            np.zeros(prev_pos_arr.size, np.bool_),
+        ))
+        order = np.lexsort((member_arr, pos_arr))
+        pos_arr = pos_arr[order]
+        member_arr = member_arr[order]
+        added_arr = added_arr[order]
+
+        same = (pos_arr[1:] == pos_arr[:-1]) & (member_arr[1:] == member_arr[:-1])
+        changed = np.ones(pos_arr.size, np.bool_)
+        changed[1:] &= ~same
+        changed[:-1] &= ~same
+        pos_arr = pos_arr[changed]
+        member_arr = member_arr[changed]
+        added_arr = added_arr[changed]
+
+        # Added members per position, for checking the new members
+        added_pos = pos_arr[added_arr]
+        added_member = member_arr[added_arr]
+        unique_pos, starts = np.unique(added_pos, return_index=True)
+        self._added: dict[int, list[TypedElementId]] = (
+            dict(
+                zip(
+                    unique_pos.tolist(),
+                    (part.tolist() for part in np.split(added_member, starts[1:])),
+                    strict=True,
+                )
+            )
+            if unique_pos.size
+            else {}
+        )
+
+        # Reference events ordered by (member, parent, position)
+        parent_arr = np.array(parent_ids, np.uint64)[pos_arr]
+        order = np.lexsort((pos_arr, parent_arr, member_arr))
+        self._event_member = member_arr[order]
+        self._event_parent = parent_arr[order]
+        self._event_pos = pos_arr[order]
+        self._event_added = added_arr[order]
+
+    def added_members(self, pos: int) -> list[TypedElementId] | None:
+        """Get the members added by the element at the upload position."""
+        return self._added.get(pos)
+
+    def references(
+        self, typed_id: TypedElementId, pos: int
+    ) -> tuple[set[TypedElementId], set[TypedElementId]]:
+        """
+        Get the local references of the element after processing the upload position.
+        Returns the parents that now reference the element,
+        and the remote parents that no longer reference it.
+        """
+        event_member = self._event_member
+        start: cython.Py_ssize_t = np.searchsorted(event_member, typed_id, 'left')
+        end: cython.Py_ssize_t = np.searchsorted(event_member, typed_id, 'right')
+        positive: set[TypedElementId] = set()
+        negative: set[TypedElementId] = set()
+        if start == end:
+            return positive, negative
+
+        parents: list[TypedElementId] = self._event_parent[start:end].tolist()
+        positions: list[int] = self._event_pos[start:end].tolist()
+        added: list[bool] = self._event_added[start:end].tolist()
+
+        # The last event of each parent up to the position determines the state
+        for parent, event_pos, event_added in zip(
+            parents, positions, added, strict=True
+        ):
+            if event_pos > pos:
+                continue
+            if event_added:
+                positive.add(parent)
+                negative.discard(parent)
+            else:
+                negative.add(parent)
+                positive.discard(parent)
+
+        return positive, negative
+
+
+@cython.cfunc
+def _unique_pairs(
+    positions: list[int], lists: list[list[TypedElementId]]
+) -> tuple[NDArray[np.int64], NDArray[np.uint64]]:
+    """Flatten the member lists into unique (position, member) pairs."""
+    if not lists:
+        return np.empty(0, np.int64), np.empty(0, np.uint64)
+
+    lengths = np.fromiter(map(len, lists), np.int64, len(lists))
+    pos_arr = np.repeat(np.array(positions, np.int64), lengths)
+    member_arr = np.fromiter(
+        (member for members in lists for member in members),
+        np.uint64,
+        int(lengths.sum()),
+    )
+
+    order = np.lexsort((member_arr, pos_arr))
+    pos_arr = pos_arr[order]
+    member_arr = member_arr[order]
+
+    unique = np.ones(pos_arr.size, np.bool_)
+    unique[1:] = (pos_arr[1:] != pos_arr[:-1]) | (member_arr[1:] != member_arr[:-1])
+    return pos_arr[unique], member_arr[unique]
@@ -15,6 +15,7 @@ from app.models.db.oauth2_application import OAuth2ApplicationInit, OAuth2Uri
 from app.models.db.user import UserInit, UserRole, user_is_test
 from app.models.scope import PUBLIC_SCOPES, PublicScope
 from app.models.types import ClientId, DisplayName, Email, LocaleCode, UserId
+from app.services.auth_cache_service import AuthCacheService
 
 
 class TestService:
@@ -85,7 +86,8 @@ class TestService:
         }
         assert user_is_test(user_init), 'Test service must only create test users'
 
-        async with db(True) as conn:
+        async with (
+            db(True) as conn,
             await conn.execute(
                 """
                 INSERT INTO "user" (
@@ -105,14 +107,18 @@ class TestService:
                     language = EXCLUDED.language,
                     roles = EXCLUDED.roles,
                     created_at = COALESCE(%(created_at)s, "user".created_at)
+                RETURNING id
                 """,
                 {
                     **user_init,
                     'roles': roles or [],
                     'created_at': created_at,
                 },
-            )
+            ) as r,
+        ):
+            user_id: UserId = (await r.fetchone())[0]  # type: ignore
 
+        await AuthCacheService.invalidate_users([user_id])
         logging.info('Upserted test user %r', name)
 
     @staticmethod
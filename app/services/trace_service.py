@@ -21,6 +21,7 @@ from app.models.db.trace import (
     trace_tags_from_str,
 )
 from app.models.types import StorageKey, TraceId
+from app.queries.timescaledb_query import TimescaleDBQuery
 
 
 class TraceService:
@@ -92,13 +93,16 @@ class TraceService:
                     trace_init,
                 ) as r,
             ):
-                return (await r.fetchone())[0]  # type: ignore
+                trace_id: TraceId = (await r.fetchone())[0]  # type: ignore
 
         except Exception:
             # Clean up trace file on error
             await TRACE_STORAGE.delete(trace_init['file_id'])
             raise
 
+        TimescaleDBQuery.observe_id('trace', trace_id)
+        return trace_id
+
     @staticmethod
     async def update(
         trace_id: TraceId,
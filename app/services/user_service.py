@@ -15,9 +15,10 @@ from app.lib.translation import t
 from app.lib.user_token_struct_utils import UserTokenStructUtils
 from app.models.db.oauth2_application import SYSTEM_APP_WEB_CLIENT_ID
 from app.models.db.user import Editor, User, user_avatar_url, user_is_test
-from app.models.types import DisplayName, Email, LocaleCode, Password
+from app.models.types import DisplayName, Email, LocaleCode, Password, UserId
 from app.queries.user_query import UserQuery
 from app.queries.user_token_query import UserTokenQuery
+from app.services.auth_cache_service import AuthCacheService
 from app.services.image_service import ImageService
 from app.services.oauth2_token_service import OAuth2TokenService
 from app.services.system_app_service import SystemAppService
@@ -94,6 +95,8 @@ class UserService:
                 (description, user_id, description),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
+
     @staticmethod
     async def update_avatar(
         avatar_type: UserAvatarType, avatar_file: UploadFile
@@ -121,6 +124,8 @@ class UserService:
                 (avatar_type, avatar_id, user_id),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
+
         # Cleanup old avatar
         if old_avatar_id is not None:
             await ImageService.delete_avatar_by_id(old_avatar_id)
@@ -153,6 +158,8 @@ class UserService:
                 (background_id, user_id),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
+
         # Cleanup old background
         if old_background_id is not None:
             await ImageService.delete_background_by_id(old_background_id)
@@ -195,6 +202,8 @@ class UserService:
                 (display_name, language, activity_tracking, crash_reporting, user_id),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
+
     @staticmethod
     async def update_editor(
         editor: Editor | None,
@@ -212,6 +221,8 @@ class UserService:
                 (editor, user_id),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
+
     @staticmethod
     async def update_email(
         *,
@@ -289,6 +300,7 @@ class UserService:
                 (new_password_pb, user_id),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
         logging.debug('Changed password for user %d', user_id)
 
     @staticmethod
@@ -348,6 +360,7 @@ class UserService:
                     (token_struct.id,),
                 )
 
+        await AuthCacheService.invalidate_users([user_id])
         logging.debug('Reset password for user %d', user_id)
 
     @staticmethod
@@ -365,8 +378,11 @@ class UserService:
                 (timezone, user_id, timezone),
             )
 
-            if result.rowcount:
-                logging.debug('Updated user %d timezone to %r', user_id, timezone)
+            if not result.rowcount:
+                return
+
+        await AuthCacheService.invalidate_users([user_id])
+        logging.debug('Updated user %d timezone to %r', user_id, timezone)
 
     # TODO: UI
     @staticmethod
@@ -384,6 +400,8 @@ class UserService:
                 (USER_SCHEDULED_DELETE_DELAY, user_id),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
+
     @staticmethod
     async def abort_scheduled_delete() -> None:
         """Abort a scheduled deletion of the user."""
@@ -399,20 +417,28 @@ class UserService:
                 (user_id,),
             )
 
+        await AuthCacheService.invalidate_users([user_id])
+
     @staticmethod
     async def delete_old_pending_users() -> None:
         """Find old pending users and delete them."""
         logging.debug('Deleting old pending users')
 
-        async with db(True) as conn:
+        async with (
+            db(True) as conn,
             await conn.execute(
                 """
                 DELETE FROM "user"
                 WHERE NOT email_verified
                 AND created_at < statement_timestamp() - %s
+                RETURNING id
                 """,
                 (USER_PENDING_EXPIRE,),
-            )
+            ) as r,
+        ):
+            user_ids: list[UserId] = [row[0] for row in await r.fetchall()]
+
+        await AuthCacheService.invalidate_users(user_ids)
 
 
 async def _rehash_user_password(user: User, password: Password) -> None:
@@ -433,5 +459,8 @@ async def _rehash_user_password(user: User, password: Password) -> None:
             (new_password_pb, user_id, user['password_pb']),
         )
 
-        if result.rowcount:
-            logging.debug('Rehashed password for user %d', user_id)
+        if not result.rowcount:
+            return
+
+    await AuthCacheService.invalidate_users([user_id])
+    logging.debug('Rehashed password for user %d', user_id)
@@ -11,6 +11,7 @@ from app.models.db.user_token import UserTokenEmailChangeInit
 from app.models.proto.server_pb2 import UserTokenStruct
 from app.models.types import Email, UserId, UserTokenId
 from app.queries.user_token_query import UserTokenQuery
+from app.services.auth_cache_service import AuthCacheService
 from app.services.email_service import EmailService
 from speedup.buffered_rand import buffered_randbytes
 
@@ -75,6 +76,8 @@ class UserTokenEmailChangeService:
                     (token_struct.id,),
                 )
 
+        await AuthCacheService.invalidate_users([user_id])
+
 
 async def _create_token(new_email: Email) -> UserTokenStruct:
     """Create a new user email change token."""
@@ -15,16 +15,17 @@ from app.lib.compressible_geometry import (
     bbox_to_compressible_wkb,
     point_to_compressible_wkb,
 )
+from app.lib.pbf import PBF, PBFElement
 from app.lib.xmltodict import XMLToDict
 from app.models.element import (
     TYPED_ELEMENT_ID_RELATION_MIN,
-    ElementType,
     TypedElementId,
 )
 from app.utils import calc_num_workers
 from speedup.element_type import typed_element_id
 
 PLANET_INPUT_PATH = PRELOAD_DIR.joinpath('preload.osm')
+PLANET_PBF_INPUT_PATH = PRELOAD_DIR.joinpath('preload.osm.pbf')
 PLANET_PARQUET_PATH = PRELOAD_DIR.joinpath('preload.osm.parquet')
 
 _PLANET_SCHEMA = pa.schema([
@@ -83,6 +84,9 @@ _NOTES_SCHEMA = pa.schema([
 
 _NUM_WORKERS = calc_num_workers()
 _TASK_SIZE = 64 * 1024 * 1024  # 64 MB
+_PBF_TASK_SIZE = 16 * 1024 * 1024  # 16 MB, compressed
+_READ_CHUNK_SIZE = 1024 * 1024  # 1 MB
+_WRITE_BATCH_SIZE = 100_000
 
 
 @cython.cfunc
@@ -97,21 +101,17 @@ def _get_worker_path(base: Path, i: int):
 
 def planet_worker(args: tuple[int, int, int, int]) -> None:
     i, num_tasks, from_seek, to_seek = args  # from_seek(inclusive), to_seek(exclusive)
+    elements = XMLToDict.iterparse(
+        _read_planet_range(from_seek, to_seek, is_last=i + 1 >= num_tasks),
+        size_limit=None,
+    )
     data: list[dict] = []
-
-    with PLANET_INPUT_PATH.open('rb') as f_in:
-        parts: list[bytes] = []
-        if from_seek > 0:
-            parts.append(b'<osm>')
-            f_in.seek(from_seek)
-        parts.append(f_in.read(to_seek - from_seek))
-        if i + 1 < num_tasks:
-            parts.append(b'</osm>')
-        input_buffer = b''.join(parts)
-
-    elements: list[tuple[ElementType, dict]]
-    elements = XMLToDict.parse(input_buffer, size_limit=None)['osm']  # type: ignore
-    del input_buffer, parts  # free memory
+    writer = pq.ParquetWriter(
+        _get_worker_path(PLANET_PARQUET_PATH, i),
+        _PLANET_SCHEMA,
+        compression='lz4',
+        write_statistics=False,
+    )
 
     type: str
     element: dict
@@ -158,17 +158,37 @@ def planet_worker(args: tuple[int, int, int, int]) -> None:
             'display_name': element.get('@user'),
         })
 
-    pq.write_table(
-        pa.Table.from_pylist(data, schema=_PLANET_SCHEMA),
-        _get_worker_path(PLANET_PARQUET_PATH, i),
-        compression='lz4',
-        write_statistics=False,
-    )
+        if len(data) >= _WRITE_BATCH_SIZE:
+            writer.write_table(pa.Table.from_pylist(data, schema=_PLANET_SCHEMA))
+            data.clear()
+
+    if data:
+        writer.write_table(pa.Table.from_pylist(data, schema=_PLANET_SCHEMA))
+    writer.close()
     del data
     gc.collect()
 
 
-def run_planet_workers() -> None:
+def _read_planet_range(from_seek: int, to_seek: int, *, is_last: bool):
+    """Read the planet byte range in chunks, wrapped in the root element."""
+    with PLANET_INPUT_PATH.open('rb') as f_in:
+        if from_seek > 0:
+            yield b'<osm>'
+            f_in.seek(from_seek)
+
+        remaining = to_seek - from_seek
+        while remaining > 0:
+            chunk = f_in.read(min(remaining, _READ_CHUNK_SIZE))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    if not is_last:
+        yield b'</osm>'
+
+
+def run_planet_workers() -> int:
     input_size = PLANET_INPUT_PATH.stat().st_size
     num_tasks = input_size // _TASK_SIZE
     from_seek_search = [b'  <node', b'  <way', b'  <relation']
@@ -202,10 +222,87 @@ def run_planet_workers() -> None:
         ):
             pass
 
+    return num_tasks
 
-def merge_planet_worker_results() -> None:
-    input_size = PLANET_INPUT_PATH.stat().st_size
-    num_tasks = input_size // _TASK_SIZE
+
+def planet_pbf_worker(args: tuple[int, list[tuple[int, int]]]) -> None:
+    i, blob_ranges = args
+    data: list[dict] = []
+    writer = pq.ParquetWriter(
+        _get_worker_path(PLANET_PARQUET_PATH, i),
+        _PLANET_SCHEMA,
+        compression='lz4',
+        write_statistics=False,
+    )
+
+    with PLANET_PBF_INPUT_PATH.open('rb') as f_in:
+        for offset, size in blob_ranges:
+            f_in.seek(offset)
+            element: PBFElement
+            for element in PBF.decode_blob(f_in.read(size)):
+                point = element['point']
+                members = element['members']
+                members_roles = element['members_roles']
+                data.append({
+                    'changeset_id': element['changeset_id'],
+                    'typed_id': element['typed_id'],
+                    'version': element['version'],
+                    'visible': element['visible'],
+                    'tags': element['tags'],
+                    'point': (
+                        point_to_compressible_wkb(*point) if point is not None else None
+                    ),
+                    'members': (
+                        (
+                            list(zip(members, members_roles, strict=True))
+                            if members_roles is not None
+                            else [(member, None) for member in members]
+                        )
+                        if members is not None
+                        else None
+                    ),
+                    'created_at': element['created_at'],
+                    'user_id': element['user_id'],
+                    'display_name': element['display_name'],
+                })
+
+            if len(data) >= _WRITE_BATCH_SIZE:
+                writer.write_table(pa.Table.from_pylist(data, schema=_PLANET_SCHEMA))
+                data.clear()
+
+    if data:
+        writer.write_table(pa.Table.from_pylist(data, schema=_PLANET_SCHEMA))
+    writer.close()
+    del data
+    gc.collect()
+
+
+def run_planet_pbf_workers() -> int:
+    # Group the consecutive blobs into tasks of similar compressed size
+    tasks: list[list[tuple[int, int]]] = [[]]
+    task_size = 0
+    for blob_range in PBF.blob_ranges(PLANET_PBF_INPUT_PATH):
+        if task_size >= _PBF_TASK_SIZE:
+            tasks.append([])
+            task_size = 0
+        tasks[-1].append(blob_range)
+        task_size += blob_range[1]
+
+    num_tasks = len(tasks)
+    print(f'Configuring {num_tasks} tasks (using {_NUM_WORKERS} workers)')
+
+    with Pool(_NUM_WORKERS) as pool:
+        for _ in tqdm(
+            pool.imap_unordered(planet_pbf_worker, enumerate(tasks)),
+            desc='Preparing planet data',
+            total=num_tasks,
+        ):
+            pass
+
+    return num_tasks
+
+
+def merge_planet_worker_results(num_tasks: int) -> None:
     paths = [_get_worker_path(PLANET_PARQUET_PATH, i) for i in range(num_tasks)]
 
     with duckdb_connect() as conn:
@@ -712,15 +809,19 @@ def main() -> None:
         merge_changesets_worker_results()
 
     if 'planet' in modes:
-        if not PLANET_INPUT_PATH.is_file():
-            raise FileNotFoundError(f'Planet data file not found: {PLANET_INPUT_PATH}')
+        # Prefer the PBF planet, decoding compressed blocks is much cheaper than XML
+        is_pbf = PLANET_PBF_INPUT_PATH.is_file()
+        if not is_pbf and not PLANET_INPUT_PATH.is_file():
+            raise FileNotFoundError(
+                f'Planet data file not found: {PLANET_PBF_INPUT_PATH} or {PLANET_INPUT_PATH}'
+            )
         if not CHANGESETS_PARQUET_PATH.is_file():
             raise FileNotFoundError(
                 f'Changesets processed data file not found: {CHANGESETS_PARQUET_PATH}'
             )
 
-        run_planet_workers()
-        merge_planet_worker_results()
+        num_tasks = run_planet_pbf_workers() if is_pbf else run_planet_workers()
+        merge_planet_worker_results(num_tasks)
 
         print('Writing changeset')
         _write_changeset()
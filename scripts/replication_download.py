@@ -2,15 +2,17 @@ import asyncio
 import gc
 import gzip
 import logging
-from asyncio import sleep
+from asyncio import Task, sleep
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import asdict, dataclass, replace
 from datetime import UTC, datetime, timedelta
 from itertools import pairwise
 from pathlib import Path
 from time import monotonic
-from typing import Literal, get_args
+from typing import Any, Literal, get_args
 
 import cython
+import numpy as np
 import orjson
 import pyarrow as pa
 import pyarrow.parquet as pq
@@ -19,13 +21,11 @@ from starlette import status
 
 from app.config import OSM_OLD_REPLICATION_URL, OSM_REPLICATION_URL, REPLICATION_DIR
 from app.db import duckdb_connect
-from app.lib.compressible_geometry import point_to_compressible_wkb
+from app.lib.compressible_geometry import compressible_geometry
 from app.lib.retry import retry
 from app.lib.sentry import SENTRY_REPLICATION_MONITOR
-from app.lib.xmltodict import XMLToDict
-from app.models.element import ElementType, TypedElementId
-from app.utils import HTTP
-from speedup.element_type import typed_element_id
+from app.utils import HTTP, calc_num_workers
+from speedup.osmchange_parse import osmchange_parse
 
 _Dataset = Literal['replication', 'redaction-period', 'cc-by-sa']
 _Frequency = Literal['minute', 'hour', 'day']
@@ -52,6 +52,8 @@ _KNOWN_CORRUPTED: set[tuple[_Dataset, _Frequency, int]] = {
     ('redaction-period', 'day', 120),
 }
 
+_NUM_WORKERS = calc_num_workers(max=8)
+
 _PARQUET_TMP_SCHEMA = pa.schema([
     pa.field('parse_order', pa.uint64()),
     pa.field('changeset_id', pa.uint64()),
@@ -117,6 +119,12 @@ class AppState:
         )
 
 
+# In-flight replica fetches, by (dataset, frequency, sequence number)
+_PREFETCH: dict[
+    tuple[_Dataset, _Frequency, int], Task[tuple[ReplicaState, Path, int] | None]
+] = {}
+
+
 @cython.cfunc
 def _clean_leftover_data(state: AppState):
     """Remove leftover replica files."""
@@ -223,88 +231,167 @@ def _save_app_state(state: AppState):
 
 
 @cython.cfunc
-def _parse_actions(
-    writer: pq.ParquetWriter,
-    actions: list[tuple[str, list[tuple[ElementType, dict]]]],
-) -> int:
-    """Parse OSM change actions and write them to parquet."""
-    parse_order: cython.Py_ssize_t = -1
-    data: list[dict] = []
-
-    def flush():
-        """Write accumulated data to parquet and clear the buffer."""
-        if data:
-            record_batch = pa.RecordBatch.from_pylist(data, schema=_PARQUET_TMP_SCHEMA)
-            writer.write_batch(record_batch, row_group_size=len(data))
-            data.clear()
-
-    for action, action_value in actions:
-        # Skip osmChange attributes
-        if action[:1] == '@':
-            continue
+def _columns_to_record_batch(columns: dict[str, Any]) -> pa.RecordBatch:
+    """Build the temporary parquet record batch from the decoded osmChange columns."""
+    typed_id = np.frombuffer(columns['typed_id'], np.uint64)
+    num_rows = typed_id.size
+
+    # Encode points as compressible WKB, the same as point_to_compressible_wkb
+    lon = np.frombuffer(columns['lon'], np.float64)
+    lat = np.frombuffer(columns['lat'], np.float64)
+    has_point = ~np.isnan(lon)
+    point_data = np.empty((num_rows, 21), np.uint8)
+    point_data[:, :5] = (1, 1, 0, 0, 0)
+    point_data[:, 5:] = (
+        compressible_geometry(np.stack((lon, lat), axis=1)).astype('<f8').view(np.uint8)
+    )
+    point = pa.FixedSizeBinaryArray.from_buffers(
+        pa.binary(21),
+        num_rows,
+        [pa.array(has_point).buffers()[1], pa.py_buffer(point_data)],
+    )
 
-        elements: list[tuple[ElementType, dict]] = action_value
-        type: str
-        element: dict
+    tags_offsets = np.frombuffer(columns['tags_offsets'], np.int64)
+    tags = pa.MapArray.from_arrays(
+        tags_offsets.astype(np.int32),
+        pa.array(columns['tags_keys'], pa.string()),
+        pa.array(columns['tags_values'], pa.string()),
+        mask=pa.array(tags_offsets[1:] == tags_offsets[:-1]),
+    )
 
-        for parse_order, (type, element) in enumerate(elements, parse_order + 1):  # noqa: B020
-            typed_id = typed_element_id(type, element['@id'])
-            version = element['@version']
+    members_offsets = np.frombuffer(columns['members_offsets'], np.int64)
+    members = pa.ListArray.from_arrays(
+        members_offsets.astype(np.int32),
+        pa.StructArray.from_arrays(
+            [
+                pa.array(np.frombuffer(columns['members'], np.uint64)),
+                pa.array(columns['members_roles'], pa.string()),
+            ],
+            fields=list(_PARQUET_TMP_SCHEMA.field('members').type.value_type),
+        ),
+        mask=pa.array(members_offsets[1:] == members_offsets[:-1]),
+    )
 
-            tags = (
-                {tag['@k']: tag['@v'] for tag in tags_}
-                if (tags_ := element.get('tag')) is not None
-                else None
-            )
-            point: bytes | None = None
-            members: list[tuple[TypedElementId, str | None]] | None = None
-
-            if type == 'node':
-                if (lon := element.get('@lon')) is not None:
-                    point = point_to_compressible_wkb(lon, element['@lat'])
-            elif type == 'way':
-                if (members_ := element.get('nd')) is not None:
-                    members = [(member['@ref'], None) for member in members_]
-            elif type == 'relation':
-                if (members_ := element.get('member')) is not None:
-                    members = [
-                        (
-                            typed_element_id(member['@type'], member['@ref']),
-                            member['@role'],
-                        )
-                        for member in members_
-                    ]
-            else:
-                raise NotImplementedError(f'Unsupported element type {type!r}')
-
-            data.append({
-                'parse_order': parse_order,
-                'changeset_id': element['@changeset'],
-                'typed_id': typed_id,
-                'version': version,
-                'visible': (
-                    (tags is not None) or (point is not None) or (members is not None)
-                ),
-                'tags': tags,
-                'point': point,
-                'members': members,
-                'created_at': element['@timestamp'],
-                'user_id': element.get('@uid'),
-                'display_name': element.get('@user'),
-            })
-
-            # Flush batch when we have accumulated enough data
-            if len(data) >= 122880:
-                flush()
-
-    # Flush any remaining data
-    flush()
-
-    return parse_order + 1
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(np.arange(num_rows, dtype=np.uint64)),
+            pa.array(np.frombuffer(columns['changeset_id'], np.uint64)),
+            pa.array(typed_id),
+            pa.array(np.frombuffer(columns['version'], np.uint64)),
+            pa.array(np.frombuffer(columns['visible'], np.bool_)),
+            tags,
+            point,
+            members,
+            pa.array(
+                np.frombuffer(columns['created_at'], np.int64),
+                pa.timestamp('ms', 'UTC'),
+            ),
+            pa.array(
+                np.frombuffer(columns['user_id'], np.uint64),
+                mask=~np.frombuffer(columns['has_user_id'], np.bool_),
+            ),
+            pa.array(columns['display_name'], pa.string()),
+        ],
+        schema=_PARQUET_TMP_SCHEMA,
+    )
+
+
+def _parse_replica(content: bytes, path: Path) -> int:
+    """Decode the gzipped osmChange and write its elements to parquet. Runs in a worker process."""
+    columns = osmchange_parse(gzip.decompress(content))
+    del content  # free memory
+
+    num_rows = len(columns['typed_id']) // 8
+    if not num_rows:
+        return 0
+
+    record_batch = _columns_to_record_batch(columns)
+    del columns  # free memory
+
+    with pq.ParquetWriter(
+        path,
+        schema=_PARQUET_TMP_SCHEMA,
+        compression='lz4',
+        write_statistics=False,
+        sorting_columns=pq.SortingColumn.from_ordering(
+            _PARQUET_TMP_SCHEMA, [('parse_order', 'ascending')]
+        ),
+    ) as writer:
+        writer.write_batch(record_batch, row_group_size=122880)
+
+    return num_rows
+
+
+async def _fetch_replica(
+    pool: ProcessPoolExecutor,
+    dataset: _Dataset,
+    frequency: _Frequency,
+    sequence_number: int,
+) -> tuple[ReplicaState, Path, int] | None:
+    """
+    Download the replica and parse it into a temporary parquet file.
+    Returns None if the replica is not available (yet).
+    """
+    url = _get_replication_url(dataset, frequency, sequence_number)
+
+    r = await HTTP.get(url + '.state.txt')
+    if r.status_code == status.HTTP_404_NOT_FOUND and (
+        frequency == 'minute' or dataset != 'replication'
+    ):
+        return None
+    r.raise_for_status()
+    remote_replica = _parse_replica_state(r.text)
+
+    r = await HTTP.get(url + '.osc.gz', timeout=300)
+    if frequency == 'minute' and r.status_code == status.HTTP_404_NOT_FOUND:
+        return None
+    r.raise_for_status()
+
+    ts = monotonic()
+    tmp_path = remote_replica.path.with_name(f'.{remote_replica.path.name}.tmp')
+    num_rows = await asyncio.get_running_loop().run_in_executor(
+        pool, _parse_replica, r.content, tmp_path
+    )
+    del r  # free memory
+
+    tt = monotonic() - ts
+    logging.info(
+        'Processed %d elements of %s/%d in %.1fs',
+        num_rows,
+        frequency,
+        sequence_number,
+        tt,
+    )
+    return remote_replica, tmp_path, num_rows
+
+
+@cython.cfunc
+def _prefetch_replicas(pool: ProcessPoolExecutor, state: AppState):
+    """Start fetching the upcoming replicas in the background while catching up."""
+    next_replica = state.next_replica
+    next_sequence_number = next_replica.sequence_number
+
+    # Discard replicas of the previous dataset or frequency
+    for key in list(_PREFETCH):
+        if key[:2] != (state.dataset, state.frequency) or key[2] < next_sequence_number:
+            _PREFETCH.pop(key).cancel()
+
+    # Only prefetch replicas that are certainly published
+    delta = _FREQUENCY_TIMEDELTA[state.frequency]
+    published_before = datetime.now(UTC) - delta
+
+    i: cython.Py_ssize_t
+    for i in range(_NUM_WORKERS):
+        if next_replica.created_at + i * delta > published_before:
+            break
+        key = (state.dataset, state.frequency, next_sequence_number + i)
+        if key in _PREFETCH or key in _KNOWN_CORRUPTED:
+            continue
+        _PREFETCH[key] = asyncio.create_task(_fetch_replica(pool, *key))
 
 
 @retry(timedelta(minutes=30))
-async def _iterate(state: AppState) -> AppState:
+async def _iterate(pool: ProcessPoolExecutor, state: AppState) -> AppState:
     """Process the next replication sequence."""
     while True:
         next_replica = state.next_replica
@@ -334,63 +421,36 @@ async def _iterate(state: AppState) -> AppState:
             state.frequency,
         )
 
-    url = _get_replication_url(
-        state.dataset, state.frequency, next_replica.sequence_number
-    )
+    _prefetch_replicas(pool, state)
+    key = (state.dataset, state.frequency, next_replica.sequence_number)
+    task = _PREFETCH.pop(key, None)
+    result = None
+
+    if task is not None:
+        try:
+            result = await task
+        except Exception:
+            logging.warning('Failed to prefetch replica, retrying', exc_info=True)
 
     # Attempt to fetch the replication data
-    while True:
-        r = await HTTP.get(url + '.state.txt')
-        if state.frequency == 'minute' and r.status_code == status.HTTP_404_NOT_FOUND:
-            logging.debug('Minute state not yet available, waiting...')
-            await sleep(60)
-            continue
+    while result is None:
+        result = await _fetch_replica(pool, *key)
+        if result is not None:
+            break
 
         # Detect if we've reached the end of the current dataset
-        if (
-            state.dataset != 'replication'
-            and r.status_code == status.HTTP_404_NOT_FOUND
-        ):
-            return await _iterate(_iterate_dataset(state))
-
-        r.raise_for_status()
-        remote_replica = _parse_replica_state(r.text)
+        if state.frequency != 'minute':
+            return await _iterate(pool, _iterate_dataset(state))
 
-        r = await HTTP.get(url + '.osc.gz', timeout=300)
-        if state.frequency == 'minute' and r.status_code == status.HTTP_404_NOT_FOUND:
-            logging.debug('Minute data not yet available, waiting...')
-            await sleep(60)
-            continue
-        r.raise_for_status()
-        break
+        logging.debug('Minute replica not yet available, waiting...')
+        await sleep(60)
 
-    actions = XMLToDict.parse(gzip.decompress(r.content), size_limit=None)['osmChange']
-    del r  # free memory
+    remote_replica, tmp_path, num_rows = result
 
-    if isinstance(actions, dict):
+    if not num_rows:
         logging.info('Skipped empty osmChange')
-        num_rows = 0
     else:
         ts = monotonic()
-        tmp_path = remote_replica.path.with_name(f'.{remote_replica.path.name}.tmp')
-
-        # Parse actions and write to temporary file
-        with pq.ParquetWriter(
-            tmp_path,
-            schema=_PARQUET_TMP_SCHEMA,
-            compression='lz4',
-            write_statistics=False,
-            sorting_columns=pq.SortingColumn.from_ordering(
-                _PARQUET_TMP_SCHEMA, [('parse_order', 'ascending')]
-            ),
-        ) as writer:
-            num_rows = _parse_actions(writer, actions)
-            assert num_rows > 0
-            del actions  # free memory
-
-        tt = monotonic() - ts
-        logging.info('Processed %d elements in %.1fs', num_rows, tt)
-        ts = monotonic()
 
         # Use DuckDB to sort and assign sequence IDs
         with duckdb_connect() as conn:
@@ -491,7 +551,7 @@ async def _increase_frequency(state: AppState) -> AppState:
             new_sequence_number += step
 
 
-async def main() -> None:
+async def _run(pool: ProcessPoolExecutor) -> None:
     # Freeze all gc objects before starting for improved performance
     gc.collect()
     gc.freeze()
@@ -519,7 +579,7 @@ async def main() -> None:
                 },
             )
             _clean_leftover_data(state)
-            state = await _iterate(state)
+            state = await _iterate(pool, state)
             _bundle_data_if_needed(state)
             _save_app_state(state)
             logging.info(
@@ -530,5 +590,10 @@ async def main() -> None:
             gc.collect()
 
 
+def main() -> None:
+    with ProcessPoolExecutor(_NUM_WORKERS) as pool:
+        asyncio.run(_run(pool))
+
+
 if __name__ == '__main__':
-    asyncio.run(main())
+    main()
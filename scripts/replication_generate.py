@@ -1,8 +1,12 @@
 import asyncio
+import gzip
 import logging
 from argparse import ArgumentParser
-from asyncio.subprocess import PIPE, create_subprocess_exec
+from asyncio import Future
+from collections import deque
 from collections.abc import AsyncGenerator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
 from datetime import UTC, datetime, timedelta
 from functools import cache
 from pathlib import Path
@@ -10,8 +14,7 @@ from shutil import copyfile
 from typing import Literal, TypedDict, get_args
 
 import cython
-from psycopg import AsyncConnection
-from psycopg.rows import dict_row
+import numpy as np
 
 from app.config import (
     COMPRESS_REPLICATION_GZIP_LEVEL,
@@ -21,8 +24,10 @@ from app.config import (
 from app.db import db
 from app.format import Format06
 from app.lib.date_utils import utcnow
-from app.lib.xmltodict import XMLToDict
-from app.models.db.element import Element
+from app.lib.pbf import PBF
+from app.models.db.element_batch import ElementBatch
+from app.models.types import SequenceId
+from app.queries.element_query import ElementQuery
 from app.utils import calc_num_workers
 
 
@@ -39,10 +44,19 @@ _TIMESPAN_DELTA: dict[_TimeSpan, timedelta] = {
     'day': timedelta(days=1),
 }
 
-_CHUNK_SIZE = 1_000_000
+_EPOCH = datetime.fromtimestamp(0, UTC)
+_MICROSECOND = timedelta(microseconds=1)
 
-_NUM_WORKERS_PIGZ = calc_num_workers(COMPRESS_REPLICATION_GZIP_THREADS)
-logging.debug('Configured pigz compression: %d workers', _NUM_WORKERS_PIGZ)
+_CHUNK_SIZE = 100_000
+
+_NUM_WORKERS = calc_num_workers(COMPRESS_REPLICATION_GZIP_THREADS)
+logging.debug('Configured diff encoding: %d workers', _NUM_WORKERS)
+
+# Maximum number of chunks being encoded, bounds the memory usage
+_MAX_PENDING_CHUNKS = _NUM_WORKERS * 2
+
+_DIFF_HEADER = b'<?xml version="1.0" encoding="UTF-8"?>\n<osmChange>'
+_DIFF_FOOTER = b'</osmChange>'
 
 
 def _make_tmp_path(path: Path) -> Path:
@@ -189,21 +203,15 @@ async def _wait_db_sync(next_timestamp: datetime) -> None:
 
 async def _find_sequence_range_for_timespan(
     from_timestamp: datetime, to_timestamp: datetime
-) -> tuple[int, int] | None:
+) -> tuple[SequenceId, SequenceId] | None:
     """
-    Efficiently find sequence_id range that corresponds to the given time range.
+    Find sequence_id range that corresponds to the given time range.
     Returns (min_sequence_id, max_sequence_id) or None if no data in range.
     """
     async with db() as conn:
-        # Get max sequence_id to establish our search space
-        async with await conn.execute('SELECT MAX(sequence_id) FROM element') as r:
-            max_seq: int | None = (await r.fetchone())[0]  # type: ignore
-            if max_seq is None:
-                logging.warning('No elements in the table')
-                return None
-
-        # Find the first sequence_id where created_at >= from_timestamp
-        start_seq = await _binary_search_boundary(conn, 1, max_seq, from_timestamp)
+        start_seq = await ElementQuery.get_sequence_id_by_timestamp(
+            from_timestamp, conn
+        )
         if start_seq is None:
             logging.debug(
                 'No elements with created_at >= %s',
@@ -211,60 +219,24 @@ async def _find_sequence_range_for_timespan(
             )
             return None
 
-        # Find the first sequence_id where created_at >= to_timestamp
-        end_seq = await _binary_search_boundary(conn, start_seq, max_seq, to_timestamp)
-        # If we found the boundary, adjust it to exclude records >= to_timestamp
-        end_seq = end_seq - 1 if end_seq is not None else max_seq
+        # Exclude the elements with created_at >= to_timestamp
+        end_seq = await ElementQuery.get_sequence_id_by_timestamp(to_timestamp, conn)
+        end_seq = (
+            SequenceId(end_seq - 1)
+            if end_seq is not None
+            else await ElementQuery.get_current_sequence_id(conn)
+        )
+        if end_seq < start_seq:
+            logging.debug('No elements in the timespan')
+            return None
 
         logging.debug('Sequence range for timespan: [%d, %d]', start_seq, end_seq)
         return start_seq, end_seq
 
 
-async def _binary_search_boundary(
-    conn: AsyncConnection,
-    low: cython.ulonglong,
-    high: cython.ulonglong,
-    timestamp: datetime,
-) -> int | None:
-    """Binary search helper that finds boundary sequence_id based on timestamp comparison."""
-    assert low > 0
-    result: cython.ulonglong = 0
-
-    while low <= high:
-        mid: cython.ulonglong = (low + high) // 2
-
-        # Find an existing sequence_id at or after mid
-        async with await conn.execute(
-            """
-            SELECT sequence_id, created_at FROM element
-            WHERE sequence_id >= %s
-            ORDER BY sequence_id
-            LIMIT 1
-            """,
-            (mid,),
-        ) as r:
-            row = await r.fetchone()
-
-        if row is None:
-            high = mid - 1  # No sequence_ids from mid to high, search lower half
-            continue
-
-        existing_seq: cython.ulonglong
-        mid_time: datetime
-        existing_seq, mid_time = row
-
-        if mid_time >= timestamp:
-            result = existing_seq
-            high = existing_seq - 1  # Keep searching for earlier matches
-        else:
-            low = existing_seq + 1  # Need a later record
-
-    return result or None
-
-
 async def _fetch_changes(
     from_timestamp: datetime, to_timestamp: datetime
-) -> AsyncGenerator[list[Element]]:
+) -> AsyncGenerator[ElementBatch]:
     """Stream database changes between timestamps in chunks using sequence_id."""
     seq_range = await _find_sequence_range_for_timespan(from_timestamp, to_timestamp)
     if seq_range is None:
@@ -273,122 +245,206 @@ async def _fetch_changes(
     num_elements: cython.Py_ssize_t = 0
     num_chunks: cython.ulonglong = 0
 
-    async with (
-        db() as conn,
-        await conn.cursor(row_factory=dict_row).execute(
-            """
-            SELECT * FROM element
-            WHERE sequence_id BETWEEN %s AND %s
-            ORDER BY sequence_id
-            """,
-            seq_range,
-        ) as r,
-    ):
-        while True:
-            rows = await r.fetchmany(_CHUNK_SIZE)
-            if not rows:
-                break
-
-            num_rows: cython.Py_ssize_t = len(rows)
+    async with aclosing(
+        ElementQuery.iter_batches_by_sequence_range(*seq_range, batch_size=_CHUNK_SIZE)
+    ) as batches:
+        async for batch in batches:
+            num_rows: cython.Py_ssize_t = len(batch)
             num_elements += num_rows
             num_chunks += 1
             logging.debug('Fetched chunk %d: %d elements', num_chunks, num_rows)
-            yield rows  # type: ignore
+            yield batch
 
     logging.info('Fetched %d elements in %d chunk(s)', num_elements, num_chunks)
 
 
-async def _generate_diff(
-    timespan: _TimeSpan, state: _State, next_timestamp: datetime
+def _encode_chunk(batch: ElementBatch, pbf: bool) -> tuple[bytes, bytes | None]:
+    """
+    Encode the chunk as a gzip member containing the osmChange body fragment.
+    If pbf is True, also encode the chunk as PBF file blocks.
+    """
+    content = Format06.encode_osmchange_batch(batch)
+    return (
+        gzip.compress(content, COMPRESS_REPLICATION_GZIP_LEVEL, mtime=0),
+        PBF.encode_batch(batch) if pbf else None,
+    )
+
+
+class _DiffFile:
+    """
+    osmChange diff being written, with the state it advances to.
+    Optionally, the same changes are written to a PBF diff alongside.
+    """
+
+    __slots__ = (
+        '_file',
+        '_pbf_file',
+        'diff_path',
+        'diff_tmp_path',
+        'pbf_path',
+        'pbf_tmp_path',
+        'state',
+    )
+
+    def __init__(self, timespan: _TimeSpan, state: _State, *, pbf: bool) -> None:
+        self.state = state
+        self.diff_path = _get_sequence_path(
+            timespan, state['sequence_number'], '.osc.gz'
+        )
+        self.diff_path.parent.mkdir(parents=True, exist_ok=True)
+        self.diff_tmp_path = _make_tmp_path(self.diff_path)
+        self._file = self.diff_tmp_path.open('wb')
+        self._file.write(gzip.compress(_DIFF_HEADER, mtime=0))
+
+        if pbf:
+            self.pbf_path = _get_sequence_path(
+                timespan, state['sequence_number'], '.osc.pbf'
+            )
+            self.pbf_tmp_path = _make_tmp_path(self.pbf_path)
+            self._pbf_file = self.pbf_tmp_path.open('wb')
+            self._pbf_file.write(
+                PBF.encode_header(
+                    replication_timestamp=state['timestamp'],
+                    replication_sequence_number=state['sequence_number'],
+                )
+            )
+        else:
+            self.pbf_path = self.pbf_tmp_path = self._pbf_file = None
+
+    def write(self, data: tuple[bytes, bytes | None]) -> None:
+        content, pbf_content = data
+        self._file.write(content)
+        if self._pbf_file is not None and pbf_content is not None:
+            self._pbf_file.write(pbf_content)
+
+    def commit(self, timespan: _TimeSpan) -> None:
+        """Finish the diff and persist it with its state files."""
+        self._file.write(gzip.compress(_DIFF_FOOTER, mtime=0))
+        self._file.close()
+        if self._pbf_file is not None:
+            self._pbf_file.close()
+
+        sequence_number = self.state['sequence_number']
+        state_path = _get_sequence_path(timespan, sequence_number, '.state.txt')
+        base_state_path = _replication_dir(timespan).joinpath('state.txt')
+        state_tmp_path = _make_tmp_path(state_path)
+        base_state_tmp_path = _make_tmp_path(base_state_path)
+
+        # Persist state files
+        _write_state(state_tmp_path, self.state)
+        copyfile(state_tmp_path, base_state_tmp_path)
+
+        # Move temporary files to their final destination
+        self.diff_tmp_path.replace(self.diff_path)
+        if self.pbf_tmp_path is not None:
+            self.pbf_tmp_path.replace(self.pbf_path)  # type: ignore
+        state_tmp_path.replace(state_path)
+        base_state_tmp_path.replace(base_state_path)
+
+        logging.info('Diff #%d created successfully', sequence_number)
+
+
+async def _generate_diffs(
+    pool: ProcessPoolExecutor,
+    timespan: _TimeSpan,
+    state: _State,
+    next_timestamp: datetime,
+    pbf: bool,
 ) -> None:
-    """Create osmChange diff between current and next timestamp."""
+    """
+    Create osmChange diffs between current and next timestamp, one per timespan.
+    When catching up on a backlog, the whole range is scanned once
+    and the rows are split into timespan buckets by created_at.
+    """
     assert state['timestamp'] < next_timestamp
     await _wait_db_sync(next_timestamp)
 
-    next_sequence_number = state['sequence_number'] + 1
     logging.info(
-        'Generating diff #%d: %s -> %s',
-        next_sequence_number,
+        'Generating diffs from #%d: %s -> %s',
+        state['sequence_number'] + 1,
         state['timestamp'].isoformat(),
         next_timestamp.isoformat(),
     )
 
-    # Set up paths
-    diff_path = _get_sequence_path(timespan, next_sequence_number, '.osc.gz')
-    state_path = _get_sequence_path(timespan, next_sequence_number, '.state.txt')
-    base_state_path = _replication_dir(timespan).joinpath('state.txt')
-
-    diff_path.parent.mkdir(parents=True, exist_ok=True)
-    logging.debug('Output directory structure created')
-
-    diff_tmp_path = _make_tmp_path(diff_path)
-    state_tmp_path = _make_tmp_path(state_path)
-    base_state_tmp_path = _make_tmp_path(base_state_path)
-    has_data: cython.bint = False
-
-    with diff_tmp_path.open('wb') as f_out:
-        pigz_proc = await create_subprocess_exec(
-            'pigz',
-            f'-{COMPRESS_REPLICATION_GZIP_LEVEL}',
-            '--processes',
-            str(_NUM_WORKERS_PIGZ),
-            stdin=PIPE,
-            stdout=f_out,
-        )
-        pigz_stdin: asyncio.StreamWriter = pigz_proc.stdin  # type: ignore
-        logging.debug('Started pigz compression process')
-
-        async for chunk in _fetch_changes(state['timestamp'], next_timestamp):
-            content: bytes = XMLToDict.unparse(
-                {'osmChange': Format06.encode_osmchange(chunk)}, binary=True
-            )
-
-            # Extract osmChange content (avoid duplication)
-            slice_start: cython.Py_ssize_t = (
-                0
-                if not has_data
-                else content.index(b'>', content.index(b'<osmChange')) + 1
+    delta_us: cython.longlong = _TIMESPAN_DELTA[timespan] // _MICROSECOND
+    last_bucket: cython.longlong = _timestamp_us(state['timestamp']) // delta_us
+    sequence_number: cython.ulonglong = state['sequence_number']
+    diff: _DiffFile | None = None
+
+    # Fetch, encode, and write the chunks as overlapping stages.
+    # Concatenated gzip members form a valid gzip file.
+    # Entries without a future mark the end of the diff.
+    loop = asyncio.get_running_loop()
+    pending: deque[tuple[_DiffFile, Future[tuple[bytes, bytes | None]] | None]]
+    pending = deque()
+
+    async def write_pending(limit: int) -> None:
+        while len(pending) > limit:
+            pending_diff, future = pending.popleft()
+            if future is None:
+                pending_diff.commit(timespan)
+                state.update(pending_diff.state)
+            else:
+                pending_diff.write(await future)
+
+    async with aclosing(_fetch_changes(state['timestamp'], next_timestamp)) as batches:
+        async for batch in batches:
+            # Assign rows to timespan buckets, never going back in sequence_id order
+            buckets = np.maximum.accumulate(
+                np.maximum(
+                    batch.created_at.view(np.int64) // delta_us,
+                    last_bucket,
+                )
             )
-            slice_end: cython.Py_ssize_t = content.rindex(b'</osmChange>')
-            content = content[slice_start:slice_end]
-
-            pigz_stdin.write(content)
-            del content
-            await pigz_stdin.drain()
-            has_data = True
-
-        if has_data:
-            pigz_stdin.write(b'</osmChange>')
-            await pigz_stdin.drain()
-
-        pigz_stdin.close()
-        exit_code = await pigz_proc.wait()
-        if exit_code:
-            raise RuntimeError(f'Subprocess failed with exit code {exit_code}')
-
-    if not has_data:
+            splits: list[int] = (np.flatnonzero(np.diff(buckets)) + 1).tolist()
+            starts = [0, *splits]
+            ends = [*splits, len(batch)]
+            batch_buckets: list[int] = buckets[starts].tolist()
+
+            for start, end, bucket in zip(starts, ends, batch_buckets, strict=True):
+                if diff is not None and bucket != last_bucket:
+                    pending.append((diff, None))
+                    diff = None
+
+                if diff is None:
+                    sequence_number += 1
+                    bucket_end = min(
+                        _EPOCH + (bucket + 1) * _TIMESPAN_DELTA[timespan],
+                        next_timestamp,
+                    )
+                    diff = _DiffFile(
+                        timespan,
+                        {'sequence_number': sequence_number, 'timestamp': bucket_end},
+                        pbf=pbf,
+                    )
+
+                last_bucket = bucket
+                pending.append((
+                    diff,
+                    loop.run_in_executor(pool, _encode_chunk, batch[start:end], pbf),
+                ))
+                await write_pending(_MAX_PENDING_CHUNKS)
+
+            del batch
+
+    if diff is not None:
+        pending.append((diff, None))
+    await write_pending(0)
+
+    if sequence_number == state['sequence_number']:
         logging.info('No changes found, skipping diff')
-        diff_tmp_path.unlink()
-        state['timestamp'] = next_timestamp
-        return
-
-    # Update state
     state['timestamp'] = next_timestamp
-    state['sequence_number'] = next_sequence_number
 
-    # Persist state files
-    _write_state(state_tmp_path, state)
-    copyfile(state_tmp_path, base_state_tmp_path)
 
-    # Move temporary files to their final destination
-    diff_tmp_path.replace(diff_path)
-    state_tmp_path.replace(state_path)
-    base_state_tmp_path.replace(base_state_path)
+@cython.cfunc
+def _timestamp_us(timestamp: datetime) -> int:
+    """Get the number of microseconds since the epoch."""
+    return (timestamp - _EPOCH) // _MICROSECOND
 
-    logging.info('Diff #%d created successfully', next_sequence_number)
 
-
-async def _run(timespan: _TimeSpan, no_backfill: bool) -> None:
+async def _run(
+    pool: ProcessPoolExecutor, timespan: _TimeSpan, no_backfill: bool, pbf: bool
+) -> None:
     """Run replication service main loop."""
     delta = _TIMESPAN_DELTA[timespan]
     state = await _read_last_state(timespan, no_backfill)
@@ -408,7 +464,7 @@ async def _run(timespan: _TimeSpan, no_backfill: bool) -> None:
             await asyncio.sleep(delay.total_seconds())
             continue
 
-        await _generate_diff(timespan, state, next_timestamp)
+        await _generate_diffs(pool, timespan, state, next_timestamp, pbf)
 
 
 def main() -> None:
@@ -423,8 +479,14 @@ def main() -> None:
         action='store_true',
         help='Skip backfilling diffs with historical data',
     )
+    parser.add_argument(
+        '--pbf',
+        action='store_true',
+        help='Also write the diffs in the PBF format (.osc.pbf)',
+    )
     args = parser.parse_args()
-    asyncio.run(_run(args.timespan, args.no_backfill))
+    with ProcessPoolExecutor(_NUM_WORKERS) as pool:
+        asyncio.run(_run(pool, args.timespan, args.no_backfill, args.pbf))
 
 
 if __name__ == '__main__':
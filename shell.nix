@@ -373,7 +373,7 @@ let
         --python_out app/models/proto \
         --pyi_out app/models/proto \
         app/models/proto/*.proto
-      rm app/views/lib/proto/server*
+      rm app/views/lib/proto/server* app/views/lib/proto/osmpbf*
     '')
     (makeScript "watch-proto" "exec watchexec -o queue -w app/models/proto --exts proto proto-pipeline")
 
@@ -0,0 +1,605 @@
+#include <Python.h>
+#include <endian.h>
+#include <math.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+#define UNLIKELY(x) __builtin_expect((x), 0)
+#define LIKELY(x) __builtin_expect((x), 1)
+#define PyScoped PyObject *__attribute__((cleanup(Py_XDECREFP)))
+
+// Number of columns in ELEMENT_BATCH_COPY_COLUMNS
+constexpr int16_t NUM_FIELDS = 12;
+
+// Microseconds between 1970-01-01 and 2000-01-01 (PostgreSQL epoch)
+constexpr int64_t POSTGRES_EPOCH_OFFSET = 946684800000000LL;
+
+// Array element type OIDs
+constexpr uint32_t INT8OID = 20;
+constexpr uint32_t TEXTOID = 25;
+
+static PyObject *typed_id_key;
+static PyObject *sequence_id_key;
+static PyObject *changeset_id_key;
+static PyObject *version_key;
+static PyObject *visible_key;
+static PyObject *latest_key;
+static PyObject *created_at_key;
+static PyObject *lon_key;
+static PyObject *lat_key;
+static PyObject *tags_offsets_key;
+static PyObject *tags_keys_key;
+static PyObject *tags_keys_offsets_key;
+static PyObject *tags_values_key;
+static PyObject *tags_values_offsets_key;
+static PyObject *members_offsets_key;
+static PyObject *members_key;
+static PyObject *members_roles_key;
+static PyObject *members_roles_offsets_key;
+
+static inline void
+Py_XDECREFP(PyObject **ptr) {
+  Py_XDECREF(*ptr);
+}
+
+#pragma region Buffer
+
+typedef struct {
+  char *data;
+  size_t size;
+  size_t capacity;
+} Buffer;
+
+static inline void
+buffer_free(Buffer *buffer) {
+  PyMem_Free(buffer->data);
+}
+
+static bool
+buffer_reserve(Buffer *buffer, size_t size) {
+  if (LIKELY(buffer->size + size <= buffer->capacity))
+    return true;
+
+  size_t capacity = buffer->capacity ? buffer->capacity * 2 : 4096;
+  while (capacity < buffer->size + size)
+    capacity *= 2;
+
+  char *data = PyMem_Realloc(buffer->data, capacity);
+  if (UNLIKELY(!data)) {
+    PyErr_NoMemory();
+    return false;
+  }
+  buffer->data = data;
+  buffer->capacity = capacity;
+  return true;
+}
+
+static inline bool
+buffer_append(Buffer *buffer, const void *value, size_t size) {
+  if (UNLIKELY(!buffer_reserve(buffer, size)))
+    return false;
+  memcpy(buffer->data + buffer->size, value, size);
+  buffer->size += size;
+  return true;
+}
+
+static inline bool
+buffer_append_i64(Buffer *buffer, int64_t value) {
+  return buffer_append(buffer, &value, sizeof(value));
+}
+
+static inline bool
+buffer_append_f64(Buffer *buffer, double value) {
+  return buffer_append(buffer, &value, sizeof(value));
+}
+
+static inline bool
+buffer_append_bool(Buffer *buffer, bool value) {
+  return buffer_append(buffer, &value, sizeof(value));
+}
+
+static inline PyObject *
+buffer_to_bytes(const Buffer *buffer) {
+  return PyBytes_FromStringAndSize(buffer->data, (Py_ssize_t)buffer->size);
+}
+
+// UTF-8 strings, concatenated and indexed by offsets
+typedef struct {
+  Buffer data;
+  Buffer offsets;
+} Strings;
+
+static inline void
+strings_free(Strings *strings) {
+  buffer_free(&strings->data);
+  buffer_free(&strings->offsets);
+}
+
+static inline bool
+strings_append(Strings *strings, const void *value, size_t size) {
+  return buffer_append(&strings->data, value, size) &&
+         buffer_append_i64(&strings->offsets, (int64_t)strings->data.size);
+}
+
+#pragma endregion
+#pragma region Reading
+
+static inline int16_t
+read_i16(const uint8_t *p) {
+  uint16_t value;
+  memcpy(&value, p, sizeof(value));
+  return (int16_t)be16toh(value);
+}
+
+static inline int32_t
+read_i32(const uint8_t *p) {
+  uint32_t value;
+  memcpy(&value, p, sizeof(value));
+  return (int32_t)be32toh(value);
+}
+
+static inline int64_t
+read_i64(const uint8_t *p) {
+  uint64_t value;
+  memcpy(&value, p, sizeof(value));
+  return (int64_t)be64toh(value);
+}
+
+static inline double
+read_f64(const uint8_t *p) {
+  uint64_t bits = (uint64_t)read_i64(p);
+  double value;
+  memcpy(&value, &bits, sizeof(value));
+  return value;
+}
+
+typedef struct {
+  const uint8_t *data;
+  int32_t size; // -1 for NULL
+} Field;
+
+// Get the size of the complete row at the given position, or 0 if the row is incomplete.
+static size_t
+scan_row(const uint8_t *p, const uint8_t *end) {
+  const uint8_t *start = p;
+  p += sizeof(int16_t);
+
+  for (int16_t i = 0; i < NUM_FIELDS; i++) {
+    if (end - p < (ptrdiff_t)sizeof(int32_t))
+      return 0;
+    int32_t size = read_i32(p);
+    p += sizeof(int32_t);
+    if (size > 0) {
+      if (end - p < size)
+        return 0;
+      p += size;
+    }
+  }
+
+  return (size_t)(p - start);
+}
+
+// Read the fields of a complete row, as validated by scan_row.
+static void
+read_row(const uint8_t *p, Field fields[static NUM_FIELDS]) {
+  p += sizeof(int16_t);
+
+  for (int16_t i = 0; i < NUM_FIELDS; i++) {
+    int32_t size = read_i32(p);
+    p += sizeof(int32_t);
+    fields[i] = (Field){p, size};
+    if (size > 0)
+      p += size;
+  }
+}
+
+static bool
+read_int8_field(Field field, int64_t *out) {
+  if (UNLIKELY(field.size != sizeof(int64_t))) {
+    PyErr_SetString(PyExc_ValueError, "Invalid int8 value in COPY data");
+    return false;
+  }
+  *out = read_i64(field.data);
+  return true;
+}
+
+static bool
+read_bool_field(Field field, bool *out) {
+  if (UNLIKELY(field.size != 1)) {
+    PyErr_SetString(PyExc_ValueError, "Invalid bool value in COPY data");
+    return false;
+  }
+  *out = field.data[0] != 0;
+  return true;
+}
+
+static bool
+read_float8_field(Field field, double *out) {
+  if (field.size == -1) {
+    *out = NAN;
+    return true;
+  }
+  if (UNLIKELY(field.size != sizeof(double))) {
+    PyErr_SetString(PyExc_ValueError, "Invalid float8 value in COPY data");
+    return false;
+  }
+  *out = read_f64(field.data);
+  return true;
+}
+
+typedef struct {
+  const uint8_t *p;
+  const uint8_t *end;
+  int32_t size;
+} ArrayReader;
+
+// Read a one-dimensional array header. NULL arrays are treated as empty.
+static bool
+array_reader_init(ArrayReader *reader, Field field, uint32_t oid) {
+  *reader = (ArrayReader){field.data, field.data + (field.size > 0 ? field.size : 0), 0};
+  if (field.size == -1)
+    return true;
+
+  // ndim, has_null, element oid
+  if (UNLIKELY(field.size < 12))
+    goto invalid;
+  int32_t ndim = read_i32(reader->p);
+  uint32_t element_oid = (uint32_t)read_i32(reader->p + 8);
+  reader->p += 12;
+  if (ndim == 0)
+    return true;
+  if (UNLIKELY(ndim != 1 || element_oid != oid || reader->end - reader->p < 8))
+    goto invalid;
+
+  // dimension size, lower bound
+  reader->size = read_i32(reader->p);
+  reader->p += 8;
+  if (UNLIKELY(reader->size < 0))
+    goto invalid;
+  return true;
+
+invalid:
+  PyErr_SetString(PyExc_ValueError, "Invalid array value in COPY data");
+  return false;
+}
+
+static bool
+array_reader_next(ArrayReader *reader, Field *out) {
+  if (UNLIKELY(reader->end - reader->p < (ptrdiff_t)sizeof(int32_t)))
+    goto invalid;
+  int32_t size = read_i32(reader->p);
+  reader->p += sizeof(int32_t);
+  if (UNLIKELY(size < 0)) {
+    PyErr_SetString(PyExc_ValueError, "Unexpected NULL array element in COPY data");
+    return false;
+  }
+  if (UNLIKELY(reader->end - reader->p < size))
+    goto invalid;
+  *out = (Field){reader->p, size};
+  reader->p += size;
+  return true;
+
+invalid:
+  PyErr_SetString(PyExc_ValueError, "Invalid array value in COPY data");
+  return false;
+}
+
+#pragma endregion
+#pragma region Columns
+
+typedef struct {
+  Buffer typed_id;
+  Buffer sequence_id;
+  Buffer changeset_id;
+  Buffer version;
+  Buffer visible;
+  Buffer latest;
+  Buffer created_at;
+  Buffer lon;
+  Buffer lat;
+  Buffer tags_offsets;
+  Buffer members_offsets;
+  Buffer members;
+  Strings tags_keys;
+  Strings tags_values;
+  Strings members_roles;
+  int64_t num_tags;
+  int64_t num_members;
+} Columns;
+
+static void
+columns_free(Columns *columns) {
+  buffer_free(&columns->typed_id);
+  buffer_free(&columns->sequence_id);
+  buffer_free(&columns->changeset_id);
+  buffer_free(&columns->version);
+  buffer_free(&columns->visible);
+  buffer_free(&columns->latest);
+  buffer_free(&columns->created_at);
+  buffer_free(&columns->lon);
+  buffer_free(&columns->lat);
+  buffer_free(&columns->tags_offsets);
+  buffer_free(&columns->members_offsets);
+  buffer_free(&columns->members);
+  strings_free(&columns->tags_keys);
+  strings_free(&columns->tags_values);
+  strings_free(&columns->members_roles);
+}
+
+// Text is copied as is, in the UTF-8 database encoding
+static inline bool
+append_text(Strings *strings, Field field) {
+  return strings_append(strings, field.data, (size_t)field.size);
+}
+
+static bool
+append_tags(Columns *columns, Field field) {
+  ArrayReader reader;
+  if (UNLIKELY(!array_reader_init(&reader, field, TEXTOID)))
+    return false;
+  if (UNLIKELY(reader.size % 2)) {
+    PyErr_SetString(PyExc_ValueError, "Invalid tags array in COPY data");
+    return false;
+  }
+
+  // hstore_to_array returns a flat array of alternating keys and values
+  for (int32_t i = 0; i < reader.size; i += 2) {
+    Field key, value;
+    if (UNLIKELY(
+          !array_reader_next(&reader, &key) || !append_text(&columns->tags_keys, key) ||
+          !array_reader_next(&reader, &value) ||
+          !append_text(&columns->tags_values, value)
+        ))
+      return false;
+  }
+
+  columns->num_tags += reader.size / 2;
+  return buffer_append_i64(&columns->tags_offsets, columns->num_tags);
+}
+
+static bool
+append_members(Columns *columns, Field members_field, Field roles_field) {
+  ArrayReader members;
+  ArrayReader roles;
+  if (UNLIKELY(
+        !array_reader_init(&members, members_field, INT8OID) ||
+        !array_reader_init(&roles, roles_field, TEXTOID) ||
+        !buffer_reserve(&columns->members, (size_t)members.size * sizeof(int64_t))
+      ))
+    return false;
+
+  bool has_roles = roles_field.size != -1;
+  if (UNLIKELY(has_roles && roles.size != members.size)) {
+    PyErr_SetString(PyExc_ValueError, "Members and roles length mismatch in COPY data");
+    return false;
+  }
+
+  for (int32_t i = 0; i < members.size; i++) {
+    Field member;
+    if (UNLIKELY(!array_reader_next(&members, &member)))
+      return false;
+    int64_t value;
+    if (UNLIKELY(!read_int8_field(member, &value)))
+      return false;
+    buffer_append_i64(&columns->members, value);
+
+    if (has_roles) {
+      Field role;
+      if (UNLIKELY(
+            !array_reader_next(&roles, &role) ||
+            !append_text(&columns->members_roles, role)
+          ))
+        return false;
+    }
+    else if (UNLIKELY(!strings_append(&columns->members_roles, "", 0)))
+      return false;
+  }
+
+  columns->num_members += members.size;
+  return buffer_append_i64(&columns->members_offsets, columns->num_members);
+}
+
+static bool
+append_row(Columns *columns, const Field fields[static NUM_FIELDS]) {
+  int64_t typed_id, sequence_id, changeset_id, version, created_at;
+  bool visible, latest;
+  double lon, lat;
+
+  if (UNLIKELY(
+        !read_int8_field(fields[0], &typed_id) ||
+        !read_int8_field(fields[1], &sequence_id) ||
+        !read_int8_field(fields[2], &changeset_id) ||
+        !read_int8_field(fields[3], &version) ||
+        !read_bool_field(fields[4], &visible) || //
+        !read_bool_field(fields[5], &latest) ||
+        !read_int8_field(fields[6], &created_at) ||
+        !read_float8_field(fields[7], &lon) || //
+        !read_float8_field(fields[8], &lat)
+      ))
+    return false;
+
+  return buffer_append_i64(&columns->typed_id, typed_id) &&
+         buffer_append_i64(&columns->sequence_id, sequence_id) &&
+         buffer_append_i64(&columns->changeset_id, changeset_id) &&
+         buffer_append_i64(&columns->version, version) &&
+         buffer_append_bool(&columns->visible, visible) &&
+         buffer_append_bool(&columns->latest, latest) &&
+         buffer_append_i64(&columns->created_at, created_at + POSTGRES_EPOCH_OFFSET) &&
+         buffer_append_f64(&columns->lon, lon) && //
+         buffer_append_f64(&columns->lat, lat) &&
+         append_tags(columns, fields[9]) &&
+         append_members(columns, fields[10], fields[11]);
+}
+
+static PyObject *
+columns_to_dict(const Columns *columns) {
+  PyScoped typed_id = buffer_to_bytes(&columns->typed_id);
+  PyScoped sequence_id = buffer_to_bytes(&columns->sequence_id);
+  PyScoped changeset_id = buffer_to_bytes(&columns->changeset_id);
+  PyScoped version = buffer_to_bytes(&columns->version);
+  PyScoped visible = buffer_to_bytes(&columns->visible);
+  PyScoped latest = buffer_to_bytes(&columns->latest);
+  PyScoped created_at = buffer_to_bytes(&columns->created_at);
+  PyScoped lon = buffer_to_bytes(&columns->lon);
+  PyScoped lat = buffer_to_bytes(&columns->lat);
+  PyScoped tags_offsets = buffer_to_bytes(&columns->tags_offsets);
+  PyScoped members_offsets = buffer_to_bytes(&columns->members_offsets);
+  PyScoped members = buffer_to_bytes(&columns->members);
+  PyScoped tags_keys = buffer_to_bytes(&columns->tags_keys.data);
+  PyScoped tags_keys_offsets = buffer_to_bytes(&columns->tags_keys.offsets);
+  PyScoped tags_values = buffer_to_bytes(&columns->tags_values.data);
+  PyScoped tags_values_offsets = buffer_to_bytes(&columns->tags_values.offsets);
+  PyScoped members_roles = buffer_to_bytes(&columns->members_roles.data);
+  PyScoped members_roles_offsets = buffer_to_bytes(&columns->members_roles.offsets);
+  PyScoped result = PyDict_New();
+  if (UNLIKELY(
+        !typed_id || !sequence_id || !changeset_id || !version || !visible ||
+        !latest || !created_at || !lon || !lat || !tags_offsets ||
+        !members_offsets || !members || !tags_keys || !tags_keys_offsets ||
+        !tags_values || !tags_values_offsets || !members_roles ||
+        !members_roles_offsets || !result
+      ))
+    return nullptr;
+
+  if (UNLIKELY(
+        PyDict_SetItem(result, typed_id_key, typed_id) < 0 ||
+        PyDict_SetItem(result, sequence_id_key, sequence_id) < 0 ||
+        PyDict_SetItem(result, changeset_id_key, changeset_id) < 0 ||
+        PyDict_SetItem(result, version_key, version) < 0 ||
+        PyDict_SetItem(result, visible_key, visible) < 0 ||
+        PyDict_SetItem(result, latest_key, latest) < 0 ||
+        PyDict_SetItem(result, created_at_key, created_at) < 0 ||
+        PyDict_SetItem(result, lon_key, lon) < 0 ||
+        PyDict_SetItem(result, lat_key, lat) < 0 ||
+        PyDict_SetItem(result, tags_offsets_key, tags_offsets) < 0 ||
+        PyDict_SetItem(result, tags_keys_key, tags_keys) < 0 ||
+        PyDict_SetItem(result, tags_keys_offsets_key, tags_keys_offsets) < 0 ||
+        PyDict_SetItem(result, tags_values_key, tags_values) < 0 ||
+        PyDict_SetItem(result, tags_values_offsets_key, tags_values_offsets) < 0 ||
+        PyDict_SetItem(result, members_offsets_key, members_offsets) < 0 ||
+        PyDict_SetItem(result, members_key, members) < 0 ||
+        PyDict_SetItem(result, members_roles_key, members_roles) < 0 ||
+        PyDict_SetItem(result, members_roles_offsets_key, members_roles_offsets) < 0
+      ))
+    return nullptr;
+
+  Py_INCREF(result);
+  return result;
+}
+
+#pragma endregion
+
+static PyObject *
+element_copy_parse(PyObject *, PyObject *const *args, Py_ssize_t nargs) {
+  if (UNLIKELY(nargs != 2 || !PyLong_CheckExact(args[1]))) {
+    PyErr_BadArgument();
+    return nullptr;
+  }
+
+  Py_ssize_t max_rows = PyLong_AsSsize_t(args[1]);
+  if (UNLIKELY(max_rows == -1 && PyErr_Occurred()))
+    return nullptr;
+
+  Py_buffer view;
+  if (UNLIKELY(PyObject_GetBuffer(args[0], &view, PyBUF_SIMPLE) < 0))
+    return nullptr;
+
+  Columns __attribute__((cleanup(columns_free))) columns = {};
+  const uint8_t *start = view.buf;
+  const uint8_t *end = start + view.len;
+  const uint8_t *p = start;
+  bool done = false;
+  bool ok = buffer_append_i64(&columns.tags_offsets, 0) &&
+            buffer_append_i64(&columns.members_offsets, 0) &&
+            buffer_append_i64(&columns.tags_keys.offsets, 0) &&
+            buffer_append_i64(&columns.tags_values.offsets, 0) &&
+            buffer_append_i64(&columns.members_roles.offsets, 0);
+
+  for (Py_ssize_t num_rows = 0; ok && num_rows < max_rows; num_rows++) {
+    if (end - p < (ptrdiff_t)sizeof(int16_t))
+      break;
+
+    int16_t num_fields = read_i16(p);
+    if (num_fields == -1) {
+      p += sizeof(int16_t);
+      done = true;
+      break;
+    }
+    if (UNLIKELY(num_fields != NUM_FIELDS)) {
+      PyErr_Format(
+        PyExc_ValueError,
+        "Expected %d fields in COPY row, got %d",
+        (int)NUM_FIELDS,
+        (int)num_fields
+      );
+      ok = false;
+      break;
+    }
+
+    size_t row_size = scan_row(p, end);
+    if (!row_size)
+      break;
+
+    Field fields[NUM_FIELDS];
+    read_row(p, fields);
+    ok = append_row(&columns, fields);
+    p += row_size;
+  }
+
+  PyBuffer_Release(&view);
+  if (UNLIKELY(!ok))
+    return nullptr;
+
+  PyScoped result = columns_to_dict(&columns);
+  if (UNLIKELY(!result))
+    return nullptr;
+
+  return Py_BuildValue("(nOO)", (Py_ssize_t)(p - start), done ? Py_True : Py_False, result);
+}
+
+static PyMethodDef methods[] = {
+  {
+    "element_copy_parse",
+    _PyCFunction_CAST(element_copy_parse),
+    METH_FASTCALL,
+    nullptr,
+  },
+  {nullptr, nullptr, 0, nullptr}
+};
+
+static struct PyModuleDef module = {
+  PyModuleDef_HEAD_INIT,
+  "speedup.element_copy",
+  nullptr,
+  -1,
+  methods,
+  nullptr,
+  nullptr,
+  nullptr,
+  nullptr
+};
+
+PyMODINIT_FUNC
+PyInit_element_copy(void) {
+  typed_id_key = PyUnicode_InternFromString("typed_id");
+  sequence_id_key = PyUnicode_InternFromString("sequence_id");
+  changeset_id_key = PyUnicode_InternFromString("changeset_id");
+  version_key = PyUnicode_InternFromString("version");
+  visible_key = PyUnicode_InternFromString("visible");
+  latest_key = PyUnicode_InternFromString("latest");
+  created_at_key = PyUnicode_InternFromString("created_at");
+  lon_key = PyUnicode_InternFromString("lon");
+  lat_key = PyUnicode_InternFromString("lat");
+  tags_offsets_key = PyUnicode_InternFromString("tags_offsets");
+  tags_keys_key = PyUnicode_InternFromString("tags_keys");
+  tags_keys_offsets_key = PyUnicode_InternFromString("tags_keys_offsets");
+  tags_values_key = PyUnicode_InternFromString("tags_values");
+  tags_values_offsets_key = PyUnicode_InternFromString("tags_values_offsets");
+  members_offsets_key = PyUnicode_InternFromString("members_offsets");
+  members_key = PyUnicode_InternFromString("members");
+  members_roles_key = PyUnicode_InternFromString("members_roles");
+  members_roles_offsets_key = PyUnicode_InternFromString("members_roles_offsets");
+
+  return PyModule_Create(&module);
+}
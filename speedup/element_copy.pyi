@@ -0,0 +1,14 @@
+from typing import Any
+
+from _typeshed import ReadableBuffer
+
+def element_copy_parse(
+    data: ReadableBuffer, max_rows: int, /
+) -> tuple[int, bool, dict[str, Any]]:
+    """
+    Parse element rows in binary COPY format, as selected with ELEMENT_BATCH_COPY_COLUMNS.
+    The data must not include the COPY header. Parsing stops at the first incomplete row,
+    after max_rows rows, or at the COPY trailer.
+    Returns the number of consumed bytes, whether the trailer was reached,
+    and the columns for ElementBatch.from_copy.
+    """
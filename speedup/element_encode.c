@@ -0,0 +1,906 @@
+#include <Python.h>
+#include <math.h>
+#include <stdint.h>
+#include <string.h>
+
+#define UNLIKELY(x) __builtin_expect((x), 0)
+#define LIKELY(x) __builtin_expect((x), 1)
+#define PyScoped PyObject *__attribute__((cleanup(Py_XDECREFP)))
+
+constexpr uint64_t RELATION_TYPE_NUM = 2;
+constexpr uint64_t SIGN_MASK = 1ULL << 59;
+constexpr uint64_t ID_MASK = (1ULL << 56) - 1;
+
+static const char *const TYPE_NAMES[] = {"node", "way", "relation"};
+static const size_t TYPE_NAMES_SIZE[] = {4, 3, 8};
+static const char *const ACTION_NAMES[] = {"create", "modify", "delete"};
+static const size_t ACTION_NAMES_SIZE[] = {6, 6, 6};
+
+static PyObject *typed_id_key;
+static PyObject *changeset_id_key;
+static PyObject *version_key;
+static PyObject *visible_key;
+static PyObject *created_at_key;
+static PyObject *lon_key;
+static PyObject *lat_key;
+static PyObject *tags_offsets_key;
+static PyObject *tags_keys_key;
+static PyObject *tags_keys_offsets_key;
+static PyObject *tags_values_key;
+static PyObject *tags_values_offsets_key;
+static PyObject *members_offsets_key;
+static PyObject *members_key;
+static PyObject *members_roles_key;
+static PyObject *members_roles_offsets_key;
+static PyObject *user_id_key;
+static PyObject *users_key;
+static PyObject *display_name_key;
+
+static inline void
+Py_XDECREFP(PyObject **ptr) {
+  Py_XDECREF(*ptr);
+}
+
+#pragma region Buffer
+
+typedef struct {
+  char *data;
+  size_t size;
+  size_t capacity;
+} Buffer;
+
+static inline void
+buffer_free(Buffer *buffer) {
+  PyMem_Free(buffer->data);
+}
+
+static bool
+buffer_reserve(Buffer *buffer, size_t size) {
+  if (LIKELY(buffer->size + size <= buffer->capacity))
+    return true;
+
+  size_t capacity = buffer->capacity ? buffer->capacity * 2 : 4096;
+  while (capacity < buffer->size + size)
+    capacity *= 2;
+
+  char *data = PyMem_Realloc(buffer->data, capacity);
+  if (UNLIKELY(!data)) {
+    PyErr_NoMemory();
+    return false;
+  }
+  buffer->data = data;
+  buffer->capacity = capacity;
+  return true;
+}
+
+static inline bool
+buffer_append(Buffer *buffer, const void *value, size_t size) {
+  if (UNLIKELY(!buffer_reserve(buffer, size)))
+    return false;
+  memcpy(buffer->data + buffer->size, value, size);
+  buffer->size += size;
+  return true;
+}
+
+#define buffer_append_literal(buffer, literal)                                        \
+  buffer_append((buffer), (literal), sizeof(literal) - 1)
+
+static inline bool
+buffer_append_char(Buffer *buffer, char value) {
+  return buffer_append(buffer, &value, 1);
+}
+
+static bool
+buffer_append_int(Buffer *buffer, int64_t value) {
+  char str[24];
+  char *end = str + sizeof(str);
+  char *p = end;
+  uint64_t abs_value = value < 0 ? -(uint64_t)value : (uint64_t)value;
+  do {
+    *--p = (char)('0' + abs_value % 10);
+    abs_value /= 10;
+  } while (abs_value);
+  if (value < 0)
+    *--p = '-';
+  return buffer_append(buffer, p, end - p);
+}
+
+static inline PyObject *
+buffer_to_bytes(const Buffer *buffer) {
+  return PyBytes_FromStringAndSize(buffer->data, (Py_ssize_t)buffer->size);
+}
+
+#pragma endregion
+#pragma region Values
+
+// Escape like libxml2 attribute serialization, for byte-identical output
+// with speedup.xml_unparse.
+static bool
+buffer_append_xml_escaped(Buffer *buffer, const char *str, size_t size) {
+  size_t start = 0;
+  for (size_t i = 0; i < size; i++) {
+    const char *escaped;
+    size_t escaped_size;
+    switch (str[i]) {
+    case '&':
+      escaped = "&amp;";
+      escaped_size = 5;
+      break;
+    case '<':
+      escaped = "&lt;";
+      escaped_size = 4;
+      break;
+    case '>':
+      escaped = "&gt;";
+      escaped_size = 4;
+      break;
+    case '"':
+      escaped = "&quot;";
+      escaped_size = 6;
+      break;
+    case '\n':
+      escaped = "&#10;";
+      escaped_size = 5;
+      break;
+    case '\r':
+      escaped = "&#13;";
+      escaped_size = 5;
+      break;
+    case '\t':
+      escaped = "&#9;";
+      escaped_size = 4;
+      break;
+    default:
+      continue;
+    }
+    if (UNLIKELY(
+          !buffer_append(buffer, str + start, i - start) ||
+          !buffer_append(buffer, escaped, escaped_size)
+        ))
+      return false;
+    start = i + 1;
+  }
+  return buffer_append(buffer, str + start, size - start);
+}
+
+// Escape like orjson, for byte-identical output with orjson.dumps.
+static bool
+buffer_append_json_string(Buffer *buffer, const char *str, size_t size) {
+  static const char HEX[] = "0123456789abcdef";
+
+  if (UNLIKELY(!buffer_append_char(buffer, '"')))
+    return false;
+
+  size_t start = 0;
+  for (size_t i = 0; i < size; i++) {
+    auto c = (unsigned char)str[i];
+    if (LIKELY(c >= 0x20 && c != '"' && c != '\\'))
+      continue;
+
+    char escaped[6] = {'\\'};
+    size_t escaped_size = 2;
+    switch (c) {
+    case '"':
+    case '\\':
+      escaped[1] = (char)c;
+      break;
+    case '\b':
+      escaped[1] = 'b';
+      break;
+    case '\t':
+      escaped[1] = 't';
+      break;
+    case '\n':
+      escaped[1] = 'n';
+      break;
+    case '\f':
+      escaped[1] = 'f';
+      break;
+    case '\r':
+      escaped[1] = 'r';
+      break;
+    default:
+      memcpy(escaped + 1, "u00", 3);
+      escaped[4] = HEX[c >> 4];
+      escaped[5] = HEX[c & 0xF];
+      escaped_size = 6;
+    }
+    if (UNLIKELY(
+          !buffer_append(buffer, str + start, i - start) ||
+          !buffer_append(buffer, escaped, escaped_size)
+        ))
+      return false;
+    start = i + 1;
+  }
+  return buffer_append(buffer, str + start, size - start) &&
+         buffer_append_char(buffer, '"');
+}
+
+static bool
+buffer_append_coordinate(Buffer *buffer, double value, bool is_json) {
+  char *str = PyOS_double_to_string(value, 'r', 0, Py_DTSF_ADD_DOT_0, nullptr);
+  if (UNLIKELY(!str))
+    return false;
+
+  char *exponent = strchr(str, 'e');
+  bool result;
+  if (!is_json || !exponent)
+    result = buffer_append(buffer, str, strlen(str));
+  else {
+    // Python repr uses the scientific notation below 1e-4, orjson below 1e-5,
+    // and orjson does not zero-pad the exponent
+    char *mantissa = str;
+    bool negative = *mantissa == '-';
+    if (negative)
+      mantissa++;
+    auto exponent_value = strtol(exponent + 1, nullptr, 10);
+
+    if (exponent_value == -5) {
+      result = (!negative || buffer_append_char(buffer, '-')) &&
+               buffer_append_literal(buffer, "0.0000");
+      for (char *p = mantissa; result && p < exponent; p++)
+        if (*p != '.')
+          result = buffer_append_char(buffer, *p);
+    } else
+      result = buffer_append(buffer, str, exponent - str) &&
+               buffer_append(buffer, exponent_value < 0 ? "e-" : "e+", 2) &&
+               buffer_append_int(buffer, labs(exponent_value));
+  }
+
+  PyMem_Free(str);
+  return result;
+}
+
+// Convert days since the Unix epoch to a civil date, see:
+// https://howardhinnant.github.io/date_algorithms.html#civil_from_days
+static void
+civil_from_days(int64_t days, int64_t *year, int *month, int *day) {
+  days += 719468;
+  auto era = (days >= 0 ? days : days - 146096) / 146097;
+  auto doe = (unsigned)(days - era * 146097);
+  auto yoe = (doe - doe / 1460 + doe / 36524 - doe / 146096) / 365;
+  auto doy = doe - (365 * yoe + yoe / 4 - yoe / 100);
+  auto mp = (5 * doy + 2) / 153;
+  *day = (int)(doy - (153 * mp + 2) / 5 + 1);
+  *month = (int)(mp < 10 ? mp + 3 : mp - 9);
+  *year = (int64_t)yoe + era * 400 + (*month <= 2);
+}
+
+// Format the timestamp like speedup.xml_unparse and orjson,
+// with the fractional part only if non-zero.
+static bool
+buffer_append_timestamp(Buffer *buffer, int64_t us) {
+  constexpr int64_t US_PER_DAY = 86400LL * 1000000;
+  auto days = us / US_PER_DAY;
+  auto us_of_day = us % US_PER_DAY;
+  if (us_of_day < 0) {
+    days--;
+    us_of_day += US_PER_DAY;
+  }
+
+  int64_t year;
+  int month, day;
+  civil_from_days(days, &year, &month, &day);
+  auto seconds = (int)(us_of_day / 1000000);
+  auto fraction = (int)(us_of_day % 1000000);
+
+  char str[40];
+  auto size = fraction ? snprintf(
+                           str, sizeof(str), "%04d-%02d-%02dT%02d:%02d:%02d.%06dZ",
+                           (int)year, month, day, seconds / 3600, seconds / 60 % 60,
+                           seconds % 60, fraction
+                         )
+                       : snprintf(
+                           str, sizeof(str), "%04d-%02d-%02dT%02d:%02d:%02dZ",
+                           (int)year, month, day, seconds / 3600, seconds / 60 % 60,
+                           seconds % 60
+                         );
+  return buffer_append(buffer, str, size);
+}
+
+static inline int64_t
+element_id(uint64_t typed_id) {
+  auto id = (int64_t)(typed_id & ID_MASK);
+  return typed_id & SIGN_MASK ? -id : id;
+}
+
+#pragma endregion
+#pragma region Columns
+
+// UTF-8 strings, concatenated and indexed by offsets
+typedef struct {
+  Py_buffer data;
+  Py_buffer offsets;
+} Strings;
+
+static inline const char *
+strings_get(const Strings *strings, Py_ssize_t i, Py_ssize_t *size) {
+  const int64_t *offsets = strings->offsets.buf;
+  *size = (Py_ssize_t)(offsets[i + 1] - offsets[i]);
+  return (const char *)strings->data.buf + offsets[i];
+}
+
+typedef struct {
+  Py_ssize_t size;
+  Py_buffer typed_id;
+  Py_buffer changeset_id;
+  Py_buffer version;
+  Py_buffer visible;
+  Py_buffer created_at;
+  Py_buffer lon;
+  Py_buffer lat;
+  Py_buffer tags_offsets;
+  Py_buffer members_offsets;
+  Py_buffer members;
+  Py_buffer user_id;
+  Strings tags_keys;
+  Strings tags_values;
+  Strings members_roles;
+  PyObject *users;
+} Columns;
+
+typedef struct {
+  uint64_t user_id;
+  const char *display_name;
+  Py_ssize_t display_name_size;
+} UserCache;
+
+static void
+columns_release(Columns *columns) {
+  Py_buffer *views[] = {
+    &columns->typed_id,                &columns->changeset_id,
+    &columns->version,                 &columns->visible,
+    &columns->created_at,              &columns->lon,
+    &columns->lat,                     &columns->tags_offsets,
+    &columns->members_offsets,         &columns->members,
+    &columns->user_id,                 &columns->tags_keys.data,
+    &columns->tags_keys.offsets,       &columns->tags_values.data,
+    &columns->tags_values.offsets,     &columns->members_roles.data,
+    &columns->members_roles.offsets,
+  };
+  for (size_t i = 0; i < sizeof(views) / sizeof(*views); i++)
+    if (views[i]->obj)
+      PyBuffer_Release(views[i]);
+}
+
+static bool
+columns_get_buffer(
+  PyObject *dict, PyObject *key, Py_buffer *view, Py_ssize_t itemsize,
+  Py_ssize_t size, bool optional
+) {
+  PyObject *value = PyDict_GetItemWithError(dict, key);
+  if (!value) {
+    if (PyErr_Occurred())
+      return false;
+    if (optional)
+      return true;
+    PyErr_Format(PyExc_KeyError, "Missing column %R", key);
+    return false;
+  }
+  if (optional && value == Py_None)
+    return true;
+  if (UNLIKELY(PyObject_GetBuffer(value, view, PyBUF_C_CONTIGUOUS) < 0))
+    return false;
+  if (UNLIKELY(size >= 0 && view->len != size * itemsize)) {
+    PyErr_Format(PyExc_ValueError, "Invalid column %R size", key);
+    return false;
+  }
+  return true;
+}
+
+// Load a string column with the given number of strings, or any if negative.
+static bool
+columns_get_strings(
+  PyObject *dict, PyObject *key, PyObject *offsets_key, Strings *strings,
+  Py_ssize_t size
+) {
+  if (UNLIKELY(
+        !columns_get_buffer(dict, key, &strings->data, 1, -1, false) ||
+        !columns_get_buffer(
+          dict, offsets_key, &strings->offsets, 8, size >= 0 ? size + 1 : -1, false
+        )
+      ))
+    return false;
+  if (UNLIKELY(strings->offsets.len < 8)) {
+    PyErr_Format(PyExc_ValueError, "Invalid column %R size", offsets_key);
+    return false;
+  }
+
+  // Offsets must be non-decreasing and within the data
+  const int64_t *offsets = strings->offsets.buf;
+  auto count = strings->offsets.len / 8;
+  int64_t prev = 0;
+  for (Py_ssize_t i = 0; i < count; i++) {
+    if (UNLIKELY(offsets[i] < prev || offsets[i] > strings->data.len)) {
+      PyErr_Format(PyExc_ValueError, "Invalid column %R offsets", offsets_key);
+      return false;
+    }
+    prev = offsets[i];
+  }
+  return true;
+}
+
+static bool
+columns_load(PyObject *dict, Columns *columns) {
+  if (UNLIKELY(!columns_get_buffer(
+        dict, typed_id_key, &columns->typed_id, 8, -1, false
+      )))
+    return false;
+  auto size = columns->size = columns->typed_id.len / 8;
+
+  if (UNLIKELY(
+        !columns_get_buffer(
+          dict, changeset_id_key, &columns->changeset_id, 8, size, false
+        ) ||
+        !columns_get_buffer(dict, version_key, &columns->version, 8, size, false) ||
+        !columns_get_buffer(dict, visible_key, &columns->visible, 1, size, false) ||
+        !columns_get_buffer(
+          dict, created_at_key, &columns->created_at, 8, size, false
+        ) ||
+        !columns_get_buffer(dict, lon_key, &columns->lon, 8, size, false) ||
+        !columns_get_buffer(dict, lat_key, &columns->lat, 8, size, false) ||
+        !columns_get_buffer(
+          dict, tags_offsets_key, &columns->tags_offsets, 8, size + 1, false
+        ) ||
+        !columns_get_buffer(
+          dict, members_offsets_key, &columns->members_offsets, 8, size + 1, false
+        ) ||
+        !columns_get_buffer(dict, members_key, &columns->members, 8, -1, false) ||
+        !columns_get_buffer(dict, user_id_key, &columns->user_id, 8, size, true) ||
+        !columns_get_strings(
+          dict, tags_keys_key, tags_keys_offsets_key, &columns->tags_keys, -1
+        )
+      ))
+    return false;
+
+  auto num_tags = columns->tags_keys.offsets.len / 8 - 1;
+  auto num_members = columns->members.len / 8;
+  if (UNLIKELY(
+        !columns_get_strings(
+          dict, tags_values_key, tags_values_offsets_key, &columns->tags_values,
+          num_tags
+        ) ||
+        !columns_get_strings(
+          dict, members_roles_key, members_roles_offsets_key, &columns->members_roles,
+          num_members
+        )
+      ))
+    return false;
+
+  // Offsets must be non-decreasing and within the flat columns
+  const int64_t *tags_offsets = columns->tags_offsets.buf;
+  const int64_t *members_offsets = columns->members_offsets.buf;
+  int64_t tags_prev = 0;
+  int64_t members_prev = 0;
+  for (Py_ssize_t i = 0; i <= size; i++) {
+    if (UNLIKELY(
+          tags_offsets[i] < tags_prev || tags_offsets[i] > num_tags ||
+          members_offsets[i] < members_prev || members_offsets[i] > num_members
+        )) {
+      PyErr_SetString(PyExc_ValueError, "Invalid tags or members offsets");
+      return false;
+    }
+    tags_prev = tags_offsets[i];
+    members_prev = members_offsets[i];
+  }
+
+  PyObject *users = PyDict_GetItemWithError(dict, users_key);
+  if (UNLIKELY(!users && PyErr_Occurred()))
+    return false;
+  if (users && users != Py_None && UNLIKELY(!PyDict_Check(users))) {
+    PyErr_SetString(PyExc_TypeError, "Column 'users' must be a dict");
+    return false;
+  }
+  columns->users = users != Py_None ? users : nullptr;
+  return true;
+}
+
+// Find the user display name, if the element has a resolved user.
+// Elements are usually ordered by changeset: cache the last lookup.
+static bool
+columns_get_user(const Columns *columns, Py_ssize_t i, UserCache *cache) {
+  if (!columns->user_id.obj || !columns->users) {
+    cache->display_name = nullptr;
+    return true;
+  }
+
+  auto user_id = ((const uint64_t *)columns->user_id.buf)[i];
+  if (LIKELY(user_id == cache->user_id))
+    return true;
+
+  cache->user_id = user_id;
+  cache->display_name = nullptr;
+  if (!user_id)
+    return true;
+
+  PyScoped key = PyLong_FromUnsignedLongLong(user_id);
+  if (UNLIKELY(!key))
+    return false;
+  PyObject *user = PyDict_GetItemWithError(columns->users, key);
+  if (!user)
+    return !PyErr_Occurred();
+
+  PyObject *display_name =
+    PyDict_Check(user) ? PyDict_GetItemWithError(user, display_name_key) : nullptr;
+  if (UNLIKELY(!display_name || !PyUnicode_Check(display_name))) {
+    if (!PyErr_Occurred())
+      PyErr_Format(PyExc_ValueError, "Invalid user %R", key);
+    cache->user_id = 0;
+    return false;
+  }
+  cache->display_name =
+    PyUnicode_AsUTF8AndSize(display_name, &cache->display_name_size);
+  return cache->display_name;
+}
+
+#pragma endregion
+#pragma region Encode
+
+static bool
+encode_xml_element(Buffer *buffer, const Columns *columns, Py_ssize_t i, UserCache *cache) {
+  auto typed_id = ((const uint64_t *)columns->typed_id.buf)[i];
+  auto type_num = typed_id >> 60;
+  auto lon = ((const double *)columns->lon.buf)[i];
+  auto lat = ((const double *)columns->lat.buf)[i];
+  auto tags_start = ((const int64_t *)columns->tags_offsets.buf)[i];
+  auto tags_end = ((const int64_t *)columns->tags_offsets.buf)[i + 1];
+  auto members_start = ((const int64_t *)columns->members_offsets.buf)[i];
+  auto members_end = ((const int64_t *)columns->members_offsets.buf)[i + 1];
+  auto has_members = members_start != members_end && type_num != 0;
+
+  if (UNLIKELY(
+        !columns_get_user(columns, i, cache) || !buffer_append_char(buffer, '<') ||
+        !buffer_append(buffer, TYPE_NAMES[type_num], TYPE_NAMES_SIZE[type_num]) ||
+        !buffer_append_literal(buffer, " id=\"") ||
+        !buffer_append_int(buffer, element_id(typed_id)) ||
+        !buffer_append_literal(buffer, "\" version=\"") ||
+        !buffer_append_int(buffer, ((const int64_t *)columns->version.buf)[i])
+      ))
+    return false;
+
+  if (cache->display_name &&
+      UNLIKELY(
+        !buffer_append_literal(buffer, "\" uid=\"") ||
+        !buffer_append_int(buffer, (int64_t)cache->user_id) ||
+        !buffer_append_literal(buffer, "\" user=\"") ||
+        !buffer_append_xml_escaped(
+          buffer, cache->display_name, cache->display_name_size
+        )
+      ))
+    return false;
+
+  if (UNLIKELY(
+        !buffer_append_literal(buffer, "\" changeset=\"") ||
+        !buffer_append_int(buffer, ((const int64_t *)columns->changeset_id.buf)[i]) ||
+        !buffer_append_literal(buffer, "\" timestamp=\"") ||
+        !buffer_append_timestamp(buffer, ((const int64_t *)columns->created_at.buf)[i]) ||
+        !(((const bool *)columns->visible.buf)[i]
+            ? buffer_append_literal(buffer, "\" visible=\"true\"")
+            : buffer_append_literal(buffer, "\" visible=\"false\""))
+      ))
+    return false;
+
+  if (!isnan(lon) &&
+      UNLIKELY(
+        !buffer_append_literal(buffer, " lon=\"") ||
+        !buffer_append_coordinate(buffer, lon, false) ||
+        !buffer_append_literal(buffer, "\" lat=\"") ||
+        !buffer_append_coordinate(buffer, lat, false) ||
+        !buffer_append_char(buffer, '"')
+      ))
+    return false;
+
+  if (tags_start == tags_end && !has_members)
+    return buffer_append_literal(buffer, "/>");
+  if (UNLIKELY(!buffer_append_char(buffer, '>')))
+    return false;
+
+  for (auto j = tags_start; j < tags_end; j++) {
+    Py_ssize_t key_size, value_size;
+    auto key = strings_get(&columns->tags_keys, j, &key_size);
+    auto value = strings_get(&columns->tags_values, j, &value_size);
+    if (UNLIKELY(
+          !buffer_append_literal(buffer, "<tag k=\"") ||
+          !buffer_append_xml_escaped(buffer, key, key_size) ||
+          !buffer_append_literal(buffer, "\" v=\"") ||
+          !buffer_append_xml_escaped(buffer, value, value_size) ||
+          !buffer_append_literal(buffer, "\"/>")
+        ))
+      return false;
+  }
+
+  if (has_members) {
+    const uint64_t *members = columns->members.buf;
+    for (auto j = members_start; j < members_end; j++) {
+      auto member = members[j];
+      auto member_type_num = member >> 60;
+      if (type_num != RELATION_TYPE_NUM) {
+        if (UNLIKELY(
+              !buffer_append_literal(buffer, "<nd ref=\"") ||
+              !buffer_append_int(buffer, element_id(member)) ||
+              !buffer_append_literal(buffer, "\"/>")
+            ))
+          return false;
+        continue;
+      }
+
+      Py_ssize_t role_size;
+      auto role = strings_get(&columns->members_roles, j, &role_size);
+      if (UNLIKELY(
+            member_type_num > RELATION_TYPE_NUM ||
+            !buffer_append_literal(buffer, "<member type=\"") ||
+            !buffer_append(
+              buffer, TYPE_NAMES[member_type_num], TYPE_NAMES_SIZE[member_type_num]
+            ) ||
+            !buffer_append_literal(buffer, "\" ref=\"") ||
+            !buffer_append_int(buffer, element_id(member)) ||
+            !buffer_append_literal(buffer, "\" role=\"") ||
+            !buffer_append_xml_escaped(buffer, role, role_size) ||
+            !buffer_append_literal(buffer, "\"/>")
+          )) {
+        if (!PyErr_Occurred())
+          PyErr_Format(PyExc_ValueError, "Invalid member type %llu", (unsigned long long)member_type_num);
+        return false;
+      }
+    }
+  }
+
+  return buffer_append_literal(buffer, "</") &&
+         buffer_append(buffer, TYPE_NAMES[type_num], TYPE_NAMES_SIZE[type_num]) &&
+         buffer_append_char(buffer, '>');
+}
+
+static bool
+encode_json_element(
+  Buffer *buffer, const Columns *columns, Py_ssize_t i, UserCache *cache
+) {
+  auto typed_id = ((const uint64_t *)columns->typed_id.buf)[i];
+  auto type_num = typed_id >> 60;
+  auto lon = ((const double *)columns->lon.buf)[i];
+  auto lat = ((const double *)columns->lat.buf)[i];
+  auto tags_start = ((const int64_t *)columns->tags_offsets.buf)[i];
+  auto tags_end = ((const int64_t *)columns->tags_offsets.buf)[i + 1];
+  auto members_start = ((const int64_t *)columns->members_offsets.buf)[i];
+  auto members_end = ((const int64_t *)columns->members_offsets.buf)[i + 1];
+
+  if (UNLIKELY(
+        !columns_get_user(columns, i, cache) ||
+        !buffer_append_literal(buffer, "{\"type\":\"") ||
+        !buffer_append(buffer, TYPE_NAMES[type_num], TYPE_NAMES_SIZE[type_num]) ||
+        !buffer_append_literal(buffer, "\",\"id\":") ||
+        !buffer_append_int(buffer, element_id(typed_id)) ||
+        !buffer_append_literal(buffer, ",\"version\":") ||
+        !buffer_append_int(buffer, ((const int64_t *)columns->version.buf)[i])
+      ))
+    return false;
+
+  if (cache->display_name &&
+      UNLIKELY(
+        !buffer_append_literal(buffer, ",\"uid\":") ||
+        !buffer_append_int(buffer, (int64_t)cache->user_id) ||
+        !buffer_append_literal(buffer, ",\"user\":") ||
+        !buffer_append_json_string(
+          buffer, cache->display_name, cache->display_name_size
+        )
+      ))
+    return false;
+
+  if (UNLIKELY(
+        !buffer_append_literal(buffer, ",\"changeset\":") ||
+        !buffer_append_int(buffer, ((const int64_t *)columns->changeset_id.buf)[i]) ||
+        !buffer_append_literal(buffer, ",\"timestamp\":\"") ||
+        !buffer_append_timestamp(buffer, ((const int64_t *)columns->created_at.buf)[i]) ||
+        !(((const bool *)columns->visible.buf)[i]
+            ? buffer_append_literal(buffer, "\",\"visible\":true,\"tags\":{")
+            : buffer_append_literal(buffer, "\",\"visible\":false,\"tags\":{"))
+      ))
+    return false;
+
+  for (auto j = tags_start; j < tags_end; j++) {
+    Py_ssize_t key_size, value_size;
+    auto key = strings_get(&columns->tags_keys, j, &key_size);
+    auto value = strings_get(&columns->tags_values, j, &value_size);
+    if (UNLIKELY(
+          (j != tags_start && !buffer_append_char(buffer, ',')) ||
+          !buffer_append_json_string(buffer, key, key_size) ||
+          !buffer_append_char(buffer, ':') ||
+          !buffer_append_json_string(buffer, value, value_size)
+        ))
+      return false;
+  }
+  if (UNLIKELY(!buffer_append_char(buffer, '}')))
+    return false;
+
+  if (!isnan(lon) &&
+      UNLIKELY(
+        !buffer_append_literal(buffer, ",\"lon\":") ||
+        !buffer_append_coordinate(buffer, lon, true) ||
+        !buffer_append_literal(buffer, ",\"lat\":") ||
+        !buffer_append_coordinate(buffer, lat, true)
+      ))
+    return false;
+
+  // Visible ways and relations always list their members, even if empty,
+  // like _encode_element. Deleted elements have no members.
+  if (type_num != 0 &&
+      (members_start != members_end || ((const bool *)columns->visible.buf)[i])) {
+    const uint64_t *members = columns->members.buf;
+    auto is_relation = type_num == RELATION_TYPE_NUM;
+    if (UNLIKELY(!(
+          is_relation ? buffer_append_literal(buffer, ",\"members\":[")
+                      : buffer_append_literal(buffer, ",\"nodes\":[")
+        )))
+      return false;
+
+    for (auto j = members_start; j < members_end; j++) {
+      auto member = members[j];
+      auto member_type_num = member >> 60;
+      if (UNLIKELY(j != members_start && !buffer_append_char(buffer, ',')))
+        return false;
+
+      if (!is_relation) {
+        if (UNLIKELY(!buffer_append_int(buffer, element_id(member))))
+          return false;
+        continue;
+      }
+
+      Py_ssize_t role_size;
+      auto role = strings_get(&columns->members_roles, j, &role_size);
+      if (UNLIKELY(
+            member_type_num > RELATION_TYPE_NUM ||
+            !buffer_append_literal(buffer, "{\"type\":\"") ||
+            !buffer_append(
+              buffer, TYPE_NAMES[member_type_num], TYPE_NAMES_SIZE[member_type_num]
+            ) ||
+            !buffer_append_literal(buffer, "\",\"ref\":") ||
+            !buffer_append_int(buffer, element_id(member)) ||
+            !buffer_append_literal(buffer, ",\"role\":") ||
+            !buffer_append_json_string(buffer, role, role_size) ||
+            !buffer_append_char(buffer, '}')
+          )) {
+        if (!PyErr_Occurred())
+          PyErr_Format(PyExc_ValueError, "Invalid member type %llu", (unsigned long long)member_type_num);
+        return false;
+      }
+    }
+
+    if (UNLIKELY(!buffer_append_char(buffer, ']')))
+      return false;
+  }
+
+  return buffer_append_char(buffer, '}');
+}
+
+// Action is determined automatically, like Format06.encode_osmchange.
+static bool
+encode_osmchange_element(
+  Buffer *buffer, const Columns *columns, Py_ssize_t i, UserCache *cache
+) {
+  auto action =
+    ((const int64_t *)columns->version.buf)[i] == 1
+      ? 0
+      : (((const bool *)columns->visible.buf)[i] ? 1 : 2);
+
+  return buffer_append_char(buffer, '<') &&
+         buffer_append(buffer, ACTION_NAMES[action], ACTION_NAMES_SIZE[action]) &&
+         buffer_append_char(buffer, '>') &&
+         encode_xml_element(buffer, columns, i, cache) &&
+         buffer_append_literal(buffer, "</") &&
+         buffer_append(buffer, ACTION_NAMES[action], ACTION_NAMES_SIZE[action]) &&
+         buffer_append_char(buffer, '>');
+}
+
+static bool
+encode_columns(Buffer *buffer, const Columns *columns, bool is_json, bool osmchange) {
+  const uint64_t *typed_ids = columns->typed_id.buf;
+  for (Py_ssize_t i = 0; i < columns->size; i++)
+    if (UNLIKELY((typed_ids[i] >> 60) > RELATION_TYPE_NUM)) {
+      PyErr_Format(PyExc_ValueError, "Invalid element type %llu",
+        (unsigned long long)(typed_ids[i] >> 60)
+      );
+      return false;
+    }
+
+  UserCache cache = {};
+
+  if (is_json) {
+    if (UNLIKELY(!buffer_append_char(buffer, '[')))
+      return false;
+    for (Py_ssize_t i = 0; i < columns->size; i++)
+      if (UNLIKELY(
+            (i && !buffer_append_char(buffer, ',')) ||
+            !encode_json_element(buffer, columns, i, &cache)
+          ))
+        return false;
+    return buffer_append_char(buffer, ']');
+  }
+
+  if (osmchange) {
+    for (Py_ssize_t i = 0; i < columns->size; i++)
+      if (UNLIKELY(!encode_osmchange_element(buffer, columns, i, &cache)))
+        return false;
+    return true;
+  }
+
+  // Merge elements of the same type together, like Format06.encode_elements
+  for (uint64_t type_num = 0; type_num <= RELATION_TYPE_NUM; type_num++)
+    for (Py_ssize_t i = 0; i < columns->size; i++)
+      if ((typed_ids[i] >> 60) == type_num &&
+          UNLIKELY(!encode_xml_element(buffer, columns, i, &cache)))
+        return false;
+  return true;
+}
+
+static PyObject *
+element_encode(PyObject *, PyObject *const *args, Py_ssize_t nargs) {
+  if (UNLIKELY(
+        nargs != 3 || !PyDict_Check(args[0]) || !PyBool_Check(args[1]) ||
+        !PyBool_Check(args[2])
+      )) {
+    PyErr_BadArgument();
+    return nullptr;
+  }
+  auto is_json = Py_IsTrue(args[1]);
+  auto osmchange = Py_IsTrue(args[2]);
+  if (UNLIKELY(is_json && osmchange)) {
+    PyErr_SetString(PyExc_ValueError, "osmChange is only supported in XML");
+    return nullptr;
+  }
+
+  Columns columns = {};
+  Buffer buffer = {};
+  PyObject *result = nullptr;
+
+  if (LIKELY(columns_load(args[0], &columns)) &&
+      LIKELY(buffer_reserve(&buffer, (size_t)columns.size * 256 + 2)) &&
+      LIKELY(encode_columns(&buffer, &columns, is_json, osmchange)))
+    result = buffer_to_bytes(&buffer);
+
+  buffer_free(&buffer);
+  columns_release(&columns);
+  return result;
+}
+
+#pragma endregion
+
+static PyMethodDef methods[] = {
+  {"element_encode", _PyCFunction_CAST(element_encode), METH_FASTCALL, nullptr},
+  {nullptr, nullptr, 0, nullptr},
+};
+
+static struct PyModuleDef module = {
+  PyModuleDef_HEAD_INIT,
+  "speedup.element_encode",
+  nullptr,
+  -1,
+  methods,
+  nullptr,
+  nullptr,
+  nullptr,
+  nullptr
+};
+
+PyMODINIT_FUNC
+PyInit_element_encode(void) {
+  typed_id_key = PyUnicode_InternFromString("typed_id");
+  changeset_id_key = PyUnicode_InternFromString("changeset_id");
+  version_key = PyUnicode_InternFromString("version");
+  visible_key = PyUnicode_InternFromString("visible");
+  created_at_key = PyUnicode_InternFromString("created_at");
+  lon_key = PyUnicode_InternFromString("lon");
+  lat_key = PyUnicode_InternFromString("lat");
+  tags_offsets_key = PyUnicode_InternFromString("tags_offsets");
+  tags_keys_key = PyUnicode_InternFromString("tags_keys");
+  tags_keys_offsets_key = PyUnicode_InternFromString("tags_keys_offsets");
+  tags_values_key = PyUnicode_InternFromString("tags_values");
+  tags_values_offsets_key = PyUnicode_InternFromString("tags_values_offsets");
+  members_offsets_key = PyUnicode_InternFromString("members_offsets");
+  members_key = PyUnicode_InternFromString("members");
+  members_roles_key = PyUnicode_InternFromString("members_roles");
+  members_roles_offsets_key = PyUnicode_InternFromString("members_roles_offsets");
+  user_id_key = PyUnicode_InternFromString("user_id");
+  users_key = PyUnicode_InternFromString("users");
+  display_name_key = PyUnicode_InternFromString("display_name");
+
+  return PyModule_Create(&module);
+}
@@ -0,0 +1,10 @@
+from typing import Any
+
+def element_encode(columns: dict[str, Any], is_json: bool, osmchange: bool, /) -> bytes:
+    """
+    Encode element columns directly into OSM 0.6 XML or JSON.
+    Columns are named like ElementBatch fields, with created_at as int64
+    microseconds, and coordinates already rounded.
+    XML is returned as the children of the root element, JSON as an array.
+    In osmChange mode, each element is wrapped in its action element.
+    """
@@ -0,0 +1,801 @@
+#include "libxml/xmlreader.h"
+#include <Python.h>
+#include <math.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define UNLIKELY(x) __builtin_expect((x), 0)
+#define LIKELY(x) __builtin_expect((x), 1)
+#define PyScoped PyObject *__attribute__((cleanup(Py_XDECREFP)))
+
+constexpr uint64_t NODE_TYPE_NUM = 0;
+constexpr uint64_t WAY_TYPE_NUM = 1;
+constexpr uint64_t RELATION_TYPE_NUM = 2;
+constexpr uint64_t SIGN_MASK = 1ULL << 59;
+constexpr Py_ssize_t TAG_VALUE_MAX_LENGTH = 255;
+
+typedef enum {
+  ACTION_CREATE,
+  ACTION_MODIFY,
+  ACTION_DELETE,
+} Action;
+
+static PyObject *action_error;
+static PyObject *action_names[3];
+
+static Py_ssize_t tags_limit;
+static Py_ssize_t tags_max_size;
+static Py_ssize_t tags_key_max_length;
+static Py_ssize_t way_members_limit;
+static Py_ssize_t relation_members_limit;
+static bool configured;
+static PyObject *normalize_func;
+static PyObject *nfc_form;
+
+static PyObject *changeset_id_key;
+static PyObject *typed_id_key;
+static PyObject *version_key;
+static PyObject *visible_key;
+static PyObject *tags_key;
+static PyObject *point_key;
+static PyObject *members_key;
+static PyObject *members_roles_key;
+static PyObject *delete_if_unused_key;
+
+static inline void
+Py_XDECREFP(PyObject **ptr) {
+  Py_XDECREF(*ptr);
+}
+
+static inline void
+xmlFreeTextReaderPtr(xmlTextReaderPtr *ptr) {
+  xmlFreeTextReader(*ptr);
+}
+
+#pragma region Buffer
+
+typedef struct {
+  char *data;
+  size_t size;
+  size_t capacity;
+} Buffer;
+
+static inline void
+buffer_free(Buffer *buffer) {
+  PyMem_Free(buffer->data);
+}
+
+static bool
+buffer_reserve(Buffer *buffer, size_t size) {
+  if (LIKELY(buffer->size + size <= buffer->capacity))
+    return true;
+
+  size_t capacity = buffer->capacity ? buffer->capacity * 2 : 4096;
+  while (capacity < buffer->size + size)
+    capacity *= 2;
+
+  char *data = PyMem_Realloc(buffer->data, capacity);
+  if (UNLIKELY(!data)) {
+    PyErr_NoMemory();
+    return false;
+  }
+  buffer->data = data;
+  buffer->capacity = capacity;
+  return true;
+}
+
+static inline bool
+buffer_append(Buffer *buffer, const void *value, size_t size) {
+  if (UNLIKELY(!buffer_reserve(buffer, size)))
+    return false;
+  memcpy(buffer->data + buffer->size, value, size);
+  buffer->size += size;
+  return true;
+}
+
+static inline bool
+buffer_append_i64(Buffer *buffer, int64_t value) {
+  return buffer_append(buffer, &value, sizeof(value));
+}
+
+static inline bool
+buffer_append_f64(Buffer *buffer, double value) {
+  return buffer_append(buffer, &value, sizeof(value));
+}
+
+static inline PyObject *
+buffer_to_bytes(const Buffer *buffer) {
+  return PyBytes_FromStringAndSize(buffer->data, (Py_ssize_t)buffer->size);
+}
+
+#pragma endregion
+#pragma region Values
+
+static bool
+parse_i64(const char *name, const xmlChar *value_xml, int64_t *out) {
+  const char *str = (const char *)value_xml;
+  char *end;
+  errno = 0;
+  *out = strtoll(str, &end, 10);
+  if (UNLIKELY(errno || end == str || *end)) {
+    PyErr_Format(PyExc_ValueError, "Invalid %s value: '%s'", name, str);
+    return false;
+  }
+  return true;
+}
+
+static bool
+parse_f64(const char *name, const xmlChar *value_xml, double *out) {
+  const char *str = (const char *)value_xml;
+  char *end;
+  errno = 0;
+  *out = strtod(str, &end);
+  if (UNLIKELY(errno || end == str || *end || !isfinite(*out))) {
+    PyErr_Format(PyExc_ValueError, "Invalid %s value: '%s'", name, str);
+    return false;
+  }
+  return true;
+}
+
+static bool
+parse_bool(const char *name, const xmlChar *value_xml, bool *out) {
+  const char *str = (const char *)value_xml;
+  if (!strcmp(str, "true"))
+    *out = true;
+  else if (!strcmp(str, "false"))
+    *out = false;
+  else {
+    PyErr_Format(PyExc_ValueError, "Invalid %s value: '%s'", name, str);
+    return false;
+  }
+  return true;
+}
+
+static bool
+parse_element_type(const char *str, uint64_t *out) {
+  if (!strcmp(str, "node"))
+    *out = NODE_TYPE_NUM;
+  else if (!strcmp(str, "way"))
+    *out = WAY_TYPE_NUM;
+  else if (!strcmp(str, "relation"))
+    *out = RELATION_TYPE_NUM;
+  else {
+    PyErr_Format(PyExc_ValueError, "Unsupported element type '%s'", str);
+    return false;
+  }
+  return true;
+}
+
+// Encode element type and id, the same as speedup.element_type.typed_element_id.
+static bool
+encode_typed_id(uint64_t type_num, int64_t id, int64_t *out) {
+  uint64_t result;
+  if (id < 0) {
+    if (UNLIKELY(id <= -(1LL << 56)))
+      goto overflow;
+    result = -id | SIGN_MASK;
+  } else {
+    if (UNLIKELY(id >= (1LL << 56)))
+      goto overflow;
+    result = id;
+  }
+  *out = (int64_t)(result | (type_num << 60));
+  return true;
+
+overflow:
+  PyErr_Format(
+    PyExc_OverflowError, "ElementId %lld is out of TypedElementId range", id
+  );
+  return false;
+}
+
+static inline bool
+is_xml_unsafe(Py_UCS4 c) {
+  return (c < 0x20 && c != '\t' && c != '\n' && c != '\r') || c == 0x7F ||
+         c == 0xFFFE || c == 0xFFFF;
+}
+
+// NFC-normalize the string, then check its length and that it is XML-safe.
+// ASCII strings are already normalized, and skip the call.
+static PyObject *
+validated_str(
+  const char *name, const xmlChar *value, Py_ssize_t min_length, Py_ssize_t max_length,
+  Py_ssize_t *length
+) {
+  bool plain = true;
+  for (const xmlChar *p = value; *p; p++) {
+    if (*p >= 0x80) {
+      plain = false;
+      break;
+    }
+  }
+
+  PyScoped str = PyUnicode_FromString((const char *)value);
+  if (UNLIKELY(!str))
+    return nullptr;
+  if (!plain) {
+    PyObject *normalized =
+      PyObject_CallFunctionObjArgs(normalize_func, nfc_form, str, nullptr);
+    if (UNLIKELY(!normalized))
+      return nullptr;
+    Py_SETREF(str, normalized);
+  }
+
+  *length = PyUnicode_GET_LENGTH(str);
+  if (UNLIKELY(*length < min_length || *length > max_length)) {
+    PyErr_Format(
+      PyExc_ValueError, "Invalid %s length: %zd (expected %zd to %zd)", name, *length,
+      min_length, max_length
+    );
+    return nullptr;
+  }
+
+  int kind = PyUnicode_KIND(str);
+  const void *data = PyUnicode_DATA(str);
+  for (Py_ssize_t i = 0; i < *length; i++) {
+    if (UNLIKELY(is_xml_unsafe(PyUnicode_READ(kind, data, i)))) {
+      PyErr_Format(PyExc_ValueError, "Invalid characters in %s", name);
+      return nullptr;
+    }
+  }
+  return Py_NewRef(str);
+}
+
+#pragma endregion
+#pragma region Element
+
+typedef struct {
+  Action action;
+  bool delete_if_unused;
+  uint64_t type_num;
+  int64_t id;
+  int64_t version;
+  int64_t changeset_id;
+  double lon;
+  double lat;
+  bool has_id;
+  bool has_lon;
+  bool has_lat;
+  bool visible;
+  Py_ssize_t tags_size;
+  PyObject *tags;
+  PyObject *members;
+  PyObject *members_roles;
+} ElementState;
+
+static void
+element_state_clear(ElementState *state) {
+  Py_CLEAR(state->tags);
+  Py_CLEAR(state->members);
+  Py_CLEAR(state->members_roles);
+}
+
+static PyObject *
+element_state_to_dict(const ElementState *state, bool with_members) {
+  int64_t typed_id;
+  if (UNLIKELY(!encode_typed_id(state->type_num, state->id, &typed_id)))
+    return nullptr;
+
+  PyObject *tags = state->tags ? state->tags : Py_None;
+  PyObject *members = with_members && state->members ? state->members : Py_None;
+  PyObject *members_roles =
+    with_members && state->members_roles ? state->members_roles : Py_None;
+
+  PyScoped changeset_id = PyLong_FromLongLong(state->changeset_id);
+  PyScoped typed_id_py = PyLong_FromLongLong(typed_id);
+  PyScoped version = PyLong_FromLongLong(state->version);
+  PyScoped result = PyDict_New();
+  if (UNLIKELY(!changeset_id || !typed_id_py || !version || !result))
+    return nullptr;
+
+  if (UNLIKELY(
+        PyDict_SetItem(result, changeset_id_key, changeset_id) < 0 ||
+        PyDict_SetItem(result, typed_id_key, typed_id_py) < 0 ||
+        PyDict_SetItem(result, version_key, version) < 0 ||
+        PyDict_SetItem(result, visible_key, state->visible ? Py_True : Py_False) < 0 ||
+        PyDict_SetItem(result, tags_key, tags) < 0 ||
+        PyDict_SetItem(result, point_key, Py_None) < 0 ||
+        PyDict_SetItem(result, members_key, members) < 0 ||
+        PyDict_SetItem(result, members_roles_key, members_roles) < 0 ||
+        (state->delete_if_unused &&
+         PyDict_SetItem(result, delete_if_unused_key, Py_True) < 0)
+      ))
+    return nullptr;
+
+  Py_INCREF(result);
+  return result;
+}
+
+// Raise OSMChangeActionError for the element that is invalid for its action.
+static void
+raise_action_error(const ElementState *state) {
+  PyScoped element = element_state_to_dict(state, true);
+  if (UNLIKELY(!element))
+    return;
+  PyScoped args = PyTuple_Pack(2, action_names[state->action], element);
+  if (args)
+    PyErr_SetObject(action_error, args);
+}
+
+static bool
+read_element(
+  xmlTextReaderPtr reader, ElementState *state, uint64_t type_num,
+  int64_t changeset_id
+) {
+  element_state_clear(state);
+  *state = (ElementState){
+    .action = state->action,
+    .delete_if_unused = state->delete_if_unused,
+    .type_num = type_num,
+    .changeset_id = changeset_id,
+    .visible = state->action != ACTION_DELETE,
+  };
+  bool has_changeset_id = changeset_id != 0;
+
+  while (xmlTextReaderMoveToNextAttribute(reader) == 1) {
+    const char *name = (const char *)xmlTextReaderConstLocalName(reader);
+    const xmlChar *value = xmlTextReaderConstValue(reader);
+    bool ok = true;
+
+    if (!strcmp(name, "id"))
+      ok = state->has_id = parse_i64(name, value, &state->id);
+    else if (!strcmp(name, "version"))
+      ok = parse_i64(name, value, &state->version);
+    else if (!strcmp(name, "lon"))
+      ok = state->has_lon = parse_f64(name, value, &state->lon);
+    else if (!strcmp(name, "lat"))
+      ok = state->has_lat = parse_f64(name, value, &state->lat);
+    else if (!strcmp(name, "changeset") && !changeset_id)
+      ok = has_changeset_id = parse_i64(name, value, &state->changeset_id);
+    else if (!strcmp(name, "visible") && state->action != ACTION_DELETE)
+      ok = parse_bool(name, value, &state->visible);
+    if (UNLIKELY(!ok))
+      return false;
+  }
+  xmlTextReaderMoveToElement(reader);
+
+  if (UNLIKELY(!state->has_id || !has_changeset_id)) {
+    PyErr_SetString(PyExc_ValueError, "Element is missing id or changeset");
+    return false;
+  }
+
+  // Creating assigns the first version, updates increment the current one
+  if (state->action == ACTION_CREATE) {
+    state->version = 1;
+    if (UNLIKELY(state->id > 0)) {
+      raise_action_error(state);
+      return false;
+    }
+    if (UNLIKELY(!state->visible)) {
+      PyErr_SetString(PyExc_ValueError, "Element cannot be hidden on creation");
+      return false;
+    }
+  } else {
+    state->version++;
+    if (UNLIKELY(state->version <= 1)) {
+      raise_action_error(state);
+      return false;
+    }
+  }
+  return true;
+}
+
+static bool
+read_tag(xmlTextReaderPtr reader, ElementState *state) {
+  PyScoped key = nullptr;
+  PyScoped value = nullptr;
+  Py_ssize_t key_length = 0;
+  Py_ssize_t value_length = 0;
+
+  while (xmlTextReaderMoveToNextAttribute(reader) == 1) {
+    const char *name = (const char *)xmlTextReaderConstLocalName(reader);
+    if (name[0] == 'k' && !name[1] && !key)
+      key = validated_str(
+        "tag key", xmlTextReaderConstValue(reader), 1, tags_key_max_length, &key_length
+      );
+    else if (name[0] == 'v' && !name[1] && !value)
+      value = validated_str(
+        "tag value", xmlTextReaderConstValue(reader), 1, TAG_VALUE_MAX_LENGTH,
+        &value_length
+      );
+    else
+      continue;
+    if (PyErr_Occurred())
+      return false;
+  }
+  xmlTextReaderMoveToElement(reader);
+
+  if (UNLIKELY(!key || !value)) {
+    PyErr_SetString(PyExc_ValueError, "Tag is missing k or v");
+    return false;
+  }
+
+  if (!state->tags && UNLIKELY(!(state->tags = PyDict_New())))
+    return false;
+  if (UNLIKELY(PyDict_GET_SIZE(state->tags) >= tags_limit)) {
+    PyErr_Format(PyExc_ValueError, "Cannot have more than %zd tags", tags_limit);
+    return false;
+  }
+  state->tags_size += key_length + value_length;
+  if (UNLIKELY(state->tags_size > tags_max_size)) {
+    PyErr_Format(
+      PyExc_ValueError, "Tags size cannot exceed %zd characters", tags_max_size
+    );
+    return false;
+  }
+
+  int contains = PyDict_Contains(state->tags, key);
+  if (UNLIKELY(contains)) {
+    if (contains > 0)
+      PyErr_SetString(PyExc_ValueError, "Duplicate tag keys");
+    return false;
+  }
+  return PyDict_SetItem(state->tags, key, value) == 0;
+}
+
+static bool
+read_member(xmlTextReaderPtr reader, ElementState *state) {
+  bool is_relation = state->type_num == RELATION_TYPE_NUM;
+  Py_ssize_t limit = is_relation ? relation_members_limit : way_members_limit;
+  uint64_t type_num = NODE_TYPE_NUM;
+  int64_t ref;
+  bool has_type = !is_relation;
+  bool has_ref = false;
+  PyScoped role = nullptr;
+
+  while (xmlTextReaderMoveToNextAttribute(reader) == 1) {
+    const char *name = (const char *)xmlTextReaderConstLocalName(reader);
+    const xmlChar *value = xmlTextReaderConstValue(reader);
+    bool ok = true;
+
+    if (!strcmp(name, "ref"))
+      ok = has_ref = parse_i64(name, value, &ref);
+    else if (is_relation && !strcmp(name, "type"))
+      ok = has_type = parse_element_type((const char *)value, &type_num);
+    else if (is_relation && !strcmp(name, "role") && !role) {
+      Py_ssize_t length;
+      role = validated_str("member role", value, 0, tags_key_max_length, &length);
+      ok = role != nullptr;
+    }
+    if (UNLIKELY(!ok))
+      return false;
+  }
+  xmlTextReaderMoveToElement(reader);
+
+  if (UNLIKELY(!has_ref || !has_type || (is_relation && !role))) {
+    PyErr_SetString(PyExc_ValueError, "Member is missing ref, type, or role");
+    return false;
+  }
+
+  if (!state->members && UNLIKELY(!(state->members = PyList_New(0))))
+    return false;
+  if (is_relation && !state->members_roles &&
+      UNLIKELY(!(state->members_roles = PyList_New(0))))
+    return false;
+  if (UNLIKELY(PyList_GET_SIZE(state->members) >= limit)) {
+    PyErr_Format(
+      PyExc_ValueError, "%s cannot have more than %zd members",
+      is_relation ? "Relations" : "Ways", limit
+    );
+    return false;
+  }
+
+  int64_t typed_id;
+  if (UNLIKELY(!encode_typed_id(type_num, ref, &typed_id)))
+    return false;
+  PyScoped typed_id_py = PyLong_FromLongLong(typed_id);
+  return typed_id_py && PyList_Append(state->members, typed_id_py) == 0 &&
+         (!is_relation || PyList_Append(state->members_roles, role) == 0);
+}
+
+typedef struct {
+  PyObject *elements;
+  Buffer points_index;
+  Buffer points_coords;
+} Result;
+
+static void
+result_free(Result *result) {
+  Py_XDECREF(result->elements);
+  buffer_free(&result->points_index);
+  buffer_free(&result->points_coords);
+}
+
+// Validate the element against its type and visibility, and append it to the result.
+static bool
+finish_element(ElementState *state, Result *result) {
+  bool has_point = false;
+
+  if (!state->visible) {
+    // Hidden elements carry no data
+    Py_CLEAR(state->tags);
+    Py_CLEAR(state->members);
+    Py_CLEAR(state->members_roles);
+  } else if (state->type_num == NODE_TYPE_NUM && state->has_lon && state->has_lat) {
+    if (UNLIKELY(
+          state->lon < -180 || state->lon > 180 || state->lat < -90 || state->lat > 90
+        )) {
+      PyScoped lon = PyFloat_FromDouble(state->lon);
+      PyScoped lat = PyFloat_FromDouble(state->lat);
+      if (LIKELY(lon && lat))
+        PyErr_Format(
+          PyExc_ValueError, "Invalid coordinates: lon=%R, lat=%R", lon, lat
+        );
+      return false;
+    }
+    has_point = true;
+  }
+
+  PyScoped element =
+    element_state_to_dict(state, state->visible && state->type_num != NODE_TYPE_NUM);
+  if (UNLIKELY(!element))
+    return false;
+
+  if (has_point &&
+      UNLIKELY(
+        !buffer_append_i64(&result->points_index, PyList_GET_SIZE(result->elements)) ||
+        !buffer_append_f64(&result->points_coords, state->lon) ||
+        !buffer_append_f64(&result->points_coords, state->lat)
+      ))
+    return false;
+
+  element_state_clear(state);
+  return PyList_Append(result->elements, element) == 0;
+}
+
+#pragma endregion
+
+static PyObject *
+osmchange_decode(PyObject *, PyObject *const *args, Py_ssize_t nargs) {
+  if (UNLIKELY(!configured)) {
+    PyErr_SetString(PyExc_RuntimeError, "osmchange_decode is not configured");
+    return nullptr;
+  }
+  if (UNLIKELY(
+        nargs != 2 || !PyBytes_CheckExact(args[0]) ||
+        (args[1] != Py_None && !PyLong_CheckExact(args[1]))
+      )) {
+    PyErr_BadArgument();
+    return nullptr;
+  }
+
+  char *buffer;
+  Py_ssize_t buffer_size;
+  PyBytes_AsStringAndSize(args[0], &buffer, &buffer_size);
+  if (UNLIKELY(buffer_size > INT_MAX)) {
+    PyErr_SetString(PyExc_ValueError, "osmChange data is too large");
+    return nullptr;
+  }
+
+  // Zero means the changeset is read from each element
+  int64_t changeset_id = 0;
+  if (args[1] != Py_None) {
+    changeset_id = PyLong_AsLongLong(args[1]);
+    if (UNLIKELY(changeset_id == -1 && PyErr_Occurred()))
+      return nullptr;
+  }
+
+  xmlTextReaderPtr __attribute__((cleanup(xmlFreeTextReaderPtr))) reader =
+    xmlReaderForMemory(
+      buffer, (int)buffer_size, nullptr, nullptr,
+      XML_PARSE_NOCDATA | XML_PARSE_COMPACT | XML_PARSE_NO_XXE
+    );
+  if (UNLIKELY(!reader)) {
+    const xmlError *error = xmlGetLastError();
+    xmlResetLastError();
+    return PyErr_Format(
+      PyExc_ValueError, "Error initializing XML reader: %s",
+      error && error->message ? error->message : "Unknown error"
+    );
+  }
+
+  Result __attribute__((cleanup(result_free))) result = {.elements = PyList_New(0)};
+  ElementState __attribute__((cleanup(element_state_clear))) state = {};
+  if (UNLIKELY(!result.elements))
+    return nullptr;
+
+  // osmChange > action > element > tag/nd/member
+  bool in_element = false;
+  bool has_root = false;
+  int parse_ret;
+  while ((parse_ret = xmlTextReaderRead(reader)) == 1) {
+    int node_type = xmlTextReaderNodeType(reader);
+    int depth = xmlTextReaderDepth(reader);
+
+    if (node_type == XML_READER_TYPE_END_ELEMENT) {
+      if (depth == 2 && in_element) {
+        in_element = false;
+        if (UNLIKELY(!finish_element(&state, &result)))
+          return nullptr;
+      }
+      continue;
+    }
+    if (node_type != XML_READER_TYPE_ELEMENT)
+      continue;
+
+    const char *name = (const char *)xmlTextReaderConstLocalName(reader);
+    switch (depth) {
+    case 0:
+      if (UNLIKELY(strcmp(name, "osmChange"))) {
+        PyErr_Format(
+          PyExc_ValueError, "Expected osmChange root element, got '%s'", name
+        );
+        return nullptr;
+      }
+      has_root = true;
+      break;
+
+    case 1:
+      if (!strcmp(name, "create"))
+        state.action = ACTION_CREATE;
+      else if (!strcmp(name, "modify"))
+        state.action = ACTION_MODIFY;
+      else if (!strcmp(name, "delete"))
+        state.action = ACTION_DELETE;
+      else {
+        PyScoped action = PyUnicode_FromString(name);
+        PyScoped args = action ? PyTuple_Pack(2, action, Py_None) : nullptr;
+        if (args)
+          PyErr_SetObject(action_error, args);
+        return nullptr;
+      }
+      state.delete_if_unused =
+        state.action == ACTION_DELETE &&
+        xmlTextReaderMoveToAttribute(reader, (const xmlChar *)"if-unused") == 1;
+      xmlTextReaderMoveToElement(reader);
+      break;
+
+    case 2: {
+      uint64_t type_num;
+      if (UNLIKELY(
+            !parse_element_type(name, &type_num) ||
+            !read_element(reader, &state, type_num, changeset_id)
+          ))
+        return nullptr;
+
+      if (xmlTextReaderIsEmptyElement(reader)) {
+        if (UNLIKELY(!finish_element(&state, &result)))
+          return nullptr;
+      } else
+        in_element = true;
+      break;
+    }
+
+    case 3:
+      if (!in_element)
+        break;
+      if (!strcmp(name, "tag")) {
+        if (UNLIKELY(!read_tag(reader, &state)))
+          return nullptr;
+      } else if ((state.type_num == WAY_TYPE_NUM && !strcmp(name, "nd")) ||
+                 (state.type_num == RELATION_TYPE_NUM && !strcmp(name, "member"))) {
+        if (UNLIKELY(!read_member(reader, &state)))
+          return nullptr;
+      }
+      break;
+    }
+  }
+
+  if (UNLIKELY(parse_ret < 0)) {
+    const xmlError *error = xmlGetLastError();
+    return PyErr_Format(
+      PyExc_ValueError, "Error parsing XML: %s",
+      error && error->message ? error->message : "Unknown error"
+    );
+  }
+  if (UNLIKELY(!has_root)) {
+    PyErr_SetString(PyExc_ValueError, "Document is empty");
+    return nullptr;
+  }
+
+  PyScoped points_index = buffer_to_bytes(&result.points_index);
+  PyScoped points_coords = buffer_to_bytes(&result.points_coords);
+  if (UNLIKELY(!points_index || !points_coords))
+    return nullptr;
+  return PyTuple_Pack(3, result.elements, points_index, points_coords);
+}
+
+static bool
+parse_limit(PyObject *value, Py_ssize_t *out) {
+  *out = PyLong_AsSsize_t(value);
+  if (UNLIKELY(*out == -1 && PyErr_Occurred()))
+    return false;
+  if (UNLIKELY(*out < 0)) {
+    PyErr_SetString(PyExc_ValueError, "Limits must not be negative");
+    return false;
+  }
+  return true;
+}
+
+static PyObject *
+osmchange_decode_configure(PyObject *, PyObject *const *args, Py_ssize_t nargs) {
+  if (UNLIKELY(nargs != 5)) {
+    PyErr_BadArgument();
+    return nullptr;
+  }
+
+  Py_ssize_t limits[5];
+  for (Py_ssize_t i = 0; i < 5; i++)
+    if (UNLIKELY(!parse_limit(args[i], &limits[i])))
+      return nullptr;
+
+  tags_limit = limits[0];
+  tags_max_size = limits[1];
+  tags_key_max_length = limits[2];
+  way_members_limit = limits[3];
+  relation_members_limit = limits[4];
+  configured = true;
+  Py_RETURN_NONE;
+}
+
+static PyMethodDef methods[] = {
+  {
+    "osmchange_decode_configure",
+    _PyCFunction_CAST(osmchange_decode_configure),
+    METH_FASTCALL,
+    nullptr,
+  },
+  {
+    "osmchange_decode",
+    _PyCFunction_CAST(osmchange_decode),
+    METH_FASTCALL,
+    nullptr,
+  },
+  {nullptr, nullptr, 0, nullptr}
+};
+
+static struct PyModuleDef module = {
+  PyModuleDef_HEAD_INIT,
+  "speedup.osmchange_decode",
+  nullptr,
+  -1,
+  methods,
+  nullptr,
+  nullptr,
+  nullptr,
+  nullptr
+};
+
+PyMODINIT_FUNC
+PyInit_osmchange_decode(void) {
+  PyScoped unicodedata_module = PyImport_ImportModule("unicodedata");
+  if (UNLIKELY(!unicodedata_module))
+    return nullptr;
+  normalize_func = PyObject_GetAttrString(unicodedata_module, "normalize");
+  nfc_form = PyUnicode_InternFromString("NFC");
+  if (UNLIKELY(!normalize_func || !nfc_form))
+    return nullptr;
+
+  action_names[ACTION_CREATE] = PyUnicode_InternFromString("create");
+  action_names[ACTION_MODIFY] = PyUnicode_InternFromString("modify");
+  action_names[ACTION_DELETE] = PyUnicode_InternFromString("delete");
+
+  changeset_id_key = PyUnicode_InternFromString("changeset_id");
+  typed_id_key = PyUnicode_InternFromString("typed_id");
+  version_key = PyUnicode_InternFromString("version");
+  visible_key = PyUnicode_InternFromString("visible");
+  tags_key = PyUnicode_InternFromString("tags");
+  point_key = PyUnicode_InternFromString("point");
+  members_key = PyUnicode_InternFromString("members");
+  members_roles_key = PyUnicode_InternFromString("members_roles");
+  delete_if_unused_key = PyUnicode_InternFromString("delete_if_unused");
+
+  PyObject *m = PyModule_Create(&module);
+  if (UNLIKELY(!m))
+    return nullptr;
+
+  action_error = PyErr_NewExceptionWithDoc(
+    "speedup.osmchange_decode.OSMChangeActionError",
+    "The osmChange action is unsupported, or invalid for the element.",
+    PyExc_ValueError, nullptr
+  );
+  if (UNLIKELY(
+        !action_error ||
+        PyModule_AddObjectRef(m, "OSMChangeActionError", action_error) < 0
+      )) {
+    Py_DECREF(m);
+    return nullptr;
+  }
+  return m;
+}
@@ -0,0 +1,30 @@
+from app.models.db.element import ElementInit
+
+class OSMChangeActionError(ValueError):
+    """
+    The osmChange action is unsupported, or invalid for the element.
+    The args are the action name and the element, or None for unsupported actions.
+    """
+
+    args: tuple[str, ElementInit | None]
+
+def osmchange_decode_configure(
+    tags_limit: int,
+    tags_max_size: int,
+    tags_key_max_length: int,
+    way_members_limit: int,
+    relation_members_limit: int,
+    /,
+) -> None:
+    """Set the limits enforced by osmchange_decode. Must be called before decoding."""
+
+def osmchange_decode(
+    xml: bytes, changeset_id: int | None, /
+) -> tuple[list[ElementInit], bytes, bytes]:
+    """
+    Decode an osmChange document into validated elements, enforcing the tags,
+    members, and coordinates limits. If changeset_id is None, it is read from
+    the elements. Node points are left unset; instead, the element indices and
+    the (lon, lat) coordinates are returned as native-endian int64 and float64 bytes.
+    Tag keys, tag values, and member roles are NFC-normalized, and otherwise kept as is.
+    """
@@ -0,0 +1,674 @@
+#include "libxml/xmlreader.h"
+#include <Python.h>
+#include <math.h>
+#include <stdint.h>
+#include <stdlib.h>
+#include <string.h>
+
+#define UNLIKELY(x) __builtin_expect((x), 0)
+#define LIKELY(x) __builtin_expect((x), 1)
+#define PyScoped PyObject *__attribute__((cleanup(Py_XDECREFP)))
+
+constexpr uint64_t NODE_TYPE_NUM = 0;
+constexpr uint64_t WAY_TYPE_NUM = 1;
+constexpr uint64_t RELATION_TYPE_NUM = 2;
+constexpr uint64_t SIGN_MASK = 1ULL << 59;
+
+static PyObject *changeset_id_key;
+static PyObject *typed_id_key;
+static PyObject *version_key;
+static PyObject *visible_key;
+static PyObject *lon_key;
+static PyObject *lat_key;
+static PyObject *created_at_key;
+static PyObject *user_id_key;
+static PyObject *has_user_id_key;
+static PyObject *display_name_key;
+static PyObject *tags_offsets_key;
+static PyObject *tags_keys_key;
+static PyObject *tags_values_key;
+static PyObject *members_offsets_key;
+static PyObject *members_key;
+static PyObject *members_roles_key;
+
+static inline void
+Py_XDECREFP(PyObject **ptr) {
+  Py_XDECREF(*ptr);
+}
+
+static inline void
+xmlFreeTextReaderPtr(xmlTextReaderPtr *ptr) {
+  xmlFreeTextReader(*ptr);
+}
+
+#pragma region Buffer
+
+typedef struct {
+  char *data;
+  size_t size;
+  size_t capacity;
+} Buffer;
+
+static inline void
+buffer_free(Buffer *buffer) {
+  PyMem_Free(buffer->data);
+}
+
+static bool
+buffer_reserve(Buffer *buffer, size_t size) {
+  if (LIKELY(buffer->size + size <= buffer->capacity))
+    return true;
+
+  size_t capacity = buffer->capacity ? buffer->capacity * 2 : 4096;
+  while (capacity < buffer->size + size)
+    capacity *= 2;
+
+  char *data = PyMem_Realloc(buffer->data, capacity);
+  if (UNLIKELY(!data)) {
+    PyErr_NoMemory();
+    return false;
+  }
+  buffer->data = data;
+  buffer->capacity = capacity;
+  return true;
+}
+
+static inline bool
+buffer_append(Buffer *buffer, const void *value, size_t size) {
+  if (UNLIKELY(!buffer_reserve(buffer, size)))
+    return false;
+  memcpy(buffer->data + buffer->size, value, size);
+  buffer->size += size;
+  return true;
+}
+
+static inline bool
+buffer_append_i64(Buffer *buffer, int64_t value) {
+  return buffer_append(buffer, &value, sizeof(value));
+}
+
+static inline bool
+buffer_append_f64(Buffer *buffer, double value) {
+  return buffer_append(buffer, &value, sizeof(value));
+}
+
+static inline bool
+buffer_append_bool(Buffer *buffer, bool value) {
+  return buffer_append(buffer, &value, sizeof(value));
+}
+
+static inline PyObject *
+buffer_to_bytes(const Buffer *buffer) {
+  return PyBytes_FromStringAndSize(buffer->data, (Py_ssize_t)buffer->size);
+}
+
+#pragma endregion
+#pragma region Values
+
+static bool
+parse_i64(const xmlChar *value_xml, int64_t *out) {
+  const char *str = (const char *)value_xml;
+  char *end;
+  errno = 0;
+  *out = strtoll(str, &end, 10);
+  if (UNLIKELY(errno || end == str || *end)) {
+    PyErr_Format(PyExc_ValueError, "Invalid integer value: '%s'", str);
+    return false;
+  }
+  return true;
+}
+
+static bool
+parse_f64(const xmlChar *value_xml, double *out) {
+  const char *str = (const char *)value_xml;
+  char *end;
+  errno = 0;
+  *out = strtod(str, &end);
+  if (UNLIKELY(errno || end == str || *end || !isfinite(*out))) {
+    PyErr_Format(PyExc_ValueError, "Invalid float value: '%s'", str);
+    return false;
+  }
+  return true;
+}
+
+static inline bool
+parse_digits(const char **p, int count, int *out) {
+  int value = 0;
+  for (int i = 0; i < count; i++) {
+    char c = (*p)[i];
+    if (UNLIKELY(c < '0' || c > '9'))
+      return false;
+    value = value * 10 + (c - '0');
+  }
+  *p += count;
+  *out = value;
+  return true;
+}
+
+// Days since 1970-01-01 of the proleptic Gregorian date.
+// http://howardhinnant.github.io/date_algorithms.html#days_from_civil
+static inline int64_t
+days_from_civil(int64_t y, int m, int d) {
+  y -= m <= 2;
+  int64_t era = (y >= 0 ? y : y - 399) / 400;
+  int64_t yoe = y - era * 400;
+  int64_t doy = (153 * (m > 2 ? m - 3 : m + 9) + 2) / 5 + d - 1;
+  int64_t doe = yoe * 365 + yoe / 4 - yoe / 100 + doy;
+  return era * 146097 + doe - 719468;
+}
+
+// Parse an ISO 8601 timestamp into milliseconds since the Unix epoch.
+// Naive timestamps are interpreted as UTC.
+static bool
+parse_timestamp_ms(const xmlChar *value_xml, int64_t *out) {
+  const char *str = (const char *)value_xml;
+  const char *p = str;
+  int year, month, day, hour, minute, second, ms = 0;
+
+  if (UNLIKELY(
+        !parse_digits(&p, 4, &year) || *p++ != '-' || //
+        !parse_digits(&p, 2, &month) || *p++ != '-' || //
+        !parse_digits(&p, 2, &day) || (*p != 'T' && *p != ' ')
+      ))
+    goto invalid;
+  p++;
+  if (UNLIKELY(
+        !parse_digits(&p, 2, &hour) || *p++ != ':' || //
+        !parse_digits(&p, 2, &minute) || *p++ != ':' || //
+        !parse_digits(&p, 2, &second) || //
+        month < 1 || month > 12 || day < 1 || day > 31 || hour > 23 || minute > 59 ||
+        second > 60
+      ))
+    goto invalid;
+
+  if (*p == '.') {
+    p++;
+    int scale = 100;
+    if (UNLIKELY(*p < '0' || *p > '9'))
+      goto invalid;
+    while (*p >= '0' && *p <= '9') {
+      ms += (*p++ - '0') * scale;
+      scale /= 10;
+    }
+  }
+
+  int64_t offset_minutes = 0;
+  if (*p == 'Z')
+    p++;
+  else if (*p == '+' || *p == '-') {
+    int sign = *p++ == '-' ? -1 : 1;
+    int offset_hour, offset_minute;
+    if (UNLIKELY(
+          !parse_digits(&p, 2, &offset_hour) || *p++ != ':' ||
+          !parse_digits(&p, 2, &offset_minute)
+        ))
+      goto invalid;
+    offset_minutes = sign * (offset_hour * 60 + offset_minute);
+  }
+  if (UNLIKELY(*p))
+    goto invalid;
+
+  int64_t seconds = days_from_civil(year, month, day) * 86400 + hour * 3600 +
+                    minute * 60 + second - offset_minutes * 60;
+  *out = seconds * 1000 + ms;
+  return true;
+
+invalid:
+  PyErr_Format(PyExc_ValueError, "Invalid timestamp value: '%s'", str);
+  return false;
+}
+
+static bool
+parse_element_type(const xmlChar *value_xml, uint64_t *out) {
+  const char *str = (const char *)value_xml;
+  if (!strcmp(str, "node"))
+    *out = NODE_TYPE_NUM;
+  else if (!strcmp(str, "way"))
+    *out = WAY_TYPE_NUM;
+  else if (!strcmp(str, "relation"))
+    *out = RELATION_TYPE_NUM;
+  else {
+    PyErr_Format(PyExc_ValueError, "Unsupported element type '%s'", str);
+    return false;
+  }
+  return true;
+}
+
+// Encode element type and id, the same as speedup.element_type.typed_element_id.
+static bool
+encode_typed_id(uint64_t type_num, int64_t id, int64_t *out) {
+  uint64_t result;
+  if (id < 0) {
+    if (UNLIKELY(id <= -(1LL << 56)))
+      goto overflow;
+    result = -id | SIGN_MASK;
+  } else {
+    if (UNLIKELY(id >= (1LL << 56)))
+      goto overflow;
+    result = id;
+  }
+  *out = (int64_t)(result | (type_num << 60));
+  return true;
+
+overflow:
+  PyErr_Format(
+    PyExc_OverflowError, "ElementId %lld is out of TypedElementId range", id
+  );
+  return false;
+}
+
+static bool
+append_str(PyObject *list, const xmlChar *value_xml) {
+  PyScoped value = PyUnicode_FromString((const char *)value_xml);
+  return value && PyList_Append(list, value) == 0;
+}
+
+#pragma endregion
+#pragma region Columns
+
+typedef struct {
+  Buffer changeset_id;
+  Buffer typed_id;
+  Buffer version;
+  Buffer visible;
+  Buffer lon;
+  Buffer lat;
+  Buffer created_at;
+  Buffer user_id;
+  Buffer has_user_id;
+  Buffer tags_offsets;
+  Buffer members_offsets;
+  Buffer members;
+  PyObject *display_name;
+  PyObject *tags_keys;
+  PyObject *tags_values;
+  PyObject *members_roles;
+  int64_t num_tags;
+  int64_t num_members;
+} Columns;
+
+static void
+columns_free(Columns *columns) {
+  buffer_free(&columns->changeset_id);
+  buffer_free(&columns->typed_id);
+  buffer_free(&columns->version);
+  buffer_free(&columns->visible);
+  buffer_free(&columns->lon);
+  buffer_free(&columns->lat);
+  buffer_free(&columns->created_at);
+  buffer_free(&columns->user_id);
+  buffer_free(&columns->has_user_id);
+  buffer_free(&columns->tags_offsets);
+  buffer_free(&columns->members_offsets);
+  buffer_free(&columns->members);
+  Py_XDECREF(columns->display_name);
+  Py_XDECREF(columns->tags_keys);
+  Py_XDECREF(columns->tags_values);
+  Py_XDECREF(columns->members_roles);
+}
+
+typedef struct {
+  uint64_t type_num;
+  int64_t id;
+  int64_t changeset_id;
+  int64_t version;
+  int64_t created_at;
+  int64_t user_id;
+  double lon;
+  double lat;
+  bool has_id;
+  bool has_changeset_id;
+  bool has_version;
+  bool has_created_at;
+  bool has_user_id;
+  bool has_display_name;
+  int64_t tags_start;
+  int64_t members_start;
+} Row;
+
+// Read the element attributes. Leaves the reader positioned on the element.
+static bool
+read_row(xmlTextReaderPtr reader, Columns *columns, uint64_t type_num, Row *row) {
+  *row = (Row){
+    .type_num = type_num,
+    .lon = NAN,
+    .lat = NAN,
+    .tags_start = columns->num_tags,
+    .members_start = columns->num_members,
+  };
+
+  while (xmlTextReaderMoveToNextAttribute(reader) == 1) {
+    const char *name = (const char *)xmlTextReaderConstLocalName(reader);
+    const xmlChar *value = xmlTextReaderConstValue(reader);
+    bool ok = true;
+
+    switch (name[0]) {
+    case 'c':
+      if (!strcmp(name, "changeset"))
+        ok = row->has_changeset_id = parse_i64(value, &row->changeset_id);
+      break;
+    case 'i':
+      if (!strcmp(name, "id"))
+        ok = row->has_id = parse_i64(value, &row->id);
+      break;
+    case 'l':
+      if (!strcmp(name, "lon"))
+        ok = parse_f64(value, &row->lon);
+      else if (!strcmp(name, "lat"))
+        ok = parse_f64(value, &row->lat);
+      break;
+    case 't':
+      if (!strcmp(name, "timestamp"))
+        ok = row->has_created_at = parse_timestamp_ms(value, &row->created_at);
+      break;
+    case 'u':
+      if (!strcmp(name, "uid"))
+        ok = row->has_user_id = parse_i64(value, &row->user_id);
+      else if (!strcmp(name, "user")) {
+        ok = append_str(columns->display_name, value);
+        row->has_display_name = true;
+      }
+      break;
+    case 'v':
+      if (!strcmp(name, "version"))
+        ok = row->has_version = parse_i64(value, &row->version);
+      break;
+    }
+    if (UNLIKELY(!ok))
+      return false;
+  }
+  xmlTextReaderMoveToElement(reader);
+
+  if (UNLIKELY(
+        !row->has_id || !row->has_changeset_id || !row->has_version ||
+        !row->has_created_at
+      )) {
+    PyErr_SetString(
+      PyExc_ValueError, "Element is missing id, changeset, version, or timestamp"
+    );
+    return false;
+  }
+  if (UNLIKELY(isnan(row->lon) != isnan(row->lat))) {
+    PyErr_SetString(PyExc_ValueError, "Node must have both lon and lat, or neither");
+    return false;
+  }
+  return true;
+}
+
+static bool
+finish_row(Columns *columns, const Row *row) {
+  int64_t typed_id;
+  if (UNLIKELY(!encode_typed_id(row->type_num, row->id, &typed_id)))
+    return false;
+
+  // Deleted elements have no tags, coordinates, or members
+  bool visible = columns->num_tags > row->tags_start || !isnan(row->lon) ||
+                 columns->num_members > row->members_start;
+
+  return buffer_append_i64(&columns->changeset_id, row->changeset_id) &&
+         buffer_append_i64(&columns->typed_id, typed_id) &&
+         buffer_append_i64(&columns->version, row->version) &&
+         buffer_append_bool(&columns->visible, visible) &&
+         buffer_append_f64(&columns->lon, row->lon) &&
+         buffer_append_f64(&columns->lat, row->lat) &&
+         buffer_append_i64(&columns->created_at, row->created_at) &&
+         buffer_append_i64(&columns->user_id, row->has_user_id ? row->user_id : 0) &&
+         buffer_append_bool(&columns->has_user_id, row->has_user_id) &&
+         (row->has_display_name ||
+          PyList_Append(columns->display_name, Py_None) == 0) &&
+         buffer_append_i64(&columns->tags_offsets, columns->num_tags) &&
+         buffer_append_i64(&columns->members_offsets, columns->num_members);
+}
+
+static bool
+read_tag(xmlTextReaderPtr reader, Columns *columns) {
+  const xmlChar *key = nullptr;
+  const xmlChar *value = nullptr;
+  PyScoped key_py = nullptr;
+
+  while (xmlTextReaderMoveToNextAttribute(reader) == 1) {
+    const char *name = (const char *)xmlTextReaderConstLocalName(reader);
+    if (name[0] == 'k' && !name[1]) {
+      key = xmlTextReaderConstValue(reader);
+      key_py = PyUnicode_FromString((const char *)key);
+      if (UNLIKELY(!key_py))
+        return false;
+    } else if (name[0] == 'v' && !name[1]) {
+      value = xmlTextReaderConstValue(reader);
+      if (UNLIKELY(!append_str(columns->tags_values, value)))
+        return false;
+    }
+  }
+  xmlTextReaderMoveToElement(reader);
+
+  if (UNLIKELY(!key || !value)) {
+    PyErr_SetString(PyExc_ValueError, "Tag is missing k or v");
+    return false;
+  }
+  if (UNLIKELY(PyList_Append(columns->tags_keys, key_py) < 0))
+    return false;
+  columns->num_tags++;
+  return true;
+}
+
+static bool
+read_member(xmlTextReaderPtr reader, Columns *columns, bool is_relation) {
+  uint64_t type_num = NODE_TYPE_NUM;
+  int64_t ref;
+  bool has_type = !is_relation;
+  bool has_ref = false;
+  bool has_role = !is_relation;
+
+  while (xmlTextReaderMoveToNextAttribute(reader) == 1) {
+    const char *name = (const char *)xmlTextReaderConstLocalName(reader);
+    const xmlChar *value = xmlTextReaderConstValue(reader);
+    bool ok = true;
+
+    if (!strcmp(name, "ref"))
+      ok = has_ref = parse_i64(value, &ref);
+    else if (is_relation && !strcmp(name, "type"))
+      ok = has_type = parse_element_type(value, &type_num);
+    else if (is_relation && !strcmp(name, "role")) {
+      ok = append_str(columns->members_roles, value);
+      has_role = true;
+    }
+    if (UNLIKELY(!ok))
+      return false;
+  }
+  xmlTextReaderMoveToElement(reader);
+
+  if (UNLIKELY(!has_ref || !has_type || !has_role)) {
+    PyErr_SetString(PyExc_ValueError, "Member is missing ref, type, or role");
+    return false;
+  }
+
+  int64_t typed_id;
+  if (UNLIKELY(
+        !encode_typed_id(type_num, ref, &typed_id) ||
+        !buffer_append_i64(&columns->members, typed_id) ||
+        (!is_relation && PyList_Append(columns->members_roles, Py_None) < 0)
+      ))
+    return false;
+  columns->num_members++;
+  return true;
+}
+
+static PyObject *
+columns_to_dict(const Columns *columns) {
+  PyScoped changeset_id = buffer_to_bytes(&columns->changeset_id);
+  PyScoped typed_id = buffer_to_bytes(&columns->typed_id);
+  PyScoped version = buffer_to_bytes(&columns->version);
+  PyScoped visible = buffer_to_bytes(&columns->visible);
+  PyScoped lon = buffer_to_bytes(&columns->lon);
+  PyScoped lat = buffer_to_bytes(&columns->lat);
+  PyScoped created_at = buffer_to_bytes(&columns->created_at);
+  PyScoped user_id = buffer_to_bytes(&columns->user_id);
+  PyScoped has_user_id = buffer_to_bytes(&columns->has_user_id);
+  PyScoped tags_offsets = buffer_to_bytes(&columns->tags_offsets);
+  PyScoped members_offsets = buffer_to_bytes(&columns->members_offsets);
+  PyScoped members = buffer_to_bytes(&columns->members);
+  PyScoped result = PyDict_New();
+  if (UNLIKELY(
+        !changeset_id || !typed_id || !version || !visible || !lon || !lat ||
+        !created_at || !user_id || !has_user_id || !tags_offsets ||
+        !members_offsets || !members || !result
+      ))
+    return nullptr;
+
+  if (UNLIKELY(
+        PyDict_SetItem(result, changeset_id_key, changeset_id) < 0 ||
+        PyDict_SetItem(result, typed_id_key, typed_id) < 0 ||
+        PyDict_SetItem(result, version_key, version) < 0 ||
+        PyDict_SetItem(result, visible_key, visible) < 0 ||
+        PyDict_SetItem(result, lon_key, lon) < 0 ||
+        PyDict_SetItem(result, lat_key, lat) < 0 ||
+        PyDict_SetItem(result, created_at_key, created_at) < 0 ||
+        PyDict_SetItem(result, user_id_key, user_id) < 0 ||
+        PyDict_SetItem(result, has_user_id_key, has_user_id) < 0 ||
+        PyDict_SetItem(result, display_name_key, columns->display_name) < 0 ||
+        PyDict_SetItem(result, tags_offsets_key, tags_offsets) < 0 ||
+        PyDict_SetItem(result, tags_keys_key, columns->tags_keys) < 0 ||
+        PyDict_SetItem(result, tags_values_key, columns->tags_values) < 0 ||
+        PyDict_SetItem(result, members_offsets_key, members_offsets) < 0 ||
+        PyDict_SetItem(result, members_key, members) < 0 ||
+        PyDict_SetItem(result, members_roles_key, columns->members_roles) < 0
+      ))
+    return nullptr;
+
+  Py_INCREF(result);
+  return result;
+}
+
+#pragma endregion
+
+static PyObject *
+osmchange_parse(PyObject *, PyObject *const *args, Py_ssize_t nargs) {
+  if (UNLIKELY(nargs != 1)) {
+    PyErr_BadArgument();
+    return nullptr;
+  }
+
+  Py_buffer view;
+  if (UNLIKELY(PyObject_GetBuffer(args[0], &view, PyBUF_SIMPLE) < 0))
+    return nullptr;
+  if (UNLIKELY(view.len > INT_MAX)) {
+    PyBuffer_Release(&view);
+    PyErr_SetString(PyExc_ValueError, "osmChange data is too large");
+    return nullptr;
+  }
+
+  xmlTextReaderPtr __attribute__((cleanup(xmlFreeTextReaderPtr))) reader =
+    xmlReaderForMemory(
+      view.buf, (int)view.len, nullptr, nullptr,
+      XML_PARSE_NOCDATA | XML_PARSE_COMPACT | XML_PARSE_NO_XXE | XML_PARSE_HUGE
+    );
+  if (UNLIKELY(!reader)) {
+    PyBuffer_Release(&view);
+    const xmlError *error = xmlGetLastError();
+    xmlResetLastError();
+    return PyErr_Format(
+      PyExc_ValueError, "Error initializing XML reader: %s",
+      error && error->message ? error->message : "Unknown error"
+    );
+  }
+
+  Columns __attribute__((cleanup(columns_free))) columns = {
+    .display_name = PyList_New(0),
+    .tags_keys = PyList_New(0),
+    .tags_values = PyList_New(0),
+    .members_roles = PyList_New(0),
+  };
+  bool ok = columns.display_name && columns.tags_keys && columns.tags_values &&
+            columns.members_roles && buffer_append_i64(&columns.tags_offsets, 0) &&
+            buffer_append_i64(&columns.members_offsets, 0);
+
+  // osmChange > action > element > tag/nd/member
+  Row row = {};
+  bool in_row = false;
+  int parse_ret = 0;
+  while (ok && (parse_ret = xmlTextReaderRead(reader)) == 1) {
+    if (xmlTextReaderNodeType(reader) != XML_READER_TYPE_ELEMENT)
+      continue;
+
+    int depth = xmlTextReaderDepth(reader);
+    const char *name = (const char *)xmlTextReaderConstLocalName(reader);
+
+    if (depth == 2) {
+      uint64_t type_num;
+      ok = (!in_row || finish_row(&columns, &row)) &&
+           parse_element_type((const xmlChar *)name, &type_num) &&
+           read_row(reader, &columns, type_num, &row);
+      in_row = true;
+    } else if (depth == 3 && in_row) {
+      if (!strcmp(name, "tag"))
+        ok = read_tag(reader, &columns);
+      else if (row.type_num == WAY_TYPE_NUM && !strcmp(name, "nd"))
+        ok = read_member(reader, &columns, false);
+      else if (row.type_num == RELATION_TYPE_NUM && !strcmp(name, "member"))
+        ok = read_member(reader, &columns, true);
+    } else if (depth == 0 && UNLIKELY(strcmp(name, "osmChange"))) {
+      PyErr_Format(PyExc_ValueError, "Expected osmChange root element, got '%s'", name);
+      ok = false;
+    }
+  }
+
+  if (ok && UNLIKELY(parse_ret < 0)) {
+    const xmlError *error = xmlGetLastError();
+    PyErr_Format(
+      PyExc_ValueError, "Error parsing XML: %s",
+      error && error->message ? error->message : "Unknown error"
+    );
+    ok = false;
+  }
+  if (ok && in_row)
+    ok = finish_row(&columns, &row);
+
+  PyBuffer_Release(&view);
+  if (UNLIKELY(!ok))
+    return nullptr;
+  return columns_to_dict(&columns);
+}
+
+static PyMethodDef methods[] = {
+  {
+    "osmchange_parse",
+    _PyCFunction_CAST(osmchange_parse),
+    METH_FASTCALL,
+    nullptr,
+  },
+  {nullptr, nullptr, 0, nullptr}
+};
+
+static struct PyModuleDef module = {
+  PyModuleDef_HEAD_INIT,
+  "speedup.osmchange_parse",
+  nullptr,
+  -1,
+  methods,
+  nullptr,
+  nullptr,
+  nullptr,
+  nullptr
+};
+
+PyMODINIT_FUNC
+PyInit_osmchange_parse(void) {
+  changeset_id_key = PyUnicode_InternFromString("changeset_id");
+  typed_id_key = PyUnicode_InternFromString("typed_id");
+  version_key = PyUnicode_InternFromString("version");
+  visible_key = PyUnicode_InternFromString("visible");
+  lon_key = PyUnicode_InternFromString("lon");
+  lat_key = PyUnicode_InternFromString("lat");
+  created_at_key = PyUnicode_InternFromString("created_at");
+  user_id_key = PyUnicode_InternFromString("user_id");
+  has_user_id_key = PyUnicode_InternFromString("has_user_id");
+  display_name_key = PyUnicode_InternFromString("display_name");
+  tags_offsets_key = PyUnicode_InternFromString("tags_offsets");
+  tags_keys_key = PyUnicode_InternFromString("tags_keys");
+  tags_values_key = PyUnicode_InternFromString("tags_values");
+  members_offsets_key = PyUnicode_InternFromString("members_offsets");
+  members_key = PyUnicode_InternFromString("members");
+  members_roles_key = PyUnicode_InternFromString("members_roles");
+
+  return PyModule_Create(&module);
+}
@@ -0,0 +1,11 @@
+from typing import Any
+
+from _typeshed import ReadableBuffer
+
+def osmchange_parse(data: ReadableBuffer, /) -> dict[str, Any]:
+    """
+    Parse osmChange XML directly into element columns, in document order.
+    Integer and float columns are returned as native-endian bytes,
+    variable-length values as flat lists with int64 offsets.
+    Elements without tags, coordinates, and members are not visible.
+    """
@@ -1,3 +1,4 @@
+#include "libxml/parser.h"
 #include "libxml/xmlreader.h"
 #include "libxml/xmlstring.h"
 #include <Python.h>
@@ -252,6 +253,247 @@ postprocess_value(const char *key, const xmlChar *value_xml) {
 
 #pragma endregion
 
+#pragma region Builder
+
+// Builds the dict tree from the element events of a parser.
+// In streaming mode, the children of the root element are collected as
+// (name, value) records instead of being merged into the root.
+typedef struct {
+  Stack stack;
+  StringCacheEntry *tag_cache;
+  StringCacheEntry *attr_cache;
+  PyObject *current_name;
+  PyObject *current_dict;
+  PyObject *current_list;
+  PyObject *result;
+  PyObject *records;
+} Builder;
+
+static bool
+builder_init(Builder *builder, bool streaming) {
+  *builder = (Builder){};
+  sh_new_arena(builder->tag_cache);
+  sh_new_arena(builder->attr_cache);
+  if (streaming) {
+    builder->records = PyList_New(0);
+    if (UNLIKELY(!builder->records))
+      return false;
+  }
+  return true;
+}
+
+static void
+builder_cleanup(Builder *builder) {
+  stack_cleanup(&builder->stack);
+  cache_cleanup(&builder->tag_cache);
+  cache_cleanup(&builder->attr_cache);
+  Py_CLEAR(builder->current_name);
+  Py_CLEAR(builder->current_dict);
+  Py_CLEAR(builder->current_list);
+  Py_CLEAR(builder->result);
+  Py_CLEAR(builder->records);
+}
+
+static bool
+builder_start(Builder *builder, const char *name) {
+  // Push to stack
+  if (LIKELY(builder->current_dict != nullptr) &&
+      UNLIKELY(!stack_push(
+        &builder->stack, builder->current_name, builder->current_dict,
+        builder->current_list
+      )))
+    return false;
+
+  builder->current_name = get_tag_name(&builder->tag_cache, name);
+  builder->current_dict = Py_None;
+  builder->current_list = Py_None;
+  if (UNLIKELY(!builder->current_name))
+    return false;
+  Py_INCREF(builder->current_name);
+  return true;
+}
+
+// Set an attribute value, or the text value if attr_name is nullptr.
+static bool
+builder_value(Builder *builder, const char *attr_name, const xmlChar *value_xml) {
+  if (builder->current_dict == Py_None) {
+    builder->current_dict = PyDict_New();
+    if (UNLIKELY(!builder->current_dict))
+      return false;
+  }
+
+  const char *postprocess_key = attr_name;
+  if (!postprocess_key) {
+    postprocess_key = PyUnicode_AsUTF8(builder->current_name);
+    if (UNLIKELY(!postprocess_key))
+      return false;
+  }
+
+  PyScoped value = postprocess_value(postprocess_key, value_xml);
+  if (UNLIKELY(!value)) {
+    PyErr_Format(
+      PyExc_ValueError, "Failed to postprocess '%s' value: '%s'", postprocess_key,
+      value_xml
+    );
+    return false;
+  }
+
+  PyObject *set_key;
+  if (attr_name) {
+    set_key = get_attr_key(&builder->attr_cache, attr_name);
+    if (UNLIKELY(!set_key))
+      return false;
+  } else {
+    set_key = text_key;
+  }
+
+  return !PyDict_SetItem(builder->current_dict, set_key, value);
+}
+
+static bool
+builder_end(Builder *builder) {
+  PyScoped parent_name = nullptr;
+  PyScoped current_result;
+
+  if (builder->current_dict == Py_None && builder->current_list == Py_None)
+    current_result = nullptr;
+  else if (builder->current_list == Py_None) {
+    // Handle potential text-only case
+    current_result = PyDict_GET_SIZE(builder->current_dict) == 1
+                       ? PyDict_GetItem(builder->current_dict, text_key)
+                       : nullptr;
+
+    if (current_result) {
+      Py_INCREF(current_result);
+      Py_CLEAR(builder->current_dict);
+    } else {
+      current_result = builder->current_dict;
+      builder->current_dict = nullptr;
+    }
+  } else if (builder->current_dict == Py_None) {
+    current_result = builder->current_list;
+    builder->current_list = nullptr;
+  } else { // current_dict != Py_None && current_list != Py_None
+    PyScoped items = PyDict_Items(builder->current_dict);
+    if (UNLIKELY(!items || PyList_Extend(builder->current_list, items)))
+      return false;
+
+    Py_CLEAR(builder->current_dict);
+    current_result = builder->current_list;
+    builder->current_list = nullptr;
+  }
+
+  if (UNLIKELY(!builder->stack.depth)) {
+    // Finished parsing, wrap in a dict (an empty root element is None)
+    builder->result = PyDict_New();
+    return builder->result &&
+           !PyDict_SetItem(
+             builder->result, builder->current_name,
+             current_result ? current_result : Py_None
+           );
+  }
+
+  // Pop from stack
+  if (UNLIKELY(!stack_pop(
+        &builder->stack, &parent_name, &builder->current_dict, &builder->current_list
+      )))
+    return false;
+  if (!current_result)
+    goto merge_ok;
+
+  // Collect the root children in streaming mode
+  if (builder->records && !builder->stack.depth) {
+    PyScoped tuple = PyTuple_Pack(2, builder->current_name, current_result);
+    if (UNLIKELY(!tuple || PyList_Append(builder->records, tuple)))
+      return false;
+
+    goto merge_ok;
+  }
+
+  // Append in "items" mode
+  const char *current_name_c = PyUnicode_AsUTF8(builder->current_name);
+  if (UNLIKELY(!current_name_c))
+    return false;
+  if (in_set(
+        current_name_c, sizeof(force_items_set) / sizeof(char *), force_items_set
+      )) {
+    if (builder->current_list == Py_None) {
+      builder->current_list = PyList_New(LIST_PREALLOC_SIZE);
+      if (UNLIKELY(!builder->current_list))
+        return false;
+      Py_SET_SIZE(builder->current_list, 0);
+    }
+
+    PyScoped tuple = PyTuple_Pack(2, builder->current_name, current_result);
+    if (UNLIKELY(!tuple || PyList_Append(builder->current_list, tuple)))
+      return false;
+
+    goto merge_ok;
+  }
+
+  // Merge with existing value
+  PyObject *existing_result =
+    builder->current_dict != Py_None
+      ? PyDict_GetItem(builder->current_dict, builder->current_name)
+      : nullptr;
+  if (existing_result) {
+    if (PyList_CheckExact(existing_result)) {
+      if (UNLIKELY(PyList_Append(existing_result, current_result)))
+        return false;
+    } else {
+      // Upgrade to a list
+      PyScoped list = PyList_New(LIST_PREALLOC_SIZE);
+      if (UNLIKELY(!list))
+        return false;
+
+      static_assert(LIST_PREALLOC_SIZE >= 2);
+      Py_SET_SIZE(list, 2);
+      Py_INCREF(existing_result);
+      Py_INCREF(current_result);
+      PyList_SET_ITEM(list, 0, existing_result);
+      PyList_SET_ITEM(list, 1, current_result);
+
+      if (UNLIKELY(PyDict_SetItem(builder->current_dict, builder->current_name, list)))
+        return false;
+    }
+
+    goto merge_ok;
+  }
+
+  // Append new value
+  if (builder->current_dict == Py_None) {
+    builder->current_dict = PyDict_New();
+    if (UNLIKELY(!builder->current_dict))
+      return false;
+  }
+
+  // Optionally wrap in a list
+  if (in_set(
+        current_name_c, sizeof(force_list_set) / sizeof(char *), force_list_set
+      )) {
+    PyObject *list = PyList_New(LIST_PREALLOC_SIZE);
+    if (UNLIKELY(!list))
+      return false;
+
+    static_assert(LIST_PREALLOC_SIZE >= 1);
+    Py_SET_SIZE(list, 1);
+    PyList_SET_ITEM(list, 0, current_result);
+    current_result = list;
+  }
+
+  if (UNLIKELY(
+        PyDict_SetItem(builder->current_dict, builder->current_name, current_result)
+      ))
+    return false;
+
+merge_ok:
+  Py_SETREF(builder->current_name, parent_name);
+  parent_name = nullptr;
+  return true;
+}
+
+#pragma endregion
+
 static PyObject *
 xml_parse(const PyObject *, PyObject *const *args, Py_ssize_t nargs) {
   if (UNLIKELY(PyVectorcall_NARGS(nargs) != 1 || !PyBytes_CheckExact(args[0]))) {
@@ -280,202 +522,38 @@ xml_parse(const PyObject *, PyObject *const *args, Py_ssize_t nargs) {
     );
   }
 
-  Stack __attribute__((cleanup(stack_cleanup))) stack = {};
-  StringCacheEntry *__attribute__((cleanup(cache_cleanup))) tag_cache;
-  sh_new_arena(tag_cache);
-  StringCacheEntry *__attribute__((cleanup(cache_cleanup))) attr_cache;
-  sh_new_arena(attr_cache);
-
-  PyScoped parent_name = nullptr;
-  PyScoped current_name = nullptr;
-  PyScoped current_dict = nullptr;
-  PyScoped current_list = nullptr;
-  PyObject *result = nullptr;
+  Builder __attribute__((cleanup(builder_cleanup))) builder;
+  if (UNLIKELY(!builder_init(&builder, false)))
+    return nullptr;
 
   auto parse_ret = xmlTextReaderRead(reader);
   auto node_type = xmlTextReaderNodeType(reader);
   while (LIKELY(parse_ret == 1)) {
     switch (node_type) {
-    case XML_READER_TYPE_ELEMENT: {
-      // Push to stack
-      if (LIKELY(current_dict != nullptr) &&
-          UNLIKELY(!stack_push(&stack, current_name, current_dict, current_list)))
+    case XML_READER_TYPE_ELEMENT:
+      if (UNLIKELY(!builder_start(
+            &builder, (const char *)xmlTextReaderConstLocalName(reader)
+          )))
         return nullptr;
-
-      current_name =
-        get_tag_name(&tag_cache, (const char *)xmlTextReaderConstLocalName(reader));
-      current_dict = Py_None;
-      current_list = Py_None;
-      if (UNLIKELY(!current_name))
-        return nullptr;
-      Py_INCREF(current_name);
       break;
-    }
-    case XML_READER_TYPE_END_ELEMENT: {
-      PyScoped current_result;
-
-      if (current_dict == Py_None && current_list == Py_None)
-        current_result = nullptr;
-      else if (current_list == Py_None) {
-        // Handle potential text-only case
-        current_result = PyDict_GET_SIZE(current_dict) == 1
-                           ? PyDict_GetItem(current_dict, text_key)
-                           : nullptr;
-
-        if (current_result) {
-          Py_INCREF(current_result);
-          Py_CLEAR(current_dict);
-        } else {
-          current_result = current_dict;
-          current_dict = nullptr;
-        }
-      } else if (current_dict == Py_None) {
-        current_result = current_list;
-        current_list = nullptr;
-      } else { // current_dict != Py_None && current_list != Py_None
-        PyScoped items = PyDict_Items(current_dict);
-        if (UNLIKELY(!items || PyList_Extend(current_list, items)))
-          return nullptr;
-
-        Py_CLEAR(current_dict);
-        current_result = current_list;
-        current_list = nullptr;
-      }
-
-      if (LIKELY(stack.depth)) {
-        // Pop from stack
-        if (UNLIKELY(!stack_pop(&stack, &parent_name, &current_dict, &current_list)))
-          return nullptr;
-        if (!current_result)
-          goto merge_ok;
-
-        // Append in "items" mode
-        const char *current_name_c = PyUnicode_AsUTF8(current_name);
-        if (UNLIKELY(!current_name_c))
-          return nullptr;
-        if (in_set(
-              current_name_c, sizeof(force_items_set) / sizeof(char *), force_items_set
-            )) {
-          if (current_list == Py_None) {
-            current_list = PyList_New(LIST_PREALLOC_SIZE);
-            if (UNLIKELY(!current_list))
-              return nullptr;
-            Py_SET_SIZE(current_list, 0);
-          }
-
-          PyScoped tuple = PyTuple_Pack(2, current_name, current_result);
-          if (UNLIKELY(!tuple || PyList_Append(current_list, tuple)))
-            return nullptr;
-
-          goto merge_ok;
-        }
-
-        // Merge with existing value
-        PyObject *existing_result = current_dict != Py_None
-                                      ? PyDict_GetItem(current_dict, current_name)
-                                      : nullptr;
-        if (existing_result) {
-          if (PyList_CheckExact(existing_result)) {
-            if (UNLIKELY(PyList_Append(existing_result, current_result)))
-              return nullptr;
-          } else {
-            // Upgrade to a list
-            PyScoped list = PyList_New(LIST_PREALLOC_SIZE);
-            if (UNLIKELY(!list))
-              return nullptr;
-
-            static_assert(LIST_PREALLOC_SIZE >= 2);
-            Py_SET_SIZE(list, 2);
-            Py_INCREF(existing_result);
-            Py_INCREF(current_result);
-            PyList_SET_ITEM(list, 0, existing_result);
-            PyList_SET_ITEM(list, 1, current_result);
-
-            if (UNLIKELY(PyDict_SetItem(current_dict, current_name, list)))
-              return nullptr;
-          }
-
-          goto merge_ok;
-        }
-
-        // Append new value
-        if (current_dict == Py_None) {
-          current_dict = PyDict_New();
-          if (UNLIKELY(!current_dict))
-            return nullptr;
-        }
-
-        // Optionally wrap in a list
-        if (in_set(
-              current_name_c, sizeof(force_list_set) / sizeof(char *), force_list_set
-            )) {
-          PyObject *list = PyList_New(LIST_PREALLOC_SIZE);
-          if (UNLIKELY(!list))
-            return nullptr;
-
-          static_assert(LIST_PREALLOC_SIZE >= 1);
-          Py_SET_SIZE(list, 1);
-          PyList_SET_ITEM(list, 0, current_result);
-          current_result = list;
-        }
-
-        if (UNLIKELY(PyDict_SetItem(current_dict, current_name, current_result)))
-          return nullptr;
-
-merge_ok:
-        Py_SETREF(current_name, parent_name);
-        parent_name = nullptr;
-      } else {
-        // Finished parsing, wrap in a dict
-        result = PyDict_New();
-        if (UNLIKELY(!result || PyDict_SetItem(result, current_name, current_result)))
-          return nullptr;
-
+    case XML_READER_TYPE_END_ELEMENT:
+      if (UNLIKELY(!builder_end(&builder)))
+        return nullptr;
+      if (builder.result)
         goto ok;
-      }
       break;
-    }
     case XML_READER_TYPE_ATTRIBUTE:
-    case XML_READER_TYPE_TEXT: {
-      if (current_dict == Py_None) {
-        current_dict = PyDict_New();
-        if (UNLIKELY(!current_dict))
-          return nullptr;
-      }
-
-      const char *postprocess_key;
-      if (node_type == XML_READER_TYPE_ATTRIBUTE)
-        postprocess_key = (const char *)xmlTextReaderConstLocalName(reader);
-      else {
-        postprocess_key = PyUnicode_AsUTF8(current_name);
-        if (UNLIKELY(!postprocess_key))
-          return nullptr;
-      }
-
-      const xmlChar *value_xml = xmlTextReaderConstValue(reader);
-      PyScoped value = postprocess_value(postprocess_key, value_xml);
-      if (UNLIKELY(!value)) {
-        PyErr_Format(
-          PyExc_ValueError, "Failed to postprocess '%s' value: '%s'", postprocess_key,
-          value_xml
-        );
+      if (UNLIKELY(!builder_value(
+            &builder, (const char *)xmlTextReaderConstLocalName(reader),
+            xmlTextReaderConstValue(reader)
+          )))
         return nullptr;
-      }
-
-      PyObject *set_key;
-      if (node_type == XML_READER_TYPE_ATTRIBUTE) {
-        set_key = get_attr_key(&attr_cache, postprocess_key);
-        if (UNLIKELY(!set_key))
-          return nullptr;
-      } else { // XML_READER_TYPE_TEXT
-        set_key = text_key;
-      }
-
-      if (UNLIKELY(PyDict_SetItem(current_dict, set_key, value)))
+      break;
+    case XML_READER_TYPE_TEXT:
+      if (UNLIKELY(!builder_value(&builder, nullptr, xmlTextReaderConstValue(reader))))
         return nullptr;
       break;
     }
-    }
 
     // Iterate to the next node.
     if (node_type == XML_READER_TYPE_ELEMENT ||
@@ -510,17 +588,278 @@ merge_ok:
   }
 
 ok:
-  if (UNLIKELY(stack.depth || (!result && current_dict))) {
+  if (UNLIKELY(
+        builder.stack.depth || (!builder.result && builder.current_dict)
+      )) {
     PyErr_SetString(PyExc_AssertionError, "Stack is not empty after parsing");
     return nullptr;
   }
-  if (UNLIKELY(!result)) {
+  if (UNLIKELY(!builder.result)) {
     PyErr_SetString(PyExc_ValueError, "Document is empty");
     return nullptr;
   }
+  PyObject *result = builder.result;
+  builder.result = nullptr;
   return result;
 }
 
+#pragma region XMLStreamParser
+
+typedef struct {
+  PyObject_HEAD xmlParserCtxtPtr ctxt;
+  Builder builder;
+  bool failed;
+  bool closed;
+  xmlChar *text;
+  size_t text_size;
+  size_t text_capacity;
+  xmlChar *value;
+  size_t value_capacity;
+} XMLStreamParserObject;
+
+static void
+stream_stop(XMLStreamParserObject *self) {
+  self->failed = true;
+  xmlStopParser(self->ctxt);
+}
+
+// Copy the value into a NUL-terminated buffer owned by the parser.
+static const xmlChar *
+stream_value(XMLStreamParserObject *self, const xmlChar *value, size_t size) {
+  if (UNLIKELY(size + 1 > self->value_capacity)) {
+    size_t capacity = self->value_capacity ? self->value_capacity : 256;
+    while (capacity < size + 1)
+      capacity *= 2;
+    xmlChar *data = PyMem_Realloc(self->value, capacity);
+    if (UNLIKELY(!data)) {
+      PyErr_NoMemory();
+      return nullptr;
+    }
+    self->value = data;
+    self->value_capacity = capacity;
+  }
+  memcpy(self->value, value, size);
+  self->value[size] = '\0';
+  return self->value;
+}
+
+// Set the pending text, unless it is whitespace only, like the text reader does.
+static bool
+stream_flush_text(XMLStreamParserObject *self) {
+  auto size = self->text_size;
+  if (!size)
+    return true;
+  self->text_size = 0;
+
+  for (size_t i = 0; i < size; i++) {
+    auto c = self->text[i];
+    if (c != ' ' && c != '\t' && c != '\n' && c != '\r') {
+      const xmlChar *value = stream_value(self, self->text, size);
+      return value && builder_value(&self->builder, nullptr, value);
+    }
+  }
+  return true;
+}
+
+static void
+stream_start_element(
+  void *ctx, const xmlChar *localname, const xmlChar *, const xmlChar *,
+  int nb_namespaces, const xmlChar **namespaces, int nb_attributes, int,
+  const xmlChar **attributes
+) {
+  XMLStreamParserObject *self = ((xmlParserCtxtPtr)ctx)->_private;
+  if (UNLIKELY(
+        !stream_flush_text(self) ||
+        !builder_start(&self->builder, (const char *)localname)
+      )) {
+    stream_stop(self);
+    return;
+  }
+
+  // Namespace declarations are visited first, like the text reader does
+  for (int i = 0; i < nb_namespaces; i++) {
+    const xmlChar *prefix = namespaces[i * 2];
+    const xmlChar *uri = namespaces[i * 2 + 1];
+    if (UNLIKELY(!builder_value(
+          &self->builder, prefix ? (const char *)prefix : "xmlns",
+          uri ? uri : BAD_CAST ""
+        ))) {
+      stream_stop(self);
+      return;
+    }
+  }
+
+  // Attributes are (localname, prefix, URI, value, end) tuples
+  for (int i = 0; i < nb_attributes; i++) {
+    const xmlChar **attribute = attributes + i * 5;
+    const xmlChar *value =
+      stream_value(self, attribute[3], (size_t)(attribute[4] - attribute[3]));
+    if (UNLIKELY(
+          !value ||
+          !builder_value(&self->builder, (const char *)attribute[0], value)
+        )) {
+      stream_stop(self);
+      return;
+    }
+  }
+}
+
+static void
+stream_end_element(void *ctx, const xmlChar *, const xmlChar *, const xmlChar *) {
+  XMLStreamParserObject *self = ((xmlParserCtxtPtr)ctx)->_private;
+  if (UNLIKELY(!stream_flush_text(self) || !builder_end(&self->builder)))
+    stream_stop(self);
+}
+
+static void
+stream_characters(void *ctx, const xmlChar *ch, int len) {
+  XMLStreamParserObject *self = ((xmlParserCtxtPtr)ctx)->_private;
+  auto size = self->text_size + (size_t)len;
+  if (size > self->text_capacity) {
+    size_t capacity = self->text_capacity ? self->text_capacity : 256;
+    while (capacity < size)
+      capacity *= 2;
+    xmlChar *data = PyMem_Realloc(self->text, capacity);
+    if (UNLIKELY(!data)) {
+      PyErr_NoMemory();
+      stream_stop(self);
+      return;
+    }
+    self->text = data;
+    self->text_capacity = capacity;
+  }
+  memcpy(self->text + self->text_size, ch, (size_t)len);
+  self->text_size = size;
+}
+
+static void
+stream_error(void *, const xmlError *) {
+  // Errors are reported from the parser context
+}
+
+static PyObject *
+XMLStreamParser_new(PyTypeObject *type, PyObject *args, PyObject *kwargs) {
+  static char *kwlist[] = {nullptr};
+  if (UNLIKELY(!PyArg_ParseTupleAndKeywords(args, kwargs, ":XMLStreamParser", kwlist)))
+    return nullptr;
+
+  XMLStreamParserObject *self = (XMLStreamParserObject *)type->tp_alloc(type, 0);
+  if (UNLIKELY(!self))
+    return nullptr;
+
+  if (UNLIKELY(!builder_init(&self->builder, true))) {
+    Py_DECREF(self);
+    return nullptr;
+  }
+
+  xmlSAXHandler sax = {
+    .initialized = XML_SAX2_MAGIC,
+    .startElementNs = stream_start_element,
+    .endElementNs = stream_end_element,
+    .characters = stream_characters,
+    .serror = stream_error,
+  };
+  self->ctxt = xmlCreatePushParserCtxt(&sax, nullptr, nullptr, 0, nullptr);
+  if (UNLIKELY(!self->ctxt)) {
+    Py_DECREF(self);
+    return PyErr_NoMemory();
+  }
+  self->ctxt->_private = self;
+  // Entities must be substituted in SAX mode, otherwise attribute values
+  // keep the &#38; escapes. External entities remain disabled.
+  xmlCtxtUseOptions(
+    self->ctxt,
+    XML_PARSE_NOENT | XML_PARSE_NOCDATA | XML_PARSE_COMPACT | XML_PARSE_NO_XXE
+  );
+  // TODO: 2.14 XML_PARSE_NO_SYS_CATALOG
+  return (PyObject *)self;
+}
+
+static void
+XMLStreamParser_dealloc(XMLStreamParserObject *self) {
+  if (self->ctxt)
+    xmlFreeParserCtxt(self->ctxt);
+  builder_cleanup(&self->builder);
+  PyMem_Free(self->text);
+  PyMem_Free(self->value);
+  Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+// Parse the chunk and return the records completed so far.
+static PyObject *
+stream_parse(XMLStreamParserObject *self, const char *data, int size, bool terminate) {
+  if (UNLIKELY(self->closed || self->failed)) {
+    PyErr_SetString(PyExc_ValueError, "Parser is closed");
+    return nullptr;
+  }
+
+  auto parse_ret = xmlParseChunk(self->ctxt, data, size, terminate);
+  if (UNLIKELY(self->failed))
+    return nullptr;
+  if (UNLIKELY(parse_ret || !self->ctxt->wellFormed)) {
+    self->failed = true;
+    const xmlError *error = xmlCtxtGetLastError(self->ctxt);
+    return PyErr_Format(
+      PyExc_ValueError, "Error parsing XML: %s",
+      error && error->message ? error->message : "Unknown error"
+    );
+  }
+
+  if (terminate) {
+    self->closed = true;
+    if (UNLIKELY(!self->builder.result)) {
+      PyErr_SetString(PyExc_ValueError, "Document is empty");
+      return nullptr;
+    }
+  }
+
+  PyObject *records = self->builder.records;
+  self->builder.records = PyList_New(0);
+  if (UNLIKELY(!self->builder.records)) {
+    self->builder.records = records;
+    return nullptr;
+  }
+  return records;
+}
+
+static PyObject *
+XMLStreamParser_feed(XMLStreamParserObject *self, PyObject *arg) {
+  Py_buffer view;
+  if (UNLIKELY(PyObject_GetBuffer(arg, &view, PyBUF_SIMPLE) < 0))
+    return nullptr;
+  if (UNLIKELY(view.len > INT_MAX)) {
+    PyBuffer_Release(&view);
+    PyErr_SetString(PyExc_ValueError, "Chunk is too large");
+    return nullptr;
+  }
+
+  PyObject *result = stream_parse(self, view.buf, (int)view.len, false);
+  PyBuffer_Release(&view);
+  return result;
+}
+
+static PyObject *
+XMLStreamParser_close(XMLStreamParserObject *self, PyObject *) {
+  return stream_parse(self, nullptr, 0, true);
+}
+
+static PyMethodDef XMLStreamParser_methods[] = {
+  {"feed", (PyCFunction)XMLStreamParser_feed, METH_O, nullptr},
+  {"close", (PyCFunction)XMLStreamParser_close, METH_NOARGS, nullptr},
+  {nullptr, nullptr, 0, nullptr},
+};
+
+static PyTypeObject XMLStreamParserType = {
+  PyVarObject_HEAD_INIT(nullptr, 0).tp_name = "speedup.xml_parse.XMLStreamParser",
+  .tp_basicsize = sizeof(XMLStreamParserObject),
+  .tp_flags = Py_TPFLAGS_DEFAULT | Py_TPFLAGS_IMMUTABLETYPE,
+  .tp_new = XMLStreamParser_new,
+  .tp_dealloc = (destructor)XMLStreamParser_dealloc,
+  .tp_methods = XMLStreamParser_methods,
+};
+
+#pragma endregion
+
 static PyMethodDef methods[] = {
   {"xml_parse", _PyCFunction_CAST(xml_parse), METH_FASTCALL, nullptr},
   {nullptr, nullptr, 0, nullptr},
@@ -549,5 +888,10 @@ PyInit_xml_parse(void) {
 
   text_key = PyUnicode_InternFromString("#text");
 
-  return PyModule_Create(&module);
+  PyObject *m = PyModule_Create(&module);
+
+  PyType_Ready(&XMLStreamParserType);
+  PyModule_Add(m, "XMLStreamParser", (PyObject *)&XMLStreamParserType);
+
+  return m;
 }
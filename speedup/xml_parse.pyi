@@ -1,3 +1,15 @@
 from typing import Any
 
 def xml_parse(xml: bytes, /) -> dict[str, Any]: ...
+
+class XMLStreamParser:
+    """
+    Incremental XML parser.
+    Yields the root element children as (name, value) records once they are complete.
+    """
+
+    def feed(self, data: bytes, /) -> list[tuple[str, Any]]:
+        """Parse the next chunk of data and return the completed records."""
+
+    def close(self) -> list[tuple[str, Any]]:
+        """Finish parsing and return the remaining records."""
@@ -1,4 +1,5 @@
 #include "libxml/tree.h"
+#include "libxml/xmlIO.h"
 #include "libxml/xmlstring.h"
 #include <Python.h>
 #include <datetime.h>
@@ -343,15 +344,50 @@ unparse_element(
 
 #pragma endregion
 
+// Serialize the children of the root element, without the XML declaration.
+// This allows the caller to stream large documents in independent parts.
+static PyObject *
+unparse_fragment(xmlDocPtr doc, xmlNodePtr root, bool binary) {
+  // UTF-8 is the internal encoding: no output conversion is needed,
+  // but the document encoding must be set to avoid escaping non-ASCII characters
+  if (!doc->encoding)
+    doc->encoding = xmlStrdup(BAD_CAST "UTF-8");
+  xmlOutputBufferPtr out = xmlAllocOutputBuffer(nullptr);
+  if (UNLIKELY(!doc->encoding || !out)) {
+    PyErr_NoMemory();
+    if (out)
+      xmlOutputBufferClose(out);
+    return nullptr;
+  }
+
+  for (xmlNodePtr child = root ? root->children : nullptr; child; child = child->next)
+    xmlNodeDumpOutput(out, doc, child, 0, 0, "UTF-8");
+
+  if (UNLIKELY(xmlOutputBufferFlush(out) < 0 || out->error)) {
+    PyErr_SetString(PyExc_ValueError, "Error unparsing XML fragment");
+    xmlOutputBufferClose(out);
+    return nullptr;
+  }
+
+  const char *content = (const char *)xmlOutputBufferGetContent(out);
+  auto size = (Py_ssize_t)xmlOutputBufferGetSize(out);
+  PyObject *result = binary ? PyBytes_FromStringAndSize(content, size)
+                            : PyUnicode_FromStringAndSize(content, size);
+  xmlOutputBufferClose(out);
+  return result;
+}
+
 static PyObject *
 xml_unparse(const PyObject *, PyObject *const *args, Py_ssize_t nargs) {
+  auto nargs_ = PyVectorcall_NARGS(nargs);
   if (UNLIKELY(
-        PyVectorcall_NARGS(nargs) != 2 || !PyDict_CheckExact(args[0]) ||
-        !PyBool_Check(args[1])
+        (nargs_ != 2 && nargs_ != 3) || !PyDict_CheckExact(args[0]) ||
+        !PyBool_Check(args[1]) || (nargs_ == 3 && !PyBool_Check(args[2]))
       )) {
     PyErr_BadArgument();
     return nullptr;
   }
+  auto fragment = nargs_ == 3 && Py_IsTrue(args[2]);
   if (UNLIKELY(PyDict_GET_SIZE(args[0]) != 1)) {
     PyErr_SetString(PyExc_ValueError, "Invalid root element count");
     return nullptr;
@@ -394,7 +430,16 @@ xml_unparse(const PyObject *, PyObject *const *args, Py_ssize_t nargs) {
     return nullptr;
   }
 
-  xmlDocSetRootElement(doc, xmlGetLastChild(dummy));
+  xmlNodePtr root = xmlGetLastChild(dummy);
+  xmlDocSetRootElement(doc, root);
+
+  if (fragment) {
+    PyObject *result = unparse_fragment(doc, root, Py_IsTrue(args[1]));
+    xmlFreeDoc(doc);
+    dummy->children = nullptr;
+    xmlFreeNode(dummy);
+    return result;
+  }
 
   xmlChar *doc_str;
   int doc_size = 0;
@@ -3,4 +3,11 @@ from typing import Any
 class CDATA:
     def __init__(self, text: str, /) -> None: ...
 
-def xml_unparse(root: dict[str, Any], binary: bool, /) -> str | bytes: ...
+def xml_unparse(
+    root: dict[str, Any], binary: bool, fragment: bool = False, /
+) -> str | bytes:
+    """
+    Unparse a dict into an XML document.
+    In fragment mode, only the children of the root element are returned,
+    without the XML declaration.
+    """
@@ -6,13 +6,17 @@ from httpx import AsyncClient
 from starlette import status
 
 from app.config import (
+    ELEMENT_WAY_MEMBERS_LIMIT,
     LEGACY_HIGH_PRECISION_TIME,
+    STREAM_RESPONSE_BATCH_SIZE,
     TAGS_KEY_MAX_LENGTH,
     TAGS_LIMIT,
     TAGS_MAX_SIZE,
 )
 from app.format import Format06
+from app.lib.pbf import PBF
 from app.lib.xmltodict import XMLToDict
+from app.models.types import ChangesetId
 from tests.utils.assert_model import assert_model
 
 
@@ -165,6 +169,154 @@ async def test_changeset_upload(client: AsyncClient):
     )
 
 
+async def test_changeset_download_streamed(client: AsyncClient):
+    client.headers['Authorization'] = 'User user1'
+    num_nodes = STREAM_RESPONSE_BATCH_SIZE * 2 + 1
+
+    # Create a changeset
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse({
+            'osm': {
+                'changeset': {
+                    'tag': [
+                        {
+                            '@k': 'created_by',
+                            '@v': test_changeset_download_streamed.__name__,
+                        }
+                    ]
+                }
+            }
+        }),
+    )
+    assert r.is_success, r.text
+    changeset_id = int(r.text)
+
+    # Upload enough changes to span multiple batches
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {
+                'create': [
+                    ('node', {'@id': -i, '@lat': 0, '@lon': 0})
+                    for i in range(1, num_nodes + 1)
+                ]
+            }
+        }),
+    )
+    assert r.is_success, r.text
+
+    # Download the changeset
+    r = await client.get(f'/api/0.6/changeset/{changeset_id}/download')
+    assert r.is_success, r.text
+    changes = XMLToDict.parse(r.content, size_limit=None)['osmChange']
+    nodes = [value['node'] for key, value in changes if key == 'create']  # type: ignore
+
+    assert len(nodes) == num_nodes
+    assert all(node['@user'] == 'user1' for node in nodes)
+    ids = [node['@id'] for node in nodes]
+    assert ids == sorted(ids)
+
+
+async def test_changeset_download_pbf(client: AsyncClient, tmp_path):
+    client.headers['Authorization'] = 'User user1'
+
+    # Create a changeset
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse({
+            'osm': {
+                'changeset': {
+                    'tag': [
+                        {
+                            '@k': 'created_by',
+                            '@v': test_changeset_download_pbf.__name__,
+                        }
+                    ]
+                }
+            }
+        }),
+    )
+    assert r.is_success, r.text
+    changeset_id = int(r.text)
+
+    # Upload nodes and a way referencing them, then modify a node and delete the way
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': [
+                (
+                    'create',
+                    [
+                        ('node', {'@id': -1, '@lat': 1, '@lon': 2}),
+                        ('node', {'@id': -2, '@lat': 3, '@lon': 4}),
+                        (
+                            'way',
+                            {
+                                '@id': -1,
+                                'nd': [{'@ref': -1}, {'@ref': -2}],
+                                'tag': [{'@k': 'highway', '@v': 'path'}],
+                            },
+                        ),
+                    ],
+                ),
+                (
+                    'modify',
+                    [
+                        (
+                            'node',
+                            {
+                                '@id': -1,
+                                '@version': 1,
+                                '@lat': 5,
+                                '@lon': 6,
+                            },
+                        )
+                    ],
+                ),
+                ('delete', [('way', {'@id': -1, '@version': 1})]),
+            ]
+        }),
+    )
+    assert r.is_success, r.text
+
+    # Download the changeset
+    r = await client.get(f'/api/0.6/changeset/{changeset_id}/download.pbf')
+    assert r.is_success, r.text
+    assert r.headers['Content-Type'] == 'application/x-protobuf'
+
+    path = tmp_path.joinpath('download.osc.pbf')
+    path.write_bytes(r.content)
+    elements = []
+    with path.open('rb') as f:
+        for offset, size in PBF.blob_ranges(path):
+            f.seek(offset)
+            elements.extend(PBF.decode_blob(f.read(size)))
+
+    assert [element['point'] for element in elements] == [
+        (2, 1),
+        (4, 3),
+        None,
+        (6, 5),
+        None,
+    ]
+
+    # The osmChange actions are implied by the version and the visible flag
+    assert [
+        'create'
+        if element['version'] == 1
+        else ('modify' if element['visible'] else 'delete')
+        for element in elements
+    ] == ['create', 'create', 'create', 'modify', 'delete']
+    assert all(element['changeset_id'] == changeset_id for element in elements)
+    assert all(element['display_name'] == 'user1' for element in elements)
+    assert elements[2]['members'] == [
+        elements[0]['typed_id'],
+        elements[1]['typed_id'],
+    ]
+    assert elements[2]['tags'] == {'highway': 'path'}
+
+
 @pytest.mark.parametrize('include', [True, False])
 async def test_changeset_with_discussion(client: AsyncClient, include):
     client.headers['Authorization'] = 'User user1'
@@ -412,3 +564,103 @@ async def test_changesets_tags_size(client: AsyncClient, num_tags, should_succee
         assert r.is_success, r.text
     else:
         assert r.status_code == status.HTTP_400_BAD_REQUEST, r.text
+
+
+@pytest.mark.parametrize(
+    ('num_nodes', 'should_succeed'),
+    [
+        (ELEMENT_WAY_MEMBERS_LIMIT, True),  # At limit
+        (ELEMENT_WAY_MEMBERS_LIMIT + 1, False),  # Too many members
+    ],
+)
+async def test_changeset_upload_way_members_limit(
+    client: AsyncClient, changeset_id: ChangesetId, num_nodes, should_succeed
+):
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {
+                'create': [
+                    ('node', {'@id': -1, '@lat': 0, '@lon': 0}),
+                    ('way', {'@id': -1, 'nd': [{'@ref': -1}] * num_nodes}),
+                ]
+            }
+        }),
+    )
+
+    if should_succeed:
+        assert r.is_success, r.text
+    else:
+        assert r.status_code == status.HTTP_400_BAD_REQUEST, r.text
+
+
+@pytest.mark.parametrize(
+    ('role', 'should_succeed'),
+    [
+        ('inner', True),
+        ('', True),  # Empty role
+        ('a' * TAGS_KEY_MAX_LENGTH, True),  # At limit
+        ('a' * (TAGS_KEY_MAX_LENGTH + 1), False),  # Too long
+    ],
+)
+async def test_changeset_upload_member_role(
+    client: AsyncClient, changeset_id: ChangesetId, role, should_succeed
+):
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {
+                'create': [
+                    ('node', {'@id': -1, '@lat': 0, '@lon': 0}),
+                    (
+                        'relation',
+                        {
+                            '@id': -1,
+                            'member': [{'@type': 'node', '@ref': -1, '@role': role}],
+                        },
+                    ),
+                ]
+            }
+        }),
+    )
+
+    if should_succeed:
+        assert r.is_success, r.text
+    else:
+        assert r.status_code == status.HTTP_400_BAD_REQUEST, r.text
+
+
+async def test_changeset_upload_tags_verbatim(
+    client: AsyncClient, changeset_id: ChangesetId
+):
+    tags = {
+        'phone': '+44 20 7946 0000',
+        'website': 'https://e.com/?q=a+b&x=%2F',
+        'name': 'C++ 100% caf%C3%A9',
+    }
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {
+                'create': [
+                    (
+                        'node',
+                        {
+                            '@id': -1,
+                            '@lat': 0,
+                            '@lon': 0,
+                            'tag': [{'@k': k, '@v': v} for k, v in tags.items()],
+                        },
+                    ),
+                ]
+            }
+        }),
+    )
+    assert r.is_success, r.text
+
+    # Tags must be stored as uploaded, without URL unquoting
+    r = await client.get(f'/api/0.6/changeset/{changeset_id}/download')
+    assert r.is_success, r.text
+    changes = XMLToDict.parse(r.content)['osmChange']
+    node = next(value['node'] for key, value in changes if key == 'create')  # type: ignore
+    assert {tag['@k']: tag['@v'] for tag in node['tag']} == tags
@@ -561,3 +561,71 @@ async def test_element_visibility(client: AsyncClient):
     assert len(nodes) == 2, 'History must contain 2 versions'
     assert_model(nodes[0], {'@id': node_id, '@version': 1, '@visible': True})
     assert_model(nodes[1], {'@id': node_id, '@version': 2, '@visible': False})
+
+
+async def test_element_empty_relation_json(client: AsyncClient):
+    client.headers['Authorization'] = 'User user1'
+
+    # Create a changeset
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse({
+            'osm': {
+                'changeset': {
+                    'tag': [
+                        {
+                            '@k': 'created_by',
+                            '@v': test_element_empty_relation_json.__name__,
+                        },
+                    ]
+                }
+            }
+        }),
+    )
+    assert r.is_success, r.text
+    changeset_id = int(r.text)
+
+    # Create a relation without members
+    r = await client.put(
+        '/api/0.6/relation/create',
+        content=XMLToDict.unparse({
+            'osm': {
+                'relation': {
+                    '@changeset': changeset_id,
+                    'tag': [{'@k': 'type', '@v': 'multipolygon'}],
+                }
+            }
+        }),
+    )
+    assert r.is_success, r.text
+    relation_id = int(r.text)
+
+    # Delete the relation
+    r = await client.request(
+        'DELETE',
+        f'/api/0.6/relation/{relation_id}',
+        content=XMLToDict.unparse({
+            'osm': {
+                'relation': {
+                    '@changeset': changeset_id,
+                    '@version': 1,
+                }
+            }
+        }),
+    )
+    assert r.is_success, r.text
+
+    # Visible relations list their members, even if empty
+    r = await client.get(f'/api/0.6/relation/{relation_id}/history.json')
+    assert r.is_success, r.text
+    relations = r.json()['elements']
+    assert relations[0]['members'] == []
+    assert 'members' not in relations[1]
+
+    # The batch encoding must match the single element encoding
+    for relation in relations:
+        r = await client.get(
+            f'/api/0.6/relation/{relation_id}/{relation["version"]}.json'
+        )
+        assert r.is_success, r.text
+        assert {k: v for k, v in r.json().items() if k in relation} == relation
@@ -96,3 +96,85 @@ async def test_map_read(client: AsyncClient):
     nodes = [value for key, value in map_data if key == 'node']
     deleted_node = next((node for node in nodes if node['@id'] == node_id), None)
     assert deleted_node is None, 'Deleted node must not appear in map response'
+
+
+async def test_map_read_after_move(client: AsyncClient):
+    client.headers['Authorization'] = 'User user1'
+
+    # Create a changeset
+    r = await client.put(
+        '/api/0.6/changeset/create',
+        content=XMLToDict.unparse({
+            'osm': {
+                'changeset': {
+                    'tag': [
+                        {'@k': 'created_by', '@v': test_map_read_after_move.__name__}
+                    ]
+                }
+            }
+        }),
+    )
+    assert r.is_success, r.text
+    changeset_id = int(r.text)
+
+    # Create a node at random coordinates
+    lon = round(random.uniform(-179, 178), 7)
+    lat = round(random.uniform(-89, 89), 7)
+    r = await client.put(
+        '/api/0.6/node/create',
+        content=XMLToDict.unparse({
+            'osm': {
+                'node': {
+                    '@changeset': changeset_id,
+                    '@lon': lon,
+                    '@lat': lat,
+                }
+            }
+        }),
+    )
+    assert r.is_success, r.text
+    node_id = int(r.text)
+
+    # Populate the map cache
+    bbox = f'{lon},{lat},{lon},{lat}'
+    r = await client.get('/api/0.6/map', params={'bbox': bbox})
+    assert r.is_success, r.text
+
+    # Move the node away
+    new_lon = lon + 0.5
+    r = await client.put(
+        f'/api/0.6/node/{node_id}',
+        content=XMLToDict.unparse({
+            'osm': {
+                'node': {
+                    '@changeset': changeset_id,
+                    '@version': 1,
+                    '@lon': new_lon,
+                    '@lat': lat,
+                }
+            }
+        }),
+    )
+    assert r.is_success, r.text
+
+    # Verify that the node is no longer at the old location
+    r = await client.get('/api/0.6/map', params={'bbox': bbox})
+    assert r.is_success, r.text
+    map_data = XMLToDict.parse(r.content)['osm']
+    if isinstance(map_data, list):
+        nodes = [value for key, value in map_data if key == 'node']
+        assert not any(node['@id'] == node_id for node in nodes), (
+            'Moved node must not appear at the old location'
+        )
+
+    # Verify that the node is at the new location
+    r = await client.get(
+        '/api/0.6/map', params={'bbox': f'{new_lon},{lat},{new_lon},{lat}'}
+    )
+    assert r.is_success, r.text
+    map_data = XMLToDict.parse(r.content)['osm']
+    assert isinstance(map_data, list), 'Map response must contain elements'
+    nodes = [value for key, value in map_data if key == 'node']
+    target_node = next((node for node in nodes if node['@id'] == node_id), None)
+    assert target_node is not None, 'Moved node must appear at the new location'
+    assert target_node['@version'] == 2
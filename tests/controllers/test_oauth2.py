@@ -20,6 +20,8 @@ from app.models.db.oauth2_token import (
     OAuth2ResponseMode,
     OAuth2TokenEndpointAuthMethod,
 )
+from app.models.types import ApplicationId
+from app.queries.oauth2_application_query import OAuth2ApplicationQuery
 from speedup.buffered_rand import buffered_rand_urlsafe
 from tests.utils.assert_model import assert_model
 
@@ -388,3 +390,60 @@ async def test_access_token_in_form(client: AsyncClient, valid_scope):
             'The request requires higher privileges than authorized (write_notes)'
             in r.text
         )
+
+
+async def test_revoke_all_authorizations(client: AsyncClient):
+    client.headers['Authorization'] = 'User user1'
+
+    # Create an application with an out-of-band redirect uri
+    r = await client.post(
+        '/api/web/settings/applications/admin/create',
+        data={'name': test_revoke_all_authorizations.__qualname__},
+    )
+    assert r.is_success, r.text
+    edit_url: str = r.json()['redirect_url']
+    app_id = ApplicationId(int(edit_url.split('/')[-2]))
+    app = await OAuth2ApplicationQuery.find_one_by_id(app_id)
+    assert app is not None
+
+    settings = {
+        'name': app['name'],
+        'is_confidential': False,
+        'redirect_uris': 'urn:ietf:wg:oauth:2.0:oob',
+    }
+    r = await client.post(f'/api/web{edit_url}', data=settings)
+    assert r.is_success, r.text
+
+    auth_client = AsyncOAuth2Client(
+        base_url=client.base_url,
+        transport=client._transport,  # noqa: SLF001
+        client_id=app['client_id'],
+        scope='',
+        redirect_uri='urn:ietf:wg:oauth:2.0:oob',
+    )
+    authorization_url, _ = auth_client.create_authorization_url('/oauth2/authorize')
+
+    # Perform authorization
+    r = await client.post(authorization_url)
+    assert r.is_success, r.text
+    authorization_code = r.headers['Test-OAuth2-Authorization-Code']
+    authorization_code = authorization_code.partition('#')[0]
+
+    # Exchange token
+    await auth_client.fetch_token(
+        '/oauth2/token', grant_type='authorization_code', code=authorization_code
+    )
+
+    # Verify token works, caching the authentication
+    r = await auth_client.get('/api/0.6/user/details.json')
+    assert r.is_success, r.text
+
+    # Revoke all authorizations of the application
+    r = await client.post(
+        f'/api/web{edit_url}', data={**settings, 'revoke_all_authorizations': True}
+    )
+    assert r.is_success, r.text
+
+    # Verify token no longer works on the very next request
+    r = await auth_client.get('/api/0.6/user/details.json')
+    assert r.status_code == status.HTTP_401_UNAUTHORIZED, r.text
@@ -0,0 +1,89 @@
+from datetime import UTC, datetime
+
+import numpy as np
+from shapely import Point
+
+from app.lib.pbf import PBF
+from app.models.db.element import Element
+from app.models.db.element_batch import ElementBatch
+from app.models.types import ChangesetId, DisplayName, SequenceId, UserId
+from speedup.element_type import typed_element_id
+
+
+def _element(typed_id, **kwargs) -> Element:
+    return {
+        'changeset_id': ChangesetId(1),
+        'typed_id': typed_id,
+        'version': 1,
+        'visible': True,
+        'tags': None,
+        'point': None,
+        'members': None,
+        'members_roles': None,
+        'sequence_id': SequenceId(1),
+        'latest': True,
+        'created_at': datetime(2020, 1, 1, 12, 30, 45, tzinfo=UTC),
+        **kwargs,
+    }
+
+
+def test_pbf_roundtrip(tmp_path):
+    node = typed_element_id('node', 1)
+    way = typed_element_id('way', 2)
+    elements = [
+        _element(node, tags={'name': 'ünï'}, point=Point(1.1234567, -2.5)),
+        _element(typed_element_id('node', 5), version=2, visible=False),
+        _element(way, members=[node, node], tags={'highway': 'path'}),
+        _element(
+            typed_element_id('relation', 3),
+            members=[way, node],
+            members_roles=['outer', ''],
+        ),
+        _element(typed_element_id('node', 6), point=Point(0, 0)),
+    ]
+    batch = ElementBatch.from_elements(elements)
+    batch.user_id = np.array([1, 1, 0, 1, 0], np.uint64)
+    batch.users = {
+        UserId(1): {
+            'id': UserId(1),
+            'display_name': DisplayName('user1'),
+            'avatar_type': None,
+            'avatar_id': None,
+        }
+    }
+
+    path = tmp_path.joinpath('test.osm.pbf')
+    path.write_bytes(PBF.encode_header() + PBF.encode_batch(batch))
+
+    decoded = []
+    with path.open('rb') as f:
+        for offset, size in PBF.blob_ranges(path):
+            f.seek(offset)
+            decoded.extend(PBF.decode_blob(f.read(size)))
+
+    assert [e['typed_id'] for e in decoded] == [e['typed_id'] for e in elements]
+    assert [e['visible'] for e in decoded] == [e['visible'] for e in elements]
+    assert [e['tags'] for e in decoded] == [e['tags'] for e in elements]
+    assert [e['point'] for e in decoded] == [
+        (1.1234567, -2.5),
+        None,
+        None,
+        None,
+        (0, 0),
+    ]
+    assert [e['members'] for e in decoded] == [e['members'] for e in elements]
+    assert [e['members_roles'] for e in decoded] == [
+        None,
+        None,
+        None,
+        ['outer', ''],
+        None,
+    ]
+    assert [e['created_at'] for e in decoded] == [e['created_at'] for e in elements]
+    assert [e['display_name'] for e in decoded] == [
+        'user1',
+        'user1',
+        None,
+        'user1',
+        None,
+    ]
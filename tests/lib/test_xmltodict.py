@@ -89,6 +89,17 @@ def test_xml_parse(input, expected):
     assert XMLToDict.parse(input) == expected
 
 
+@pytest.mark.parametrize('chunk_size', [1, 7, 1024])
+@_check_for_leaks
+def test_xml_iterparse(chunk_size):
+    input = (
+        b'<osmChange><modify><node id="1" user="\xe5\xb0\x8f\xe6\x99\xba"/></modify>'
+        b'<create><way id="2"><nd ref="1"/><tag k="test" v="a &amp; b"/></way></create></osmChange>'
+    )
+    chunks = (input[i : i + chunk_size] for i in range(0, len(input), chunk_size))
+    assert list(XMLToDict.iterparse(chunks)) == XMLToDict.parse(input)['osmChange']
+
+
 @pytest.mark.parametrize(
     ('input', 'expected'),
     [
@@ -164,3 +175,29 @@ def test_xml_unparse_xattr():
 def test_xml_unparse_invalid_multi_root():
     with pytest.raises(ValueError):
         XMLToDict.unparse({'root1': {}, 'root2': {}})
+
+
+@pytest.mark.parametrize(
+    ('input', 'expected'),
+    [
+        (
+            {'osm': {'@version': '0.6', 'node': [{'@id': 1}, {'@id': 2}]}},
+            '<node id="1"/><node id="2"/>',
+        ),
+        (
+            {'osmChange': [('create', {'node': {'@id': 1, '@user': '小智智'}})]},
+            '<create><node id="1" user="小智智"/></create>',
+        ),
+        (
+            {'osm': {}},
+            '',
+        ),
+        (
+            {'osm': []},
+            '',
+        ),
+    ],
+)
+@_check_for_leaks
+def test_xml_unparse_fragment(input, expected):
+    assert XMLToDict.unparse(input, fragment=True) == expected
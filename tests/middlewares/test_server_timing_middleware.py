@@ -0,0 +1,29 @@
+from httpx import AsyncClient
+
+from app.lib.xmltodict import XMLToDict
+from app.models.types import ChangesetId
+
+
+async def test_server_timing_upload(client: AsyncClient, changeset_id: ChangesetId):
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {'create': [('node', {'@id': -1, '@lat': 1, '@lon': 2})]}
+        }),
+    )
+    assert r.is_success, r.text
+
+    phases = {part.split(';', 1)[0] for part in r.headers['Server-Timing'].split(', ')}
+    assert {
+        'xml_parse',
+        'decode',
+        'preload_changeset',
+        'apply',
+        'copy_elements',
+    } <= phases
+
+
+async def test_server_timing_not_measured(client: AsyncClient):
+    r = await client.get('/api/0.6/capabilities')
+    assert r.is_success, r.text
+    assert 'Server-Timing' not in r.headers
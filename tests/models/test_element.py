@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from app.models.element import (
+    ELEMENT_TYPES,
+    split_typed_element_ids_array,
+    typed_element_ids_array,
+)
+from speedup.element_type import split_typed_element_ids, typed_element_id
+
+
+def test_typed_element_ids_array_roundtrip():
+    type_ids = [
+        ('node', 1),
+        ('node', -5),
+        ('way', 2),
+        ('relation', (1 << 56) - 1),
+        ('relation', -3),
+    ]
+    typed_ids = [typed_element_id(type, id) for type, id in type_ids]  # type: ignore
+
+    type_nums, ids = split_typed_element_ids_array(np.array(typed_ids, np.uint64))
+    assert [ELEMENT_TYPES[num] for num in type_nums.tolist()] == [
+        type for type, _ in split_typed_element_ids(typed_ids)
+    ]
+    assert ids.tolist() == [id for _, id in type_ids]
+    assert typed_element_ids_array(type_nums, ids).tolist() == typed_ids
+
+
+def test_typed_element_ids_array_single_type():
+    assert typed_element_ids_array(1, np.array([1, -2], np.int64)).tolist() == [
+        typed_element_id('way', 1),  # type: ignore
+        typed_element_id('way', -2),  # type: ignore
+    ]
+
+
+def test_typed_element_ids_array_invalid():
+    with pytest.raises(OverflowError):
+        typed_element_ids_array(0, np.array([1 << 56], np.int64))
+    with pytest.raises(NotImplementedError):
+        typed_element_ids_array(3, np.array([1], np.int64))
+    with pytest.raises(NotImplementedError):
+        split_typed_element_ids_array(np.array([3 << 60], np.uint64))
@@ -0,0 +1,111 @@
+from datetime import UTC, datetime
+
+from shapely import Point
+
+from app.format import Format06
+from app.lib.xmltodict import XMLToDict
+from app.models.db.element import Element
+from app.models.db.element_batch import ElementBatch
+from app.models.types import ChangesetId, SequenceId
+from speedup.element_type import typed_element_id
+
+
+def _element(typed_id, **kwargs) -> Element:
+    return {
+        'changeset_id': ChangesetId(1),
+        'typed_id': typed_id,
+        'version': 1,
+        'visible': True,
+        'tags': None,
+        'point': None,
+        'members': None,
+        'members_roles': None,
+        'sequence_id': SequenceId(1),
+        'latest': True,
+        'created_at': datetime(2020, 1, 1, 12, 30, 45, 123456, tzinfo=UTC),
+        **kwargs,
+    }
+
+
+def test_element_batch_roundtrip():
+    node = typed_element_id('node', 1)
+    way = typed_element_id('way', 2)
+    elements = [
+        _element(node, tags={'name': 'test'}, point=Point(1.1234567, -2.5)),
+        _element(typed_element_id('node', -1), version=2, visible=False),
+        _element(way, members=[node, node]),
+        _element(
+            typed_element_id('relation', 3),
+            members=[way, node],
+            members_roles=['outer', ''],
+        ),
+    ]
+
+    batch = ElementBatch.from_elements(elements)
+    assert len(batch) == len(elements)
+
+    result = batch.to_elements()
+    for element, expected in zip(result, elements, strict=True):
+        point = element.pop('point')
+        expected_point = expected.pop('point')
+        assert element == expected
+        assert point == expected_point
+
+    # Slicing must rebase the offsets
+    sliced = batch[2:]
+    assert len(sliced) == 2
+    assert [element['members'] for element in sliced.to_elements()] == [
+        [node, node],
+        [way, node],
+    ]
+    assert sliced.to_elements()[1]['members_roles'] == ['outer', '']
+    assert not batch[0:0].to_elements()
+
+
+def test_element_batch_string_columns():
+    elements = [
+        _element(typed_element_id('node', 1), tags={'name': 'zażółć', 'a': 'b'}),
+        _element(typed_element_id('node', 2)),
+        _element(typed_element_id('node', 3), tags={'ę': ''}),
+    ]
+
+    # Strings are stored as UTF-8 bytes, indexed by offsets
+    batch = ElementBatch.from_elements(elements)
+    assert batch.tags_keys.tobytes() == 'nameaę'.encode()
+    assert batch.tags_keys_offsets.tolist() == [0, 4, 5, 7]
+    assert batch.tags_values.tobytes() == 'zażółćb'.encode()
+    assert batch.tags_values_offsets.tolist() == [0, 10, 11, 11]
+
+    sliced = batch[1:]
+    assert sliced.tags_keys.tobytes() == 'ę'.encode()
+    assert sliced.tags_keys_offsets.tolist() == [0, 2]
+    assert sliced.to_elements()[1]['tags'] == {'ę': ''}
+
+
+def test_element_batch_encode_osmchange():
+    node = typed_element_id('node', 1)
+    way = typed_element_id('way', 2)
+    elements = [
+        _element(
+            node,
+            tags={'name': 'a & <b> "c"\n', 'emoji': '😀'},
+            point=Point(1.1234567, -0.00001),
+        ),
+        _element(typed_element_id('node', -1), version=2, visible=False),
+        _element(way, version=2, members=[node, typed_element_id('node', -1)]),
+        _element(
+            typed_element_id('relation', 3),
+            members=[way, node],
+            members_roles=['outer', ''],
+        ),
+    ]
+
+    # The direct encoder must match the generic dict encoder
+    expected = XMLToDict.unparse(
+        {'osmChange': Format06.encode_osmchange(elements)},
+        binary=True,
+        fragment=True,
+    )
+    batch = ElementBatch.from_elements(elements)
+    assert Format06.encode_osmchange_batch(batch) == expected
+    assert Format06.encode_osmchange_batch(batch[0:0]) == b''
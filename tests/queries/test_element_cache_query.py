@@ -0,0 +1,59 @@
+from httpx import AsyncClient
+
+from app.lib.xmltodict import XMLToDict
+from app.models.types import ChangesetId
+from app.queries.element_cache_query import ElementCacheQuery
+from app.queries.element_query import ElementQuery
+from speedup.element_type import split_typed_element_id
+
+
+async def test_element_cache_invalidated_by_diff(
+    client: AsyncClient, changeset_id: ChangesetId
+):
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {'create': [('node', {'@id': -1, '@lat': 1, '@lon': 2})]}
+        }),
+    )
+    assert r.is_success, r.text
+    (node,) = await ElementQuery.get_by_changeset(changeset_id)
+    typed_id = node['typed_id']
+
+    # Populate the cache
+    element = await ElementCacheQuery.get_latest(typed_id)
+    assert element is not None
+    assert element['version'] == 1
+    assert element['latest']
+
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {
+                'modify': [
+                    (
+                        'node',
+                        {
+                            '@id': split_typed_element_id(typed_id)[1],
+                            '@version': 1,
+                            '@changeset': changeset_id,
+                            '@lat': 3,
+                            '@lon': 4,
+                        },
+                    )
+                ]
+            }
+        }),
+    )
+    assert r.is_success, r.text
+
+    element = await ElementCacheQuery.get_latest(typed_id)
+    assert element is not None
+    assert element['version'] == 2
+
+    element = await ElementCacheQuery.get_version(typed_id, 1)
+    assert element is not None
+    assert not element['latest']
+    assert element['point'] == node['point']
+
+    assert await ElementCacheQuery.get_version(typed_id, 3) is None
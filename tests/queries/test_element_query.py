@@ -0,0 +1,163 @@
+import random
+from datetime import timedelta
+
+from httpx import AsyncClient
+from shapely import box
+
+from app.lib.xmltodict import XMLToDict
+from app.models.types import ChangesetId
+from app.queries.element_query import ElementQuery
+from speedup.element_type import split_typed_element_id
+
+
+async def test_iter_batches_by_changeset(
+    client: AsyncClient, changeset_id: ChangesetId
+):
+    # Upload elements covering all the batch columns
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {
+                'create': [
+                    (
+                        'node',
+                        {
+                            '@id': -1,
+                            '@lat': 1.5,
+                            '@lon': -2.25,
+                            'tag': [{'@k': 'name', '@v': 'zażółć'}],
+                        },
+                    ),
+                    ('node', {'@id': -2, '@lat': 0, '@lon': 0}),
+                    ('way', {'@id': -1, 'nd': [{'@ref': -1}, {'@ref': -2}]}),
+                    (
+                        'relation',
+                        {
+                            '@id': -1,
+                            'member': [
+                                {'@type': 'way', '@ref': -1, '@role': 'outer'},
+                                {'@type': 'node', '@ref': -1, '@role': ''},
+                            ],
+                        },
+                    ),
+                ]
+            }
+        }),
+    )
+    assert r.is_success, r.text
+
+    expected = await ElementQuery.get_by_changeset(changeset_id)
+    batches = [
+        batch
+        async for batch in ElementQuery.iter_batches_by_changeset(
+            changeset_id, batch_size=3
+        )
+    ]
+    assert [len(batch) for batch in batches] == [3, 1]
+
+    result = [element for batch in batches for element in batch.to_elements()]
+    assert result == expected
+
+
+async def test_find_page_by_geom(client: AsyncClient, changeset_id: ChangesetId):
+    lon, lat = random.uniform(-170, 170), random.uniform(-80, 80)
+    geometry = box(lon - 0.001, lat - 0.001, lon + 0.001, lat + 0.001)
+
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {
+                'create': [
+                    *(
+                        ('node', {'@id': -i, '@lat': lat, '@lon': lon})
+                        for i in range(1, 4)
+                    ),
+                    ('way', {'@id': -1, 'nd': [{'@ref': -1}, {'@ref': -2}]}),
+                ]
+            }
+        }),
+    )
+    assert r.is_success, r.text
+    node1, node2, node3, way = await ElementQuery.get_by_changeset(changeset_id)
+    at_sequence_id = await ElementQuery.get_current_sequence_id()
+
+    # Move the first node out of the geometry after the snapshot
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {
+                'modify': [
+                    (
+                        'node',
+                        {
+                            '@id': split_typed_element_id(node1['typed_id'])[1],
+                            '@version': 1,
+                            '@changeset': changeset_id,
+                            '@lat': 0,
+                            '@lon': 0,
+                        },
+                    )
+                ]
+            }
+        }),
+    )
+    assert r.is_success, r.text
+
+    # Pages are consistent with the snapshot
+    elements, next_typed_id = await ElementQuery.find_page_by_geom(
+        geometry, at_sequence_id=at_sequence_id, nodes_limit=2
+    )
+    assert [e['typed_id'] for e in elements] == [
+        node1['typed_id'],
+        node2['typed_id'],
+        way['typed_id'],
+    ]
+    assert elements[0]['version'] == 1
+    assert next_typed_id == node2['typed_id']
+
+    elements, next_typed_id = await ElementQuery.find_page_by_geom(
+        geometry,
+        at_sequence_id=at_sequence_id,
+        after_typed_id=next_typed_id,
+        nodes_limit=2,
+    )
+    assert [e['typed_id'] for e in elements] == [node3['typed_id']]
+    assert next_typed_id is None
+
+    # The current snapshot no longer contains the moved node
+    elements, next_typed_id = await ElementQuery.find_page_by_geom(
+        geometry,
+        at_sequence_id=await ElementQuery.get_current_sequence_id(),
+        nodes_limit=2,
+    )
+    assert [e['typed_id'] for e in elements] == [
+        node2['typed_id'],
+        node3['typed_id'],
+        node1['typed_id'],
+        way['typed_id'],
+    ]
+    assert elements[2]['version'] == 2
+    assert next_typed_id is None
+
+
+async def test_get_sequence_id_by_timestamp(
+    client: AsyncClient, changeset_id: ChangesetId
+):
+    r = await client.post(
+        f'/api/0.6/changeset/{changeset_id}/upload',
+        content=XMLToDict.unparse({
+            'osmChange': {'create': [('node', {'@id': -1, '@lat': 1, '@lon': 2})]}
+        }),
+    )
+    assert r.is_success, r.text
+    (node,) = await ElementQuery.get_by_changeset(changeset_id)
+    created_at = node['created_at']
+
+    assert (
+        await ElementQuery.get_sequence_id_by_timestamp(created_at)
+        == node['sequence_id']
+    )
+    sequence_id = await ElementQuery.get_sequence_id_by_timestamp(
+        created_at + timedelta(microseconds=1)
+    )
+    assert sequence_id is None or sequence_id > node['sequence_id']
@@ -1,3 +1,4 @@
+from concurrent.futures import ProcessPoolExecutor
 from inspect import unwrap
 from pathlib import Path
 
@@ -18,7 +19,8 @@ async def test_iterate():
     )
 
     # Iterate once
-    state = await unwrap(_iterate)(state)
+    with ProcessPoolExecutor(1) as pool:
+        state = await unwrap(_iterate)(pool, state)
 
     # Verify the file was created
     path: Path = state.last_replica.path
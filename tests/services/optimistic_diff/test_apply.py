@@ -0,0 +1,105 @@
+import asyncio
+from asyncio import TaskGroup
+
+from shapely import Point
+
+from app.db import db
+from app.models.db.element import ElementInit
+from app.models.element import ElementId
+from app.models.types import ChangesetId
+from app.queries.element_query import ElementQuery
+from app.services.changeset_service import ChangesetService
+from app.services.optimistic_diff import OptimisticDiff
+from app.services.optimistic_diff.apply import _lock_partitions
+from speedup.element_type import split_typed_element_id, typed_element_id
+
+
+async def test_lock_partitions():
+    node_id = typed_element_id('node', ElementId(1))
+    same_partition_node_id = typed_element_id('node', ElementId(2))
+    other_partition_node_id = typed_element_id('node', ElementId(600_000_000))
+
+    locked = asyncio.Event()
+    release = asyncio.Event()
+
+    async def hold_lock():
+        async with db(True) as conn:
+            await _lock_partitions(conn, {node_id})
+            locked.set()
+            await release.wait()
+
+    async def acquire_lock(typed_id):
+        async with db(True) as conn:
+            await _lock_partitions(conn, {typed_id})
+
+    async with TaskGroup() as tg:
+        tg.create_task(hold_lock())
+        await locked.wait()
+
+        # Other partitions are not blocked
+        async with asyncio.timeout(5):
+            await acquire_lock(other_partition_node_id)
+
+        # The same partition is blocked until the transaction ends
+        blocked_task = tg.create_task(acquire_lock(same_partition_node_id))
+        await asyncio.sleep(0.2)
+        assert not blocked_task.done()
+
+        release.set()
+        async with asyncio.timeout(5):
+            await blocked_task
+
+
+async def _get_element_counter() -> tuple[int, int]:
+    async with (
+        db() as conn,
+        await conn.execute('SELECT sequence_id, node_id FROM element_counter') as r,
+    ):
+        return await r.fetchone()  # type: ignore
+
+
+async def test_allocate_ids_concurrent(changeset_id: ChangesetId):
+    changeset_ids = [
+        await ChangesetService.create({'created_by': 'tests'}) for _ in range(3)
+    ]
+    uploads: list[list[ElementInit]] = [
+        [
+            {
+                'changeset_id': changeset_id,
+                'typed_id': typed_element_id('node', ElementId(-j)),
+                'version': 1,
+                'visible': True,
+                'tags': {},
+                'point': Point(i, j),
+                'members': None,
+                'members_roles': None,
+            }
+            for j in range(1, 3)
+        ]
+        for i, changeset_id in enumerate(changeset_ids)
+    ]
+    sequence_id_before, node_id_before = await _get_element_counter()
+
+    # Push changes to the database
+    async with TaskGroup() as tg:
+        tasks = [tg.create_task(OptimisticDiff.run(upload)) for upload in uploads]
+
+    # The counter advances by exactly the allocated ids
+    sequence_id_after, node_id_after = await _get_element_counter()
+    assert sequence_id_after - sequence_id_before == 6
+    assert node_id_after - node_id_before == 6
+
+    # Each element got a distinct id and sequence id from the allocated blocks
+    typed_ids = [
+        typed_id
+        for task in tasks
+        for typed_id, _ in task.result().values()  #
+    ]
+    assert sorted(
+        split_typed_element_id(typed_id)[1] for typed_id in typed_ids
+    ) == list(range(node_id_before + 1, node_id_after + 1))
+
+    elements = await ElementQuery.get_by_refs(typed_ids)
+    assert sorted(element['sequence_id'] for element in elements) == list(
+        range(sequence_id_before + 1, sequence_id_after + 1)
+    )
@@ -1,3 +1,6 @@
+import asyncio
+from asyncio import TaskGroup
+
 import pytest
 from shapely import Point
 
@@ -8,6 +11,8 @@ from app.models.types import ChangesetId
 from app.queries.element_query import ElementQuery
 from app.services.changeset_service import ChangesetService
 from app.services.optimistic_diff import OptimisticDiff
+from app.services.optimistic_diff import apply as optimistic_diff_apply
+from app.services.optimistic_diff.prepare import OptimisticDiffPrepare
 from speedup.element_type import typed_element_id
 from tests.utils.assert_model import assert_model
 
@@ -246,6 +251,97 @@ async def test_create_multiple_nodes(changeset_id: ChangesetId):
     assert_model(name_map['Node 2'], nodes[1] | {'typed_id': typed_ids[1]})
 
 
+def _patch_apply_group(
+    monkeypatch: pytest.MonkeyPatch, num_updates: int, *, fail_groups: bool = False
+) -> list[int]:
+    """
+    Record the sizes of the applied groups.
+    The first group waits until all the updates are prepared, so the rest are grouped.
+    """
+    prepare = OptimisticDiffPrepare.prepare
+    apply_group = optimistic_diff_apply._apply_group  # noqa: SLF001
+    prepared = asyncio.Event()
+    num_prepared = 0
+    group_sizes: list[int] = []
+
+    async def patched_prepare(self: OptimisticDiffPrepare) -> None:
+        nonlocal num_prepared
+        await prepare(self)
+        num_prepared += 1
+        if num_prepared >= num_updates:
+            prepared.set()
+
+    async def patched_apply_group(prepares: list[OptimisticDiffPrepare]):
+        if not group_sizes:
+            async with asyncio.timeout(10):
+                await prepared.wait()
+
+        group_sizes.append(len(prepares))
+        if fail_groups and len(prepares) > 1:
+            raise RuntimeError('Simulated group failure')
+        return await apply_group(prepares)
+
+    monkeypatch.setattr(OptimisticDiffPrepare, 'prepare', patched_prepare)
+    monkeypatch.setattr(optimistic_diff_apply, '_apply_group', patched_apply_group)
+    return group_sizes
+
+
+async def _create_concurrent(num_updates: int) -> None:
+    """Create nodes in concurrent operations, each in its own changeset."""
+    changeset_ids = [
+        await ChangesetService.create({'created_by': 'tests'})
+        for _ in range(num_updates)
+    ]
+    nodes: list[ElementInit] = [
+        {
+            'changeset_id': changeset_id,
+            'typed_id': typed_element_id('node', ElementId(-1)),
+            'version': 1,
+            'visible': True,
+            'tags': {'name': f'Node {i}'},
+            'point': Point(i, i),
+            'members': None,
+            'members_roles': None,
+        }
+        for i, changeset_id in enumerate(changeset_ids)
+    ]
+
+    # Push changes to the database
+    async with TaskGroup() as tg:
+        tasks = [tg.create_task(OptimisticDiff.run([node])) for node in nodes]
+
+    typed_ids = [
+        task.result()[typed_element_id('node', ElementId(-1))][0] for task in tasks
+    ]
+    assert len(set(typed_ids)) == len(nodes)
+
+    # Verify the created elements
+    elements = await ElementQuery.get_by_refs(typed_ids)
+    name_map = {e['tags']['name']: e for e in elements}  # type: ignore
+    for node, typed_id in zip(nodes, typed_ids, strict=True):
+        assert_model(name_map[node['tags']['name']], node | {'typed_id': typed_id})  # type: ignore
+
+
+async def test_create_concurrent(
+    changeset_id: ChangesetId, monkeypatch: pytest.MonkeyPatch
+):
+    # Concurrent updates of different changesets are grouped into shared commits
+    group_sizes = _patch_apply_group(monkeypatch, 5)
+    await _create_concurrent(5)
+    assert max(group_sizes) > 1
+    assert sum(group_sizes) == 5
+
+
+async def test_create_concurrent_group_failure(
+    changeset_id: ChangesetId, monkeypatch: pytest.MonkeyPatch
+):
+    # Failed groups are retried individually
+    group_sizes = _patch_apply_group(monkeypatch, 5, fail_groups=True)
+    await _create_concurrent(5)
+    assert max(group_sizes) > 1
+    assert group_sizes.count(1) == 5
+
+
 def test_create_hidden(changeset_id: ChangesetId):
     # Try to create an element with visible=False (invalid for version 1)
     element: ElementInit = {
@@ -2,10 +2,11 @@ import pytest
 from shapely import Point
 
 from app.models.db.element import ElementInit
-from app.models.element import ElementId
+from app.models.element import ElementId, TypedElementId
 from app.models.types import ChangesetId
 from app.queries.element_query import ElementQuery
 from app.services.optimistic_diff import OptimisticDiff
+from app.services.optimistic_diff.prepare import OptimisticDiffPrepare
 from speedup.element_type import typed_element_id
 from tests.utils.assert_model import assert_model
 
@@ -244,3 +245,52 @@ async def test_multiple_consecutive_modifications(changeset_id: ChangesetId):
     elements = await ElementQuery.get_versions_by_ref(node_typed_id, sort_dir='asc')
     for element, node in zip(elements, nodes, strict=True):
         assert_model(element, node | {'typed_id': node_typed_id})
+
+
+async def test_prepare_reuses_unchanged_elements(changeset_id: ChangesetId):
+    # Create two nodes
+    nodes: list[ElementInit] = [
+        {
+            'changeset_id': changeset_id,
+            'typed_id': typed_element_id('node', ElementId(-i)),
+            'version': 1,
+            'visible': True,
+            'tags': {},
+            'point': Point(i, i),
+            'members': None,
+            'members_roles': None,
+        }
+        for i in (1, 2)
+    ]
+    assigned_ref_map = await OptimisticDiff.run(nodes)
+    typed_id1 = assigned_ref_map[typed_element_id('node', ElementId(-1))][0]
+    typed_id2 = assigned_ref_map[typed_element_id('node', ElementId(-2))][0]
+
+    def modify(typed_id: TypedElementId, version: int) -> ElementInit:
+        return {
+            'changeset_id': changeset_id,
+            'typed_id': typed_id,
+            'version': version,
+            'visible': True,
+            'tags': {'version': str(version)},
+            'point': Point(0, 0),
+            'members': None,
+            'members_roles': None,
+        }
+
+    # Prepare a modification of both nodes
+    prep1 = OptimisticDiffPrepare([modify(typed_id1, 2), modify(typed_id2, 2)])
+    await prep1.prepare()
+
+    # Concurrently modify the second node
+    await OptimisticDiff.run([modify(typed_id2, 2)])
+
+    # Re-prepare: the first node is reused, the second node is reloaded
+    prep2 = OptimisticDiffPrepare([modify(typed_id1, 2), modify(typed_id2, 3)], prep1)
+    await prep2.prepare()
+
+    remote1 = prep2.element_state[typed_id1].remote
+    remote2 = prep2.element_state[typed_id2].remote
+    assert remote1 is prep1.element_state[typed_id1].remote
+    assert remote2 is not None
+    assert remote2['version'] == 2
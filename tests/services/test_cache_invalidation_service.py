@@ -0,0 +1,29 @@
+import pytest
+
+from app.services.cache_invalidation_service import (
+    _HANDLERS,
+    CacheInvalidationService,
+    _dispatch_payload,
+)
+
+
+@pytest.fixture
+def received():
+    received: list[list[int] | None] = []
+    CacheInvalidationService.register('element', received.append)
+    yield received
+    _HANDLERS['element'].remove(received.append)
+
+
+def test_dispatch_payload(received):
+    _dispatch_payload('element:1,22,333')
+    _dispatch_payload('element')
+    assert received == [[1, 22, 333], None]
+
+
+async def test_publish_invalidates_current_process(received):
+    keys = list(range(1000))
+    await CacheInvalidationService.publish('element', keys)
+    await CacheInvalidationService.publish('element', [])
+    await CacheInvalidationService.publish('element')
+    assert received == [keys, None]